@@ -67,6 +67,10 @@ def get_hidden_imports():
         "webbrowser",
         "time",
         "threading",
+        "selectors",
+        "asyncio",
+        "codecs",
+        "locale",
         "re",
         "os",
         "sys",
@@ -79,13 +83,39 @@ def get_hidden_imports():
         "gui",
         "utils",
         "core.pjsua_utils",
+        "core.pjsua_discovery",
         "core.sip_manager",
+        "core.sip_engine",
+        "core.scheduler",
+        "core.async_driver",
+        "core.pjsua_options",
+        "core.pjsua_parser",
+        "core.pjsua_events",
+        "core.pipe_reader",
+        "core.pjsua_commands",
+        "core.stdin_writer",
+        "core.connection_state",
+        "core.accounts",
+        "core.warm_pool",
+        "core.port_allocator",
+        "core.call_metrics",
+        "core.metrics_server",
+        "core.cdr_store",
+        "core.structured_log",
         "gui.ui_manager",
+        "gui.ui_dispatcher",
         "gui.status_panel",
         "gui.dial_panel",
         "gui.settings_panel",
+        "gui.account_panel",
+        "gui.log_filter_panel",
         "utils.logger",
-        "utils.config_manager"
+        "utils.config_manager",
+        "utils.process_stats",
+        "utils.log_store",
+        "utils.log_sink",
+        "utils.log_index",
+        "headless_client"
     ]
     
     hidden_imports.extend(project_modules)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SIP账号
+
+一个pjsua进程可以同时注册多个账号：启动时第一个账号之后的账号以
+--next-account追加，运行中用+a/-a控制台命令增删。每个账号有自己的
+注册状态(复用连接状态机)、pjsua账号ID和呼叫统计。
+"""
+
+from core import connection_state
+from core.connection_state import ConnectionStateMachine
+
+
+class SIPAccount:
+    """一个SIP账号及其在pjsua中的状态"""
+
+    def __init__(self, username, password, server, on_change=None):
+        """
+        初始化账号
+
+        Args:
+            username: 用户名
+            password: 密码
+            server: SIP服务器地址
+            on_change: 状态变化回调 on_change(账号, 旧状态, 新状态, 原因)
+        """
+        self.username = username
+        self.password = password
+        self.server = server
+        self.key = f"{username}@{server}"
+        self.uri = f"sip:{self.key}"
+        self.registrar = f"sip:{server}"
+
+        # pjsua中的账号ID，从d命令的输出中获知
+        self.acc_id = None
+        self.last_error = None
+        self.calls = 0
+
+        self.state = ConnectionStateMachine(
+            on_change=(lambda old, new, reason: on_change(self, old, new, reason)) if on_change else None)
+
+    def pjsua_args(self):
+        """该账号的pjsua命令行参数"""
+        return [
+            f"--id={self.uri}",
+            f"--registrar={self.registrar}",
+            "--realm=*",
+            f"--username={self.username}",
+            f"--password={self.password}",
+        ]
+
+    def to_config(self):
+        """保存到配置文件的内容"""
+        return {'server': self.server, 'username': self.username, 'password': self.password}
+
+    def __repr__(self):
+        return f"SIPAccount({self.key}, acc_id={self.acc_id}, state={self.state.state})"
+
+
+class AccountTable:
+    """账号表: 主账号排在最前，按键、URI或pjsua账号ID查找均为O(1)"""
+
+    def __init__(self):
+        self._accounts = {}  # 键 -> SIPAccount，保持添加顺序
+        self._primary_key = None
+        self._by_uri = {}
+        self._by_acc_id = {}
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(list(self._accounts.values()))
+
+    def __contains__(self, key):
+        return key in self._accounts
+
+    @property
+    def primary(self):
+        """主账号(登录界面中的账号)，尚未登录时为None"""
+        return self._accounts.get(self._primary_key)
+
+    def extras(self):
+        """主账号之外的账号"""
+        return [a for a in self._accounts.values() if a.key != self._primary_key]
+
+    def set_primary(self, account):
+        """设置主账号，替换原主账号，其余账号保持不变"""
+        extras = [a for a in self.extras() if a.key != account.key]
+        self._primary_key = account.key
+        self._accounts.clear()
+        self._by_uri.clear()
+        self._by_acc_id.clear()
+        for item in [account] + extras:
+            self.add(item)
+
+    def add(self, account):
+        """添加账号，键已存在时返回False"""
+        if account.key in self._accounts:
+            return False
+        self._accounts[account.key] = account
+        self._by_uri[account.uri] = account
+        if account.acc_id is not None:
+            self._by_acc_id[account.acc_id] = account
+        return True
+
+    def remove(self, key):
+        """移除账号并返回它，不存在时返回None"""
+        account = self._accounts.pop(key, None)
+        if account is not None:
+            self._by_uri.pop(account.uri, None)
+            if self._by_acc_id.get(account.acc_id) is account:
+                del self._by_acc_id[account.acc_id]
+        return account
+
+    def get(self, key):
+        """按键(用户名@服务器)查找"""
+        return self._accounts.get(key)
+
+    def by_uri(self, uri):
+        """按账号URI查找，忽略尖括号"""
+        if not uri:
+            return None
+        return self._by_uri.get(uri.strip("<>"))
+
+    def by_acc_id(self, acc_id):
+        """按pjsua账号ID查找"""
+        return self._by_acc_id.get(acc_id)
+
+    def set_acc_id(self, account, acc_id):
+        """记录账号在pjsua中的ID"""
+        if self._by_acc_id.get(account.acc_id) is account:
+            del self._by_acc_id[account.acc_id]
+        account.acc_id = acc_id
+        if acc_id is not None:
+            self._by_acc_id[acc_id] = account
+
+    def clear_acc_ids(self):
+        """pjsua进程结束后账号ID失效"""
+        for account in self._accounts.values():
+            account.acc_id = None
+        self._by_acc_id.clear()
+
+    def snapshot(self):
+        """
+        各账号当前状态的快照，供界面显示
+
+        Returns:
+            list: [(键, 状态), ...]，已登录时第一个为主账号
+        """
+        return [(account.key, account.state.state) for account in self._accounts.values()]
+
+    def registered_count(self):
+        """注册有效的账号数"""
+        return sum(1 for account in self._accounts.values()
+                   if account.state.state in connection_state.CONNECTED_STATES)
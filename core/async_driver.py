@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pjsua的asyncio驱动
+
+基于asyncio.create_subprocess_exec管理pjsua进程的标准输入输出，
+不为每个进程创建线程，一个事件循环即可同时驱动大量pjsua子进程。
+"""
+
+import os
+import sys
+import asyncio
+
+from core.pipe_reader import LineSplitter
+from core.pjsua_options import VERBOSE_LOG_LEVEL, PJSUA_ENCODING
+from core.pjsua_events import (PjsuaEventStream, RegistrationSucceeded, CallState,
+                               CallFailed, ConsoleReply, ProcessExited)
+
+# 等待控制台输入提示的超时(秒)
+PROMPT_TIMEOUT = 5.0
+
+
+class PjsuaError(Exception):
+    """pjsua操作失败或超时"""
+
+
+def install_child_watcher():
+    """
+    为asyncio子进程选择不为每个子进程创建线程的监视器
+
+    Python 3.8-3.11在POSIX上默认使用ThreadedChildWatcher，每个子进程占用一个
+    等待线程；此时改用pidfd(Linux 5.3+)，不支持时退回SIGCHLD信号方式
+    (须在主线程的事件循环中使用)。Python 3.12起及Windows上无需处理。
+    """
+    if sys.platform == "win32" or sys.version_info >= (3, 12):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+        watcher = asyncio.PidfdChildWatcher()
+    except (AttributeError, OSError):
+        watcher = asyncio.SafeChildWatcher()
+    asyncio.set_child_watcher(watcher)
+
+
+class AsyncPjsuaDriver:
+    """在asyncio事件循环中驱动一个pjsua进程"""
+
+    def __init__(self, pjsua_path, server, username, password, port=5060,
+                 log_level=VERBOSE_LOG_LEVEL, extra_args=(), command_prefix=(),
+                 encoding=PJSUA_ENCODING, chunk_size=65536):
+        """
+        初始化驱动
+
+        Args:
+            pjsua_path: pjsua可执行文件路径
+            server: SIP服务器地址
+            username: 用户名
+            password: 密码
+            port: 本地SIP端口
+            log_level: pjsua日志级别
+            extra_args: 附加的pjsua命令行参数
+            command_prefix: 加在pjsua路径之前的命令(如以python运行模拟pjsua)
+            encoding: 标准输入输出编码
+            chunk_size: 单次读取的最大字节数
+        """
+        self.pjsua_path = pjsua_path
+        self.server = server
+        self.username = username
+        self.password = password
+        self.port = port
+        self.log_level = log_level
+        self.extra_args = tuple(extra_args)
+        self.command_prefix = tuple(command_prefix)
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+        self.process = None
+        self.returncode = None
+        self.call_id = None
+        self.stream = PjsuaEventStream()
+        self.stream.subscribe(self._dispatch)
+
+        self._reader_task = None
+        self._waiters = []  # [(判断函数, Future), ...]
+        self._queues = []   # 各事件迭代器的队列
+
+    def build_command(self):
+        """构建pjsua命令行"""
+        return [
+            *self.command_prefix,
+            self.pjsua_path,
+            f"--id=sip:{self.username}@{self.server}",
+            f"--registrar=sip:{self.server}",
+            "--realm=*",
+            f"--username={self.username}",
+            f"--password={self.password}",
+            f"--log-level={self.log_level}",
+            f"--app-log-level={self.log_level}",
+            f"--local-port={self.port}",
+            *self.extra_args,
+        ]
+
+    async def start(self):
+        """启动pjsua进程和读取任务"""
+        if self.process is not None:
+            return
+        self.process = await asyncio.create_subprocess_exec(
+            *self.build_command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def login(self, timeout=15.0):
+        """
+        启动pjsua并等待注册成功
+
+        Args:
+            timeout: 等待注册结果的超时(秒)
+
+        Returns:
+            RegistrationSucceeded: 注册成功事件
+        """
+        return await self._request(self.start(), lambda event: isinstance(event, RegistrationSucceeded),
+                                   timeout, "注册")
+
+    async def call(self, uri, timeout=30.0):
+        """
+        拨打电话并等待接通
+
+        与引擎的命令队列一样，先发送m并等待"Make call"提示，再发送URI，
+        pjsua尚未准备好读取URI时不会把它当作下一条命令。
+
+        Args:
+            uri: 被叫SIP URI
+            timeout: 等待接通的超时(秒)
+
+        Returns:
+            CallState: 通话建立(CONFIRMED)事件
+
+        Raises:
+            PjsuaError: 拨号失败、被拒绝或超时
+        """
+        await self._request(
+            self.send("m\r\n"),
+            lambda event: isinstance(event, ConsoleReply) and event.reply == ConsoleReply.MAKE_CALL,
+            PROMPT_TIMEOUT, "等待拨号提示")
+        event = await self._request(
+            self.send(f"{uri}\r\n"),
+            lambda event: isinstance(event, CallFailed) or (
+                isinstance(event, CallState) and
+                event.state in (CallState.CONFIRMED, CallState.DISCONNECTED)),
+            timeout, "呼叫")
+        if isinstance(event, CallFailed):
+            raise PjsuaError(f"拨号失败: {event.reason}")
+        if event.state == CallState.DISCONNECTED:
+            raise PjsuaError(f"呼叫被拒绝: {event.status_code} {event.reason}")
+        self.call_id = event.call_id
+        return event
+
+    async def hangup(self, timeout=5.0):
+        """
+        挂断当前通话并等待断开
+
+        Args:
+            timeout: 等待断开的超时(秒)
+
+        Returns:
+            CallState: 通话断开(DISCONNECTED)事件
+        """
+        call_id = self.call_id
+        event = await self._request(
+            self.send("h\r\n"),
+            lambda event: isinstance(event, CallState) and
+            event.state == CallState.DISCONNECTED and
+            (call_id is None or event.call_id == call_id),
+            timeout, "挂断")
+        self.call_id = None
+        return event
+
+    async def close(self, timeout=2.0):
+        """
+        退出pjsua，超时未退出时强制终止
+
+        Returns:
+            int: 进程返回码
+        """
+        process = self.process
+        if process is None:
+            return self.returncode
+        if process.returncode is None:
+            try:
+                await self.send("q\r\n")
+                await asyncio.wait_for(process.wait(), timeout)
+            except (PjsuaError, ConnectionError, asyncio.TimeoutError):
+                if process.returncode is None:
+                    process.terminate()
+        if self._reader_task is not None:
+            await self._reader_task
+        return self.returncode
+
+    async def send(self, *texts):
+        """向pjsua标准输入写入一条或多条命令文本"""
+        if self.process is None or self.process.returncode is not None:
+            raise PjsuaError("pjsua进程未运行")
+        self.process.stdin.write("".join(texts).encode(self.encoding))
+        await self.process.stdin.drain()
+
+    def events(self):
+        """
+        异步迭代之后发生的事件，进程结束(ProcessExited)后停止
+
+        调用时即开始缓存事件，可在login()之前创建迭代器而不丢失注册事件。
+
+        Returns:
+            异步迭代器，产生解析得到的事件(不含OutputLine)
+        """
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        return self._iterate(queue)
+
+    async def _iterate(self, queue):
+        """从队列中依次取出事件"""
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if isinstance(event, ProcessExited):
+                    return
+        finally:
+            self._queues.remove(queue)
+
+    def __aiter__(self):
+        return self.events()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, operation, predicate, timeout, action):
+        """
+        执行操作并等待满足条件的事件
+
+        等待条件在执行操作之前登记，不会错过紧随命令输出的响应。
+
+        Args:
+            operation: 要执行的协程(启动进程或发送命令)
+            predicate: 判断事件是否为期望响应的函数
+            timeout: 超时(秒)
+            action: 操作名称，用于错误信息
+
+        Returns:
+            PjsuaEvent: 满足条件的事件
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = (predicate, future)
+        self._waiters.append(waiter)
+        try:
+            await operation
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise PjsuaError(f"{action}超时 ({timeout}秒)") from None
+        finally:
+            self._waiters.remove(waiter)
+            if not future.done():
+                future.cancel()
+
+    def _dispatch(self, event):
+        """将事件交给等待者和迭代器"""
+        for predicate, future in list(self._waiters):
+            if not future.done():
+                if isinstance(event, ProcessExited):
+                    future.set_exception(PjsuaError(f"pjsua进程已退出 (返回码 {event.returncode})"))
+                elif predicate(event):
+                    future.set_result(event)
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+    async def _read_loop(self):
+        """读取pjsua输出直到管道关闭"""
+        splitter = LineSplitter(self.encoding)
+        read = self.process.stdout.read
+        feed_lines = self.stream.feed_lines
+        while True:
+            data = await read(self.chunk_size)
+            if not data:
+                break
+            lines = splitter.split(data)
+            if lines:
+                feed_lines(lines)
+        tail = splitter.flush()
+        if tail:
+            feed_lines(tail)
+        self.returncode = await self.process.wait()
+        self.stream.close(self.returncode)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+登录和通话时延统计
+
+每次登录(会话)和每个呼叫记录各阶段的单调时钟时刻: 会话为启动进程、发出
+REGISTER、收到401/407质询、收到200；呼叫为发出m命令、发出INVITE、收到180、
+收到200、CONFIRMED、发出BYE、DISCONNECTED。时刻来自读取线程读到对应输出行
+的时间，而不是调度线程处理事件的时间。
+
+记录以紧凑的定长数组保存最近若干条，注册耗时、拨号后延迟(PDD)、振铃到接听
+和呼叫建立耗时分别累计到HDR式直方图(按二进制数量级分段、每段等分，相对误差
+约1%)，可随时取p50/p90/p99，并导出为JSON或CSV。
+"""
+
+import csv
+import json
+import math
+import time
+from array import array
+from collections import deque
+
+# 会话的阶段
+SESSION_MILESTONES = ("spawn", "register_sent", "challenged", "registered")
+# 呼叫的阶段
+CALL_MILESTONES = ("dial", "invite_sent", "ringing", "answered", "confirmed", "bye_sent", "disconnected")
+
+# 直方图名称 -> (说明, 记录类型, 起点阶段(依次尝试), 终点阶段)
+HISTOGRAMS = {
+    "registration": ("注册耗时", "session", ("register_sent", "spawn"), "registered"),
+    "post_dial_delay": ("拨号后延迟", "call", ("dial",), "ringing"),
+    "answer_time": ("振铃到接听", "call", ("ringing",), "confirmed"),
+    "setup_time": ("呼叫建立", "call", ("dial",), "confirmed"),
+}
+
+# 默认保留的记录数
+DEFAULT_MAX_RECORDS = 500
+
+_UNSET = math.nan
+
+
+class LatencyHistogram:
+    """
+    HDR式时延直方图
+
+    以微秒为单位记录；小于2^precision的值精确计数，更大的值按二进制数量级
+    分段，每段再等分为2^(precision-1)个桶，相对误差不超过2^(1-precision)。
+    只保存非空的桶，占用与不同取值的数量成正比。
+    """
+
+    def __init__(self, precision=7):
+        """
+        Args:
+            precision: 每个数量级的精度位数，7位约为1%的相对误差
+        """
+        self.precision = precision
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        """记录一个时延(秒)"""
+        value = max(0, int(round(seconds * 1_000_000)))
+        shift = max(0, value.bit_length() - self.precision)
+        key = (value >> shift) << shift
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        """
+        百分位数
+
+        Args:
+            fraction: 0~1，如0.99
+
+        Returns:
+            float: 时延(秒)，没有数据时返回None
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                # 取桶的中点，但不超出实际的最大最小值
+                shift = max(0, key.bit_length() - self.precision)
+                value = key + ((1 << shift) >> 1)
+                return min(max(value, self.min), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def cumulative(self, bounds):
+        """
+        按给定上界累计的次数，用于导出Prometheus直方图
+
+        Args:
+            bounds: 递增的上界(秒)
+
+        Returns:
+            tuple: (总次数, 总和(秒), [不超过各上界的次数, ...])
+        """
+        # 其他线程读取时先复制，避免遍历中字典被修改
+        items = sorted(list(self.counts.items()))
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = bound * 1_000_000
+            while index < len(items) and items[index][0] <= limit:
+                seen += items[index][1]
+                index += 1
+            result.append(seen)
+        return sum(count for _, count in items), self.total / 1_000_000, result
+
+    def summary(self):
+        """p50/p90/p99和最大值的简短文本(毫秒)"""
+        if not self.count:
+            return "无数据"
+        parts = [f"p{int(fraction * 100)} {self.percentile(fraction) * 1000:.0f}ms"
+                 for fraction in (0.5, 0.9, 0.99)]
+        return f"{self.count}次 " + " ".join(parts) + f" 最大{self.max / 1000:.0f}ms"
+
+    def to_dict(self):
+        """导出用的字典，buckets为 [[桶下界(微秒), 次数], ...]"""
+        result = {"count": self.count}
+        if self.count:
+            result.update({
+                "mean_ms": self.total / self.count / 1000,
+                "min_ms": self.min / 1000,
+                "max_ms": self.max / 1000,
+            })
+            for fraction in (0.5, 0.9, 0.99):
+                result[f"p{int(fraction * 100)}_ms"] = self.percentile(fraction) * 1000
+        result["buckets"] = [[key, self.counts[key]] for key in sorted(self.counts)]
+        return result
+
+
+class TimelineRecord:
+    """一次会话或呼叫的各阶段时刻，未发生的阶段为NaN"""
+
+    __slots__ = ("kind", "label", "target", "wall_time", "started_at", "times", "outcome",
+                 "incoming", "status_code", "reason")
+
+    def __init__(self, kind, label, target=None, started_at=None, incoming=False):
+        """
+        Args:
+            kind: "session" 或 "call"
+            label: 账号(用户名@服务器)
+            target: 呼叫的对方URI，呼入时为主叫
+            started_at: 第一个阶段的单调时钟时刻，默认为现在
+            incoming: 是否为呼入
+        """
+        self.kind = kind
+        self.label = label
+        self.target = target
+        now = time.monotonic()
+        self.started_at = now if started_at is None else started_at
+        self.wall_time = time.time() - (now - self.started_at)
+        milestones = SESSION_MILESTONES if kind == "session" else CALL_MILESTONES
+        self.times = array("d", [_UNSET] * len(milestones))
+        self.outcome = None
+        self.incoming = incoming
+        self.status_code = None     # 呼叫结束的SIP状态码
+        self.reason = None          # 呼叫结束或失败的原因
+
+    @property
+    def milestones(self):
+        return SESSION_MILESTONES if self.kind == "session" else CALL_MILESTONES
+
+    def mark(self, milestone, at):
+        """
+        记录某阶段的时刻，只保留第一次
+
+        Returns:
+            bool: 是否为第一次记录
+        """
+        index = self.milestones.index(milestone)
+        if not math.isnan(self.times[index]):
+            return False
+        self.times[index] = at
+        return True
+
+    def get(self, milestone):
+        """某阶段的时刻，未发生时返回None"""
+        value = self.times[self.milestones.index(milestone)]
+        return None if math.isnan(value) else value
+
+    def wall(self, milestone):
+        """某阶段对应的time.time()时刻，未发生时返回None"""
+        value = self.get(milestone)
+        return None if value is None else self.wall_time + (value - self.started_at)
+
+    def offsets(self):
+        """各阶段相对第一个已记录阶段的毫秒数，未发生的为None"""
+        known = [value for value in self.times if not math.isnan(value)]
+        if not known:
+            return {name: None for name in self.milestones}
+        start = known[0]
+        return {name: None if math.isnan(value) else round((value - start) * 1000, 1)
+                for name, value in zip(self.milestones, self.times)}
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "label": self.label,
+            "target": self.target,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.wall_time)),
+            "outcome": self.outcome,
+            "offsets_ms": self.offsets(),
+        }
+
+
+class CallMetrics:
+    """会话和呼叫的时延记录，只在引擎的调度线程中修改"""
+
+    def __init__(self, max_records=DEFAULT_MAX_RECORDS, on_call_end=None):
+        """
+        Args:
+            max_records: 会话和呼叫各保留的最近记录数
+            on_call_end: 呼叫结束时调用 on_call_end(记录)，如写入通话详单
+        """
+        self.on_call_end = on_call_end
+        self.sessions = deque(maxlen=max_records)
+        self.calls = deque(maxlen=max_records)
+        self.session = None     # 当前会话
+        self.call = None        # 当前呼叫
+        self.histograms = {name: LatencyHistogram() for name in HISTOGRAMS}
+        self.outcomes = {}      # 呼叫结果 -> 次数
+
+    # 会话
+    def begin_session(self, label, at, warm=False):
+        """
+        启动PJSUA(或取出预热实例)时开始一次会话
+
+        Args:
+            label: 主账号
+            at: 启动时刻(time.monotonic)
+            warm: 是否为预热实例
+        """
+        self.end_session("replaced")
+        self.session = TimelineRecord("session", label, "预热" if warm else None, at)
+        self.session.mark("spawn", at)
+        self.sessions.append(self.session)
+
+    def session_event(self, milestone, at):
+        """记录当前会话的阶段，注册成功时累计注册耗时"""
+        session = self.session
+        if session is None or session.outcome is not None:
+            return
+        if session.mark(milestone, at) and milestone == "registered":
+            session.outcome = "registered"
+            self._record(session)
+
+    def end_session(self, outcome):
+        """会话在注册成功前结束(失败、进程退出等)"""
+        session = self.session
+        if session is not None and session.outcome is None:
+            session.outcome = outcome
+        self.session = None
+
+    # 呼叫
+    def begin_call(self, label, target, at, milestone="dial"):
+        """
+        开始一个呼叫
+
+        Args:
+            label: 呼出或接听的账号
+            target: 对方URI
+            at: 时刻
+            milestone: 呼出为"dial"；呼入没有拨号阶段，从振铃("ringing")开始
+        """
+        self.end_call("replaced")
+        self.call = TimelineRecord("call", label, target, at, incoming=milestone != "dial")
+        self.call.mark(milestone, at)
+        self.calls.append(self.call)
+
+    def call_event(self, milestone, at):
+        """记录当前呼叫的阶段"""
+        if self.call is not None:
+            self.call.mark(milestone, at)
+
+    def end_call(self, outcome, at=None, status_code=None, reason=None):
+        """
+        呼叫结束，累计该呼叫的各项时延
+
+        Args:
+            outcome: 结果，如 "answered"、"unanswered"、"failed"
+            at: 断开时刻，None表示没有断开阶段(如拨号失败)
+            status_code: 最终SIP状态码
+            reason: 结束或失败的原因
+        """
+        call = self.call
+        if call is None:
+            return
+        self.call = None
+        if at is not None:
+            call.mark("disconnected", at)
+        call.outcome = outcome
+        call.status_code = status_code
+        call.reason = reason
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self._record(call)
+        if self.on_call_end is not None:
+            self.on_call_end(call)
+
+    def _record(self, record):
+        """把记录中已完整的区间累计到直方图"""
+        for name, (_, kind, starts, end) in HISTOGRAMS.items():
+            if kind != record.kind:
+                continue
+            end_at = record.get(end)
+            if end_at is None:
+                continue
+            for start in starts:
+                start_at = record.get(start)
+                if start_at is not None:
+                    self.histograms[name].record(end_at - start_at)
+                    break
+
+    # 报告和导出
+    def report(self):
+        """各项时延的p50/p90/p99"""
+        parts = [f"{HISTOGRAMS[name][0]}: {histogram.summary()}"
+                 for name, histogram in self.histograms.items()]
+        return "; ".join(parts)
+
+    def export(self, path):
+        """
+        导出记录和直方图，.csv导出逐条记录，其他扩展名导出JSON
+
+        Args:
+            path: 文件路径
+        """
+        if path.lower().endswith(".csv"):
+            self._export_csv(path)
+            return
+        data = {
+            "exported": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "histograms": {name: dict(description=HISTOGRAMS[name][0], **histogram.to_dict())
+                           for name, histogram in self.histograms.items()},
+            "sessions": [record.to_dict() for record in self.sessions],
+            "calls": [record.to_dict() for record in self.calls],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def _export_csv(self, path):
+        milestones = SESSION_MILESTONES + CALL_MILESTONES
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "label", "target", "started", "outcome"]
+                            + [f"{name}_ms" for name in milestones])
+            for record in list(self.sessions) + list(self.calls):
+                data = record.to_dict()
+                offsets = data["offsets_ms"]
+                writer.writerow([data["kind"], data["label"], data["target"] or "", data["started"],
+                                 data["outcome"] or ""]
+                                + ["" if offsets.get(name) is None else offsets[name] for name in milestones])
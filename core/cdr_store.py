@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+通话详单(CDR)存储
+
+每个呼叫结束时生成一条详单: 对方号码、方向、账号、发起/接通/结束时刻、通话时长、
+最终SIP状态码和失败原因，保存在本地SQLite数据库中，不受清除日志影响。
+
+写入由后台线程完成: 详单先进入内存队列，写入线程每隔一段时间(或积累到一定条数)
+在一个事务中批量插入，高呼叫速率下不会每个呼叫都触发一次磁盘同步。数据库使用
+WAL模式，查询与写入互不阻塞；按号码和按时间范围的查询都有索引，百万条记录中
+也能在毫秒级返回。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+
+# 写入线程两次提交之间的最长等待(秒)，以及达到多少条立即提交
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 500
+
+# 呼叫方向
+OUTGOING = "out"
+INCOMING = "in"
+
+COLUMNS = ("number", "destination", "direction", "account", "setup_time", "answer_time",
+           "end_time", "duration", "status_code", "reason")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cdr (
+    id INTEGER PRIMARY KEY,
+    number TEXT,
+    destination TEXT,
+    direction TEXT NOT NULL,
+    account TEXT,
+    setup_time REAL NOT NULL,
+    answer_time REAL,
+    end_time REAL,
+    duration REAL,
+    status_code INTEGER,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS cdr_number_time ON cdr (number, setup_time);
+CREATE INDEX IF NOT EXISTS cdr_time ON cdr (setup_time);
+"""
+
+
+def number_of(uri):
+    """
+    从SIP URI中取出号码(用户部分)
+
+    Args:
+        uri: 如 "sip:2000@10.20.25.111"、"\"Bob\" <sip:2000@host>"，也可以直接是号码
+
+    Returns:
+        str: 号码，uri为空时返回None
+    """
+    if not uri:
+        return None
+    text = uri.rsplit("<", 1)[-1].rstrip(">").strip()
+    if ":" in text.split("@", 1)[0]:
+        text = text.split(":", 1)[1]
+    return text.split("@", 1)[0].split(";", 1)[0]
+
+
+class CallDetailRecord:
+    """一条通话详单，时刻为time.time()的秒数，未发生的为None"""
+
+    __slots__ = COLUMNS + ("id",)
+
+    def __init__(self, destination, direction, account, setup_time, answer_time=None,
+                 end_time=None, status_code=None, reason=None, number=None, duration=None,
+                 id=None):
+        """
+        Args:
+            destination: 对方URI(呼出为被叫，呼入为主叫)
+            direction: OUTGOING 或 INCOMING
+            account: 呼出或接听的账号
+            setup_time: 发起呼叫(呼入为收到INVITE)的时刻
+            answer_time: 接通时刻，未接通为None
+            end_time: 结束时刻
+            status_code: 最终SIP状态码
+            reason: 失败或结束原因
+            number: 号码，默认从destination中取出
+            duration: 通话时长(秒)，默认按接通和结束时刻计算，未接通为0
+        """
+        self.id = id
+        self.destination = destination
+        self.direction = direction
+        self.account = account
+        self.setup_time = setup_time
+        self.answer_time = answer_time
+        self.end_time = end_time
+        self.status_code = status_code
+        self.reason = reason
+        self.number = number if number is not None else number_of(destination)
+        if duration is None:
+            duration = end_time - answer_time if answer_time is not None and end_time is not None else 0.0
+        self.duration = duration
+
+    def row(self):
+        return tuple(getattr(self, name) for name in COLUMNS)
+
+    @classmethod
+    def from_row(cls, row):
+        """从查询结果(id, 各列...)构造"""
+        values = dict(zip(COLUMNS, row[1:]))
+        return cls(values.pop("destination"), values.pop("direction"), values.pop("account"),
+                   values.pop("setup_time"), id=row[0], **values)
+
+    def summary(self):
+        """日志中显示的一行文本"""
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.setup_time))
+        direction = "呼出" if self.direction == OUTGOING else "呼入"
+        result = f"通话{self.duration:.0f}秒" if self.answer_time is not None else "未接通"
+        status = f" {self.status_code}" if self.status_code else ""
+        reason = f" {self.reason}" if self.reason else ""
+        return f"{started} {direction} {self.number or '-'} ({self.account}) {result}{status}{reason}"
+
+
+class CdrStore:
+    """SQLite详单库，写入在后台线程中批量提交"""
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, flush_batch=FLUSH_BATCH, log=print):
+        """
+        打开(或创建)详单库并启动写入线程
+
+        Args:
+            path: 数据库文件路径
+            flush_interval: 两次提交之间的最长等待(秒)
+            flush_batch: 排队达到这么多条时立即提交
+            log: 日志函数
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.log = log
+        # 写入统计: 提交次数、写入条数、失败次数
+        self.commits = 0
+        self.written = 0
+        self.errors = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._writer_db = self._connect()
+        self._writer_db.executescript(SCHEMA)
+        # 查询在调用者的线程中进行，使用另一个连接
+        self._reader_db = self._connect()
+        self._reader_lock = threading.Lock()
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="cdr-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # WAL模式下NORMAL只在检查点时同步，断电最多丢失最近的提交
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(self, record):
+        """
+        添加一条详单(可在任意线程调用，不等待写入)
+
+        Args:
+            record: CallDetailRecord
+        """
+        with self._cond:
+            if self._closing:
+                return
+            self._queue.append(record.row())
+            # 第一条开始计时，满一批时立即提交
+            if len(self._queue) == 1 or len(self._queue) >= self.flush_batch:
+                self._cond.notify()
+
+    def pending(self):
+        """排队等待写入的条数"""
+        return len(self._queue)
+
+    def close(self):
+        """写入剩余的详单后关闭数据库"""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        with self._reader_lock:
+            self._reader_db.close()
+
+    def report(self):
+        """写入统计"""
+        average = self.written / self.commits if self.commits else 0
+        return (f"已写入{self.written}条 提交{self.commits}次(平均每次{average:.1f}条), "
+                f"排队{self.pending()}条, 失败{self.errors}次")
+
+    def _run(self):
+        """写入线程: 每隔flush_interval或积累flush_batch条时批量插入"""
+        db = self._writer_db
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                # 不足一批时等到间隔结束，让期间到达的详单合并到同一个事务
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._queue) < self.flush_batch and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                rows = list(self._queue)
+                self._queue.clear()
+                closing = self._closing
+            if rows:
+                try:
+                    with db:
+                        db.executemany(f"INSERT INTO cdr ({', '.join(COLUMNS)}) "
+                                       f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+                    self.commits += 1
+                    self.written += len(rows)
+                except sqlite3.Error as e:
+                    self.errors += 1
+                    self.log(f"写入通话详单失败: {str(e)}")
+            if closing:
+                db.close()
+                return
+
+    def query(self, number=None, start=None, end=None, limit=100, prefix=False):
+        """
+        查询详单，按发起时刻从新到旧排列
+
+        Args:
+            number: 号码，None表示不限
+            start: 发起时刻下限(time.time()秒，含)
+            end: 发起时刻上限(不含)
+            limit: 最多返回的条数
+            prefix: number是否按前缀匹配
+
+        Returns:
+            list: [CallDetailRecord, ...]
+        """
+        conditions = []
+        params = []
+        if number:
+            if prefix:
+                # 以范围代替LIKE，可以使用号码索引
+                conditions.append("number >= ? AND number < ?")
+                params += [number, number + "\U0010ffff"]
+            else:
+                conditions.append("number = ?")
+                params.append(number)
+        if start is not None:
+            conditions.append("setup_time >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("setup_time < ?")
+            params.append(end)
+        sql = f"SELECT id, {', '.join(COLUMNS)} FROM cdr"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY setup_time DESC LIMIT ?"
+        params.append(limit)
+        with self._reader_lock:
+            rows = self._reader_db.execute(sql, params).fetchall()
+        return [CallDetailRecord.from_row(row) for row in rows]
+
+    def count(self):
+        """已写入的详单总数"""
+        with self._reader_lock:
+            return self._reader_db.execute("SELECT COUNT(*) FROM cdr").fetchone()[0]
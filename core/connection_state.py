@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+连接状态机
+
+SIP引擎的连接状态只由解析得到的pjsua事件和引擎自身的操作推动：
+Idle → Spawning → Registering → Registered ⇄ InCall → Unregistering → Dead。
+查询当前状态只需读取一个属性，不再轮询pjsua或扫描日志文本。
+"""
+
+import time
+from collections import deque
+
+IDLE = "idle"                    # 尚未启动PJSUA
+SPAWNING = "spawning"            # 已启动进程，尚无输出
+REGISTERING = "registering"      # PJSUA运行中，等待注册结果
+REGISTERED = "registered"        # 注册成功，空闲
+IN_CALL = "in_call"              # 通话中
+UNREGISTERING = "unregistering"  # 已发送注销命令，等待PJSUA退出
+DEAD = "dead"                    # PJSUA进程已结束
+
+# 状态 -> 界面显示名称
+STATE_LABELS = {
+    IDLE: "未启动",
+    SPAWNING: "正在启动",
+    REGISTERING: "正在注册",
+    REGISTERED: "已注册",
+    IN_CALL: "通话中",
+    UNREGISTERING: "正在注销",
+    DEAD: "已停止",
+}
+
+# 允许的状态转换; 任何状态都可以进入DEAD (进程结束或被终止)
+TRANSITIONS = {
+    IDLE: (SPAWNING,),
+    SPAWNING: (REGISTERING,),
+    REGISTERING: (REGISTERED, UNREGISTERING),
+    REGISTERED: (IN_CALL, REGISTERING, UNREGISTERING),
+    IN_CALL: (REGISTERED, UNREGISTERING),
+    UNREGISTERING: (),
+    DEAD: (SPAWNING,),
+}
+
+# 注册有效的状态
+CONNECTED_STATES = frozenset((REGISTERED, IN_CALL))
+
+
+class ConnectionStateMachine:
+    """连接状态机，只在引擎的调度线程中修改"""
+
+    def __init__(self, on_change=None, clock=time.monotonic, history_size=50):
+        """
+        初始化状态机
+
+        Args:
+            on_change: 状态变化回调 on_change(旧状态, 新状态, 原因)
+            clock: 计时时钟
+            history_size: 保留的状态变化记录条数
+        """
+        self.on_change = on_change
+        self.clock = clock
+        self.state = IDLE
+        self.since = clock()
+        # 最近的状态变化: [(时刻, 旧状态, 新状态, 原因), ...]
+        self.history = deque(maxlen=history_size)
+        # 各状态的累计停留时间(秒)
+        self.durations = {}
+
+    @property
+    def is_connected(self):
+        """注册是否有效"""
+        return self.state in CONNECTED_STATES
+
+    @property
+    def in_call(self):
+        """是否在通话中"""
+        return self.state == IN_CALL
+
+    @property
+    def is_running(self):
+        """PJSUA进程是否在运行(或正在启动)"""
+        return self.state not in (IDLE, DEAD)
+
+    def can_transition(self, new_state):
+        """是否允许从当前状态转换到new_state"""
+        return new_state == DEAD or new_state in TRANSITIONS[self.state]
+
+    def transition(self, new_state, reason=None):
+        """
+        转换到新状态
+
+        Args:
+            new_state: 目标状态
+            reason: 转换原因，用于日志和记录
+
+        Returns:
+            bool: 是否发生了转换; 已处于目标状态或转换不允许时返回False
+        """
+        old_state = self.state
+        if new_state == old_state or not self.can_transition(new_state):
+            return False
+        now = self.clock()
+        self.durations[old_state] = self.durations.get(old_state, 0.0) + now - self.since
+        self.state = new_state
+        self.since = now
+        self.history.append((now, old_state, new_state, reason))
+        if self.on_change:
+            self.on_change(old_state, new_state, reason)
+        return True
+
+    def elapsed(self):
+        """在当前状态停留的时间(秒)"""
+        return self.clock() - self.since
+
+    def label(self, state=None):
+        """状态的显示名称"""
+        return STATE_LABELS.get(state or self.state, state or self.state)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Prometheus指标端点
+
+在本地HTTP端口(默认只监听127.0.0.1)上以Prometheus文本格式提供运行中客户端的
+指标: 注册状态、各账号的呼叫数、注册和呼叫时延直方图、读取线程的输出行数和
+字节数、错误计数、PJSUA进程的内存和CPU，以及界面可附加的指标(如Tk更新队列
+深度)。
+
+指标在被抓取时才从引擎现有的计数器读取和格式化，热路径上只有单线程写入的
+整数自增，不加锁。默认不启动，在配置中设置metrics_port(或无界面模式的
+--metrics-port)后启用。
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from core import connection_state
+from utils.process_stats import process_usage
+
+# 指标名前缀
+PREFIX = "sip_client"
+# 时延直方图的桶上界(秒)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class Exposition:
+    """按Prometheus文本格式逐个追加指标"""
+
+    def __init__(self):
+        self.lines = []
+
+    def _header(self, name, kind, help_text):
+        self.lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    def _sample(self, name, value, labels=None):
+        label_text = ""
+        if labels:
+            label_text = "{" + ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + "}"
+        self.lines.append(f"{PREFIX}_{name}{label_text} {_format_value(value)}")
+
+    def gauge(self, name, help_text, samples):
+        """
+        添加一个gauge
+
+        Args:
+            name: 指标名(不含前缀)
+            help_text: 说明
+            samples: 值，或 [(标签字典, 值), ...]
+        """
+        self._family(name, "gauge", help_text, samples)
+
+    def counter(self, name, help_text, samples):
+        """添加一个counter，name应以_total结尾，参数同gauge"""
+        self._family(name, "counter", help_text, samples)
+
+    def _family(self, name, kind, help_text, samples):
+        self._header(name, kind, help_text)
+        if not isinstance(samples, list):
+            samples = [(None, samples)]
+        for labels, value in samples:
+            self._sample(name, value, labels)
+
+    def histogram(self, name, help_text, histograms):
+        """
+        添加一个histogram
+
+        Args:
+            histograms: [(标签字典, LatencyHistogram), ...]
+        """
+        self._header(name, "histogram", help_text)
+        for labels, histogram in histograms:
+            labels = labels or {}
+            count, total, cumulative = histogram.cumulative(LATENCY_BUCKETS)
+            for bound, value in zip(LATENCY_BUCKETS, cumulative):
+                self._sample(f"{name}_bucket", value, dict(labels, le=repr(bound)))
+            self._sample(f"{name}_bucket", count, dict(labels, le="+Inf"))
+            self._sample(f"{name}_sum", total, labels)
+            self._sample(f"{name}_count", count, labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def collect_engine(engine, out):
+    """
+    把引擎的状态和计数器写入out
+
+    Args:
+        engine: SIPEngine
+        out: Exposition
+    """
+    current = engine.state.state
+    out.gauge("up", "指标端点正在运行", 1)
+    out.gauge("registered", "主账号是否已注册(通话中也算已注册)", int(engine.is_connected))
+    out.gauge("connection_state", "当前连接状态，当前状态为1",
+              [({"state": state}, int(state == current)) for state in connection_state.STATE_LABELS])
+
+    accounts = list(engine.accounts)
+    out.gauge("account_registered", "各账号是否已注册",
+              [({"account": account.key}, int(account.state.is_connected)) for account in accounts])
+    out.counter("calls_total", "各账号呼出和接听的呼叫数",
+                [({"account": account.key}, account.calls) for account in accounts])
+
+    out.histogram("latency_seconds", "登录和呼叫各阶段的时延",
+                  [({"stage": name}, histogram)
+                   for name, histogram in engine.metrics.histograms.items()])
+    out.counter("call_outcomes_total", "已结束的呼叫按结果计数",
+                [({"outcome": outcome}, count)
+                 for outcome, count in sorted(engine.metrics.outcomes.items())])
+
+    out.counter("output_lines_total", "读取线程读到的PJSUA输出行数", engine.output_lines)
+    out.counter("output_bytes_total", "读取线程读到的PJSUA输出字节数", engine.output_bytes)
+    out.counter("stdin_commands_total", "写入PJSUA标准输入的命令数", engine.write_stats.commands)
+    out.counter("errors_total", "各类错误的次数",
+                [({"kind": kind}, count) for kind, count in sorted(engine.error_counts.items())])
+
+    process = engine.process
+    usage = process_usage(process.pid) if process is not None else None
+    out.gauge("pjsua_running", "PJSUA进程是否在运行", int(process is not None))
+    out.gauge("pjsua_resident_memory_bytes", "PJSUA进程的常驻内存", usage[0] if usage else None)
+    out.counter("pjsua_cpu_seconds_total", "PJSUA进程累计的CPU时间", usage[1] if usage else None)
+
+
+class MetricsServer:
+    """在后台线程中提供/metrics的HTTP服务"""
+
+    def __init__(self, engine, port, host="127.0.0.1", collectors=(), log=print):
+        """
+        启动HTTP服务
+
+        Args:
+            engine: SIPEngine
+            port: 监听端口
+            host: 监听地址，默认只接受本机访问
+            collectors: 附加的指标函数，每个接受一个Exposition
+            log: 日志函数
+
+        Raises:
+            OSError: 端口无法绑定
+        """
+        self.engine = engine
+        self.collectors = list(collectors)
+        self.log = log
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        self.log(f"指标端点: http://{self.address[0]}:{self.address[1]}/metrics")
+
+    def render(self):
+        """生成一次抓取的全部指标"""
+        out = Exposition()
+        collect_engine(self.engine, out)
+        for collector in self.collectors:
+            try:
+                collector(out)
+            except Exception as e:
+                self.log(f"收集指标时出错: {str(e)}")
+        return out.text()
+
+    def close(self):
+        """停止HTTP服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA输出管道读取器
+
+以大块os.read读取pjsua的标准输出，在可复用的bytearray中切分行，
+增量解码(非法字节替换为U+FFFD)后按批交给解析器。
+LineSplitter也供asyncio驱动等其他读取方式复用。
+"""
+
+import os
+import sys
+import codecs
+import locale
+import selectors
+
+# 程序使用的pjsua控制台输入提示(拨号、+a添加账号、-a删除账号)，提示不换行，
+# pjsua输出后等待用户输入。普通输出被管道截断在": "处时(如"Call state: ")不属于提示
+PROMPTS = (b"Make call: ", b"(empty to cancel): ", b"account ID to delete: ")
+
+
+class LineSplitter:
+    """将任意切分的字节块还原为完整文本行"""
+
+    def __init__(self, encoding=None):
+        """
+        初始化切分器
+
+        Args:
+            encoding: 输出编码，默认与text=True的Popen相同(系统首选编码)
+        """
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self._buffer = bytearray()
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+
+    def split(self, data):
+        """
+        将新数据追加到缓冲区，取出其中所有完整的行
+
+        缓冲区以已知的输入提示结尾时，提示也作为一行取出，否则要等到下一次输出才能看到它。
+
+        Returns:
+            list: 完整的行(不含换行符)，没有完整行时返回None
+        """
+        buffer = self._buffer
+        buffer += data
+        end = len(buffer) - 1 if buffer.endswith(PROMPTS) else buffer.rfind(b"\n")
+        if end < 0:
+            return None
+        with memoryview(buffer)[:end + 1] as view:
+            text = self._decoder.decode(view)
+        # bytearray从头部删除只移动起始指针，不会重新分配
+        del buffer[:end + 1]
+        return text.splitlines()
+
+    def flush(self):
+        """
+        取出最后一段不以换行结尾的内容
+
+        Returns:
+            list: 剩余内容组成的行，没有剩余内容时为空列表
+        """
+        tail = self._decoder.decode(bytes(self._buffer), final=True)
+        self._buffer.clear()
+        return [tail] if tail else []
+
+
+class PipeLineReader:
+    """按批读取管道输出行的读取器"""
+
+    def __init__(self, pipe, encoding=None, chunk_size=65536, poll_interval=0.5):
+        """
+        初始化读取器
+
+        Args:
+            pipe: 以二进制模式打开的管道文件对象或文件描述符
+            encoding: 输出编码，默认与text=True的Popen相同(系统首选编码)
+            chunk_size: 单次os.read的最大字节数
+            poll_interval: 等待数据的超时(秒)，超时后检查是否已请求停止
+        """
+        self.fd = pipe if isinstance(pipe, int) else pipe.fileno()
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+
+        self._splitter = LineSplitter(encoding)
+        self.encoding = self._splitter.encoding
+        self._stopped = False
+
+        # 统计信息
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.reads = 0
+
+    def stop(self):
+        """请求停止读取，batches()会在下一次等待超时后返回"""
+        self._stopped = True
+
+    def _open_selector(self):
+        """
+        为管道创建selector
+
+        Windows的select只支持套接字(新版本Python中对管道的register和set_blocking
+        可能成功，但select时才报错)，此时返回None并退回到阻塞读取。
+        """
+        if sys.platform == "win32":
+            return None
+        selector = selectors.DefaultSelector()
+        try:
+            os.set_blocking(self.fd, False)
+            selector.register(self.fd, selectors.EVENT_READ)
+        except (OSError, ValueError, AttributeError):
+            self._close_selector(selector)
+            return None
+        return selector
+
+    def _close_selector(self, selector):
+        """关闭selector并把管道恢复为阻塞模式"""
+        selector.close()
+        try:
+            os.set_blocking(self.fd, True)
+        except (OSError, AttributeError):
+            pass
+
+    def batches(self):
+        """
+        读取输出直到管道关闭
+
+        Yields:
+            list: 一次读取得到的完整行(不含换行符)
+        """
+        selector = self._open_selector()
+        try:
+            while not self._stopped:
+                if selector is not None:
+                    try:
+                        ready = selector.select(self.poll_interval)
+                    except (OSError, ValueError):
+                        # 平台不支持对管道select，改为阻塞读取
+                        self._close_selector(selector)
+                        selector = None
+                        continue
+                    if not ready:
+                        continue
+                try:
+                    data = os.read(self.fd, self.chunk_size)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    break
+                if not data:
+                    break
+                self.reads += 1
+                self.bytes_read += len(data)
+                lines = self._splitter.split(data)
+                if lines:
+                    self.lines_read += len(lines)
+                    yield lines
+
+            # 管道关闭时输出最后一段不以换行结尾的内容
+            tail = self._splitter.flush()
+            if tail:
+                self.lines_read += len(tail)
+                yield tail
+        finally:
+            if selector is not None:
+                selector.close()
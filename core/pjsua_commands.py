@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA控制台命令
+
+将发往pjsua的控制台命令与其输出中的提示和结果关联起来：每条命令分为若干步，
+每一步写入文本后等待对应的提示或结果事件(带超时)，确认后才进行下一步。
+命令按提交顺序逐条执行，避免后一条命令的文本被前一条命令的提示当作输入。
+"""
+
+import time
+from concurrent.futures import Future
+
+from core.pjsua_events import (CallState, CallProgress, CallFailed, ConsoleReply,
+                               CurrentAccountChanged)
+
+# 单个步骤等待响应的默认超时(秒)
+DEFAULT_STEP_TIMEOUT = 3.0
+
+
+class CommandResult:
+    """控制台命令的执行结果"""
+
+    __slots__ = ('name', 'ok', 'error', 'event', 'latency', 'step_latencies')
+
+    def __init__(self, name, ok, error=None, event=None, latency=None, step_latencies=()):
+        """
+        Args:
+            name: 命令名称
+            ok: 是否成功
+            error: 失败原因
+            event: 决定结果的事件，超时时为None
+            latency: 从写入第一步到收到结果的耗时(秒)
+            step_latencies: 每一步从写入到收到响应的耗时(秒)
+        """
+        self.name = name
+        self.ok = ok
+        self.error = error
+        self.event = event
+        self.latency = latency
+        self.step_latencies = tuple(step_latencies)
+
+    @property
+    def timed_out(self):
+        """是否因等待超时而失败"""
+        return not self.ok and self.event is None
+
+    def __repr__(self):
+        latency = f"{self.latency * 1000:.1f}ms" if self.latency is not None else "-"
+        return f"CommandResult({self.name}, ok={self.ok}, error={self.error!r}, latency={latency})"
+
+
+class CommandStep:
+    """命令的一个步骤: 写入文本，然后等待匹配的事件"""
+
+    __slots__ = ('text', 'match', 'timeout')
+
+    def __init__(self, text, match=None, timeout=DEFAULT_STEP_TIMEOUT):
+        """
+        Args:
+            text: 写入pjsua标准输入的文本
+            match: 判断函数 match(event)，返回None表示无关事件、True表示成功、
+                   字符串表示失败原因；为None时写入后立即完成
+            timeout: 等待响应的超时(秒)
+        """
+        self.text = text
+        self.match = match
+        self.timeout = timeout
+
+
+# 各命令的响应判断
+def _match_make_call_prompt(event):
+    if isinstance(event, ConsoleReply) and event.reply == ConsoleReply.MAKE_CALL:
+        return True
+    return None
+
+
+def _match_call_started(event):
+    # 精简日志级别下没有"Making call"，以CALLING等中间状态作为已发起的依据
+    if isinstance(event, CallProgress) and event.stage in (CallProgress.MAKING_CALL,
+                                                          CallProgress.SENDING_INVITE):
+        return True
+    if isinstance(event, CallFailed):
+        return event.reason or "Unable to make call"
+    if isinstance(event, CallState):
+        if event.state == CallState.DISCONNECTED:
+            return f"{event.status_code} {event.reason}"
+        return True
+    return None
+
+
+def _match_disconnected(event):
+    if isinstance(event, CallState) and event.state == CallState.DISCONNECTED:
+        return True
+    if isinstance(event, ConsoleReply) and event.reply == ConsoleReply.NO_CURRENT_CALL:
+        return ConsoleReply.NO_CURRENT_CALL
+    return None
+
+
+def _match_account_list(event):
+    if isinstance(event, ConsoleReply) and event.reply == ConsoleReply.ACCOUNT_LIST:
+        return True
+    return None
+
+
+def _match_prompt(reply):
+    """生成等待指定控制台提示的判断函数"""
+    def match(event):
+        if isinstance(event, ConsoleReply) and event.reply == reply:
+            return True
+        return None
+    return match
+
+
+def _match_account_changed(event):
+    if isinstance(event, CurrentAccountChanged):
+        return True
+    return None
+
+
+class _PendingCommand:
+    """执行中的命令"""
+
+    __slots__ = ('name', 'steps', 'future', 'index', 'started', 'step_started',
+                 'step_latencies', 'timer_id')
+
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = steps
+        self.future = Future()
+        self.index = 0
+        self.started = None
+        self.step_started = None
+        self.step_latencies = []
+        self.timer_id = None
+
+
+class PjsuaCommands:
+    """pjsua控制台命令队列，在调度线程中执行"""
+
+    def __init__(self, write, scheduler, clock=time.monotonic):
+        """
+        初始化命令队列
+
+        Args:
+            write: 向pjsua标准输入写入文本的函数
+            scheduler: 调度器(after/after_cancel/call_soon)，命令在其线程中执行
+            clock: 计时时钟，须与事件时间戳的时钟一致
+        """
+        self.write = write
+        self.scheduler = scheduler
+        self.clock = clock
+        self._queue = []
+        self._current = None
+
+        # 统计信息: 命令名 -> [次数, 失败次数, 总耗时, 最大耗时]
+        self.stats = {}
+
+    # 命令 - 可在任意线程调用，返回concurrent.futures.Future，结果为CommandResult
+    def make_call(self, uri, timeout=DEFAULT_STEP_TIMEOUT):
+        """m -> "Make call:"提示 -> URI -> "Making call"或"Unable to make call" """
+        return self.submit("make_call", [
+            # 先发送空行取消可能残留的输入
+            CommandStep("\r\nm\r\n", _match_make_call_prompt, timeout),
+            CommandStep(f"{uri}\r\n", _match_call_started, timeout),
+        ])
+
+    def hangup(self, timeout=5.0):
+        """h -> 通话断开或"No current call" """
+        return self.submit("hangup", [CommandStep("h\r\n", _match_disconnected, timeout)])
+
+    def account_info(self, timeout=DEFAULT_STEP_TIMEOUT):
+        """d -> "Account list:" """
+        return self.submit("account_info", [CommandStep("d\r\n", _match_account_list, timeout)])
+
+    def add_account(self, uri, registrar, realm, username, password, timeout=DEFAULT_STEP_TIMEOUT):
+        """+a -> 依次回答账号URI、注册服务器、认证域、用户名和密码的提示"""
+        return self.submit("add_account", [
+            CommandStep("+a\r\n", _match_prompt(ConsoleReply.SIP_URL), timeout),
+            CommandStep(f"{uri}\r\n", _match_prompt(ConsoleReply.REGISTRAR), timeout),
+            CommandStep(f"{registrar}\r\n", _match_prompt(ConsoleReply.AUTH_REALM), timeout),
+            CommandStep(f"{realm}\r\n", _match_prompt(ConsoleReply.AUTH_USERNAME), timeout),
+            CommandStep(f"{username}\r\n", _match_prompt(ConsoleReply.AUTH_PASSWORD), timeout),
+            CommandStep(f"{password}\r\n"),
+        ])
+
+    def remove_account(self, acc_id, timeout=DEFAULT_STEP_TIMEOUT):
+        """-a -> 删除账号提示 -> 账号ID"""
+        return self.submit("remove_account", [
+            CommandStep("-a\r\n", _match_prompt(ConsoleReply.DELETE_ACCOUNT), timeout),
+            CommandStep(f"{acc_id}\r\n"),
+        ])
+
+    def next_account(self, timeout=DEFAULT_STEP_TIMEOUT):
+        """> -> "Current account changed to N"，结果事件中为新的当前账号"""
+        return self.submit("next_account", [CommandStep(">\r\n", _match_account_changed, timeout)])
+
+    def send(self, name, text):
+        """发送不等待响应的命令(如ru)，仍按顺序排队"""
+        return self.submit(name, [CommandStep(text)])
+
+    def submit(self, name, steps):
+        """
+        提交一条命令
+
+        Args:
+            name: 命令名称
+            steps: CommandStep列表
+
+        Returns:
+            Future: 完成时结果为CommandResult
+        """
+        command = _PendingCommand(name, steps)
+        self.scheduler.call_soon(self._enqueue, command)
+        return command.future
+
+    def pending_count(self):
+        """排队中的命令数(含执行中的命令)"""
+        return len(self._queue) + (1 if self._current is not None else 0)
+
+    def report(self):
+        """返回各命令的耗时统计"""
+        parts = []
+        for name, (count, failed, total, worst) in sorted(self.stats.items()):
+            average = total / count * 1000 if count else 0
+            parts.append(f"{name}: {count}次 失败{failed} 平均{average:.0f}ms 最大{worst * 1000:.0f}ms")
+        return "; ".join(parts) or "无数据"
+
+    # 以下方法在调度线程中运行
+    def on_event(self, event):
+        """处理一个pjsua事件，推进执行中的命令"""
+        command = self._current
+        if command is None:
+            return
+        step = command.steps[command.index]
+        # 写入之前读到的输出不可能是本步骤的响应
+        if step.match is None or event.timestamp < command.step_started:
+            return
+        outcome = step.match(event)
+        if outcome is None:
+            return
+        self._cancel_timer(command)
+        command.step_latencies.append(event.timestamp - command.step_started)
+        if outcome is True:
+            command.index += 1
+            if command.index < len(command.steps):
+                self._run_step(command)
+            else:
+                self._finish(command, True, event=event, latency=event.timestamp - command.started)
+        else:
+            self._finish(command, False, error=outcome, event=event,
+                         latency=event.timestamp - command.started)
+
+    def reset(self, reason):
+        """进程已结束或被替换，放弃所有命令"""
+        pending = ([self._current] if self._current is not None else []) + self._queue
+        self._current = None
+        self._queue = []
+        for command in pending:
+            self._cancel_timer(command)
+            self._resolve(command, CommandResult(command.name, False, error=reason))
+
+    def _enqueue(self, command):
+        """加入队列，空闲时立即执行"""
+        self._queue.append(command)
+        if self._current is None:
+            self._start_next()
+
+    def _start_next(self):
+        """执行队列中的下一条命令"""
+        while self._queue and self._current is None:
+            command = self._queue.pop(0)
+            self._current = command
+            command.started = self.clock()
+            self._run_step(command)
+
+    def _run_step(self, command):
+        """写入当前步骤的文本并开始等待响应"""
+        step = command.steps[command.index]
+        command.step_started = self.clock()
+        try:
+            self.write(step.text)
+        except Exception as e:
+            self._finish(command, False, error=f"写入失败: {str(e)}")
+            return
+        if step.match is None:
+            command.step_latencies.append(self.clock() - command.step_started)
+            command.index += 1
+            if command.index < len(command.steps):
+                self._run_step(command)
+            else:
+                self._finish(command, True, latency=self.clock() - command.started)
+            return
+        command.timer_id = self.scheduler.after(int(step.timeout * 1000), self._on_timeout, command)
+
+    def _on_timeout(self, command):
+        """步骤等待超时"""
+        command.timer_id = None
+        if command is not self._current:
+            return
+        step = command.steps[command.index]
+        self._finish(command, False, error=f"等待响应超时 ({step.timeout}秒)",
+                     latency=self.clock() - command.started)
+
+    def _cancel_timer(self, command):
+        """取消步骤的超时定时器"""
+        if command.timer_id is not None:
+            self.scheduler.after_cancel(command.timer_id)
+            command.timer_id = None
+
+    def _finish(self, command, ok, error=None, event=None, latency=None):
+        """结束当前命令并执行下一条"""
+        self._current = None
+        result = CommandResult(command.name, ok, error, event, latency, command.step_latencies)
+        stats = self.stats.setdefault(command.name, [0, 0, 0.0, 0.0])
+        stats[0] += 1
+        if not ok:
+            stats[1] += 1
+        if latency is not None:
+            stats[2] += latency
+            stats[3] = max(stats[3], latency)
+        self._resolve(command, result)
+        self._start_next()
+
+    def _resolve(self, command, result):
+        """设置命令的Future结果"""
+        if not command.future.done():
+            command.future.set_result(result)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA查找与检测
+
+并行扫描PATH、程序目录和常见的Linux/Windows安装位置查找pjsua，
+检测结果(是否可用、版本和支持的功能)按路径缓存到磁盘，并以文件大小、
+修改时间和inode校验：可执行文件未变化时不再启动 pjsua --help。
+查找和检测都可以在后台线程中进行，界面启动不必等待。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# 缓存文件，与配置文件一样放在工作目录
+DEFAULT_CACHE_FILE = "pjsua_cache.json"
+
+# 检测时等待pjsua输出帮助的最长时间(秒)
+CHECK_TIMEOUT = 2
+
+# 帮助文本中的选项 -> 功能名
+FEATURE_OPTIONS = {
+    "--next-account": "multi_account",
+    "--use-tls": "tls",
+    "--use-srtp": "srtp",
+    "--ipv6": "ipv6",
+    "--video": "video",
+    "--null-audio": "null_audio",
+    "--no-tcp": "tcp",
+}
+
+# --version输出中的版本号，如 "PJ_VERSION: 2.14.1"
+_version_pattern = re.compile(r"(?:PJ_VERSION|version)\s*:?\s*v?(\d+\.\d+(?:\.\d+)?(?:-\w+)?)", re.I)
+
+
+def candidate_dirs():
+    """可能存放pjsua的目录，按优先顺序"""
+    dirs = [os.getcwd(), os.path.dirname(os.path.abspath(sys.argv[0] or "."))]
+    dirs += os.environ.get("PATH", "").split(os.pathsep)
+    if sys.platform == "win32":
+        dirs += [
+            os.path.join(os.environ.get('ProgramFiles', 'C:\\Program Files'), "PJSIP", "bin"),
+            os.path.join(os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)'), "PJSIP", "bin"),
+            os.path.join(os.environ.get('USERPROFILE', 'C:\\Users\\Default'), "Downloads"),
+        ]
+    else:
+        home = os.path.expanduser("~")
+        dirs += [
+            "/usr/local/bin", "/usr/bin", "/opt/pjsip/bin", "/usr/local/pjsip/bin",
+            os.path.join(home, "bin"),
+            os.path.join(home, "pjproject", "pjsip-apps", "bin"),
+            "/usr/src/pjproject/pjsip-apps/bin",
+        ]
+    seen = set()
+    result = []
+    for path in dirs:
+        key = os.path.normcase(os.path.abspath(path)) if path else None
+        if key and key not in seen:
+            seen.add(key)
+            result.append(path)
+    return result
+
+
+def _scan_dir(directory):
+    """列出目录中名称以pjsua开头的可执行文件(包括pjsua-x86_64-unknown-linux-gnu之类的构建产物)"""
+    found = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                if not name.startswith("pjsua") or name.endswith((".c", ".h", ".o", ".d", ".py")):
+                    continue
+                if not entry.is_file():
+                    continue
+                if sys.platform == "win32":
+                    if name.endswith(".exe"):
+                        found.append(entry.path)
+                elif os.access(entry.path, os.X_OK):
+                    found.append(entry.path)
+    except OSError:
+        pass
+    # 名称正好是pjsua的排在前面
+    found.sort(key=lambda path: (os.path.basename(path).lower() not in ("pjsua", "pjsua.exe"), path))
+    return found
+
+
+def resolve_path(path):
+    """将不含目录的名称按PATH解析为完整路径，找不到时原样返回"""
+    if path and not os.path.dirname(path) and not os.path.exists(path):
+        return shutil.which(path) or path
+    return path
+
+
+def fingerprint(path):
+    """可执行文件的 (大小, 修改时间ns, inode)，文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class PjsuaInfo:
+    """一个pjsua可执行文件的检测结果"""
+
+    __slots__ = ("path", "fingerprint", "valid", "version", "features", "error", "checked_at",
+                 "returncode")
+
+    def __init__(self, path, fingerprint=None, valid=False, version=None, features=None,
+                 error=None, checked_at=None, returncode=None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.valid = valid
+        self.version = version
+        self.features = features or {}
+        self.error = error
+        self.checked_at = checked_at
+        # pjsua --help的返回码，未能启动时为None
+        self.returncode = returncode
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def describe(self):
+        """版本和功能的简短描述"""
+        features = ", ".join(name for name, supported in sorted(self.features.items()) if supported)
+        return f"版本 {self.version or '未知'}" + (f", 支持 {features}" if features else "")
+
+    def __repr__(self):
+        return f"PjsuaInfo({self.path}, valid={self.valid}, version={self.version})"
+
+
+def validate(path, shell=False):
+    """
+    启动pjsua --help检测是否可用，并读取版本和支持的功能
+
+    Args:
+        path: 可执行文件的完整路径
+        shell: 是否经由shell启动(与启动pjsua的方式一致)
+
+    Returns:
+        PjsuaInfo: 检测结果
+    """
+    info = PjsuaInfo(path, fingerprint(path), checked_at=time.time())
+    if info.fingerprint is None:
+        info.error = "文件不存在"
+        return info
+    try:
+        result = subprocess.run([path, "--help"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, errors="replace", shell=shell, timeout=CHECK_TIMEOUT)
+    except Exception as e:
+        info.error = str(e)
+        return info
+
+    info.returncode = result.returncode
+    text = result.stdout + result.stderr
+    # 非零返回码时只认标准输出中的帮助信息，"pjsua: error while loading shared
+    # libraries"之类的错误输出中同样含有"pjsua"
+    if "Usage:" not in result.stdout and (result.returncode != 0 or
+                                          ("usage:" not in text and "pjsua" not in text)):
+        info.error = result.stderr.strip() or f"输出中没有帮助信息(返回码 {result.returncode})"
+        return info
+    info.valid = True
+    info.features = {name: option in text for option, name in FEATURE_OPTIONS.items()}
+
+    # 支持--version时读取版本；结果会被缓存，每个可执行文件只需读取一次
+    if "--version" in text:
+        try:
+            version = subprocess.run([path, "--version"], stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT, text=True, errors="replace",
+                                     shell=shell, timeout=CHECK_TIMEOUT).stdout
+            text = version + text
+        except Exception:
+            pass
+    match = _version_pattern.search(text)
+    if match:
+        info.version = match.group(1)
+    return info
+
+
+class PjsuaDiscovery:
+    """带磁盘缓存的pjsua查找与检测，可在任意线程调用"""
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, log=None, workers=8, shell=False):
+        """
+        初始化并加载缓存
+
+        Args:
+            cache_file: 缓存文件路径，为None时只在内存中缓存
+            log: 日志函数
+            workers: 并行扫描和检测的线程数
+            shell: 检测时是否经由shell启动pjsua
+        """
+        self.cache_file = cache_file
+        self.shell = shell
+        self.log = log or (lambda message: None)
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._cache = self._load()
+        # 检测次数统计: 命中缓存 / 实际启动pjsua
+        self.hits = 0
+        self.spawns = 0
+
+    def _load(self):
+        """加载缓存文件"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return {path: PjsuaInfo.from_dict(data) for path, data in json.load(f).items()}
+        except Exception as e:
+            self.log(f"读取PJSUA检测缓存失败: {e}")
+            return {}
+
+    def _save(self):
+        """
+        写入缓存文件(先写临时文件再替换，避免写到一半的文件)
+
+        已删除或已变化的可执行文件的条目同时从缓存中删除，缓存不会随临时目录中
+        的pjsua(如测试工具启动的模拟程序)不断增长。
+        """
+        if not self.cache_file:
+            return
+        with self._save_lock:
+            with self._lock:
+                stale = []
+                for path, info in self._cache.items():
+                    current = fingerprint(path)
+                    if current is None or current != info.fingerprint:
+                        stale.append(path)
+                for path in stale:
+                    del self._cache[path]
+                data = {path: info.to_dict() for path, info in self._cache.items()}
+            temp = f"{self.cache_file}.tmp"
+            try:
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4, ensure_ascii=False)
+                os.replace(temp, self.cache_file)
+            except Exception as e:
+                self.log(f"保存PJSUA检测缓存失败: {e}")
+
+    def cached(self, path):
+        """
+        缓存中仍然有效的检测结果
+
+        Returns:
+            PjsuaInfo: 可执行文件未变化时返回缓存的结果，否则返回None
+        """
+        path = os.path.abspath(resolve_path(path))
+        with self._lock:
+            info = self._cache.get(path)
+        if info is not None and info.fingerprint == fingerprint(path):
+            return info
+        return None
+
+    def check(self, path, save=True):
+        """
+        检测pjsua是否可用，可执行文件未变化时直接返回缓存的结果
+
+        只缓存可用且正常退出的结果，检测失败(可能只是超时)或返回码非零的文件
+        下次仍会重新检测。
+
+        Args:
+            path: pjsua路径或PATH中的名称
+            save: 是否立即写入缓存文件
+
+        Returns:
+            PjsuaInfo: 检测结果
+        """
+        full_path = os.path.abspath(resolve_path(path))
+        info = self.cached(full_path)
+        if info is not None:
+            with self._lock:
+                self.hits += 1
+            return info
+        with self._lock:
+            self.spawns += 1
+        info = validate(full_path, self.shell)
+        if info.valid and info.returncode == 0:
+            with self._lock:
+                self._cache[full_path] = info
+            if save:
+                self._save()
+        return info
+
+    def check_async(self, path, callback):
+        """在后台线程中检测，完成后在该线程中调用 callback(PjsuaInfo)"""
+        threading.Thread(target=lambda: callback(self.check(path)),
+                         name="pjsua-check", daemon=True).start()
+
+    def candidates(self):
+        """并行扫描所有候选目录，返回找到的可执行文件(按目录优先顺序)"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(_scan_dir, candidate_dirs())
+        seen = set()
+        paths = []
+        for found in results:
+            for path in found:
+                key = os.path.normcase(os.path.realpath(path))
+                if key not in seen:
+                    seen.add(key)
+                    paths.append(path)
+        return paths
+
+    def discover(self):
+        """
+        查找并检测所有候选的pjsua
+
+        Returns:
+            list: 可用的PjsuaInfo，按目录优先顺序排列
+        """
+        paths = self.candidates()
+        spawns = self.spawns
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            infos = list(pool.map(lambda path: self.check(path, save=False), paths))
+        if self.spawns != spawns:
+            self._save()
+        return [info for info in infos if info.valid]
+
+    def discover_async(self, callback):
+        """在后台线程中查找，完成后在该线程中调用 callback(可用的PjsuaInfo列表)"""
+        threading.Thread(target=lambda: callback(self.discover()),
+                         name="pjsua-discovery", daemon=True).start()
+
+    def report(self):
+        """返回检测次数统计"""
+        return f"检测{self.hits + self.spawns}次, 命中缓存{self.hits}次, 启动pjsua {self.spawns}次"
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA事件流
+
+将pjsua的标准输出转换为带类型的事件对象，并分发给订阅者。
+界面、统计和录制等模块都从同一个事件流获取状态，不再各自解析文本。
+"""
+
+import re
+import time
+
+from core import pjsua_parser
+from core.pjsua_parser import default_classifier
+
+
+class PjsuaEvent:
+    """pjsua事件基类"""
+
+    __slots__ = ('timestamp', 'offset', 'line')
+
+    def __init__(self, timestamp, offset, line):
+        """
+        Args:
+            timestamp: 读到该行时的单调时钟时间 (time.monotonic)
+            offset: 该行在输出流中的行号，从0开始
+            line: 原始输出行
+        """
+        self.timestamp = timestamp
+        self.offset = offset
+        self.line = line
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}"
+                           for cls in reversed(type(self).__mro__[:-1]) for name in cls.__slots__
+                           if name != 'line')
+        return f"{type(self).__name__}({fields})"
+
+
+class OutputLine(PjsuaEvent):
+    """任意一行输出，仅在有订阅者时产生"""
+
+    __slots__ = ()
+
+
+class RegistrationSucceeded(PjsuaEvent):
+    """账号注册成功; uri为输出中的账号URI，可能为None"""
+
+    __slots__ = ('uri',)
+
+    def __init__(self, timestamp, offset, line, uri=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.uri = uri
+
+
+class RegistrationFailed(PjsuaEvent):
+    """账号注册失败; status_code、reason和uri可能为None"""
+
+    __slots__ = ('status_code', 'reason', 'uri')
+
+    def __init__(self, timestamp, offset, line, status_code=None, reason=None, uri=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.status_code = status_code
+        self.reason = reason
+        self.uri = uri
+
+
+class Unregistered(PjsuaEvent):
+    """账号注销成功; uri可能为None"""
+
+    __slots__ = ('uri',)
+
+    def __init__(self, timestamp, offset, line, uri=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.uri = uri
+
+
+class AccountInfo(PjsuaEvent):
+    """账号信息; acc_id为None表示从非标准格式中提取，current表示是否为当前账号"""
+
+    __slots__ = ('acc_id', 'uri', 'username', 'server', 'current')
+
+    def __init__(self, timestamp, offset, line, acc_id, uri, username, server, current=False):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.acc_id = acc_id
+        self.uri = uri
+        self.username = username
+        self.server = server
+        self.current = current
+
+
+class CurrentAccountChanged(PjsuaEvent):
+    """控制台的当前账号(拨号使用的账号)已切换"""
+
+    __slots__ = ('acc_id',)
+
+    def __init__(self, timestamp, offset, line, acc_id):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.acc_id = acc_id
+
+
+class IncomingCall(PjsuaEvent):
+    """来电; remote_uri和接听账号acc_id可能为None"""
+
+    __slots__ = ('remote_uri', 'acc_id')
+
+    def __init__(self, timestamp, offset, line, remote_uri, acc_id=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.remote_uri = remote_uri
+        self.acc_id = acc_id
+
+
+class CallState(PjsuaEvent):
+    """通话状态变化"""
+
+    __slots__ = ('call_id', 'state', 'status_code', 'reason')
+
+    CONFIRMED = "CONFIRMED"
+    DISCONNECTED = "DISCONNECTED"
+
+    def __init__(self, timestamp, offset, line, call_id, state, status_code=None, reason=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.call_id = call_id
+        self.state = state
+        self.status_code = status_code
+        self.reason = reason
+
+
+class CallProgress(PjsuaEvent):
+    """呼叫过程中的阶段信息"""
+
+    __slots__ = ('stage',)
+
+    MAKING_CALL = pjsua_parser.MAKING_CALL
+    SENDING_INVITE = pjsua_parser.SENDING_INVITE
+    RINGING = pjsua_parser.RINGING
+    ANSWERED = pjsua_parser.INVITE_OK
+    MEDIA_SOON = pjsua_parser.MEDIA_SOON
+    BYE_SENT = pjsua_parser.BYE_SENT
+
+    def __init__(self, timestamp, offset, line, stage):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.stage = stage
+
+
+class CallFailed(PjsuaEvent):
+    """发起呼叫失败"""
+
+    __slots__ = ('reason',)
+
+    def __init__(self, timestamp, offset, line, reason):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.reason = reason
+
+
+class SipTraffic(PjsuaEvent):
+    """pjsua收发的一条SIP消息(4级日志中的TX/RX行); 请求的status_code为None，响应的method取自CSeq"""
+
+    __slots__ = ('direction', 'method', 'status_code')
+
+    SENT = "TX"
+    RECEIVED = "RX"
+
+    def __init__(self, timestamp, offset, line, direction, method, status_code=None):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.direction = direction
+        self.method = method
+        self.status_code = status_code
+
+
+class ConsoleReply(PjsuaEvent):
+    """控制台命令的提示或应答"""
+
+    __slots__ = ('reply',)
+
+    MAKE_CALL = "Make call"
+    ACCOUNT_LIST = "Account list"
+    NO_CURRENT_CALL = "No current call"
+    # +a 添加账号的各个提示
+    SIP_URL = "Your SIP URL"
+    REGISTRAR = "URL of the registrar"
+    AUTH_REALM = "Auth Realm"
+    AUTH_USERNAME = "Auth Username"
+    AUTH_PASSWORD = "Auth Password"
+    # -a 删除账号的提示
+    DELETE_ACCOUNT = "account ID to delete"
+    REPLIES = (MAKE_CALL, ACCOUNT_LIST, NO_CURRENT_CALL, SIP_URL, REGISTRAR, AUTH_REALM,
+               AUTH_USERNAME, AUTH_PASSWORD, DELETE_ACCOUNT)
+
+    def __init__(self, timestamp, offset, line, reply):
+        PjsuaEvent.__init__(self, timestamp, offset, line)
+        self.reply = reply
+
+
+class ProcessExited(PjsuaEvent):
+    """pjsua进程已结束，line为空字符串"""
+
+    __slots__ = ('returncode',)
+
+    def __init__(self, timestamp, offset, returncode=None):
+        PjsuaEvent.__init__(self, timestamp, offset, "")
+        self.returncode = returncode
+
+
+# 字段提取
+_call_state_pattern = re.compile(
+    r"Call (?P<call_id>\d+) state changed to (?P<state>[A-Z_]+)"
+    r"(?: \[reason=(?P<code>\d+) \((?P<reason>[^)]*)\)\])?"
+    r"|Call state: (?P<short_state>[A-Z_]+)")
+_status_pattern = re.compile(r"status=(?P<code>\d+) \((?P<reason>[^)]*)\)")
+_sip_uri_pattern = re.compile(r"sip:([^@\s]+)@([^\s:;>,]+)")
+_account_number_pattern = re.compile(r"account (?:changed to )?(\d+)")
+
+
+def _account_uri(line):
+    """注册类输出中的账号URI"""
+    uri = _sip_uri_pattern.search(line)
+    return uri.group(0) if uri else None
+
+
+def _build_registered(timestamp, offset, line, match):
+    return RegistrationSucceeded(timestamp, offset, line, _account_uri(line))
+
+
+def _build_registration_failed(timestamp, offset, line, match):
+    status = _status_pattern.search(line)
+    if status is None:
+        return RegistrationFailed(timestamp, offset, line, uri=_account_uri(line))
+    return RegistrationFailed(timestamp, offset, line, int(status.group('code')),
+                              status.group('reason'), _account_uri(line))
+
+
+def _build_unregistered(timestamp, offset, line, match):
+    return Unregistered(timestamp, offset, line, _account_uri(line))
+
+
+def _build_account(timestamp, offset, line, match):
+    acc_id, uri, username, server = match.group('acc_id', 'acc_uri', 'acc_user', 'acc_server')
+    return AccountInfo(timestamp, offset, line, acc_id, uri, username, server,
+                       match.group('acc_current') is not None)
+
+
+def _build_account_changed(timestamp, offset, line, match):
+    number = _account_number_pattern.search(line)
+    if number is None:
+        return None
+    return CurrentAccountChanged(timestamp, offset, line, int(number.group(1)))
+
+
+def _build_account_alt(timestamp, offset, line, match):
+    username, server = match.group('alt_user', 'alt_server')
+    return AccountInfo(timestamp, offset, line, None, f"sip:{username}@{server}", username, server)
+
+
+def _build_account_generic(timestamp, offset, line, match):
+    uri = _sip_uri_pattern.search(line)
+    if uri is None:
+        return None
+    username, server = uri.group(1), uri.group(2).rstrip(",.;:")
+    return AccountInfo(timestamp, offset, line, None, f"sip:{username}@{server}", username, server)
+
+
+def _build_incoming_call(timestamp, offset, line, match):
+    uri = _sip_uri_pattern.search(line)
+    number = _account_number_pattern.search(line)
+    return IncomingCall(timestamp, offset, line, uri.group(0) if uri else None,
+                        int(number.group(1)) if number else None)
+
+
+def _build_call_state(timestamp, offset, line, state):
+    match = _call_state_pattern.search(line)
+    if match is None:
+        return CallState(timestamp, offset, line, None, state)
+    call_id = match.group('call_id')
+    code = match.group('code')
+    return CallState(timestamp, offset, line,
+                     int(call_id) if call_id is not None else None,
+                     state or match.group('state') or match.group('short_state'),
+                     int(code) if code is not None else None,
+                     match.group('reason'))
+
+
+def _build_call_confirmed(timestamp, offset, line, match):
+    return _build_call_state(timestamp, offset, line, CallState.CONFIRMED)
+
+
+def _build_call_disconnected(timestamp, offset, line, match):
+    return _build_call_state(timestamp, offset, line, CallState.DISCONNECTED)
+
+
+def _build_call_state_other(timestamp, offset, line, match):
+    return _build_call_state(timestamp, offset, line, None)
+
+
+def _build_call_failed(timestamp, offset, line, match):
+    _, _, reason = line.partition("Unable to make call")
+    return CallFailed(timestamp, offset, line, reason.lstrip(": ").strip() or None)
+
+
+def _build_sip_message(timestamp, offset, line, match):
+    status = match.group('sip_status')
+    if status is None:
+        return SipTraffic(timestamp, offset, line, match.group('sip_dir'), match.group('sip_method'))
+    return SipTraffic(timestamp, offset, line, match.group('sip_dir'),
+                      match.group('sip_cseq_method'), int(status))
+
+
+def _build_console_reply(timestamp, offset, line, match):
+    for reply in ConsoleReply.REPLIES:
+        if reply in line:
+            return ConsoleReply(timestamp, offset, line, reply)
+    return None
+
+
+def _progress_builder(stage):
+    """为呼叫阶段生成构造函数 (仅在模块加载时调用)"""
+    def build(timestamp, offset, line, match):
+        return CallProgress(timestamp, offset, line, stage)
+    return build
+
+
+# 事件类型 -> 事件构造函数 (timestamp, offset, line, match) -> 事件或None
+EVENT_BUILDERS = {
+    pjsua_parser.REGISTERED: _build_registered,
+    pjsua_parser.REGISTRATION_FAILED: _build_registration_failed,
+    pjsua_parser.UNREGISTERED: _build_unregistered,
+    pjsua_parser.ACCOUNT: _build_account,
+    pjsua_parser.ACCOUNT_CHANGED: _build_account_changed,
+    pjsua_parser.ACCOUNT_ALT: _build_account_alt,
+    pjsua_parser.ACCOUNT_GENERIC: _build_account_generic,
+    pjsua_parser.INCOMING_CALL: _build_incoming_call,
+    pjsua_parser.CALL_CONFIRMED: _build_call_confirmed,
+    pjsua_parser.CALL_DISCONNECTED: _build_call_disconnected,
+    pjsua_parser.CALL_STATE: _build_call_state_other,
+    pjsua_parser.CALL_FAILED: _build_call_failed,
+    pjsua_parser.MAKING_CALL: _progress_builder(CallProgress.MAKING_CALL),
+    pjsua_parser.SENDING_INVITE: _progress_builder(CallProgress.SENDING_INVITE),
+    pjsua_parser.RINGING: _progress_builder(CallProgress.RINGING),
+    pjsua_parser.INVITE_OK: _progress_builder(CallProgress.ANSWERED),
+    pjsua_parser.MEDIA_SOON: _progress_builder(CallProgress.MEDIA_SOON),
+    pjsua_parser.BYE_SENT: _progress_builder(CallProgress.BYE_SENT),
+    pjsua_parser.SIP_MESSAGE: _build_sip_message,
+    pjsua_parser.CONSOLE_REPLY: _build_console_reply,
+}
+
+
+def iter_events(lines, start_offset=0, classifier=default_classifier, clock=time.monotonic,
+                include_lines=False):
+    """
+    将输出行转换为事件的生成器
+
+    Args:
+        lines: 输出行的可迭代对象
+        start_offset: 第一行的行号
+        classifier: 行分类器
+        clock: 时间戳来源
+        include_lines: 是否为每一行额外产生OutputLine事件
+
+    Yields:
+        PjsuaEvent: 按输出顺序产生的事件
+    """
+    classify = classifier.classify
+    builders = EVENT_BUILDERS
+    for offset, line in enumerate(lines, start_offset):
+        timestamp = clock()
+        if include_lines:
+            yield OutputLine(timestamp, offset, line)
+        kind, match = classify(line)
+        if kind is not None:
+            event = builders[kind](timestamp, offset, line, match)
+            if event is not None:
+                yield event
+
+
+class PjsuaEventStream:
+    """pjsua事件流，负责解析输出行并将事件分发给订阅者"""
+
+    def __init__(self, classifier=default_classifier, clock=time.monotonic):
+        """
+        初始化事件流
+
+        Args:
+            classifier: 行分类器
+            clock: 时间戳来源
+        """
+        self.classifier = classifier
+        self.clock = clock
+        self.offset = 0  # 下一行的行号
+        self._subscribers = []  # [(回调, 事件类型元组), ...]
+        self._routes = {}       # 事件类 -> [回调, ...]
+
+    def subscribe(self, callback, *event_types):
+        """
+        订阅事件
+
+        Args:
+            callback: 回调函数，参数为事件对象；在调用feed的线程中执行
+            *event_types: 关注的事件类(含子类)，为空表示全部事件(不含OutputLine)
+        """
+        self._subscribers.append((callback, event_types))
+        self._rebuild_routes()
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        self._subscribers = [(cb, types) for cb, types in self._subscribers if cb != callback]
+        self._rebuild_routes()
+
+    def _rebuild_routes(self):
+        """预先计算每个事件类对应的回调列表，分发时只需一次字典查找"""
+        routes = {}
+        for cls in _all_event_classes():
+            callbacks = []
+            for callback, event_types in self._subscribers:
+                if event_types:
+                    if issubclass(cls, event_types):
+                        callbacks.append(callback)
+                elif cls is not OutputLine:
+                    callbacks.append(callback)
+            if callbacks:
+                routes[cls] = tuple(callbacks)
+        self._routes = routes
+
+    def publish(self, event):
+        """将事件分发给订阅者"""
+        for callback in self._routes.get(type(event), ()):
+            callback(event)
+
+    def feed(self, line):
+        """
+        处理一行输出
+
+        Args:
+            line: 输出行
+
+        Returns:
+            PjsuaEvent: 该行解析得到的事件(不含OutputLine)，无事件时返回None
+        """
+        offset = self.offset
+        self.offset = offset + 1
+        routes = self._routes
+        timestamp = self.clock()
+        if OutputLine in routes:
+            self.publish(OutputLine(timestamp, offset, line))
+        kind, match = self.classifier.classify(line)
+        if kind is not None:
+            event = EVENT_BUILDERS[kind](timestamp, offset, line, match)
+            if event is not None:
+                self.publish(event)
+                return event
+        return None
+
+    def classify(self, lines):
+        """
+        对一批输出行分类，结果可交给feed_lines()，也可供其他使用者共用而不必再次解析
+
+        Returns:
+            list: [(行下标, 事件类型, 字段匹配对象或None), ...]，只包含命中的行
+        """
+        return self.classifier.classify_batch(lines)
+
+    def feed_lines(self, lines, hits=None):
+        """
+        处理一批输出行
+
+        整批只扫描一次，同一批中的行共用读取时刻的时间戳。
+
+        Args:
+            lines: 输出行列表(同一次读取得到)
+            hits: classify()对这批行的结果，默认在此分类
+        """
+        offset = self.offset
+        self.offset = offset + len(lines)
+        timestamp = self.clock()
+        routes = self._routes
+        publish = self.publish
+        builders = EVENT_BUILDERS
+        if hits is None:
+            hits = self.classifier.classify_batch(lines)
+
+        if OutputLine not in routes:
+            for index, kind, match in hits:
+                event = builders[kind](timestamp, offset + index, lines[index], match)
+                if event is not None:
+                    publish(event)
+            return
+
+        # 有原始行订阅者时按行序交错发布OutputLine和解析出的事件
+        hits = iter(hits)
+        hit = next(hits, None)
+        for index, line in enumerate(lines):
+            publish(OutputLine(timestamp, offset + index, line))
+            if hit is not None and hit[0] == index:
+                event = builders[hit[1]](timestamp, offset + index, line, hit[2])
+                if event is not None:
+                    publish(event)
+                hit = next(hits, None)
+
+    def close(self, returncode=None):
+        """输出流结束，发布ProcessExited事件"""
+        self.publish(ProcessExited(self.clock(), self.offset, returncode))
+
+    def events(self, lines):
+        """
+        以生成器方式消费输出行，事件同时分发给订阅者
+
+        Args:
+            lines: 输出行的可迭代对象
+
+        Yields:
+            PjsuaEvent: 解析得到的事件(不含OutputLine)
+        """
+        for line in lines:
+            event = self.feed(line)
+            if event is not None:
+                yield event
+
+
+def _all_event_classes():
+    """返回所有具体事件类"""
+    classes = []
+    pending = [PjsuaEvent]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
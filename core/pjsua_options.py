@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA进程的公共参数
+
+SIP引擎和asyncio驱动共用的日志级别和标准输入输出编码，单独成模块以便
+轻量的使用者不必导入整个引擎。
+"""
+
+import locale
+
+# PJSUA日志级别: 精简模式只保留解析器所需的事件(注册结果、通话状态等)，
+# 详细模式额外输出完整的SIP报文
+LEAN_LOG_LEVEL = 3
+VERBOSE_LOG_LEVEL = 4
+
+# 与PJSUA标准输入输出交互使用的编码
+PJSUA_ENCODING = locale.getpreferredencoding(False)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA输出解析
+
+将pjsua打印的每一行归类为一种事件类型。所有规则的关键字在模块加载时
+合并编译成一个正则表达式，每行只扫描一次。
+"""
+
+import re
+from bisect import bisect_right
+from itertools import accumulate, repeat
+from operator import add
+
+# 事件类型
+REGISTERED = "registered"
+REGISTRATION_FAILED = "registration_failed"
+UNREGISTERED = "unregistered"
+ACCOUNT = "account"
+ACCOUNT_CHANGED = "account_changed"
+ACCOUNT_ALT = "account_alt"
+ACCOUNT_GENERIC = "account_generic"
+INCOMING_CALL = "incoming_call"
+CALL_CONFIRMED = "call_confirmed"
+CALL_DISCONNECTED = "call_disconnected"
+CALL_FAILED = "call_failed"
+CALL_STATE = "call_state"
+MAKING_CALL = "making_call"
+SENDING_INVITE = "sending_invite"
+RINGING = "ringing"
+INVITE_OK = "invite_ok"
+MEDIA_SOON = "media_soon"
+BYE_SENT = "bye_sent"
+SIP_MESSAGE = "sip_message"
+CONSOLE_REPLY = "console_reply"
+
+# 匹配规则表: (事件类型, 关键字组合, ...)
+# 组合的第一项为触发关键字，参与合并扫描；其余各项只在触发后用子串判断确认。
+# 触发关键字尽量以大写字母、数字或符号开头，便于扫描时按首字符跳过普通文本。
+# 某一组合全部出现在行内即命中；一行只归为一种事件，按表中顺序优先。
+EVENT_RULES = (
+    # 收发SIP消息的行数量较多且不含其他关键字，放在最前面以便尽快确定类型
+    (SIP_MESSAGE, ("Request msg",), ("Response msg",)),
+    (UNREGISTERED, (": unregistration success",)),
+    # 注册成功的行如 "sip:1000@host: registration success, status=200 (OK), ..."，
+    # 以"200 OK"或": registration success"触发，再确认状态
+    (REGISTERED, ("Registration success",), ("200 OK", "REGISTER"),
+                 ("200 OK", "registration success"),
+                 (": registration success", "status=200"), (": registration success", "OK")),
+    (REGISTRATION_FAILED, (": registration failed",), (": registration error",),
+                          ("SIP registration error",)),
+    (ACCOUNT_CHANGED, ("Current account changed to",)),
+    # 账号列表中已注册账号的行如 " *[ 1] sip:1000@host: 200/OK (expires=299)"
+    (ACCOUNT, ("(expires=", "] sip:")),
+    (ACCOUNT_ALT, ("Account", "sip:")),
+    (ACCOUNT_GENERIC, ("Account", "sip:")),
+    (CALL_FAILED, ("Unable to make call",)),
+    (INCOMING_CALL, ("Incoming INVITE",), ("Incoming call", "for account")),
+    (CALL_CONFIRMED, ("Call established",), ("Media active",),
+                     ("CONFIRMED", "state changed to"), ("Call state: CONFIRMED",)),
+    (CALL_DISCONNECTED, ("Call disconnected",),
+                        ("Call state: DISCONNECTED",), ("DISCONNECTED", "state changed to")),
+    (RINGING, ("180 Ringing",)),
+    (INVITE_OK, ("200 OK", "INVITE")),
+    (MAKING_CALL, ("Making call",)),
+    (SENDING_INVITE, ("Sending INVITE",)),
+    # "Call "带空格，SIP报文中的"Call-ID"不会触发
+    (CALL_STATE, ("Call state",), ("Call ", "state changed to")),
+    (MEDIA_SOON, ("Media will be active soon",)),
+    (BYE_SENT, ("BYE sent",)),
+    # +a 添加账号的各个提示都以"(empty to cancel)"结尾，具体是哪一个由事件构造时区分
+    (CONSOLE_REPLY, ("Make call:",), ("Account list:",), ("No current call",),
+                    ("(empty to cancel)",), ("Enter account ID to delete",)),
+)
+
+# 需要提取字段的事件类型: 关键字命中后再用对应正则确认并取值，确认失败则继续匹配后续规则
+EVENT_EXTRACTORS = {
+    ACCOUNT: re.compile(r"(?P<acc_current>\*)?\[\s*(?P<acc_id>\d+)\]\s+"
+                        r"(?P<acc_uri>sip:(?P<acc_user>[^@]+)@(?P<acc_server>[^:]+))"),
+    ACCOUNT_ALT: re.compile(r"Account\s+\d+:\s+sip:(?P<alt_user>[^@]+)@(?P<alt_server>[^:]+)"),
+    # 4级日志中收发的SIP消息，如 "TX 548 bytes Request msg REGISTER/cseq=..."、
+    # "RX 553 bytes Response msg 401/REGISTER/cseq=..."
+    SIP_MESSAGE: re.compile(r"(?P<sip_dir>TX|RX) \d+ bytes (?:Request msg (?P<sip_method>[A-Z]+)"
+                            r"|Response msg (?P<sip_status>\d{3})/(?P<sip_cseq_method>[A-Z]+))"),
+}
+
+
+def _trie_pattern(words):
+    """
+    将一组字面量关键字按前缀树合并为正则表达式
+
+    同一位置上较长的关键字优先(如"Call state: CONFIRMED"优先于"Call state")。
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 到此已是完整关键字时，后续部分可选(贪婪匹配保证取最长)
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class PjsuaLineClassifier:
+    """pjsua输出行分类器"""
+
+    # 合并候选组合的缓存上限(正常输出中的关键字序列只有几十种)
+    MERGED_CACHE_SIZE = 512
+
+    def __init__(self, rules=EVENT_RULES, extractors=EVENT_EXTRACTORS):
+        """
+        编译匹配规则
+
+        所有触发关键字按公共前缀合并为一个不带捕获分组的字面量正则，re模块
+        可据此按首字符快速跳过不相关的位置；大多数行(SIP报文正文等)一次扫描即可排除。
+
+        Args:
+            rules: 规则表，格式同EVENT_RULES
+            extractors: 事件类型 -> 字段提取正则
+        """
+        # 触发关键字 -> [((规则序号, 组合序号), 事件类型, 其余关键字), ...]，按表中顺序排列
+        self._by_trigger = {}
+        for rule_index, (kind, *groups) in enumerate(rules):
+            for group_index, group in enumerate(groups):
+                self._by_trigger.setdefault(group[0], []).append(
+                    ((rule_index, group_index), kind, group[1:]))
+        # 一行出现多个触发关键字时合并后的候选组合，按关键字序列缓存
+        self._merged = {}
+        self._extractors = {kind: pattern.search for kind, pattern in extractors.items()}
+
+        self._pattern = re.compile(_trie_pattern(self._by_trigger))
+        self._findall = self._pattern.findall
+
+    def classify(self, line):
+        """
+        对一行输出进行分类
+
+        Args:
+            line: pjsua输出的一行文本
+
+        Returns:
+            tuple: (事件类型, 字段匹配对象或None)，未命中任何规则时返回 (None, None)
+        """
+        found = self._findall(line)
+        if not found:
+            return None, None
+        return self._resolve(line, found)
+
+    def classify_batch(self, lines):
+        """
+        对一批输出行进行分类
+
+        将整批文本拼接后只做一次扫描，未命中任何触发关键字的行不再进入Python层处理。
+
+        Args:
+            lines: 输出行列表
+
+        Returns:
+            list: [(行下标, 事件类型, 字段匹配对象或None), ...]，只包含命中的行
+        """
+        text = "\n".join(lines)
+        # 每一行的下一行起始偏移，用于二分定位命中所在的行
+        next_starts = list(accumulate(map(add, map(len, lines), repeat(1))))
+        results = []
+        index = -1
+        found = []
+        for hit in self._pattern.finditer(text):
+            hit_index = bisect_right(next_starts, hit.start())
+            if hit_index != index:
+                # 触发关键字落在新的一行，先结算上一行
+                if found:
+                    self._append_result(results, lines, index, found)
+                index = hit_index
+                found = []
+            found.append(hit.group())
+        if found:
+            self._append_result(results, lines, index, found)
+        return results
+
+    def _append_result(self, results, lines, index, found):
+        """结算一行的分类结果"""
+        kind, match = self._resolve(lines[index], found)
+        if kind is not None:
+            results.append((index, kind, match))
+
+    def _resolve(self, line, found):
+        """
+        根据行内出现的触发关键字确定事件类型
+
+        只检查由这些触发关键字引出的组合，按规则表中的顺序逐一确认。
+        """
+        if len(found) == 1:
+            candidates = self._by_trigger[found[0]]
+        else:
+            key = tuple(found)
+            candidates = self._merged.get(key)
+            if candidates is None:
+                candidates = sorted({candidate for trigger in key for candidate in self._by_trigger[trigger]})
+                if len(self._merged) < self.MERGED_CACHE_SIZE:
+                    self._merged[key] = candidates
+        extractors = self._extractors
+        failed_rule = None
+        for (rule_index, _), kind, extras in candidates:
+            if rule_index == failed_rule:
+                continue
+            if extras and not all(extra in line for extra in extras):
+                continue
+            if kind not in extractors:
+                return kind, None
+            match = extractors[kind](line)
+            if match is not None:
+                return kind, match
+            # 字段确认失败，跳过该规则的其余组合
+            failed_rule = rule_index
+        return None, None
+
+
+# 默认分类器，供各模块共享
+default_classifier = PjsuaLineClassifier()
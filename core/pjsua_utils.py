@@ -8,45 +8,89 @@ PJSUA工具类
 """
 
 import os
-import socket
-import random
-import subprocess
+import sys
+import threading
 import webbrowser
-import tkinter as tk
-from tkinter import filedialog, messagebox
+
+from core.pjsua_discovery import PjsuaDiscovery, DEFAULT_CACHE_FILE, resolve_path
+from core.port_allocator import PortAllocator, DEFAULT_RANGE
+
+# Windows下沿用shell启动pjsua；POSIX的shell只会执行参数列表的第一项，必须直接启动
+USE_SHELL = sys.platform == "win32"
 
 class PJSUAUtils:
     """PJSUA辅助工具类"""
     
-    def __init__(self, logger):
-        """初始化PJSUA工具类"""
+    def __init__(self, logger, show_error=None, cache_file=DEFAULT_CACHE_FILE, port_range=DEFAULT_RANGE):
+        """
+        初始化PJSUA工具类
+        
+        Args:
+            logger: 日志管理器
+            show_error: 错误提示函数 show_error(标题, 内容)，为None时只记录日志
+                        (无界面运行时)
+            cache_file: PJSUA检测结果的缓存文件
+            port_range: 本地SIP端口的分配范围
+        """
         self.logger = logger
+        self.show_error = show_error
+        # 查找和检测pjsua，检测结果按文件指纹缓存到磁盘
+        self.discovery = PjsuaDiscovery(cache_file, log=logger.log, shell=USE_SHELL)
+        # 本地端口分配 - 与同一主机上的其他客户端进程协调
+        self.port_allocator = PortAllocator(port_range, log=logger.log)
+        
+    def report_error(self, title, message):
+        """提示错误信息"""
+        if self.show_error:
+            self.show_error(title, message)
         
     def find_pjsua_path(self):
-        """尝试自动查找pjsua可能的路径"""
-        # 默认路径
-        default_path = "pjsua.exe"
+        """
+        查找pjsua，并行扫描程序目录、PATH和常见安装位置(会阻塞，界面中请用locate_pjsua_async)
         
-        # 检查当前目录
+        Returns:
+            str: 第一个可用的pjsua路径，都不可用时返回默认名称
+        """
+        # 当前目录的pjsua.exe优先，与之前的查找顺序一致
         current_dir_path = os.path.join(os.getcwd(), "pjsua.exe")
         if os.path.exists(current_dir_path):
             return current_dir_path
             
-        # 检查可能的安装目录
-        possible_paths = [
-            os.path.join(os.environ.get('ProgramFiles', 'C:\\Program Files'), "PJSIP", "bin", "pjsua.exe"),
-            os.path.join(os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)'), "PJSIP", "bin", "pjsua.exe"),
-            os.path.join(os.environ.get('USERPROFILE', 'C:\\Users\\Default'), "Downloads", "pjsua.exe")
-        ]
+        found = self.discovery.discover()
+        if found:
+            return found[0].path
+        return "pjsua.exe" if sys.platform == "win32" else "pjsua"
         
-        for path in possible_paths:
-            if os.path.exists(path):
-                return path
-                
-        return default_path
+    def locate_pjsua_async(self, pjsua_path, callback):
+        """
+        在后台检测pjsua_path，不可用时查找其他可用的pjsua
+        
+        Args:
+            pjsua_path: 当前设置的pjsua路径
+            callback: 在后台线程中调用 callback(可用的路径或None)
+        """
+        def run():
+            info = self.discovery.check(pjsua_path)
+            if info.valid:
+                self.logger.log(f"PJSUA检测成功: {info.path} ({info.describe()})")
+                callback(pjsua_path)
+                return
+            found = self.discovery.discover()
+            if found:
+                self.logger.log(f"PJSUA不可用: {pjsua_path}，已找到 {found[0].path} ({found[0].describe()})")
+                callback(found[0].path)
+                return
+            # 都不可用时按原来的方式提示
+            callback(pjsua_path if self.check_pjsua(pjsua_path) else None)
+            
+        threading.Thread(target=run, name="pjsua-locate", daemon=True).start()
         
     def browse_pjsua(self, path_entry):
         """浏览并选择pjsua.exe路径"""
+        # 仅界面使用，延迟导入以便在无显示器的环境中加载本模块
+        import tkinter as tk
+        from tkinter import filedialog
+        
         filename = filedialog.askopenfilename(
             initialdir=os.getcwd(),
             title="选择pjsua.exe文件",
@@ -58,6 +102,8 @@ class PJSUAUtils:
             
     def download_pjsua(self):
         """打开PJSIP下载页面"""
+        from tkinter import messagebox
+        
         download_url = "https://www.pjsip.org/download.htm"
         download_msg = """
 PJSUA下载和安装指南:
@@ -79,50 +125,42 @@ PJSUA下载和安装指南:
     def check_pjsua(self, pjsua_path):
         """检查PJSUA是否可用"""
         try:
-            # 检查路径是否存在
-            if not os.path.exists(pjsua_path):
+            # 检查路径是否存在 (不含目录的名称按PATH查找)
+            if not os.path.exists(resolve_path(pjsua_path)):
                 self.logger.log(f"PJSUA路径不存在: {pjsua_path}")
-                messagebox.showerror("PJSUA检测失败", 
+                self.report_error("PJSUA检测失败", 
                     f"找不到PJSUA可执行文件: {pjsua_path}\n\n您需要下载并安装PJSUA才能连接到SIP服务器。")
                 return False
                 
-            # 尝试运行pjsua --help看是否工作
-            result = subprocess.run([pjsua_path, "--help"], 
-                                   stdout=subprocess.PIPE, 
-                                   stderr=subprocess.PIPE,
-                                   text=True,
-                                   shell=True,
-                                   timeout=2)
-            if "Usage:" in result.stdout or "pjsua" in result.stdout:
-                self.logger.log(f"PJSUA检测成功: {pjsua_path}")
+            # 尝试运行pjsua --help看是否工作；文件未变化时直接使用缓存的结果
+            hits = self.discovery.hits
+            info = self.discovery.check(pjsua_path)
+            if info.valid:
+                source = "缓存" if self.discovery.hits > hits else "已检测"
+                self.logger.log(f"PJSUA检测成功: {pjsua_path} ({info.describe()}, {source})")
                 return True
             else:
-                self.logger.log(f"PJSUA似乎不工作: {result.stderr}")
-                messagebox.showerror("PJSUA检测失败", 
-                    f"PJSUA找到了，但无法正常运行。\n错误信息: {result.stderr}")
+                self.logger.log(f"PJSUA似乎不工作: {info.error}")
+                self.report_error("PJSUA检测失败", 
+                    f"PJSUA找到了，但无法正常运行。\n错误信息: {info.error}")
                 return False
         except Exception as e:
             self.logger.log(f"PJSUA检测失败: {str(e)}")
-            messagebox.showerror("PJSUA检测失败", 
+            self.report_error("PJSUA检测失败", 
                 f"PJSUA检测时出错: {str(e)}\n\n您需要下载并安装PJSUA才能连接到SIP服务器。")
             return False
             
-    def find_available_port(self, start_port=5060):
-        """查找可用的SIP端口"""
-        # 直接生成随机端口
-        port = random.randint(10000, 60000)
-        self.logger.log(f"生成随机端口: {port}")
+    def find_available_port(self, start_port=None):
+        """
+        分配一个可用的SIP端口并持有，直到启动pjsua时交出
         
-        # 尝试测试随机端口是否可用
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.bind(('0.0.0.0', port))
-            s.close()
-            self.logger.log(f"随机端口 {port} 可用")
-            return port
-        except:
-            # 如果随机端口不可用，再次尝试
-            self.logger.log(f"随机端口 {port} 不可用，重新生成")
-            port = random.randint(10000, 60000)
-            self.logger.log(f"重新生成随机端口: {port}")
-            return port 
\ No newline at end of file
+        Args:
+            start_port: 优先使用的端口，不可用时从分配范围中另选
+            
+        Returns:
+            int: 端口号，没有可用端口时返回None
+        """
+        port = self.port_allocator.reserve(start_port)
+        if port is not None:
+            self.logger.log(f"已分配端口: {port}")
+        return port
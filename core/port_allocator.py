@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地SIP端口分配
+
+分配端口时绑定该端口的UDP和TCP套接字并一直持有，直到即将启动pjsua时才交出，
+期间其他程序无法占用。同一主机上的多个客户端进程通过一个登记文件协调：
+文件锁保护下登记端口及所属进程，已登记的端口不再分配给别的进程，
+所属进程结束后其登记自动失效。这样在交出套接字到pjsua完成绑定的间隙里，
+其他客户端也不会选中同一个端口。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import tempfile
+import threading
+
+# 默认分配范围
+DEFAULT_RANGE = (10000, 60000)
+
+# 默认登记文件，同一主机上的所有客户端共用
+DEFAULT_REGISTRY = os.path.join(tempfile.gettempdir(), "sip_client_ports.json")
+
+
+def _pid_alive(pid):
+    """进程是否仍在运行"""
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _FileLock:
+    """跨进程的文件锁(POSIX用flock，Windows用msvcrt.locking)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if sys.platform == "win32":
+            import msvcrt
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK重试10秒后仍失败时抛出，继续等待
+                    pass
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class PortAllocator:
+    """本地SIP端口分配器，可在任意线程调用"""
+
+    def __init__(self, port_range=DEFAULT_RANGE, registry_file=DEFAULT_REGISTRY, log=None):
+        """
+        初始化端口分配器
+
+        Args:
+            port_range: (起始端口, 结束端口)，包含两端
+            registry_file: 跨进程登记文件，为None时只在本进程内协调
+            log: 日志函数
+        """
+        self.start, self.end = int(port_range[0]), int(port_range[1])
+        self.registry_file = registry_file
+        self.log = log or (lambda message: None)
+        self._lock = threading.Lock()
+        # 本进程持有的端口 -> 套接字列表(已交给pjsua的端口为空列表)
+        self._held = {}
+
+        # 统计
+        self.allocations = 0
+        self.collisions = 0       # 因被占用或已被登记而跳过的端口数
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def reserve(self, preferred=None):
+        """
+        分配并持有一个端口
+
+        Args:
+            preferred: 优先使用的端口，不可用时从范围中另选
+
+        Returns:
+            int: 端口号，范围内没有可用端口时返回None
+        """
+        started = time.perf_counter()
+        with self._lock, self._registry() as registry:
+            port = None
+            if preferred is not None:
+                preferred = int(preferred)
+                if self._held.get(preferred):
+                    # 本进程已持有且尚未交给pjsua(如界面上预先分配的端口)
+                    port = preferred
+                elif preferred not in self._held and self._try_port(preferred, registry):
+                    port = preferred
+            if port is None:
+                port = self._scan(registry)
+            if port is not None:
+                registry[str(port)] = {"pid": os.getpid(), "time": time.time()}
+        elapsed = time.perf_counter() - started
+        if port is not None:
+            self.allocations += 1
+            self.total_latency += elapsed
+            self.max_latency = max(self.max_latency, elapsed)
+        else:
+            self.log(f"端口范围 {self.start}-{self.end} 内没有可用端口")
+        return port
+
+    def handoff(self, port):
+        """
+        即将启动pjsua时交出端口: 关闭持有的套接字，登记保留到release为止
+
+        Args:
+            port: reserve返回的端口
+        """
+        with self._lock:
+            sockets = self._held.get(port)
+            if sockets:
+                self._held[port] = []
+        for sock in sockets or ():
+            sock.close()
+
+    def release(self, port):
+        """
+        释放端口(pjsua已退出或不再需要)
+
+        Args:
+            port: 端口号
+        """
+        if port is None:
+            return
+        with self._lock:
+            sockets = self._held.pop(port, None)
+            if sockets is None:
+                return
+            for sock in sockets:
+                sock.close()
+            with self._registry() as registry:
+                entry = registry.get(str(port))
+                if entry and entry.get("pid") == os.getpid():
+                    del registry[str(port)]
+
+    def release_unused(self, port):
+        """释放尚未交给pjsua的端口(如界面上被替换掉的端口)"""
+        with self._lock:
+            unused = bool(self._held.get(port))
+        if unused:
+            self.release(port)
+
+    def release_all(self):
+        """释放本进程持有的所有端口"""
+        for port in list(self._held):
+            self.release(port)
+
+    def report(self):
+        """返回分配延迟和冲突统计"""
+        if not self.allocations:
+            return f"无分配, 冲突{self.collisions}次"
+        average = self.total_latency / self.allocations * 1000
+        return (f"{self.allocations}次分配, 冲突{self.collisions}次, "
+                f"平均{average:.2f}ms 最大{self.max_latency * 1000:.2f}ms, 持有{len(self._held)}个")
+
+    def _scan(self, registry):
+        """从随机位置开始顺序扫描范围，多个进程同时分配时不会都从同一端口开始"""
+        size = self.end - self.start + 1
+        offset = random.randrange(size)
+        for index in range(size):
+            port = self.start + (offset + index) % size
+            if port in self._held:
+                continue
+            if self._try_port(port, registry):
+                return port
+        return None
+
+    def _try_port(self, port, registry):
+        """端口未被其他进程登记且能绑定时持有它"""
+        entry = registry.get(str(port))
+        if entry and entry.get("pid") != os.getpid() and _pid_alive(entry.get("pid", 0)):
+            self.collisions += 1
+            return False
+        sockets = []
+        try:
+            # pjsua在同一端口上同时监听UDP和TCP
+            for kind in (socket.SOCK_DGRAM, socket.SOCK_STREAM):
+                sock = socket.socket(socket.AF_INET, kind)
+                sockets.append(sock)
+                sock.bind(("0.0.0.0", port))
+        except OSError:
+            for sock in sockets:
+                sock.close()
+            self.collisions += 1
+            return False
+        self._held[port] = sockets
+        return True
+
+    def _registry(self):
+        """在文件锁保护下读写登记文件"""
+        return _Registry(self.registry_file)
+
+
+class _Registry(dict):
+    """登记文件的内容，退出with时写回；所属进程已结束的登记在读取时清除"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = _FileLock(path + ".lock") if path else None
+
+    def __enter__(self):
+        if self._lock is None:
+            return self
+        try:
+            self._lock.__enter__()
+        except OSError:
+            # 无法创建锁文件(如临时目录只读)时只在本进程内协调
+            self._lock = None
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.update({port: entry for port, entry in data.items()
+                     if isinstance(entry, dict) and _pid_alive(entry.get("pid", 0))})
+        return self
+
+    def __exit__(self, *exc):
+        if self._lock is None:
+            return
+        try:
+            temp = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(dict(self), f)
+            os.replace(temp, self.path)
+        except OSError:
+            pass
+        finally:
+            self._lock.__exit__(*exc)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台定时调度器
+
+在单独的线程中按时间顺序执行回调，接口与Tk的after/after_cancel一致，
+使核心逻辑不依赖Tk主循环也能使用定时器。
+"""
+
+import heapq
+import time
+import threading
+import itertools
+import traceback
+
+
+class Scheduler:
+    """单线程定时任务调度器"""
+
+    def __init__(self, name="sip-engine"):
+        """
+        初始化调度器并启动调度线程
+
+        Args:
+            name: 调度线程名称
+        """
+        self._cond = threading.Condition()
+        self._queue = []  # [(到期时间, 任务ID), ...]
+        self._tasks = {}  # 任务ID -> (回调, 参数)
+        self._ids = itertools.count(1)
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def after(self, delay_ms, func, *args):
+        """
+        在delay_ms毫秒后于调度线程中执行回调，可在任意线程调用
+
+        Args:
+            delay_ms: 延迟(毫秒)
+            func: 回调函数
+            *args: 回调参数
+
+        Returns:
+            int: 任务ID，可传给after_cancel取消
+        """
+        due = time.monotonic() + delay_ms / 1000.0
+        with self._cond:
+            timer_id = next(self._ids)
+            self._tasks[timer_id] = (func, args)
+            heapq.heappush(self._queue, (due, timer_id))
+            self._cond.notify()
+        return timer_id
+
+    def call_soon(self, func, *args):
+        """尽快在调度线程中执行回调"""
+        return self.after(0, func, *args)
+
+    def after_cancel(self, timer_id):
+        """取消尚未执行的任务"""
+        with self._cond:
+            self._tasks.pop(timer_id, None)
+
+    def in_scheduler_thread(self):
+        """当前是否运行在调度线程中"""
+        return threading.current_thread() is self._thread
+
+    def stop(self, timeout=2.0):
+        """停止调度线程，未执行的任务被丢弃"""
+        with self._cond:
+            self._running = False
+            self._tasks.clear()
+            self._cond.notify()
+        if not self.in_scheduler_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        """调度线程主循环"""
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._queue:
+                        delay = self._queue[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    return
+                _, timer_id = heapq.heappop(self._queue)
+                task = self._tasks.pop(timer_id, None)
+
+            # 已取消的任务只在出队时丢弃
+            if task is None:
+                continue
+            func, args = task
+            try:
+                func(*args)
+            except Exception:
+                print(f"定时任务执行失败: {func}")
+                traceback.print_exc()
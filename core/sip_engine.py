@@ -0,0 +1,1289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SIP引擎
+
+与界面无关的PJSUA进程管理：登录、拨号、挂断、注销以及输出解析。
+引擎的状态只在自己的调度线程中修改，结果通过监听器回调通知，
+因此既可以作为Tk界面的后端，也可以在没有显示器的服务器上独立运行。
+"""
+
+import time
+import threading
+import subprocess
+
+from core.scheduler import Scheduler
+from core import connection_state
+from core.connection_state import ConnectionStateMachine
+from core.accounts import SIPAccount, AccountTable
+from core.pipe_reader import PipeLineReader
+from core.stdin_writer import StdinWriter, WriteStats
+from core.pjsua_utils import USE_SHELL
+from core.pjsua_options import LEAN_LOG_LEVEL, VERBOSE_LOG_LEVEL, PJSUA_ENCODING
+from core.pjsua_commands import PjsuaCommands
+from core.warm_pool import WarmPool
+from core.call_metrics import CallMetrics
+from core.cdr_store import CallDetailRecord, OUTGOING, INCOMING
+from core.pjsua_events import (PjsuaEventStream, RegistrationSucceeded, RegistrationFailed,
+                               Unregistered, AccountInfo, IncomingCall, CallState, CallProgress,
+                               CallFailed, SipTraffic, ConsoleReply, CurrentAccountChanged,
+                               ProcessExited)
+from utils.process_stats import process_usage, format_usage
+
+# 读取线程累计管道输出速率的间隔(秒)，pipe_report()据此反映正在运行的进程
+PIPE_SAMPLE_INTERVAL = 5.0
+
+# 呼叫过程信息 -> 时延统计的阶段(4级日志中的TX/RX行更早到达时以其为准)
+PROGRESS_MILESTONES = {
+    CallProgress.SENDING_INVITE: "invite_sent",
+    CallProgress.RINGING: "ringing",
+    CallProgress.ANSWERED: "answered",
+    CallProgress.BYE_SENT: "bye_sent",
+}
+
+# 呼叫阶段 -> 日志提示
+PROGRESS_MESSAGES = {
+    CallProgress.MAKING_CALL: "正在发起呼叫...",
+    CallProgress.SENDING_INVITE: "发送INVITE请求...",
+    CallProgress.RINGING: "对方正在响铃...",
+    CallProgress.ANSWERED: "对方已接听...",
+    CallProgress.MEDIA_SOON: "媒体即将激活...",
+    CallProgress.BYE_SENT: "已发送挂断请求...",
+}
+
+
+class SIPEngineListener:
+    """
+    引擎事件监听器
+
+    子类按需覆盖。on_output在读取线程中调用，其余方法在引擎的调度线程中调用，
+    界面实现需要自行切换到UI线程。
+    """
+
+    def on_output(self, lines, hits=()):
+        """
+        PJSUA输出了一批原始行
+
+        Args:
+            lines: 输出行
+            hits: 事件流对这批行的分类结果 [(行下标, 事件类型, 字段匹配对象), ...]
+        """
+
+    def on_state_changed(self, old_state, new_state):
+        """连接状态变化，取值见core.connection_state"""
+
+    def on_connecting(self, server, username):
+        """开始连接服务器"""
+
+    def on_login_failed(self, reason):
+        """启动PJSUA失败或注册被拒绝"""
+
+    def on_registered(self, server, username):
+        """注册成功"""
+
+    def on_account_info(self, acc_id, uri, username, server):
+        """获得账号信息，acc_id在备用格式中为None"""
+
+    def on_calling(self, uri):
+        """已开始拨号"""
+
+    def on_call_ringing(self):
+        """对方响铃"""
+
+    def on_call_established(self):
+        """通话建立"""
+
+    def on_call_failed(self, reason):
+        """拨号失败"""
+
+    def on_hanging_up(self):
+        """正在挂断"""
+
+    def on_hangup_failed(self, reason):
+        """挂断失败"""
+
+    def on_call_ended(self):
+        """通话结束"""
+
+    def on_unregistered(self):
+        """已注销并停止PJSUA"""
+
+    def on_accounts_changed(self, accounts):
+        """账号或其状态变化，accounts为[(用户名@服务器, 状态), ...]，第一个为主账号"""
+
+    def on_process_exited(self, returncode):
+        """PJSUA进程意外结束"""
+
+
+class SIPEngine:
+    """与界面无关的SIP引擎"""
+
+    def __init__(self, pjsua_utils, log=print, scheduler=None, adaptive_log_level=False, cdr_store=None,
+                 structured_log=None):
+        """
+        初始化SIP引擎
+
+        Args:
+            pjsua_utils: PJSUA工具实例，用于检测PJSUA是否可用
+            log: 日志函数，接受一条消息文本
+            scheduler: 调度器，默认创建独立的调度线程
+            adaptive_log_level: 是否以精简日志级别启动并按需提高
+            cdr_store: 保存通话详单的CdrStore，None表示不保存；引擎关闭时一并关闭
+            structured_log: 记录PJSUA输出和引擎日志的StructuredLog，None表示不记录；引擎关闭时一并关闭
+        """
+        self.pjsua_utils = pjsua_utils
+        self.structured_log = structured_log
+        if structured_log is not None:
+            structured_log.account = self._log_account
+            log = structured_log.tee(log)
+        self.log = log
+        self.scheduler = scheduler or Scheduler()
+        self.adaptive_log_level = adaptive_log_level
+        self.listeners = []
+
+        self.process = None
+        self.call_start_time = None
+        self.server = None
+        self.username = None
+
+        # 日志级别: 当前PJSUA进程使用的级别，以及按需提高级别的状态
+        self.log_level = None
+        self.log_escalated = False
+        self.pending_escalation = None
+        self.last_login = None
+
+        # 预热池 - 预先启动不带账号的PJSUA，登录时只需添加账号
+        self.ports = pjsua_utils.port_allocator
+        self.port = None  # 当前PJSUA进程使用的本地端口
+        self.warm_pool = WarmPool(self.scheduler, self.ports, log=log)
+        # 登录耗时: 本次登录的 (请求时刻, 启动方式)，以及各启动方式的历次耗时(秒)
+        self.login_started = None
+        self.login_times = {}
+
+        # 管道输出统计: 日志级别 -> [字节数, 秒数]
+        self.pipe_stats = {}
+
+        # 登录和呼叫各阶段的时延记录，每个呼叫结束时写入一条通话详单
+        self.cdr_store = cdr_store
+        self.metrics = CallMetrics(on_call_end=self._write_cdr)
+        # 读取线程读到的输出(只由读取线程累加)和各类错误的次数(只在调度线程中修改)
+        self.output_lines = 0
+        self.output_bytes = 0
+        self.error_counts = {}
+
+        # 连接状态 - 只由pjsua事件和引擎操作推动
+        self.state = ConnectionStateMachine(on_change=self._on_state_changed)
+
+        # 账号: 主账号随登录设置，附加账号在同一个PJSUA进程中注册
+        self.accounts = AccountTable()
+        self.current_acc_id = None  # pjsua控制台的当前账号，拨号使用该账号
+        self.call_account = None    # 当前通话使用的账号
+
+        # 定时器: 名称 -> 调度器任务ID
+        self._timers = {}
+
+        # 标准输入写入器(每个PJSUA进程一个)及其累计统计
+        self.stdin_writer = None
+        self.write_stats = WriteStats()
+
+        # 控制台命令队列 - 每条命令等待pjsua的提示或结果后再继续
+        self.commands = PjsuaCommands(self.write_stdin, self.scheduler)
+
+        # pjsua输出事件流 - 读取线程解析输出后转交调度线程处理
+        self.events = PjsuaEventStream()
+        self.events.subscribe(self._post_event)
+        self._event_handlers = {
+            RegistrationSucceeded: self._on_registration_succeeded,
+            RegistrationFailed: self._on_registration_failed,
+            Unregistered: self._on_unregistered,
+            AccountInfo: self._on_account_info,
+            CurrentAccountChanged: self._on_current_account_changed,
+            IncomingCall: self._on_incoming_call,
+            CallState: self._on_call_state,
+            CallProgress: self._on_call_progress,
+            CallFailed: self._on_call_failed,
+            SipTraffic: self._on_sip_traffic,
+            ProcessExited: self._on_process_exited,
+        }
+
+    @property
+    def is_connected(self):
+        """注册是否有效"""
+        return self.state.is_connected
+
+    @property
+    def call_in_progress(self):
+        """是否在通话中"""
+        return self.state.in_call
+
+    def add_listener(self, listener):
+        """添加监听器"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """移除监听器"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, name, *args):
+        """调用所有监听器的on_<name>方法"""
+        for listener in list(self.listeners):
+            try:
+                getattr(listener, "on_" + name)(*args)
+            except Exception as e:
+                self.log(f"监听器处理{name}时出错: {str(e)}")
+
+    # 公开操作 - 可在任意线程调用，实际处理在调度线程中进行
+    def login(self, server, username, password, pjsua_path, port):
+        """
+        启动PJSUA并注册到SIP服务器
+
+        Args:
+            server: SIP服务器地址
+            username: 用户名
+            password: 密码
+            pjsua_path: pjsua可执行文件路径
+            port: 本地SIP端口
+        """
+        self.scheduler.call_soon(self._login, server, username, password, pjsua_path, port,
+                                 time.monotonic())
+
+    def configure_warm_pool(self, pjsua_path, size):
+        """
+        设置预热池，保持size个不带账号的PJSUA备用，0为停用
+
+        Args:
+            pjsua_path: pjsua可执行文件路径
+            size: 备用实例数
+        """
+        self.scheduler.call_soon(self._configure_warm_pool, pjsua_path, size)
+
+    def make_call(self, destination, server=None, account=None):
+        """
+        拨打电话
+
+        Args:
+            destination: 被叫号码
+            server: 被叫所在服务器，默认为呼出账号的服务器
+            account: 呼出账号的键(用户名@服务器)，默认为主账号
+        """
+        self.scheduler.call_soon(self._make_call, destination, server, account)
+
+    def add_account(self, username, password, server=None):
+        """
+        添加附加账号，PJSUA运行中时立即注册，否则在下次登录时注册
+
+        Args:
+            username: 用户名
+            password: 密码
+            server: SIP服务器地址，默认与主账号相同
+        """
+        self.scheduler.call_soon(self._add_account, username, password, server)
+
+    def remove_account(self, key):
+        """
+        注销并移除附加账号
+
+        Args:
+            key: 账号的键(用户名@服务器)
+        """
+        self.scheduler.call_soon(self._remove_account, key)
+
+    def hangup(self):
+        """挂断当前通话"""
+        self.scheduler.call_soon(self._hangup)
+
+    def unregister(self):
+        """从SIP服务器注销并停止PJSUA，但不退出程序"""
+        self.scheduler.call_soon(self._unregister)
+
+    def request_account_info(self):
+        """请求当前账号信息"""
+        self.scheduler.call_soon(self._request_account_info)
+
+    def escalate_log_level(self, reason):
+        """
+        按需将PJSUA提高到详细日志级别
+
+        Args:
+            reason: 提高级别的原因，写入日志
+        """
+        self.scheduler.call_soon(self._escalate_log_level, reason)
+
+    def cleanup(self):
+        """立即终止PJSUA进程，用于退出程序"""
+        self._cancel_timers()
+        self.commands.reset("PJSUA进程已终止")
+        self._close_writer()
+        process = self.process
+        self.process = None
+        if process:
+            try:
+                process.terminate()
+                self.log("已终止PJSUA进程")
+            except Exception:
+                pass
+        if self.state.is_running:
+            self.state.transition(connection_state.DEAD, "PJSUA进程已终止")
+        self._accounts_stopped("PJSUA进程已终止")
+        self._release_port()
+
+    def shutdown(self):
+        """终止PJSUA进程和预热实例并停止调度线程"""
+        self.cleanup()
+        self.warm_pool.close()
+        self.log(f"本地端口分配: {self.ports.report()}")
+        self.log(f"时延统计: {self.metrics_report()}")
+        self.ports.release_all()
+        if self.cdr_store is not None:
+            self.cdr_store.close()
+            self.log(f"通话详单: {self.cdr_store.report()}")
+        if self.structured_log is not None:
+            self.structured_log.close()
+            self.log(f"结构化日志: {self.structured_log.report()}")
+        self.scheduler.stop()
+
+    def stdin_report(self):
+        """返回标准输入写入的队列深度和延迟统计"""
+        writer = self.stdin_writer
+        depth = writer.depth() if writer else 0
+        return f"当前队列{depth}, {self.write_stats.report()}"
+
+    def resource_report(self):
+        """返回PJSUA进程的内存和CPU占用及按账号分摊的值"""
+        process = self.process
+        if process is None:
+            return "PJSUA未运行"
+        count = max(len(self.accounts), 1)
+        return f"{count}个账号, {format_usage(process_usage(process.pid), count)}"
+
+    def login_report(self):
+        """返回各启动方式从点击登录到注册成功的耗时统计"""
+        parts = []
+        for mode, times in sorted(self.login_times.items()):
+            average = sum(times) / len(times) * 1000
+            parts.append(f"{mode}: {len(times)}次 平均{average:.0f}ms "
+                         f"最快{min(times) * 1000:.0f}ms 最慢{max(times) * 1000:.0f}ms")
+        return "; ".join(parts) or "无数据"
+
+    def command_report(self):
+        """返回控制台命令的耗时统计"""
+        return self.commands.report()
+
+    def metrics_report(self):
+        """返回注册耗时、拨号后延迟、振铃到接听和呼叫建立耗时的百分位数"""
+        return self.metrics.report()
+
+    def export_metrics(self, path):
+        """
+        导出时延记录和直方图
+
+        Args:
+            path: 文件路径，.csv导出逐条记录，其他扩展名导出JSON
+        """
+        self.metrics.export(path)
+
+    def query_cdr(self, number=None, start=None, end=None, limit=100, prefix=False):
+        """
+        查询通话详单，参数见CdrStore.query
+
+        Returns:
+            list: [CallDetailRecord, ...]，未保存详单时为空列表
+        """
+        if self.cdr_store is None:
+            return []
+        return self.cdr_store.query(number, start, end, limit, prefix)
+
+    def _log_account(self):
+        """结构化日志中的当前账号(在读取线程中调用，只读取属性)"""
+        account = self.call_account
+        if account is not None:
+            return account.key
+        return f"{self.username}@{self.server}" if self.username else None
+
+    def pipe_report(self):
+        """返回各日志级别下管道输出速率(字节/秒)的报告"""
+        parts = []
+        for level, (byte_count, seconds) in sorted(self.pipe_stats.items()):
+            rate = byte_count / seconds if seconds > 0 else 0
+            parts.append(f"级别{level}: {rate:,.0f} B/s ({byte_count:,} 字节 / {seconds:.0f} 秒)")
+        return "; ".join(parts) or "无数据"
+
+    # 定时器
+    def _schedule(self, name, delay_ms, func):
+        """启动(或重新启动)一个命名定时器"""
+        self._cancel_timer(name)
+        self._timers[name] = self.scheduler.after(delay_ms, self._fire_timer, name, func)
+
+    def _fire_timer(self, name, func):
+        """定时器到期"""
+        self._timers.pop(name, None)
+        func()
+
+    def _cancel_timer(self, name):
+        """取消一个命名定时器"""
+        timer_id = self._timers.pop(name, None)
+        if timer_id is not None:
+            self.scheduler.after_cancel(timer_id)
+
+    def _cancel_timers(self):
+        """取消所有定时器"""
+        for name in list(self._timers):
+            self._cancel_timer(name)
+
+    # 以下方法在调度线程中运行
+    def _login(self, server, username, password, pjsua_path, port, requested_at=None):
+        """启动PJSUA进程，预热池中有就绪的实例时改为向其添加账号"""
+        if not server or not username:
+            self.log("服务器地址和用户名不能为空")
+            return
+
+        # 检查端口是否有效
+        try:
+            port = int(port)
+            if port < 1024 or port > 65535:
+                self.log("端口号必须在1024-65535之间")
+                return
+        except (TypeError, ValueError):
+            self.log("请输入有效的端口号")
+            return
+
+        log_level = self._initial_log_level()
+
+        # 预热的实例已证明PJSUA可用，无需再检查
+        instance = self.warm_pool.take(pjsua_path, log_level)
+        if instance is None and not self.pjsua_utils.check_pjsua(pjsua_path):
+            return
+
+        # 如果已经有进程在运行，先结束它
+        self.cleanup()
+
+        try:
+            self.log(f"尝试连接到服务器: {server}")
+            self.log(f"用户名: {username}")
+            self.server = server
+            self.username = username
+            primary = SIPAccount(username, password, server, on_change=self._on_account_state_changed)
+            self.accounts.set_primary(primary)
+            self._notify('connecting', server, username)
+
+            self.last_login = (server, username, password, pjsua_path, port)
+            # 日志级别变化(按需提高)后，预热池改为准备同一级别的实例
+            self.warm_pool.retarget(pjsua_path, log_level)
+
+            if instance is not None and self._adopt_warm_instance(instance, log_level):
+                self.login_started = (requested_at or time.monotonic(), "预热")
+                return
+            self.login_started = (requested_at or time.monotonic(), "冷启动")
+
+            # 先占住端口，避免与同一主机上的其他客户端冲突
+            reserved = self.ports.reserve(port)
+            if reserved is None:
+                raise RuntimeError("没有可用的本地端口")
+            if reserved != port:
+                self.log(f"端口 {port} 已被占用，改用端口 {reserved}")
+            port = reserved
+            self.port = port
+
+            # 构建PJSUA命令 - 使用最基本的命令，附加账号以--next-account追加
+            cmd = [
+                pjsua_path,
+                *primary.pjsua_args(),
+                f"--log-level={log_level}",
+                f"--app-log-level={log_level}",
+                f"--local-port={port}"
+            ]
+            for account in self.accounts.extras():
+                cmd += ["--next-account", *account.pjsua_args()]
+
+            self.log(f"启动PJSUA: {' '.join(cmd)}")
+
+            # 启动PJSUA进程，端口在pjsua绑定前一刻才交出
+            self.state.transition(connection_state.SPAWNING, f"{username}@{server}")
+            for account in self.accounts:
+                account.state.transition(connection_state.SPAWNING)
+            self.ports.handoff(port)
+            self.metrics.begin_session(primary.key, time.monotonic())
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.PIPE,
+                bufsize=0,
+                shell=USE_SHELL
+            )
+
+            self.log_level = log_level
+            self.stdin_writer = StdinWriter(self.process.stdin, PJSUA_ENCODING,
+                                            stats=self.write_stats, on_error=self._on_write_error)
+
+            # 启动线程读取输出
+            thread = threading.Thread(target=self._read_output, args=(self.process, log_level))
+            thread.daemon = True
+            thread.start()
+
+            # 10秒内没有注册结果时提示用户
+            self._schedule('login_check', 10000, self._check_login_status)
+
+        except Exception as e:
+            self.log(f"登录失败: {str(e)}")
+            self._count_error("login")
+            self.metrics.end_session("failed")
+            self.process = None
+            self._close_writer()
+            self.state.transition(connection_state.DEAD, str(e))
+            self._accounts_stopped(str(e))
+            self._release_port()
+            self._notify('login_failed', str(e))
+
+    def _initial_log_level(self):
+        """精简模式下以较低级别启动，已按需提高过则保持详细级别"""
+        if self.adaptive_log_level and not self.log_escalated:
+            return LEAN_LOG_LEVEL
+        return VERBOSE_LOG_LEVEL
+
+    def _adopt_warm_instance(self, instance, log_level):
+        """
+        接管预热的PJSUA实例并以+a添加所有账号
+
+        Returns:
+            bool: 实例已退出无法接管时返回False
+        """
+        process = instance.process
+        if not instance.adopt(lambda reader, batches: self._read_output(process, log_level,
+                                                                        reader, batches)):
+            self.log("预热的PJSUA已退出，改为重新启动")
+            self.ports.release(instance.port)
+            return False
+
+        primary = self.accounts.primary
+        self.log(f"使用预热的PJSUA (端口 {instance.port})")
+        self.state.transition(connection_state.SPAWNING, f"{primary.key}")
+        self.process = process
+        self.port = instance.port
+        self.log_level = log_level
+        self.metrics.begin_session(primary.key, time.monotonic(), warm=True)
+        self.stdin_writer = StdinWriter(process.stdin, PJSUA_ENCODING,
+                                        stats=self.write_stats, on_error=self._on_write_error)
+        # 进程早已运行，直接等待注册结果
+        self.state.transition(connection_state.REGISTERING, "使用预热的PJSUA")
+        for account in self.accounts:
+            self._send_add_account(account)
+        self._schedule('login_check', 10000, self._check_login_status)
+        return True
+
+    def _configure_warm_pool(self, pjsua_path, size):
+        """设置预热池"""
+        self.warm_pool.configure(pjsua_path, size, self._initial_log_level())
+        self.log(f"预热池: 保持{self.warm_pool.size}个PJSUA备用" if self.warm_pool.size else "预热池已停用")
+
+    def _read_output(self, process, log_level, reader=None, batches=None):
+        """
+        读取PJSUA进程的输出(读取线程)
+
+        Args:
+            process: PJSUA进程
+            log_level: 进程的日志级别
+            reader: 已在读取该进程的PipeLineReader(接管预热实例时)，默认新建
+            batches: reader剩余的输出批次，默认从头读取
+        """
+        # 按块读取二进制输出，整批交给事件流解析，分类结果与监听器共用
+        reader = reader or PipeLineReader(process.stdout)
+        classify = self.events.classify
+        feed_lines = self.events.feed_lines
+        sampled_at = time.monotonic()
+        sampled_bytes = 0
+        first_output = True
+        counted_bytes = reader.bytes_read
+        for lines in batches if batches is not None else reader.batches():
+            if first_output:
+                first_output = False
+                self.scheduler.call_soon(self._on_process_started, process)
+            self.output_lines += len(lines)
+            self.output_bytes += reader.bytes_read - counted_bytes
+            counted_bytes = reader.bytes_read
+            hits = classify(lines)
+            self._notify('output', lines, hits)
+            if self.structured_log is not None:
+                self.structured_log.add_output(lines, hits)
+            feed_lines(lines, hits)
+            now = time.monotonic()
+            if now - sampled_at >= PIPE_SAMPLE_INTERVAL:
+                self.scheduler.call_soon(self._record_pipe_stats, log_level,
+                                         reader.bytes_read - sampled_bytes, now - sampled_at)
+                sampled_at, sampled_bytes = now, reader.bytes_read
+        self.scheduler.call_soon(self._record_pipe_stats, log_level, reader.bytes_read - sampled_bytes,
+                                 time.monotonic() - sampled_at, True)
+        if self.structured_log is not None:
+            self.structured_log.end_output()
+
+        # 如果进程结束了
+        if process.stdout:
+            process.stdout.close()
+        # 被新进程替换时(如重启以提高日志级别)，不再发布结束事件
+        if self.process is process:
+            try:
+                returncode = process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                returncode = None
+            self.events.close(returncode)
+
+    def _record_pipe_stats(self, log_level, byte_count, seconds, finished=False):
+        """
+        累计某一日志级别下管道输出的字节数和时长
+
+        Args:
+            log_level: 进程的日志级别
+            byte_count: 上次累计以来读到的字节数
+            seconds: 上次累计以来经过的时长
+            finished: 进程输出是否已结束，结束时输出各项统计报告
+        """
+        stats = self.pipe_stats.setdefault(log_level, [0, 0.0])
+        stats[0] += byte_count
+        stats[1] += seconds
+        if not finished:
+            return
+        self.log(f"PJSUA输出速率: {self.pipe_report()}")
+        self.log(f"PJSUA命令耗时: {self.command_report()}")
+        self.log(f"PJSUA标准输入: {self.stdin_report()}")
+        self.log(f"本地端口分配: {self.ports.report()}")
+        self.log(f"时延统计: {self.metrics_report()}")
+
+    def _post_event(self, event):
+        """将读取线程解析出的事件转交调度线程"""
+        self.scheduler.call_soon(self._handle_event, event)
+
+    def _handle_event(self, event):
+        """处理一个事件: 先推进等待响应的命令，再更新引擎状态"""
+        self.commands.on_event(event)
+        handler = self._event_handlers.get(type(event))
+        if handler is not None:
+            handler(event)
+
+    def _when_done(self, future, callback):
+        """命令完成后在调度线程中处理其结果"""
+        future.add_done_callback(lambda done: self.scheduler.call_soon(callback, done.result()))
+
+    def write_stdin(self, text):
+        """将命令文本交给写入线程，立即返回"""
+        writer = self.stdin_writer
+        if writer is None:
+            raise BrokenPipeError("PJSUA进程未运行")
+        writer.write(text)
+
+    def _on_write_error(self, error):
+        """写入线程报告写入失败"""
+        self.log(f"向PJSUA写入命令失败: {str(error)}")
+        self.scheduler.call_soon(self._count_error, "stdin_write")
+
+    def _count_error(self, kind):
+        """累计一次错误，供指标端点读取"""
+        self.error_counts[kind] = self.error_counts.get(kind, 0) + 1
+
+    def _close_writer(self):
+        """写出已排队的命令后停止写入线程"""
+        writer = self.stdin_writer
+        self.stdin_writer = None
+        if writer:
+            writer.close()
+
+    def _on_state_changed(self, old_state, new_state, reason):
+        """记录连接状态变化并通知监听器"""
+        message = f"连接状态: {self.state.label(old_state)} -> {self.state.label(new_state)}"
+        self.log(f"{message} ({reason})" if reason else message)
+        self._notify('state_changed', old_state, new_state)
+
+    def _on_process_started(self, process):
+        """PJSUA开始输出，等待注册结果"""
+        # 接管的预热实例早已启动，账号由+a的结果推进
+        if self.process is process and self.state.transition(connection_state.REGISTERING, "PJSUA已启动"):
+            for account in self.accounts:
+                if account.state.state == connection_state.SPAWNING:
+                    account.state.transition(connection_state.REGISTERING, "PJSUA已启动")
+
+    def _login_completed(self):
+        """登录成功后的处理"""
+        # pjsua定期重新注册，已注册时忽略后续的注册成功事件
+        if self.state.state not in (connection_state.SPAWNING, connection_state.REGISTERING):
+            return
+
+        # 注册成功的输出可能与首批输出同时到达
+        if self.state.state == connection_state.SPAWNING:
+            self.state.transition(connection_state.REGISTERING, "PJSUA已启动")
+        self.log("登录成功")
+        if self.login_started:
+            requested_at, mode = self.login_started
+            self.login_started = None
+            elapsed = time.monotonic() - requested_at
+            self.login_times.setdefault(mode, []).append(elapsed)
+            self.log(f"登录耗时: {elapsed * 1000:.0f}ms ({mode})")
+        self.state.transition(connection_state.REGISTERED, "注册成功")
+        self._cancel_timer('login_check')
+        self._notify('registered', self.server, self.username)
+
+        # 请求一次账号信息
+        self._request_account_info()
+
+    def _request_account_info(self):
+        """请求当前账号信息"""
+        if self.process:
+            self._when_done(self.commands.account_info(), self._on_account_info_result)
+            self.log("已请求账号状态信息")
+
+    def _on_account_info_result(self, result):
+        """d命令的结果"""
+        if not result.ok:
+            self.log(f"请求账号信息失败: {result.error}")
+
+    def _make_call(self, destination, server, account_key=None):
+        """拨打电话"""
+        if not destination:
+            self.log("请输入要拨打的号码")
+            return
+
+        if not self.is_connected or not self.process:
+            self.log("未连接到SIP服务器，无法拨打电话")
+            return
+
+        account = self.accounts.get(account_key) if account_key else self.accounts.primary
+        if account is None:
+            self.log(f"账号 {account_key} 不存在，无法拨打电话")
+            return
+        if not account.state.is_connected:
+            self.log(f"账号 {account.key} 未注册，无法拨打电话")
+            return
+        server = server or account.server
+
+        self.log(f"正在拨打: {destination}")
+        full_url = f"sip:{destination}@{server}"
+        self._notify('calling', full_url)
+
+        # 记录完整的拨号URL
+        self.log(f"拨号URL: {full_url}")
+
+        # 先把pjsua的当前账号切换到呼出账号，再拨号
+        self._select_account(account, lambda: self._dial(full_url, account))
+
+    def _dial(self, full_url, account):
+        """以当前账号拨号"""
+        self.call_account = account
+        account.calls += 1
+        self.metrics.begin_call(account.key, full_url, time.monotonic())
+        # m -> 等待"Make call"提示 -> URI -> 等待呼叫发起或失败
+        self._when_done(self.commands.make_call(full_url), self._on_make_call_result)
+
+    def _select_account(self, account, then, attempts=0):
+        """
+        将pjsua的当前账号切换为account后执行then
+
+        pjsua只能用>逐个切换当前账号，每次切换后根据输出的账号ID判断是否到达。
+        """
+        if len(self.accounts) == 1 or (account.acc_id is not None and
+                                       account.acc_id == self.current_acc_id):
+            then()
+            return
+        # 本地账号也参与切换，最多切换一轮
+        if attempts > len(self.accounts) + 2:
+            self._on_select_account_failed(account, "未找到该账号")
+            return
+        if account.acc_id is None:
+            # 还不知道账号ID，先查询账号列表
+            if attempts > 0:
+                self._on_select_account_failed(account, "账号ID未知")
+                return
+            future = self.commands.account_info()
+        else:
+            future = self.commands.next_account()
+
+        def on_result(result):
+            if result.ok:
+                self._select_account(account, then, attempts + 1)
+            else:
+                self._on_select_account_failed(account, result.error)
+        self._when_done(future, on_result)
+
+    def _on_select_account_failed(self, account, reason):
+        """切换呼出账号失败"""
+        message = f"切换到账号 {account.key} 失败: {reason}"
+        self.log(message)
+        self._notify('call_failed', message)
+
+    def _on_make_call_result(self, result):
+        """m命令的结果"""
+        if result.ok:
+            self.log(f"PJSUA已发起呼叫 (耗时 {result.latency * 1000:.0f} ms)")
+        elif result.event is None:
+            # 拨号失败的输出已由事件处理，这里只处理超时和写入失败
+            self.log(f"拨打电话失败: {result.error}")
+            self._count_error("call")
+            self.metrics.end_call("failed", reason=result.error)
+            self._notify('call_failed', result.error)
+
+    def _call_established(self):
+        """通话建立后的处理"""
+        if not self.state.transition(connection_state.IN_CALL, "通话建立"):
+            return
+        if self.call_account is not None:
+            self.call_account.state.transition(connection_state.IN_CALL, "通话建立")
+        self.call_start_time = time.time()
+        self._notify('call_established')
+
+    def _call_disconnected(self, at=None, status_code=None, reason=None):
+        """
+        通话断开后的处理
+
+        Args:
+            at: 读到断开输出的时刻，强制断开时为None
+            status_code: 呼叫结束的状态码
+            reason: 呼叫结束的原因
+        """
+        if self.metrics.call is not None and self.metrics.call.get("confirmed") is not None:
+            outcome = "answered"
+        else:
+            outcome = "failed" if status_code is not None and status_code >= 300 else "unanswered"
+        self.metrics.end_call(outcome, at, status_code, reason)
+        if self.state.in_call:
+            self.state.transition(connection_state.REGISTERED, "通话结束")
+        if self.call_account is not None:
+            if self.call_account.state.in_call:
+                self.call_account.state.transition(connection_state.REGISTERED, "通话结束")
+            self.call_account = None
+        self.call_start_time = None
+        self._notify('call_ended')
+
+        # 通话期间推迟的日志级别提升
+        if self.pending_escalation:
+            self._escalate_log_level(self.pending_escalation)
+
+    def _hangup(self):
+        """挂断电话"""
+        if not self.call_in_progress or not self.process:
+            self.log("当前没有通话，无法挂断")
+            return
+
+        self.log("正在结束通话...")
+        self._notify('hanging_up')
+
+        # h -> 等待通话断开，5秒内未断开则强制断开
+        self._when_done(self.commands.hangup(), self._on_hangup_result)
+
+    def _on_hangup_result(self, result):
+        """h命令的结果"""
+        if result.ok:
+            self.log(f"通话已挂断 (耗时 {result.latency * 1000:.0f} ms)")
+        elif result.error == ConsoleReply.NO_CURRENT_CALL or result.timed_out:
+            if result.timed_out:
+                self.log("挂断超时，强制断开通话")
+            else:
+                self.log("PJSUA报告当前没有通话")
+            if self.call_in_progress:
+                self._call_disconnected()
+        else:
+            self.log(f"挂断失败: {result.error}")
+            self._count_error("hangup")
+            self._notify('hangup_failed', result.error)
+
+    def _check_login_status(self):
+        """注册结果超时提示，不再轮询"""
+        if self.state.state in (connection_state.SPAWNING, connection_state.REGISTERING):
+            self.log(f"{self.state.elapsed():.0f}秒内未收到注册结果，继续等待PJSUA注册...")
+
+    def _escalate_log_level(self, reason):
+        """
+        提高日志级别
+
+        pjsua不支持运行时修改日志级别，因此以相同账号受控重启；
+        通话进行中时推迟到通话结束后再重启。
+        """
+        if not self.adaptive_log_level or self.log_escalated:
+            return
+        if not self.process or self.last_login is None:
+            return
+        if self.call_in_progress:
+            self.pending_escalation = reason
+            return
+
+        self.pending_escalation = None
+        self.log_escalated = True
+        self.log(f"提高PJSUA日志级别到{VERBOSE_LOG_LEVEL} ({reason})，正在重启PJSUA...")
+        self._login(*self.last_login)
+
+    # 附加账号
+    def _add_account(self, username, password, server):
+        """添加附加账号"""
+        server = server or self.server
+        if not username or not server:
+            self.log("附加账号的用户名和服务器不能为空")
+            return
+        account = SIPAccount(username, password, server, on_change=self._on_account_state_changed)
+        if not self.accounts.add(account):
+            self.log(f"账号 {account.key} 已存在")
+            return
+        self._notify_accounts()
+
+        if not self.state.is_connected:
+            self.log(f"已添加账号 {account.key}，将在下次登录时注册")
+            return
+
+        self.log(f"正在添加账号 {account.key}...")
+        self._send_add_account(account)
+
+    def _send_add_account(self, account):
+        """+a 在运行中的PJSUA里添加账号，pjsua随即开始注册"""
+        account.state.transition(connection_state.SPAWNING, "添加账号")
+        self._when_done(
+            self.commands.add_account(account.uri, account.registrar, "*",
+                                      account.username, account.password),
+            lambda result: self._on_account_added(account, result))
+
+    def _on_account_added(self, account, result):
+        """+a命令的结果"""
+        if self.accounts.get(account.key) is not account:
+            return
+        if result.ok:
+            account.state.transition(connection_state.REGISTERING, "已添加到PJSUA")
+            return
+        account.last_error = result.error
+        self.log(f"添加账号 {account.key} 失败: {result.error}")
+        if account is self.accounts.primary and self.state.state == connection_state.REGISTERING:
+            # 预热实例中添加主账号失败，登录失败
+            self._cleanup_without_exit()
+            self._notify('login_failed', result.error)
+            return
+        account.state.transition(connection_state.DEAD, result.error)
+
+    def _remove_account(self, key, retried=False):
+        """注销并移除附加账号"""
+        account = self.accounts.get(key)
+        if account is None:
+            self.log(f"账号 {key} 不存在")
+            return
+        if account is self.accounts.primary:
+            self.log("主账号请使用断开连接注销")
+            return
+        if account is self.call_account:
+            self.log(f"账号 {key} 正在通话，无法移除")
+            return
+        if not self.process or not account.state.is_running:
+            self._drop_account(account, "已移除")
+            return
+
+        if account.acc_id is None:
+            # -a 需要账号ID，先查询账号列表
+            if retried:
+                self.log(f"无法获取账号 {key} 的ID，直接移除")
+                self._drop_account(account, "已移除")
+                return
+            self._when_done(self.commands.account_info(),
+                            lambda result: self._remove_account(key, retried=True))
+            return
+
+        self.log(f"正在移除账号 {key}...")
+        account.state.transition(connection_state.UNREGISTERING, "移除账号")
+        self._when_done(self.commands.remove_account(account.acc_id),
+                        lambda result: self._on_account_removed(account, result))
+
+    def _on_account_removed(self, account, result):
+        """-a命令的结果"""
+        if not result.ok:
+            self.log(f"移除账号 {account.key} 时出错: {result.error}")
+        self._drop_account(account, "已移除")
+
+    def _drop_account(self, account, reason):
+        """从账号表中删除账号"""
+        self.accounts.remove(account.key)
+        if account.state.is_running:
+            account.state.transition(connection_state.DEAD, reason)
+        self.log(f"账号 {account.key} {reason}")
+        self._notify_accounts()
+
+    def _accounts_stopped(self, reason):
+        """PJSUA进程结束，所有账号随之停止"""
+        for account in self.accounts:
+            if account.state.is_running:
+                account.state.transition(connection_state.DEAD, reason)
+        self.accounts.clear_acc_ids()
+        self.current_acc_id = None
+        self.call_account = None
+
+    def _release_port(self):
+        """PJSUA进程结束后释放其本地端口"""
+        port, self.port = self.port, None
+        self.ports.release(port)
+
+    def _on_account_state_changed(self, account, old_state, new_state, reason):
+        """账号状态变化"""
+        # 主账号的状态变化已由连接状态记录
+        if account is not self.accounts.primary:
+            message = f"账号 {account.key}: {account.state.label(old_state)} -> {account.state.label(new_state)}"
+            self.log(f"{message} ({reason})" if reason else message)
+        self._notify_accounts()
+
+    def _notify_accounts(self):
+        """通知监听器账号列表"""
+        self._notify('accounts_changed', self.accounts.snapshot())
+
+    def _event_account(self, uri):
+        """事件对应的账号，输出中没有账号URI时视为主账号"""
+        return self.accounts.by_uri(uri) or self.accounts.primary
+
+    def _unregister(self):
+        """从SIP服务器注销但不退出程序"""
+        if not self.process:
+            self.log("当前未连接到SIP服务器")
+            return
+        if self.state.state == connection_state.UNREGISTERING:
+            return
+
+        self.log("正在从SIP服务器注销...")
+
+        # 如果有通话，先挂断 (命令按顺序执行，ru在挂断完成后发送)
+        if self.call_in_progress:
+            self._hangup()
+        self.state.transition(connection_state.UNREGISTERING, "用户注销")
+        for account in self.accounts:
+            account.state.transition(connection_state.UNREGISTERING, "用户注销")
+
+        # 向PJSUA发送注销命令 - 先尝试使用PJSUA的ru命令
+        self._when_done(self.commands.send("unregister", "ru\r\n"), self._on_unregister_sent)
+
+    def _on_unregister_sent(self, result):
+        """ru命令已写入，等待注销结果，1秒内没有结果也结束进程"""
+        if result.ok:
+            self.log("已发送注销命令")
+            self._schedule('unregister', 1000, self._finish_unregister)
+        else:
+            self.log(f"注销过程中出错: {result.error}")
+            self._finish_unregister()
+
+    def _finish_unregister(self):
+        """清理资源但不退出程序"""
+        if self.state.state != connection_state.UNREGISTERING:
+            return
+        self._cleanup_without_exit()
+        self._notify('unregistered')
+
+    def _cleanup_without_exit(self):
+        """清理资源但不退出程序"""
+        process = self.process
+        writer = self.stdin_writer
+        # 先解除引用，读取线程不再为该进程发布结束事件
+        self.process = None
+        self.stdin_writer = None
+        if process and process.poll() is None:
+            # 尝试通过q命令优雅退出，0.5秒后仍在运行则强制终止
+            try:
+                writer.write("q\n")
+            except Exception as e:
+                self.log(f"清理PJSUA进程时出错: {str(e)}")
+            self.scheduler.after(500, self._terminate_process, process)
+        if writer:
+            writer.close()
+
+        # 停止所有定时器和命令并重置状态
+        self._cancel_timers()
+        self.commands.reset("PJSUA进程已结束")
+        self.call_start_time = None
+        self.state.transition(connection_state.DEAD, "PJSUA已停止")
+        self._accounts_stopped("PJSUA已停止")
+        self._release_port()
+
+    def _terminate_process(self, process):
+        """进程未响应q命令时终止，2秒后仍未退出则强制结束"""
+        try:
+            if process.poll() is None:
+                process.terminate()
+                self.scheduler.after(2000, self._kill_process, process)
+        except Exception as e:
+            self.log(f"清理PJSUA进程时出错: {str(e)}")
+
+    def _kill_process(self, process):
+        """强制结束未响应终止信号的进程"""
+        try:
+            if process.poll() is None:
+                process.kill()
+                self.log("PJSUA进程未响应终止信号，已强制结束")
+        except Exception as e:
+            self.log(f"清理PJSUA进程时出错: {str(e)}")
+
+    # 事件处理方法 - 在调度线程中运行
+    def _on_registration_succeeded(self, event):
+        """检测到注册成功"""
+        account = self._event_account(event.uri)
+        if account is not None:
+            account.last_error = None
+            if account.state.state == connection_state.SPAWNING:
+                account.state.transition(connection_state.REGISTERING, "PJSUA已启动")
+            registered = account.state.transition(connection_state.REGISTERED, "注册成功")
+            if account is not self.accounts.primary:
+                # 新注册的附加账号需要查询一次账号ID，供拨号切换和移除使用
+                if registered:
+                    self._request_account_info()
+                return
+        self.metrics.session_event("registered", event.timestamp)
+        self._login_completed()
+
+    def _on_registration_failed(self, event):
+        """检测到注册失败"""
+        reason = f"{event.status_code} {event.reason}" if event.status_code else event.line.strip()
+        self._count_error("registration")
+        account = self._event_account(event.uri)
+        if account is not None:
+            account.last_error = reason
+            if account.state.state == connection_state.REGISTERED:
+                account.state.transition(connection_state.REGISTERING, f"重新注册失败: {reason}")
+            if account is not self.accounts.primary:
+                self.log(f"账号 {account.key} 注册失败: {reason}")
+                return
+        self.log(f"注册失败: {reason}")
+        if self.state.state in (connection_state.SPAWNING, connection_state.REGISTERING):
+            self.metrics.end_session(f"failed {event.status_code}" if event.status_code else "failed")
+            self._cancel_timer('login_check')
+            self._notify('login_failed', f"注册失败: {reason}")
+        elif self.state.transition(connection_state.REGISTERING, f"重新注册失败: {reason}"):
+            # 注册失效，PJSUA会按重试间隔继续注册
+            self._notify('connecting', self.server, self.username)
+
+    def _on_unregistered(self, event):
+        """检测到注销成功"""
+        if self.state.state == connection_state.UNREGISTERING:
+            self._cancel_timer('unregister')
+            self._finish_unregister()
+            return
+        account = self._event_account(event.uri)
+        if account is not None:
+            if account.state.state == connection_state.REGISTERED:
+                account.state.transition(connection_state.REGISTERING, "账号已注销")
+            if account is not self.accounts.primary:
+                return
+        if self.state.transition(connection_state.REGISTERING, "账号已注销"):
+            self._notify('connecting', self.server, self.username)
+
+    def _on_account_info(self, event):
+        """检测到账号信息"""
+        if event.acc_id is None:
+            # 附加账号的输出(如添加账号的日志)不更新主账号显示
+            account = self.accounts.by_uri(event.uri)
+            if account is not None and account is not self.accounts.primary:
+                return
+            self.log(f"使用备用方法更新账号信息: {event.username}@{event.server}")
+            self._notify('account_info', event.acc_id, event.uri, event.username, event.server)
+            return
+
+        acc_id = int(event.acc_id)
+        account = self.accounts.by_uri(event.uri)
+        if account is not None:
+            self.accounts.set_acc_id(account, acc_id)
+        if event.current:
+            self.current_acc_id = acc_id
+            self.log(f"当前活跃账号: #{event.acc_id} {event.uri}")
+        # 界面只显示主账号；无法对应到已知账号时以当前账号为准
+        if account is self.accounts.primary or (account is None and event.current):
+            self._notify('account_info', event.acc_id, event.uri, event.username, event.server)
+
+    def _on_current_account_changed(self, event):
+        """pjsua的当前账号已切换"""
+        self.current_acc_id = event.acc_id
+        account = self.accounts.by_acc_id(event.acc_id)
+        self.log(f"当前账号已切换为 #{event.acc_id}" + (f" ({account.key})" if account else ""))
+
+    def _on_incoming_call(self, event):
+        """检测到来电"""
+        account = self.accounts.by_acc_id(event.acc_id) if event.acc_id is not None else None
+        if account is None:
+            self.log("检测到来电")
+            return
+        self.log(f"检测到来电 (账号 {account.key})")
+        if not self.call_in_progress:
+            self.call_account = account
+            account.calls += 1
+            # 呼入没有拨号阶段，从收到INVITE(开始振铃)起计时
+            self.metrics.begin_call(account.key, event.remote_uri, event.timestamp, milestone="ringing")
+
+    def _on_call_state(self, event):
+        """检测到通话状态变化"""
+        if event.state == CallState.CONFIRMED:
+            self.metrics.call_event("confirmed", event.timestamp)
+            self._call_established()
+        elif event.state == CallState.DISCONNECTED:
+            if event.status_code is not None and event.status_code >= 400:
+                self.pending_escalation = f"呼叫失败: {event.status_code} {event.reason}"
+            self._call_disconnected(event.timestamp, event.status_code, event.reason)
+        else:
+            self.log(f"呼叫状态: {event.line}")
+
+    def _on_call_progress(self, event):
+        """检测到呼叫过程信息"""
+        message = PROGRESS_MESSAGES.get(event.stage)
+        if message:
+            self.log(message)
+        milestone = PROGRESS_MILESTONES.get(event.stage)
+        if milestone:
+            self.metrics.call_event(milestone, event.timestamp)
+        if event.stage == CallProgress.RINGING:
+            self._notify('call_ringing')
+
+    def _on_call_failed(self, event):
+        """检测到拨号失败"""
+        self.log(f"拨号失败: {event.line}")
+        self._count_error("call")
+        self.metrics.end_call("failed", reason=event.reason)
+        self._notify('call_failed', event.reason)
+        self._escalate_log_level("拨号失败")
+
+    def _write_cdr(self, record):
+        """呼叫结束时写入通话详单"""
+        if self.cdr_store is None:
+            return
+        end_time = record.wall("disconnected")
+        self.cdr_store.append(CallDetailRecord(
+            record.target, INCOMING if record.incoming else OUTGOING, record.label,
+            record.wall_time, record.wall("confirmed"),
+            end_time if end_time is not None else time.time(),
+            record.status_code, record.reason))
+
+    def _on_sip_traffic(self, event):
+        """收发SIP消息(4级日志)，记录登录和呼叫各阶段的时刻"""
+        metrics = self.metrics
+        if event.direction == SipTraffic.SENT:
+            if event.status_code is not None:
+                return
+            if event.method == "REGISTER":
+                metrics.session_event("register_sent", event.timestamp)
+            elif event.method == "INVITE":
+                metrics.call_event("invite_sent", event.timestamp)
+            elif event.method == "BYE":
+                metrics.call_event("bye_sent", event.timestamp)
+        elif event.status_code is not None:
+            if event.method == "REGISTER":
+                if event.status_code in (401, 407):
+                    metrics.session_event("challenged", event.timestamp)
+                elif event.status_code == 200:
+                    metrics.session_event("registered", event.timestamp)
+            elif event.method == "INVITE":
+                if event.status_code in (180, 183):
+                    metrics.call_event("ringing", event.timestamp)
+                elif event.status_code == 200:
+                    metrics.call_event("answered", event.timestamp)
+
+    def _on_process_exited(self, event):
+        """PJSUA进程已结束"""
+        # 读取线程发布事件后进程可能已被替换或主动清理
+        if self.process is None or self.process.poll() is None:
+            return
+        self.log("PJSUA进程已结束")
+        if self.state.state != connection_state.UNREGISTERING:
+            self._count_error("process_exit")
+        self.metrics.end_call("exited", event.timestamp, reason=f"PJSUA已结束 (返回码 {event.returncode})")
+        self.metrics.end_session("exited")
+        self.process = None
+        self.call_start_time = None
+        self._cancel_timers()
+        self.commands.reset("PJSUA进程已结束")
+        self._close_writer()
+        self.state.transition(connection_state.DEAD, f"返回码 {event.returncode}")
+        self._accounts_stopped(f"返回码 {event.returncode}")
+        self._release_port()
+        self._notify('process_exited', event.returncode)
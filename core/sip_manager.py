@@ -4,36 +4,106 @@
 """
 SIP管理器
 
-管理SIP通信和PJSUA进程。
+连接SIP引擎和Tk界面：从界面读取参数调用引擎，把引擎的通知转换为界面更新。
 """
 
-import re
 import time
-import threading
-import subprocess
 from tkinter import messagebox
 
-class SIPManager:
+from core.sip_engine import SIPEngine, SIPEngineListener
+from core.metrics_server import MetricsServer
+from core.cdr_store import CdrStore
+from core.structured_log import structured_log_from_config
+from utils.log_index import PJSUA_OUTPUT
+
+class SIPManager(SIPEngineListener):
     """SIP通信管理器"""
-    
+
     def __init__(self, client, ui_manager, logger, pjsua_utils):
         """初始化SIP管理器"""
         self.client = client
         self.ui_manager = ui_manager
         self.logger = logger
         self.pjsua_utils = pjsua_utils
-        
-        self.process = None
-        self.is_connected = False
-        self.call_in_progress = False
-        self.call_start_time = None
+
+        # 界面更新统一经由调度器，按帧合并后在UI线程中应用
+        self.ui = ui_manager.dispatcher
+
         self.call_timer_id = None
-        
+
+        # SIP引擎 - 在自己的线程中管理PJSUA，通过监听器回调通知本类
+        # 通话详单保存到本地数据库，cdr_path为空时不保存
+        cdr_path = self.client.config_manager.get('cdr_path', 'sip_client_cdr.db')
+        cdr_store = CdrStore(cdr_path, log=self.log) if cdr_path else None
+        # 可选的结构化日志(JSONL + 按时间和Call-ID的索引)
+        structured_log = structured_log_from_config(self.client.config_manager)
+        self.engine = SIPEngine(pjsua_utils, log=self.log,
+                                adaptive_log_level=self.is_adaptive_log_level(),
+                                cdr_store=cdr_store, structured_log=structured_log)
+        self.engine.add_listener(self)
+        self.events = self.engine.events
+
+        # 配置中的附加账号在登录时与主账号注册到同一个PJSUA进程
+        for account in self.client.config_manager.get_accounts():
+            self.engine.add_account(account.get('username'), account.get('password'),
+                                    account.get('server'))
+
+        # 可选的Prometheus指标端点，附带界面更新队列的指标
+        self.metrics_server = None
+        metrics_port = int(self.client.config_manager.get('metrics_port', 0) or 0)
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(
+                    self.engine, metrics_port, self.client.config_manager.get('metrics_host', '127.0.0.1'),
+                    collectors=[self._collect_ui_metrics], log=self.log)
+            except OSError as e:
+                self.log(f"无法启动指标端点: {str(e)}")
+
+    @property
+    def process(self):
+        """当前PJSUA进程"""
+        return self.engine.process
+
+    @property
+    def is_connected(self):
+        """是否已注册到服务器"""
+        return self.engine.is_connected
+
+    @property
+    def call_in_progress(self):
+        """是否正在通话"""
+        return self.engine.call_in_progress
+
+    def log(self, message):
+        """记录日志，可在任意线程调用(Logger自行排队，由UI线程按帧显示)"""
+        self.logger.log(message)
+
     def check_pjsua(self):
         """检查PJSUA是否可用"""
         pjsua_path = self.ui_manager.get_pjsua_path()
         return self.pjsua_utils.check_pjsua(pjsua_path)
-        
+
+    def locate_pjsua(self, then=None):
+        """
+        在后台检测PJSUA，设置的路径不可用时查找其他可用的pjsua并填入设置
+
+        Args:
+            then: 完成后在UI线程中调用的函数
+        """
+        current = self.ui_manager.get_pjsua_path()
+
+        def on_located(path):
+            if path and path != current:
+                self.ui.call(self.ui_manager.set_pjsua_path, path)
+            if then:
+                self.ui.call(then)
+
+        self.pjsua_utils.locate_pjsua_async(current, on_located)
+
+    def is_adaptive_log_level(self):
+        """是否启用按需提高日志级别的精简模式"""
+        return bool(self.client.config_manager.get('adaptive_log_level', False))
+
     def login(self, server=None, username=None, password=None):
         """登录到SIP服务器"""
         # 如果未提供参数，从UI获取
@@ -42,548 +112,249 @@ class SIPManager:
             server = info['server']
             username = info['username']
             password = info['password']
-            
-        pjsua_path = self.ui_manager.get_pjsua_path()
-        port = self.ui_manager.get_port()
-        
-        if not server or not username:
-            self.logger.log("服务器地址和用户名不能为空")
-            return
-            
-        # 检查端口是否有效
-        try:
-            port = int(port)
-            if port < 1024 or port > 65535:
-                self.logger.log("端口号必须在1024-65535之间")
-                return
-        except ValueError:
-            self.logger.log("请输入有效的端口号")
-            return
-            
-        # 检查PJSUA是否可用
-        if not self.check_pjsua():
-            return
-        
-        # 如果已经有进程在运行，先结束它    
-        self.cleanup()
-            
-        try:
-            self.logger.log(f"尝试连接到服务器: {server}")
-            self.logger.log(f"用户名: {username}")
-            
-            # 更新状态
-            self.ui_manager.update_status("正在连接...", "orange")
-            
-            # 禁用登录按钮，防止重复操作
-            self.ui_manager.disable_login_button()
-            
-            # 构建PJSUA命令 - 使用最基本的命令
-            cmd = [
-                pjsua_path,
-                f"--id=sip:{username}@{server}",
-                f"--registrar=sip:{server}",
-                "--realm=*",
-                f"--username={username}",
-                f"--password={password}",
-                "--log-level=4",
-                "--app-log-level=4",
-                f"--local-port={port}"
-            ]
-            
-            self.logger.log(f"启动PJSUA: {' '.join(cmd)}")
-            
-            # 启动PJSUA进程
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                stdin=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                shell=True
-            )
-            
-            # 启动线程读取输出
-            thread = threading.Thread(target=self.read_output)
-            thread.daemon = True
-            thread.start()
-            
-            # 添加状态检查定时器，10秒后检查连接状态
-            self.client.root.after(10000, self.check_login_status)
-            
-            # 5秒后开始检查PJSUA状态
-            self.client.root.after(5000, self.check_pjsua_status)
-            
-        except Exception as e:
-            self.logger.log(f"登录失败: {str(e)}")
-            self.ui_manager.update_status("连接失败", "red")
-            self.ui_manager.enable_login_button()
-            messagebox.showerror("登录失败", f"连接到服务器时出错: {str(e)}")
-            
-    def read_output(self):
-        """读取PJSUA进程的输出"""
-        if not self.process:
-            return
-            
-        # 检测帐户ID正则表达式 - 增强匹配模式
-        account_pattern = re.compile(r"\*\[\s*(\d+)\]\s+(sip:([^@]+)@([^:]+))")
-        # 检测更多账户信息格式
-        alt_account_pattern = re.compile(r"Account\s+\d+:\s+sip:([^@]+)@([^:]+)")
-        
-        for line in iter(self.process.stdout.readline, ''):
-            # 在UI线程中更新日志
-            self.client.root.after(0, lambda msg=line.strip(): self.logger.log(msg))
-            
-            # 检测注册成功 - 增加更多匹配模式
-            if ("registration success" in line and "status=200" in line) or \
-               ("registration success" in line and "OK" in line) or \
-               ("REGISTER" in line and "200 OK" in line) or \
-               ("Registration success" in line):
-                self.client.root.after(0, self.login_completed)
-            
-            # 检测账号信息 - 主要模式
-            account_match = account_pattern.search(line)
-            if account_match:
-                acc_id = account_match.group(1)
-                sip_uri = account_match.group(2)
-                username = account_match.group(3)
-                server = account_match.group(4)
-                self.client.root.after(0, lambda a=acc_id, s=sip_uri, u=username, sv=server: 
-                                      self.update_account_info(a, s, u, sv))
-            
-            # 检测账号信息 - 备选模式
-            alt_match = alt_account_pattern.search(line)
-            if alt_match and not account_match:
-                username = alt_match.group(1)
-                server = alt_match.group(2)
-                self.client.root.after(0, lambda u=username, sv=server:
-                                      self.fallback_account_info(u, sv))
-                
-            # 如果看到账号状态信息但未匹配到正则，尝试提取用户名和服务器
-            if "Account" in line and "sip:" in line and not account_match and not alt_match:
-                self.client.root.after(0, lambda l=line: self.try_extract_account(l))
-                
-            # 检测来电
-            if "Incoming INVITE" in line or "incoming call" in line:
-                self.client.root.after(0, lambda: self.logger.log("检测到来电"))
-                
-            # 检测通话建立 - 增加多种模式匹配
-            if "Call established" in line or "call connected" in line or "Media active" in line:
-                self.client.root.after(0, lambda: self.call_established())
-                
-            # 检测通话状态更新为确认
-            if "state changed to CONFIRMED" in line or "Call state: CONFIRMED" in line:
-                self.client.root.after(0, lambda: self.call_established())
-                
-            # 检测通话结束 - 增加多种模式匹配
-            if "Call disconnected" in line or "call disconnected" in line or "Call state: DISCONNECTED" in line:
-                self.client.root.after(0, lambda: self.call_disconnected())
-                
-            # 检测拨号相关消息
-            if "Making call" in line:
-                self.client.root.after(0, lambda: self.logger.log("正在发起呼叫..."))
-            if "Call state" in line:
-                self.client.root.after(0, lambda msg=line: self.logger.log(f"呼叫状态: {msg}"))
-            if "Sending INVITE" in line:
-                self.client.root.after(0, lambda: self.logger.log("发送INVITE请求..."))
-            if "180 Ringing" in line:
-                self.client.root.after(0, lambda: self.logger.log("对方正在响铃..."))
-                self.client.root.after(0, lambda: self.ui_manager.update_call_status("对方响铃中...", "orange"))
-            if "200 OK" in line and "INVITE" in line:
-                self.client.root.after(0, lambda: self.logger.log("对方已接听..."))
-            if "Media will be active soon" in line:
-                self.client.root.after(0, lambda: self.logger.log("媒体即将激活..."))
-                
-            # 检测挂断相关消息
-            if "BYE sent" in line:
-                self.client.root.after(0, lambda: self.logger.log("已发送挂断请求..."))
-                
-            # 检测错误信息
-            if "Unable to make call" in line:
-                error_msg = line
-                self.client.root.after(0, lambda msg=error_msg: self.logger.log(f"拨号失败: {msg}"))
-                self.client.root.after(0, lambda: self.ui_manager.update_status("已连接", "green"))
-                self.client.root.after(0, lambda: self.ui_manager.update_call_status("拨打失败", "red"))
-                self.client.root.after(0, lambda: self.ui_manager.enable_dial_button())
-                
-        # 如果进程结束了
-        if hasattr(self.process, 'stdout') and self.process.stdout:
-            self.process.stdout.close()
-        self.client.root.after(0, lambda: self.logger.log("PJSUA进程已结束"))
-        self.client.root.after(0, lambda: self.ui_manager.update_status("未连接", "red"))
-        self.client.root.after(0, lambda: self.ui_manager.update_account_info("无", "gray"))
-        self.client.root.after(0, lambda: self.ui_manager.update_call_status("无通话", "gray"))
-        self.client.root.after(0, lambda: self.ui_manager.update_call_time("00:00:00", "gray"))
-        self.client.root.after(0, lambda: self.ui_manager.reset_login_button())
-        self.client.root.after(0, lambda: self.ui_manager.disable_dial_button())
-        self.client.root.after(0, lambda: self.ui_manager.disable_hangup_button())
-        self.process = None
-        
-    def try_extract_account(self, line):
-        """尝试从各种格式的行中提取账号信息"""
-        try:
-            if "sip:" in line:
-                # 尝试提取形如 "sip:username@server" 的部分
-                start = line.find("sip:")
-                if start >= 0:
-                    sip_part = line[start:]
-                    end = sip_part.find(" ")
-                    if end > 0:
-                        sip_part = sip_part[:end]
-                    
-                    # 清理结尾可能的标点
-                    sip_part = sip_part.rstrip(",.;:")
-                    
-                    # 提取用户名和服务器
-                    if "@" in sip_part:
-                        username = sip_part.split(":")[1].split("@")[0]
-                        server = sip_part.split("@")[1]
-                        self.fallback_account_info(username, server)
-                        return True
-            return False
-        except Exception as e:
-            self.logger.log(f"提取账号信息失败: {str(e)}")
-            return False
-        
-    def update_account_info(self, acc_id, sip_uri, username, server=None):
-        """更新账号信息显示"""
-        self.logger.log(f"当前活跃账号: #{acc_id} {sip_uri}")
-        
-        # 如果未提供服务器，尝试从sip_uri中提取
-        if not server and "@" in sip_uri:
-            server = sip_uri.split('@')[1]
-            
-        # 更新UI显示
-        self.ui_manager.update_account_info(f"{username}@{server}", "blue")
-        
-        # 保存账号信息到配置
-        self.client.config_manager.set('current_username', username)
-        self.client.config_manager.set('current_server', server)
-    
-    def fallback_account_info(self, username, server):
-        """备用方法更新账号信息"""
-        self.logger.log(f"使用备用方法更新账号信息: {username}@{server}")
-        self.ui_manager.update_account_info(f"{username}@{server}", "blue")
-        
-        # 保存账号信息到配置
-        self.client.config_manager.set('current_username', username)
-        self.client.config_manager.set('current_server', server)
-        
-    def login_completed(self):
-        """登录成功后的处理"""
-        # 避免重复调用
-        if self.is_connected:
-            return
-            
-        self.logger.log("登录成功")
-        
-        # 更新状态
-        self.is_connected = True
-        self.ui_manager.update_status("已连接", "green")
-        
-        # 获取登录信息直接显示，避免等待
-        info = self.ui_manager.get_server_info()
-        if info['username'] and info['server']:
-            self.ui_manager.update_account_info(f"{info['username']}@{info['server']}", "blue")
-        else:
-            self.ui_manager.update_account_info("正在获取...", "blue")
-            
-        self.ui_manager.update_call_status("空闲", "green")
-        
-        # 启用拨号按钮
-        self.ui_manager.enable_dial_button()
-        
-        # 更新登录按钮状态
-        self.ui_manager.set_login_button_connected()
-        
-        # 启用断开连接按钮
-        self.ui_manager.enable_disconnect_button()
-        
-        # 立即请求账号信息
-        self.request_account_info()
-        
-        # 设置定期请求账号信息的定时器
-        self.setup_account_info_timer()
-        
-        # messagebox.showinfo("连接成功", "已成功连接到SIP服务器！")
-        
-    def request_account_info(self):
-        """请求当前账号信息"""
-        try:
-            if self.process and self.process.stdin:
-                self.process.stdin.write("d\r\n")
-                self.process.stdin.flush()
-                self.logger.log("已请求账号状态信息")
-        except Exception as e:
-            self.logger.log(f"请求账号信息失败: {str(e)}")
-            
-    def setup_account_info_timer(self):
-        """设置定期请求账号信息的定时器"""
-        # 定义定时器变量
-        self.account_info_timer = None
-        
-        # 每10秒请求一次账号信息
-        def request_regularly():
-            if self.is_connected and self.process:
-                self.request_account_info()
-                # 继续下一次定时
-                self.account_info_timer = self.client.root.after(10000, request_regularly)
-        
-        # 启动第一次定时
-        self.account_info_timer = self.client.root.after(10000, request_regularly)
-        
+
+        self.engine.adaptive_log_level = self.is_adaptive_log_level()
+        self.engine.login(server, username, password,
+                          self.ui_manager.get_pjsua_path(), self.ui_manager.get_port())
+
     def make_call(self):
         """拨打电话"""
         destination = self.ui_manager.get_dial_number()
+        # 被叫服务器默认为呼出账号的服务器
+        self.engine.make_call(destination, account=self.ui_manager.get_call_account())
+
+    def add_account(self, username, password):
+        """添加附加账号并保存到配置"""
         server = self.ui_manager.get_server_info()['server']
-        
-        if not destination:
-            self.logger.log("请输入要拨打的号码")
+        if not username or not server:
+            messagebox.showwarning("添加账号", "用户名和服务器不能为空")
             return
-            
-        if not self.is_connected or not self.process:
-            self.logger.log("未连接到SIP服务器，无法拨打电话")
-            return
-            
-        try:
-            self.logger.log(f"正在拨打: {destination}")
-            
-            # 更新状态
-            self.ui_manager.update_status("已连接", "green")
-            self.ui_manager.update_call_status("正在拨号...", "orange")
-            
-            # 禁用拨号按钮，防止重复操作
-            self.ui_manager.disable_dial_button()
-            
-            # 清空输入缓冲区
-            self.process.stdin.write("\r\n")
-            self.process.stdin.flush()
-            time.sleep(0.1)
-            
-            # 发送m命令
-            self.process.stdin.write("m\r\n")
-            self.process.stdin.flush()
-            time.sleep(0.1)
-            
-            # 发送目标URI
-            full_url = f"sip:{destination}@{server}"
-            self.process.stdin.write(f"{full_url}\r\n")
-            self.process.stdin.flush()
-            
-            # 记录完整的拨号URL
-            self.logger.log(f"拨号URL: {full_url}")
-            
-        except Exception as e:
-            self.logger.log(f"拨打电话失败: {str(e)}")
-            self.ui_manager.update_status("已连接", "green")
-            self.ui_manager.update_call_status("拨打失败", "red")
-            self.ui_manager.enable_dial_button()
-            
-    def call_established(self):
-        """通话建立后的处理"""
-        self.call_in_progress = True
-        self.ui_manager.update_status("已连接", "green")
-        self.ui_manager.update_call_status("通话中", "green")
-        self.ui_manager.enable_hangup_button()
-        
-        # 开始计时
-        self.call_start_time = time.time()
+        config = self.client.config_manager
+        accounts = [a for a in config.get_accounts()
+                    if (a.get('username'), a.get('server')) != (username, server)]
+        accounts.append({'server': server, 'username': username, 'password': password})
+        config.set_accounts(accounts)
+        config.save_config()
+        self.engine.add_account(username, password, server)
+
+    def remove_account(self, key):
+        """移除附加账号并从配置中删除"""
+        config = self.client.config_manager
+        config.set_accounts([a for a in config.get_accounts()
+                             if f"{a.get('username')}@{a.get('server')}" != key])
+        config.save_config()
+        self.engine.remove_account(key)
+
+    def resource_report(self):
+        """返回PJSUA进程的资源占用报告"""
+        return self.engine.resource_report()
+
+    def metrics_report(self):
+        """返回登录和呼叫各阶段时延的百分位数"""
+        return self.engine.metrics_report()
+
+    def export_metrics(self, path):
+        """导出时延记录和直方图"""
+        self.engine.export_metrics(path)
+
+    def query_cdr(self, number=None, limit=20):
+        """查询最近的通话详单，number为号码前缀"""
+        return self.engine.query_cdr(number, limit=limit, prefix=True)
+
+    def hangup(self):
+        """挂断电话"""
+        self.engine.hangup()
+
+    def unregister(self):
+        """从SIP服务器注销但不退出程序"""
+        self.engine.unregister()
+
+    def configure_warm_pool(self):
+        """按配置保持预热的PJSUA实例，加快登录"""
+        size = int(self.client.config_manager.get('warm_pool_size', 0) or 0)
+        self.engine.adaptive_log_level = self.is_adaptive_log_level()
+        self.engine.configure_warm_pool(self.ui_manager.get_pjsua_path(), size)
+
+    def escalate_log_level(self, reason):
+        """按需将PJSUA提高到详细日志级别"""
+        self.engine.adaptive_log_level = self.is_adaptive_log_level()
+        self.engine.escalate_log_level(reason)
+
+    def pipe_report(self):
+        """返回各日志级别下管道输出速率的报告"""
+        return self.engine.pipe_report()
+
+    def _collect_ui_metrics(self, out):
+        """界面更新队列的指标(在指标端点的线程中调用)"""
+        out.gauge("ui_dispatch_pending", "等待UI线程应用的更新和回调数", self.ui.pending_count())
+        out.counter("ui_dispatch_frames_total", "执行过更新的帧数", self.ui.frames)
+        out.counter("ui_dispatch_applied_total", "实际更新控件的次数", self.ui.applied)
+        out.counter("ui_dispatch_coalesced_total", "被同一帧内后续更新覆盖的次数", self.ui.coalesced)
+        out.gauge("log_render_pending", "等待显示到日志页的行数", self.logger.pending_count())
+        out.counter("log_render_lines_total", "显示到日志页的行数", self.logger.rendered)
+        out.counter("log_render_skipped_total", "积压超过日志页容量而未显示的行数", self.logger.skipped)
+        sink = self.logger.sink
+        if sink is not None:
+            out.gauge("log_sink_pending", "等待写入日志文件的记录数", sink.pending())
+            out.counter("log_sink_written_total", "写入日志文件的记录数", sink.written)
+            out.counter("log_sink_dropped_total", "队列满而未写入日志文件的记录数", sink.dropped)
+            out.counter("log_sink_rotations_total", "日志文件归档次数", sink.rotations)
+
+    def cleanup(self):
+        """清理资源"""
+        self.engine.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+
+    def start_call_timer(self):
+        """开始通话计时"""
+        if self.call_timer_id:
+            self.client.root.after_cancel(self.call_timer_id)
         self.update_call_timer()
-        
+
     def update_call_timer(self):
         """更新通话时间"""
-        if not self.call_in_progress:
+        start_time = self.engine.call_start_time
+        if not self.engine.call_in_progress or start_time is None:
+            self.call_timer_id = None
             return
-            
-        elapsed = int(time.time() - self.call_start_time)
+
+        elapsed = int(time.time() - start_time)
         hours = elapsed // 3600
         minutes = (elapsed % 3600) // 60
         seconds = elapsed % 60
-        
+
         time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        self.ui_manager.update_call_time(time_str, "blue")
-        
+        self.ui.update('update_call_time', time_str, "blue")
+
         # 每秒更新一次
         self.call_timer_id = self.client.root.after(1000, self.update_call_timer)
-        
-    def call_disconnected(self):
-        """通话断开后的处理"""
-        self.call_in_progress = False
-        
-        # 停止计时器
+
+    def stop_call_timer(self):
+        """停止通话计时"""
         if self.call_timer_id:
             self.client.root.after_cancel(self.call_timer_id)
             self.call_timer_id = None
-        
-        # 重置通话时间显示
-        self.ui_manager.update_call_time("00:00:00", "gray")
-        
-        if self.is_connected:
-            self.ui_manager.update_status("已连接", "green")
-            self.ui_manager.update_call_status("空闲", "green")
-            self.ui_manager.enable_dial_button()
+        self.ui.update('update_call_time', "00:00:00", "gray")
+
+    def save_account(self, username, server):
+        """保存账号信息到配置"""
+        self.client.config_manager.set('current_username', username)
+        self.client.config_manager.set('current_server', server)
+
+    # 引擎通知 - 在引擎线程中调用，通过调度器切换到UI线程
+    def on_output(self, lines, hits=()):
+        """整批记录pjsua输出，按事件流的分类结果标注各行的事件类型以便日志页按事件筛选"""
+        lines = [line.strip() for line in lines]
+        events = [None] * len(lines)
+        for index, kind, _ in hits:
+            events[index] = kind
+        self.logger.log_many(lines, source=PJSUA_OUTPUT, events=events)
+
+    def on_connecting(self, server, username):
+        """开始连接"""
+        self.ui.update('update_status', "正在连接...", "orange")
+        # 禁用登录按钮，防止重复操作
+        self.ui.update('disable_login_button')
+
+    def on_login_failed(self, reason):
+        """启动PJSUA失败"""
+        self.ui.update('update_status', "连接失败", "red")
+        self.ui.update('enable_login_button')
+        self.ui.call(messagebox.showerror, "登录失败", f"连接到服务器时出错: {reason}")
+
+    def on_registered(self, server, username):
+        """注册成功"""
+        self.ui.update('update_status', "已连接", "green")
+
+        # 获取登录信息直接显示，避免等待
+        if username and server:
+            self.ui.update('update_account_info', f"{username}@{server}", "blue")
         else:
-            self.ui_manager.update_status("未连接", "red")
-            self.ui_manager.update_call_status("无通话", "gray")
-        self.ui_manager.disable_hangup_button()
-            
-    def hangup(self):
-        """挂断电话"""
-        if not self.call_in_progress or not self.process:
-            self.logger.log("当前没有通话，无法挂断")
-            return
-            
-        try:
-            self.logger.log("正在结束通话...")
-            
-            # 更新状态
-            self.ui_manager.update_call_status("结束通话中...", "orange")
-            
-            # 禁用挂断按钮，防止重复操作
-            self.ui_manager.disable_hangup_button()
-            
-            # 向PJSUA发送挂断命令，使用\r\n确保命令发送
-            self.process.stdin.write("h\r\n")
-            self.process.stdin.flush()
-            
-            # 再次发送回车确保命令被执行
-            time.sleep(0.1)
-            self.process.stdin.write("\r\n")
-            self.process.stdin.flush()
-            
-            # 如果5秒内通话没有断开，强制断开
-            self.client.root.after(5000, self.check_hangup_status)
-            
-        except Exception as e:
-            self.logger.log(f"挂断失败: {str(e)}")
-            self.ui_manager.update_call_status("挂断失败", "red")
-            self.ui_manager.enable_hangup_button()
-            
-    def check_hangup_status(self):
-        """检查挂断是否成功，如果仍在通话则强制断开"""
-        if self.call_in_progress:
-            self.logger.log("挂断超时，强制断开通话")
-            self.call_disconnected()
-            
-    def check_pjsua_status(self):
-        """直接检查PJSUA状态"""
-        if not self.process:
-            return
-            
-        try:
-            # 向PJSUA发送状态查询命令
-            self.process.stdin.write("d\r\n")  # 'd'命令用于显示状态
-            self.process.stdin.flush()
-            
-            # 5秒后再次检查
-            self.client.root.after(5000, self.check_pjsua_status)
-        except:
-            pass
-            
-    def check_login_status(self):
-        """检查连接状态并更新UI"""
-        # 如果进程仍在运行，但状态未更新为已连接，则检查是否有注册成功的日志信息
-        if self.process and not self.is_connected:
-            # 获取日志内容 - 这里应该改为从Logger获取，但为了简化，直接检查UI中的日志文本
-            log_content = self.ui_manager.log_text.get("1.0", "end")
-            
-            # 检查是否有注册成功的信息
-            if ("registration success" in log_content and "status=200" in log_content) or \
-               ("registration success" in log_content and "OK" in log_content) or \
-               ("REGISTER" in log_content and "200 OK" in log_content) or \
-               ("Online status: Online" in log_content):
-                self.logger.log("检测到注册已成功，但状态未更新，手动更新状态")
-                self.login_completed()
-            else:
-                # 如果还未连接成功，继续等待5秒后再次检查
-                self.client.root.after(5000, self.check_login_status)
-                
-    def cleanup(self):
-        """清理资源"""
-        if self.process:
-            try:
-                self.process.terminate()
-                self.logger.log("已终止PJSUA进程")
-            except:
-                pass
-            self.process = None
+            self.ui.update('update_account_info', "正在获取...", "blue")
 
-    def unregister(self):
-        """从SIP服务器注销但不退出程序"""
-        if not self.process:
-            self.logger.log("当前未连接到SIP服务器")
-            return
-            
-        try:
-            self.logger.log("正在从SIP服务器注销...")
-            
-            # 如果有通话，先挂断
-            if self.call_in_progress:
-                self.hangup()
-                
-            # 向PJSUA发送注销命令 - 先尝试使用PJSUA的ru命令
-            if self.process and self.process.stdin:
-                self.process.stdin.write("ru\n")
-                self.process.stdin.flush()
-                self.logger.log("已发送注销命令")
-                
-                # 给一点时间让PJSUA处理注销
-                time.sleep(1)
-                
-            # 清理资源但不退出程序
-            self.cleanup_without_exit()
-            
-            # 更新状态
-            self.is_connected = False
-            self.ui_manager.update_status("已断开", "red")
-            self.ui_manager.update_account_info("无", "gray")
-            self.ui_manager.update_call_status("无通话", "gray")
-            
-            # 重置按钮状态
-            self.ui_manager.reset_login_button()
-            self.ui_manager.disable_disconnect_button()
-            self.ui_manager.disable_dial_button()
-            
-        except Exception as e:
-            self.logger.log(f"注销过程中出错: {str(e)}")
-            
-    def cleanup_without_exit(self):
-        """清理资源但不退出程序"""
-        if self.process:
-            try:
-                # 终止PJSUA进程
-                if self.process.poll() is None:  # 如果进程仍在运行
-                    # 尝试通过q命令优雅退出
-                    if self.process.stdin:
-                        self.process.stdin.write("q\n")
-                        self.process.stdin.flush()
-                        
-                    # 等待一段时间让进程自行终止
-                    time.sleep(0.5)
-                    
-                    # 如果进程仍在运行，强制终止
-                    if self.process.poll() is None:
-                        self.process.terminate()
-                        self.process.wait(timeout=2)
-                        
-            except Exception as e:
-                self.logger.log(f"清理PJSUA进程时出错: {str(e)}")
-            finally:
-                self.process = None
-                
-        # 停止所有定时器
-        if hasattr(self, 'account_info_timer') and self.account_info_timer:
-            self.client.root.after_cancel(self.account_info_timer)
-            self.account_info_timer = None
-            
-        if self.call_timer_id:
-            self.client.root.after_cancel(self.call_timer_id)
-            self.call_timer_id = None
-            
-        # 重置状态
-        self.call_in_progress = False
-        self.call_start_time = None
-        
-        # 重置登录按钮状态
-        self.ui_manager.reset_login_button() 
\ No newline at end of file
+        self.ui.update('update_call_status', "空闲", "green")
+        self.ui.update('enable_dial_button')
+        self.ui.update('set_login_button_connected')
+        self.ui.update('enable_disconnect_button')
+
+    def on_account_info(self, acc_id, uri, username, server):
+        """更新账号信息显示"""
+        # 如果未提供服务器，尝试从sip_uri中提取
+        if not server and uri and "@" in uri:
+            server = uri.split('@')[1]
+        self.ui.update('update_account_info', f"{username}@{server}", "blue")
+        self.ui.call(self.save_account, username, server)
+
+    def on_accounts_changed(self, accounts):
+        """账号列表或账号状态变化"""
+        self.ui.update('update_accounts', accounts)
+
+    def on_calling(self, uri):
+        """已开始拨号"""
+        self.ui.update('update_status', "已连接", "green")
+        self.ui.update('update_call_status', "正在拨号...", "orange")
+        # 禁用拨号按钮，防止重复操作
+        self.ui.update('disable_dial_button')
+
+    def on_call_ringing(self):
+        """对方响铃"""
+        self.ui.update('update_call_status', "对方响铃中...", "orange")
+
+    def on_call_established(self):
+        """通话建立"""
+        self.ui.update('update_status', "已连接", "green")
+        self.ui.update('update_call_status', "通话中", "green")
+        self.ui.update('enable_hangup_button')
+        # 开始计时
+        self.ui.call(self.start_call_timer)
+
+    def on_call_failed(self, reason):
+        """拨号失败"""
+        self.ui.update('update_status', "已连接", "green")
+        self.ui.update('update_call_status', "拨打失败", "red")
+        self.ui.update('enable_dial_button')
+
+    def on_hanging_up(self):
+        """正在挂断"""
+        self.ui.update('update_call_status', "结束通话中...", "orange")
+        # 禁用挂断按钮，防止重复操作
+        self.ui.update('disable_hangup_button')
+
+    def on_hangup_failed(self, reason):
+        """挂断失败"""
+        self.ui.update('update_call_status', "挂断失败", "red")
+        self.ui.update('enable_hangup_button')
+
+    def on_call_ended(self):
+        """通话结束"""
+        self.ui.call(self.stop_call_timer)
+        if self.engine.is_connected:
+            self.ui.update('update_status', "已连接", "green")
+            self.ui.update('update_call_status', "空闲", "green")
+            self.ui.update('enable_dial_button')
+        else:
+            self.ui.update('update_status', "未连接", "red")
+            self.ui.update('update_call_status', "无通话", "gray")
+        self.ui.update('disable_hangup_button')
+
+    def on_unregistered(self):
+        """已注销"""
+        self.ui.call(self.stop_call_timer)
+        self.ui.update('update_status', "已断开", "red")
+        self.ui.update('update_account_info', "无", "gray")
+        self.ui.update('update_call_status', "无通话", "gray")
+        self.ui.update('reset_login_button')
+        self.ui.update('disable_disconnect_button')
+        self.ui.update('disable_dial_button')
+        self.ui.update('disable_hangup_button')
+
+    def on_process_exited(self, returncode):
+        """PJSUA进程已结束"""
+        self.ui.call(self.stop_call_timer)
+        self.ui.update('update_status', "未连接", "red")
+        self.ui.update('update_account_info', "无", "gray")
+        self.ui.update('update_call_status', "无通话", "gray")
+        self.ui.update('reset_login_button')
+        self.ui.update('disable_dial_button')
+        self.ui.update('disable_hangup_button')
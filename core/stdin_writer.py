@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA标准输入写入器
+
+所有写往pjsua标准输入的命令都进入一个队列，由专门的写入线程按顺序写出：
+两次写出之间保持最小间隔，间隔内排队的多条命令合并为一次write和flush。
+调用方只负责入队，管道写满或pjsua卡住时也不会阻塞调度线程或界面线程。
+"""
+
+import time
+import locale
+import threading
+from collections import deque
+
+# 两次写出之间的默认最小间隔(秒)
+DEFAULT_PACING = 0.01
+
+
+class WriteStats:
+    """写入统计，可由同一引擎先后启动的多个写入器共同累计"""
+
+    def __init__(self):
+        self.commands = 0        # 写出的命令条数
+        self.batches = 0         # write+flush次数
+        self.bytes_written = 0
+        self.max_depth = 0       # 队列深度峰值
+        self.total_latency = 0.0  # 入队到写出的总耗时(秒)
+        self.max_latency = 0.0
+        self.errors = 0
+
+    def record_batch(self, byte_count, latencies):
+        """记录一次写出"""
+        self.batches += 1
+        self.commands += len(latencies)
+        self.bytes_written += byte_count
+        self.total_latency += sum(latencies)
+        self.max_latency = max(self.max_latency, max(latencies))
+
+    def report(self):
+        """返回统计报告"""
+        if not self.commands:
+            return "无数据"
+        average = self.total_latency / self.commands * 1000
+        return (f"{self.commands}条命令 {self.batches}次写出 {self.bytes_written:,} 字节, "
+                f"队列峰值{self.max_depth}, 平均延迟{average:.1f}ms 最大{self.max_latency * 1000:.1f}ms, "
+                f"失败{self.errors}")
+
+
+class StdinWriter:
+    """pjsua标准输入的写入线程"""
+
+    def __init__(self, stream, encoding=None, pacing=DEFAULT_PACING, stats=None,
+                 on_error=None, name="pjsua-stdin"):
+        """
+        初始化写入器并启动写入线程
+
+        Args:
+            stream: pjsua进程的标准输入(二进制)
+            encoding: 命令文本的编码，默认为系统首选编码
+            pacing: 两次写出之间的最小间隔(秒)
+            stats: 累计统计的WriteStats，默认新建
+            on_error: 写入失败时在写入线程中调用 on_error(exc)
+            name: 写入线程名称
+        """
+        self.stream = stream
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.pacing = pacing
+        self.stats = stats or WriteStats()
+        self.on_error = on_error
+        self.error = None
+
+        self._cond = threading.Condition()
+        self._queue = deque()  # [(数据, 入队时刻), ...]
+        self._closing = False
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        """
+        将命令文本加入写入队列，立即返回，可在任意线程调用
+
+        Raises:
+            BrokenPipeError: 之前的写入已失败或写入器已关闭
+        """
+        data = text.encode(self.encoding)
+        with self._cond:
+            if self.error is not None:
+                raise BrokenPipeError(f"PJSUA标准输入不可用: {self.error}")
+            if self._closing:
+                raise BrokenPipeError("PJSUA标准输入已关闭")
+            self._queue.append((data, time.monotonic()))
+            if len(self._queue) > self.stats.max_depth:
+                self.stats.max_depth = len(self._queue)
+            self._cond.notify()
+
+    def depth(self):
+        """当前排队的命令数"""
+        return len(self._queue)
+
+    def close(self):
+        """写出已排队的命令后结束写入线程，不关闭标准输入"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+
+    def _run(self):
+        """写入线程主循环"""
+        last_write = 0.0
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+
+            # 距上次写出不足最小间隔时等待，其间到达的命令一并写出
+            delay = last_write + self.pacing - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._cond:
+                batch = list(self._queue)
+                self._queue.clear()
+
+            try:
+                self.stream.write(b"".join(data for data, _ in batch))
+                self.stream.flush()
+            except Exception as e:
+                with self._cond:
+                    self.error = e
+                    self.stats.errors += 1
+                    self._queue.clear()
+                if self.on_error:
+                    self.on_error(e)
+                return
+
+            last_write = time.monotonic()
+            self.stats.record_batch(sum(len(data) for data, _ in batch),
+                                    [last_write - queued for _, queued in batch])
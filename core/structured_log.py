@@ -0,0 +1,482 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志
+
+PJSUA的每一行输出(以及引擎自身的日志)写成一行JSON: 单调时钟和系统时刻、级别、
+账号、SIP Call-ID、事件类型、来源和原始行。收发SIP消息的整段报文(从 "TX/RX ...
+msg" 行到 "--end msg--")都归属于报文中Call-ID头的值。报文之外的行只有含某个
+进行中呼叫的Call-ID，或是能对应到某个呼叫的呼叫事件("Call 0 state changed ..."，
+pjsua的呼叫序号在只有一个呼叫尚未对应序号时与其Call-ID关联)时才归属于该呼叫，
+其余的行(后台输出等)不属于任何呼叫。
+
+每个日志文件旁有一个SQLite索引(<文件名>.idx)，记录每个时间段(默认每分钟)第一行
+的偏移，以及每个Call-ID的各段连续行的偏移和长度。取出一个呼叫的全部行只需查询
+索引后按偏移读取，不必扫描整个文件。
+
+写入沿用LogSink: 读取线程只做分类并放入队列，JSON编码、写文件和写索引都在
+后台线程中完成。
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+from bisect import bisect_right
+
+from core.pjsua_parser import (default_classifier, SIP_MESSAGE, REGISTRATION_FAILED, CALL_FAILED,
+                               CALL_DISCONNECTED)
+from utils.log_sink import LogSink, DROP, QUEUE_SIZE, BACKUPS
+from utils.log_store import DEBUG, INFO, ERROR, LEVEL_NAMES, guess_level
+
+# 文件名前缀和扩展名
+BASENAME = "sip_client_events"
+SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+
+# 索引的时间段长度(秒)
+BUCKET_SECONDS = 60
+# 各行按写入顺序排列，时刻只是大致递增(引擎日志与同一时刻读到的输出可能交错)，
+# 按时间范围读取时超过结束时刻这么多秒后才停止
+LATE_SECONDS = 1.0
+
+# 未归为任何事件的输出行和引擎日志的事件类型
+OUTPUT = "output"
+APP = "app"
+
+# 结束一段SIP报文的行
+END_OF_MESSAGE = "--end msg--"
+# 一段报文最多缓存的行数，超过时不再等待Call-ID头
+MAX_MESSAGE_LINES = 200
+
+# 呼叫事件行中pjsua的呼叫序号，如 "Call 0 state changed to CONFIRMED"
+_CALL_INDEX = re.compile(r"\b[Cc]all (\d+)\b")
+# 最多同时跟踪的呼叫数，超过时丢弃最早的(如漏掉了断开事件的呼叫)
+MAX_CALLS = 64
+
+# 事件类型对应的级别，其他事件为INFO，未归类的行为DEBUG
+EVENT_LEVELS = {REGISTRATION_FAILED: ERROR, CALL_FAILED: ERROR}
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER PRIMARY KEY, offset INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS extents (call_id TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS extents_call ON extents (call_id, offset);
+"""
+
+
+class StructuredRecord:
+    """结构化日志的一行"""
+
+    __slots__ = ('mono', 'time', 'level', 'account', 'call_id', 'event', 'source', 'line')
+
+    def __init__(self, mono, timestamp, level, account, call_id, event, source, line):
+        self.mono = mono
+        self.time = timestamp
+        self.level = level
+        self.account = account
+        self.call_id = call_id
+        self.event = event
+        self.source = source
+        self.line = line
+
+    def to_json(self):
+        """编码为一行JSON"""
+        return json.dumps({"mono": round(self.mono, 6), "time": round(self.time, 6),
+                           "level": LEVEL_NAMES.get(self.level, self.level), "account": self.account,
+                           "call_id": self.call_id, "event": self.event, "source": self.source,
+                           "line": self.line}, ensure_ascii=False)
+
+
+class LineAnnotator:
+    """
+    为PJSUA输出行标注事件类型、级别和Call-ID(只在读取线程中使用)
+
+    SIP报文的行先缓存到读到Call-ID头(或报文结束)为止，因此输出的行可能比输入晚一批。
+    """
+
+    def __init__(self, classifier=default_classifier):
+        self.classifier = classifier
+        self.calls = {}             # 进行中呼叫的Call-ID -> pjsua呼叫序号(尚未对应时为None)
+        self._call_indexes = {}     # pjsua呼叫序号 -> Call-ID
+        self._message = None        # 正在读取的SIP报文中尚未写出的行，None表示不在报文中
+        self._message_method = None
+        self._message_call_id = None
+
+    def annotate(self, lines, mono, wall, account, hits=None):
+        """
+        标注一批输出行
+
+        Args:
+            lines: 同一次读取得到的输出行
+            mono: 读取时的单调时钟时间
+            wall: 读取时的系统时刻
+            account: 当前账号
+            hits: 事件流对这批行的分类结果，默认在此分类
+
+        Returns:
+            list: 可以写出的StructuredRecord
+        """
+        if hits is None:
+            hits = self.classifier.classify_batch(lines)
+        hits = {index: (kind, match) for index, kind, match in hits}
+        out = []
+        for index, line in enumerate(lines):
+            kind, match = hits.get(index, (None, None))
+            record = StructuredRecord(mono, wall, EVENT_LEVELS.get(kind, INFO if kind else DEBUG),
+                                      account, None, kind or OUTPUT, "pjsua", line.rstrip("\r\n"))
+            if kind == SIP_MESSAGE:
+                self._end_message(out)
+                self._message = [record]
+                self._message_method = match.group('sip_method') or match.group('sip_cseq_method')
+                continue
+            message = self._message
+            if message is not None:
+                record.call_id = self._message_call_id
+                message.append(record)
+                if self._message_call_id is None and (line.startswith("Call-ID:") or line.startswith("i:")):
+                    self._set_message_call_id(line.split(":", 1)[1].strip())
+                if END_OF_MESSAGE in line or len(message) >= MAX_MESSAGE_LINES:
+                    self._end_message(out)
+                elif self._message_call_id is not None:
+                    # 已知Call-ID，报文的剩余各行不必再缓存
+                    out.extend(message)
+                    message.clear()
+                continue
+            if self.calls:
+                record.call_id = self._line_call_id(line, kind)
+            out.append(record)
+        return out
+
+    def _line_call_id(self, line, kind):
+        """报文之外的一行所属呼叫的Call-ID，无法确定时为None"""
+        if kind is not None:
+            match = _CALL_INDEX.search(line)
+            if match is not None:
+                index = int(match.group(1))
+                call_id = self._call_indexes.get(index)
+                if call_id is None:
+                    unbound = [known for known, bound in self.calls.items() if bound is None]
+                    if len(unbound) == 1:
+                        call_id = unbound[0]
+                        self.calls[call_id] = index
+                        self._call_indexes[index] = call_id
+                if call_id is not None and kind == CALL_DISCONNECTED:
+                    self._end_call(call_id)
+                return call_id
+        for call_id in self.calls:
+            if call_id in line:
+                return call_id
+        return None
+
+    def _end_call(self, call_id):
+        """呼叫结束，不再跟踪"""
+        index = self.calls.pop(call_id, None)
+        if index is not None:
+            self._call_indexes.pop(index, None)
+
+    def _set_message_call_id(self, call_id):
+        """确定当前报文的Call-ID"""
+        for record in self._message:
+            record.call_id = call_id
+        self._message_call_id = call_id
+        if self._message_method == "INVITE" and call_id not in self.calls:
+            self.calls[call_id] = None
+            if len(self.calls) > MAX_CALLS:
+                self._end_call(next(iter(self.calls)))
+
+    def _end_message(self, out):
+        """报文结束，写出缓存的行"""
+        if self._message is not None:
+            out.extend(self._message)
+            self._message = None
+            self._message_method = None
+            self._message_call_id = None
+
+    def flush(self):
+        """输出结束时取出缓存的行"""
+        out = []
+        self._end_message(out)
+        return out
+
+
+class StructuredSink(LogSink):
+    """写入JSONL文件并维护偏移索引的LogSink"""
+
+    SIDECARS = (INDEX_SUFFIX,)
+
+    def __init__(self, directory, basename=BASENAME, bucket_seconds=BUCKET_SECONDS, **kwargs):
+        """
+        Args:
+            directory: 日志目录
+            basename: 文件名前缀
+            bucket_seconds: 索引的时间段长度(秒)
+            kwargs: 传给LogSink的其他参数；索引按未压缩的偏移记录，归档不压缩
+        """
+        self.bucket_seconds = bucket_seconds
+        self._index = None
+        self._last_bucket = None
+        kwargs.update(suffix=SUFFIX, compress=False, formatter=StructuredRecord.to_json)
+        super().__init__(directory, basename, **kwargs)
+
+    def _encode(self, records):
+        # 逐行编码，记下每行的长度供索引使用
+        lines = [(record.to_json() + "\n").encode("utf-8") for record in records]
+        self._lengths = [len(line) for line in lines]
+        return b"".join(lines)
+
+    def _after_write(self, records, offset):
+        """把这批行的时间段和Call-ID偏移写入索引"""
+        if self._index is None:
+            self._index = sqlite3.connect(self.path + INDEX_SUFFIX)
+            # 索引损坏或缺失时查询退回逐行扫描，不必每次提交都同步到磁盘
+            self._index.execute("PRAGMA synchronous=OFF")
+            self._index.executescript(INDEX_SCHEMA)
+            row = self._index.execute("SELECT MAX(bucket) FROM buckets").fetchone()
+            self._last_bucket = row[0]
+        buckets = []
+        extents = []
+        run = None  # 当前连续段: [call_id, 起始偏移, 长度]
+        for record, length in zip(records, self._lengths):
+            bucket = int(record.time // self.bucket_seconds)
+            if self._last_bucket is None or bucket > self._last_bucket:
+                buckets.append((bucket, offset))
+                self._last_bucket = bucket
+            call_id = record.call_id
+            if run is not None and run[0] == call_id:
+                run[2] += length
+            else:
+                if run is not None and run[0] is not None:
+                    extents.append(tuple(run))
+                run = [call_id, offset, length]
+            offset += length
+        if run is not None and run[0] is not None:
+            extents.append(tuple(run))
+        with self._index:
+            self._index.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?)", buckets)
+            self._index.executemany("INSERT INTO extents VALUES (?, ?, ?)", extents)
+
+    def _close_file(self):
+        super()._close_file()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+            self._last_bucket = None
+
+
+class StructuredLog:
+    """引擎使用的结构化日志: 在读取线程中标注输出行，交给StructuredSink写入"""
+
+    def __init__(self, sink, account=None):
+        """
+        Args:
+            sink: StructuredSink
+            account: 返回当前账号的函数，在读取线程中调用(SIPEngine会设置为自己的当前账号)
+        """
+        self.sink = sink
+        self.account = account or (lambda: None)
+        self.annotator = LineAnnotator()
+
+    def add_output(self, lines, hits=None, mono=None):
+        """
+        记录PJSUA输出的一批行(读取线程)
+
+        Args:
+            lines: 输出行
+            hits: 事件流对这批行的分类结果，默认重新分类
+            mono: 读取时的单调时钟时间，默认为现在
+        """
+        records = self.annotator.annotate(lines, mono if mono is not None else time.monotonic(),
+                                          time.time(), self.account(), hits)
+        if records:
+            self.sink.put_many(records)
+
+    def end_output(self):
+        """PJSUA输出结束"""
+        records = self.annotator.flush()
+        if records:
+            self.sink.put_many(records)
+
+    def add_message(self, message, level=None):
+        """记录一条引擎日志(任意线程)"""
+        if level is None:
+            level = guess_level(message)
+        self.sink.put(StructuredRecord(time.monotonic(), time.time(), level, self.account(),
+                                       None, APP, "app", message))
+
+    def tee(self, log):
+        """返回同时调用log并记录到本日志的日志函数"""
+        def log_both(message):
+            log(message)
+            self.add_message(message)
+        return log_both
+
+    def close(self):
+        self.end_output()
+        self.sink.close()
+
+    def report(self):
+        return self.sink.report()
+
+
+class StructuredLogReader:
+    """按索引查询结构化日志文件"""
+
+    def __init__(self, directory, basename=BASENAME, bucket_seconds=BUCKET_SECONDS):
+        self.directory = directory
+        self.basename = basename
+        self.bucket_seconds = bucket_seconds
+
+    def files(self):
+        """日志文件，从旧到新"""
+        current = os.path.join(self.directory, self.basename + SUFFIX)
+        prefix = self.basename + "_"
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith(prefix) and name.endswith(SUFFIX)]
+        paths.sort(key=lambda path: (os.path.getmtime(path), path))
+        if os.path.exists(current):
+            paths.append(current)
+        return paths
+
+    def _query_index(self, path, sql, params=()):
+        """
+        查询path的索引
+
+        Returns:
+            list: 查询结果，没有索引或索引损坏时返回None
+        """
+        if not os.path.exists(path + INDEX_SUFFIX):
+            return None
+        try:
+            index = sqlite3.connect(f"file:{path + INDEX_SUFFIX}?mode=ro", uri=True)
+            try:
+                return index.execute(sql, params).fetchall()
+            finally:
+                index.close()
+        except sqlite3.Error:
+            return None
+
+    def call(self, call_id):
+        """
+        取出一个呼叫(Call-ID)的全部行
+
+        Returns:
+            list: 各行解析后的dict，按写入顺序
+        """
+        rows = []
+        for path in self.files():
+            extents = self._query_index(path, "SELECT offset, length FROM extents WHERE call_id = ? "
+                                              "ORDER BY offset", (call_id,))
+            if extents is None:
+                rows.extend(self._scan(path, call_id))
+                continue
+            if not extents:
+                continue
+            with open(path, "rb") as f:
+                for offset, length in _merge_extents(extents):
+                    f.seek(offset)
+                    rows.extend(json.loads(line) for line in f.read(length).splitlines())
+        return rows
+
+    def between(self, start, end, limit=None):
+        """
+        取出系统时刻在 [start, end) 内的行
+
+        Args:
+            start: 起始时刻(time.time()秒)
+            end: 结束时刻
+            limit: 最多返回的行数
+
+        Returns:
+            list: 各行解析后的dict
+        """
+        rows = []
+        for path in self.files():
+            offset = 0
+            buckets = self._query_index(path, "SELECT bucket, offset FROM buckets ORDER BY bucket")
+            if buckets is not None:
+                if not buckets:
+                    continue
+                if buckets[0][0] * self.bucket_seconds >= end + LATE_SECONDS:
+                    continue
+                keys = [bucket for bucket, _ in buckets]
+                position = bisect_right(keys, int(start // self.bucket_seconds)) - 1
+                offset = buckets[max(0, position)][1]
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in _complete_lines(f):
+                    row = json.loads(line)
+                    if row["time"] >= end + LATE_SECONDS:
+                        break
+                    if row["time"] >= end:
+                        continue
+                    if row["time"] >= start:
+                        rows.append(row)
+                        if limit is not None and len(rows) >= limit:
+                            return rows
+        return rows
+
+    def scan(self, call_id):
+        """不使用索引，逐行扫描全部文件取出一个呼叫的行(用于比较和索引缺失时)"""
+        rows = []
+        for path in self.files():
+            rows.extend(self._scan(path, call_id))
+        return rows
+
+    def _scan(self, path, call_id):
+        """逐行扫描一个文件，只解析含有该Call-ID的行"""
+        needle = json.dumps(call_id, ensure_ascii=False).encode("utf-8")
+        rows = []
+        with open(path, "rb") as f:
+            for line in _complete_lines(f):
+                if needle in line:
+                    row = json.loads(line)
+                    if row.get("call_id") == call_id:
+                        rows.append(row)
+        return rows
+
+
+def _complete_lines(f):
+    """逐行读取，跳过写入线程尚未写完的最后一行"""
+    for line in f:
+        if line.endswith(b"\n"):
+            yield line
+
+
+def _merge_extents(extents):
+    """合并首尾相接的(偏移, 长度)段，减少读取次数"""
+    merged = []
+    for offset, length in extents:
+        if merged and merged[-1][0] + merged[-1][1] == offset:
+            merged[-1][1] += length
+        else:
+            merged.append([offset, length])
+    return merged
+
+
+def structured_log_from_config(config, log=print):
+    """
+    按配置创建结构化日志，structured_log为假时返回None
+
+    Args:
+        config: ConfigManager
+        log: 报告写入错误的函数
+
+    Returns:
+        StructuredLog: 或None
+    """
+    if not config.get('structured_log', False):
+        return None
+    try:
+        sink = StructuredSink(config.get('log_dir') or 'logs',
+                              max_bytes=int(config.get('structured_log_max_bytes', 256 * 1024 * 1024)),
+                              max_age=float(config.get('log_max_age', 24 * 3600)),
+                              backups=int(config.get('log_backups', BACKUPS)),
+                              queue_size=int(config.get('log_queue_size', QUEUE_SIZE)),
+                              policy=config.get('log_queue_policy', DROP),
+                              log=log)
+    except (OSError, ValueError) as e:
+        log(f"无法创建结构化日志: {str(e)}")
+        return None
+    return StructuredLog(sink)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PJSUA预热池
+
+预先启动若干个不带账号的pjsua进程(传输已绑定、媒体已初始化)作为备用。
+登录时从池中取出一个就绪的实例，只需以+a添加账号即可开始注册，省去
+pjsua --help检测、进程冷启动和初始化的时间。实例被取走后池会在稍后补充。
+
+备用实例的输出由它自己的读取线程持续读取(否则管道写满会阻塞pjsua)，
+被取走时同一个读取线程把后续输出转交给引擎，不丢失也不重复读取。
+"""
+
+import time
+import itertools
+import threading
+import subprocess
+
+from core.pipe_reader import PipeLineReader
+from core.pjsua_utils import USE_SHELL
+
+# pjsua完成初始化后输出的状态变化
+READY_MARKER = "STARTING --> RUNNING"
+# 早期版本的pjsua不输出状态变化，运行这么久(秒)仍未退出也视为就绪
+READY_FALLBACK = 3.0
+# 实例被取走或意外退出后，多久(毫秒)再补充，避免与正在进行的注册争抢CPU
+REFILL_DELAY = 1000
+# 连续这么多个实例未就绪就退出时停用预热池
+MAX_FAILURES = 3
+
+
+class WarmInstance:
+    """一个备用的pjsua进程"""
+
+    def __init__(self, pjsua_path, port, log_level, on_exit=None):
+        """
+        启动不带账号的pjsua进程
+
+        Args:
+            pjsua_path: pjsua可执行文件路径
+            port: 本地SIP端口
+            log_level: pjsua日志级别
+            on_exit: 未被取走前进程结束时在读取线程中调用 on_exit(实例)
+        """
+        self.pjsua_path = pjsua_path
+        self.port = port
+        self.log_level = log_level
+        self.on_exit = on_exit
+        self.started = time.monotonic()
+        self.ready_time = None
+        self.exited = False
+
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._target = None
+
+        self.cmd = [
+            pjsua_path,
+            f"--log-level={log_level}",
+            f"--app-log-level={log_level}",
+            f"--local-port={port}",
+        ]
+        self.process = subprocess.Popen(
+            self.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.PIPE,
+            bufsize=0,
+            shell=USE_SHELL
+        )
+        self.reader = PipeLineReader(self.process.stdout)
+        self._thread = threading.Thread(target=self._run, name=f"pjsua-warm-{port}", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_ready(self):
+        """是否已完成初始化，可以添加账号"""
+        if self.exited or self.process.poll() is not None:
+            return False
+        return self._ready.is_set() or time.monotonic() - self.started >= READY_FALLBACK
+
+    def adopt(self, target):
+        """
+        取走实例，此后的输出交给target处理
+
+        Args:
+            target: 在读取线程中调用 target(reader, batches)，batches为剩余输出批次的迭代器
+
+        Returns:
+            bool: 实例已退出时返回False
+        """
+        with self._lock:
+            if self.exited or self._target is not None:
+                return False
+            self._target = target
+        return True
+
+    def close(self):
+        """通过q命令请求未被取走的实例退出"""
+        if self.process.poll() is not None:
+            return
+        try:
+            self.process.stdin.write(b"q\n")
+            self.process.stdin.flush()
+        except Exception:
+            pass
+
+    def wait_or_terminate(self, timeout):
+        """等待实例退出，超时则终止"""
+        try:
+            self.process.wait(timeout=max(0.0, timeout))
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+
+    def _run(self):
+        """读取线程: 备用期间只检测就绪，被取走后转交剩余输出"""
+        batches = self.reader.batches()
+        for lines in batches:
+            with self._lock:
+                target = self._target
+            if target is not None:
+                target(self.reader, itertools.chain([lines], batches))
+                return
+            if not self._ready.is_set() and any(READY_MARKER in line for line in lines):
+                self.ready_time = time.monotonic() - self.started
+                self._ready.set()
+
+        with self._lock:
+            self.exited = True
+            target = self._target
+        if target is not None:
+            # 取走后立即退出: 交给引擎按进程结束处理
+            target(self.reader, iter(()))
+        elif self.on_exit:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            self.on_exit(self)
+
+
+class WarmPool:
+    """PJSUA预热池，只在引擎的调度线程中使用"""
+
+    def __init__(self, scheduler, ports, log=print):
+        """
+        初始化预热池
+
+        Args:
+            scheduler: 引擎的调度器
+            ports: 本地端口分配器(PortAllocator)
+            log: 日志函数
+        """
+        self.scheduler = scheduler
+        self.ports = ports
+        self.log = log
+        self.size = 0
+        self.pjsua_path = None
+        self.log_level = None
+        self.instances = []
+        self.failures = 0
+        self._refill_id = None
+
+    def configure(self, pjsua_path, size, log_level):
+        """
+        设置池的大小和实例参数，参数变化时重建所有实例
+
+        Args:
+            pjsua_path: pjsua可执行文件路径
+            size: 保持的备用实例数，0为停用
+            log_level: 实例的pjsua日志级别
+        """
+        if (pjsua_path, log_level) != (self.pjsua_path, self.log_level):
+            self._close_instances()
+        self.pjsua_path = pjsua_path
+        self.log_level = log_level
+        self.size = max(0, int(size))
+        self.failures = 0
+        if len(self.instances) > self.size:
+            surplus = self.instances[self.size:]
+            del self.instances[self.size:]
+            self._stop(surplus)
+        self.refill()
+
+    def retarget(self, pjsua_path, log_level):
+        """
+        登录参数与池中实例不同时，改为准备新参数的实例
+
+        Args:
+            pjsua_path: 登录使用的pjsua路径
+            log_level: 登录使用的日志级别
+        """
+        if not self.size or (pjsua_path, log_level) == (self.pjsua_path, self.log_level):
+            return
+        self._close_instances()
+        self.pjsua_path = pjsua_path
+        self.log_level = log_level
+        self.failures = 0
+        self._schedule_refill()
+
+    def take(self, pjsua_path, log_level):
+        """
+        取出一个就绪的实例，实例的端口随之交给调用方释放
+
+        Args:
+            pjsua_path: 登录使用的pjsua路径
+            log_level: 登录需要的日志级别
+
+        Returns:
+            WarmInstance: 就绪的实例，没有匹配的就绪实例时返回None
+        """
+        if pjsua_path != self.pjsua_path or log_level != self.log_level:
+            return None
+        for instance in self.instances:
+            if instance.is_ready:
+                self.instances.remove(instance)
+                self.failures = 0
+                self._schedule_refill()
+                return instance
+        return None
+
+    def refill(self):
+        """补充实例到设定的数量"""
+        self._refill_id = None
+        if not self.pjsua_path or self.failures >= MAX_FAILURES:
+            return
+        while len(self.instances) < self.size:
+            port = self.ports.reserve()
+            if port is None:
+                return
+            self.ports.handoff(port)
+            try:
+                instance = WarmInstance(self.pjsua_path, port, self.log_level,
+                                        on_exit=self._post_exit)
+            except Exception as e:
+                self.ports.release(port)
+                self.failures += 1
+                self.log(f"启动预热PJSUA失败: {str(e)}")
+                return
+            self.instances.append(instance)
+            self.log(f"已启动预热PJSUA (端口 {port})")
+
+    def close(self):
+        """结束所有备用实例"""
+        self.size = 0
+        if self._refill_id is not None:
+            self.scheduler.after_cancel(self._refill_id)
+            self._refill_id = None
+        self._close_instances()
+
+    def report(self):
+        """返回池的状态"""
+        ready = sum(1 for instance in self.instances if instance.is_ready)
+        return f"预热PJSUA: {ready}/{self.size} 就绪"
+
+    def _close_instances(self):
+        instances, self.instances = self.instances, []
+        self._stop(instances)
+
+    def _stop(self, instances):
+        """请求实例退出，最多共等待0.5秒"""
+        for instance in instances:
+            instance.close()
+        deadline = time.monotonic() + 0.5
+        for instance in instances:
+            instance.wait_or_terminate(deadline - time.monotonic())
+            self.ports.release(instance.port)
+
+    def _schedule_refill(self):
+        if self._refill_id is None and self.size:
+            self._refill_id = self.scheduler.after(REFILL_DELAY, self.refill)
+
+    def _post_exit(self, instance):
+        """读取线程报告备用实例退出"""
+        self.scheduler.call_soon(self._on_instance_exited, instance)
+
+    def _on_instance_exited(self, instance):
+        """备用实例意外退出，稍后补充；连续失败时停用"""
+        if instance not in self.instances:
+            return
+        self.instances.remove(instance)
+        self.ports.release(instance.port)
+        if instance.ready_time is None:
+            self.failures += 1
+        self.log(f"预热PJSUA已退出 (端口 {instance.port}, 返回码 {instance.process.poll()})")
+        if self.failures >= MAX_FAILURES:
+            self.log("预热PJSUA多次启动失败，已停用预热池")
+            return
+        self._schedule_refill()
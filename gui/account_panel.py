@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+账号面板
+
+显示与主账号注册在同一个PJSUA进程中的附加账号及其状态，
+可添加、删除账号，查看PJSUA进程的资源占用、登录和呼叫的时延统计以及通话记录。
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, simpledialog
+
+from core.connection_state import STATE_LABELS
+
+class AccountPanel:
+    """附加账号面板 - iOS风格"""
+
+    def __init__(self, parent, client):
+        """初始化账号面板"""
+        self.client = client
+        # 列表中各行对应的账号键
+        self.keys = []
+
+        account_section = ttk.LabelFrame(parent, text="附加账号", padding=10)
+        account_section.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        # 账号列表
+        list_frame = ttk.Frame(account_section)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.account_list = tk.Listbox(list_frame, height=5, font=('SF Pro Display', 11),
+                                       activestyle='none', borderwidth=0)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.account_list.yview)
+        self.account_list.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.account_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # 用户名行
+        username_row = ttk.Frame(account_section)
+        username_row.pack(fill=tk.X, pady=(10, 5))
+
+        ttk.Label(
+            username_row,
+            text="用户名:",
+            font=('SF Pro Display', 11),
+            width=12,
+            foreground="#8E8E93"
+        ).pack(side=tk.LEFT, padx=(0, 5))
+
+        self.username_entry = ttk.Entry(username_row)
+        self.username_entry.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # 密码行
+        password_row = ttk.Frame(account_section)
+        password_row.pack(fill=tk.X, pady=5)
+
+        ttk.Label(
+            password_row,
+            text="密码:",
+            font=('SF Pro Display', 11),
+            width=12,
+            foreground="#8E8E93"
+        ).pack(side=tk.LEFT, padx=(0, 5))
+
+        self.password_entry = ttk.Entry(password_row, show="*")
+        self.password_entry.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # 按钮行
+        button_frame = ttk.Frame(account_section, padding=(0, 5, 0, 0))
+        button_frame.pack(fill=tk.X)
+
+        ttk.Button(button_frame, text="添加", command=self.add_account).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(button_frame, text="删除", command=self.remove_account).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(button_frame, text="资源占用", command=self.show_resources).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+
+        # 时延统计行
+        metrics_frame = ttk.Frame(account_section, padding=(0, 5, 0, 0))
+        metrics_frame.pack(fill=tk.X)
+
+        ttk.Button(metrics_frame, text="时延统计", command=self.show_metrics).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(metrics_frame, text="导出时延", command=self.export_metrics).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(metrics_frame, text="通话记录", command=self.show_call_records).pack(
+            side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+
+    def update_accounts(self, accounts):
+        """
+        刷新账号列表
+
+        Args:
+            accounts: [(键, 状态), ...]
+        """
+        selected = self.selected_key()
+        self.keys = [key for key, _ in accounts]
+        self.account_list.delete(0, tk.END)
+        for key, state in accounts:
+            self.account_list.insert(tk.END, f"{key}    {STATE_LABELS.get(state, state)}")
+        if selected in self.keys:
+            self.account_list.selection_set(self.keys.index(selected))
+
+    def selected_key(self):
+        """当前选中的账号键，未选中时返回None"""
+        selection = self.account_list.curselection()
+        if not selection or selection[0] >= len(self.keys):
+            return None
+        return self.keys[selection[0]]
+
+    def add_account(self):
+        """添加附加账号"""
+        username = self.username_entry.get().strip()
+        password = self.password_entry.get()
+        self.client.sip_manager.add_account(username, password)
+        self.username_entry.delete(0, tk.END)
+        self.password_entry.delete(0, tk.END)
+
+    def remove_account(self):
+        """删除选中的账号"""
+        key = self.selected_key()
+        if key is None:
+            messagebox.showinfo("删除账号", "请先选择要删除的账号")
+            return
+        self.client.sip_manager.remove_account(key)
+
+    def show_resources(self):
+        """在日志中记录PJSUA进程的资源占用"""
+        self.client.log(f"PJSUA资源占用: {self.client.sip_manager.resource_report()}")
+
+    def show_metrics(self):
+        """在日志中记录注册耗时、拨号后延迟等的百分位数"""
+        self.client.log(f"时延统计: {self.client.sip_manager.metrics_report()}")
+
+    def show_call_records(self):
+        """按号码前缀查询通话详单并记录到日志，不输入号码时显示最近的记录"""
+        number = simpledialog.askstring("通话记录", "号码(留空显示全部):", parent=self.account_list)
+        if number is None:
+            return  # 用户取消操作
+        records = self.client.sip_manager.query_cdr(number.strip() or None)
+        if not records:
+            self.client.log("没有符合条件的通话记录")
+            return
+        self.client.log(f"最近{len(records)}条通话记录:")
+        for record in records:
+            self.client.log(f"  {record.summary()}")
+
+    def export_metrics(self):
+        """导出时延记录和直方图到JSON或CSV文件"""
+        import datetime
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON文件", "*.json"), ("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            initialfile=f"sip_client_latency_{timestamp}.json"
+        )
+        if not filepath:
+            return  # 用户取消操作
+        try:
+            self.client.sip_manager.export_metrics(filepath)
+            self.client.log(f"时延记录已导出到: {filepath}")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出时延记录时出错: {str(e)}")
@@ -21,6 +21,20 @@ class DialPanel:
         dial_frame = ttk.Frame(parent, padding=10)
         dial_frame.pack(fill=tk.BOTH, expand=True)
         
+        # 呼出账号 - 只有一个账号时默认使用主账号
+        account_row = ttk.Frame(dial_frame)
+        account_row.pack(fill=tk.X, padx=30, pady=(5, 0))
+        
+        ttk.Label(
+            account_row, 
+            text="呼出账号:", 
+            font=('SF Pro Display', 11),
+            foreground="#8E8E93"
+        ).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.account_combo = ttk.Combobox(account_row, state='readonly')
+        self.account_combo.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+        
         # 拨号输入框 - 大字体，居中显示，iOS风格
         dial_input_frame = ttk.Frame(dial_frame)
         dial_input_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -148,6 +162,17 @@ class DialPanel:
         """清除拨号输入框"""
         self.dial_entry.delete(0, tk.END)
         
+    def set_accounts(self, keys):
+        """更新可选的呼出账号，保留仍存在的选择"""
+        current = self.account_combo.get()
+        self.account_combo['values'] = keys
+        if current not in keys:
+            self.account_combo.set(keys[0] if keys else "")
+        
+    def get_account(self):
+        """选中的呼出账号键，未选择时返回None(使用主账号)"""
+        return self.account_combo.get() or None
+        
     def make_call(self):
         """拨打电话"""
         self.client.sip_manager.make_call()
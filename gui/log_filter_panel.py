@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志筛选面板
+
+日志页顶部的筛选栏: 关键字输入框、级别和事件类型下拉框、"只显示匹配"开关。
+输入停顿后在内存中的全部日志中检索，检索在Tk主循环中分帧执行，新的输入
+会取消未完成的检索。只高亮时直接给已显示的行加标签，检索只用于统计匹配的行数。
+"""
+
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from core import pjsua_parser
+from utils.log_store import INFO, WARNING, ERROR
+from utils.log_index import LogFilter, APP_MESSAGES, PJSUA_OUTPUT
+
+# 下拉框的选项: (显示文本, 取值)
+LEVEL_CHOICES = (
+    ("全部级别", None),
+    ("信息及以上", INFO),
+    ("警告及以上", WARNING),
+    ("错误", ERROR),
+)
+
+EVENT_CHOICES = (
+    ("全部事件", None),
+    ("程序消息", APP_MESSAGES),
+    ("PJSUA输出", PJSUA_OUTPUT),
+    ("SIP消息", pjsua_parser.SIP_MESSAGE),
+    ("注册成功", pjsua_parser.REGISTERED),
+    ("注册失败", pjsua_parser.REGISTRATION_FAILED),
+    ("注销", pjsua_parser.UNREGISTERED),
+    ("来电", pjsua_parser.INCOMING_CALL),
+    ("呼叫状态", pjsua_parser.CALL_STATE),
+    ("振铃", pjsua_parser.RINGING),
+    ("通话建立", pjsua_parser.CALL_CONFIRMED),
+    ("通话结束", pjsua_parser.CALL_DISCONNECTED),
+    ("呼叫失败", pjsua_parser.CALL_FAILED),
+)
+
+
+class LogFilterPanel:
+    """日志筛选栏"""
+
+    # 输入停顿多久后开始检索(毫秒)
+    DEBOUNCE = 150
+    # 检索每帧的时间上限(秒)和帧间隔(毫秒)
+    STEP_BUDGET = 0.008
+    STEP_INTERVAL = 15
+
+    def __init__(self, parent, client, log_text):
+        """
+        创建筛选栏
+
+        Args:
+            parent: 父控件
+            client: SIP客户端实例
+            log_text: 日志文本控件
+        """
+        self.client = client
+        self.logger = client.logger
+        self.log_text = log_text
+        self._debounce_id = None
+        self._step_id = None
+        self._search = None
+
+        log_text.tag_configure("match", background="#ffe066")
+        log_text.tag_configure("current_match", background="#ff9f1a")
+
+        self.frame = frame = ttk.Frame(parent)
+        frame.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(frame, text="筛选:").pack(side=tk.LEFT)
+        self.text_var = tk.StringVar()
+        entry = ttk.Entry(frame, textvariable=self.text_var, width=30)
+        entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        entry.bind("<Return>", lambda event: self.next_match())
+        entry.bind("<Escape>", lambda event: self.text_var.set(""))
+
+        self.level_combo = ttk.Combobox(frame, state='readonly', width=10,
+                                        values=[label for label, _ in LEVEL_CHOICES])
+        self.level_combo.current(0)
+        self.level_combo.pack(side=tk.LEFT, padx=5)
+
+        self.event_combo = ttk.Combobox(frame, state='readonly', width=10,
+                                        values=[label for label, _ in EVENT_CHOICES])
+        self.event_combo.current(0)
+        self.event_combo.pack(side=tk.LEFT, padx=5)
+
+        self.view_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="只显示匹配", variable=self.view_var,
+                        command=self.apply).pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(frame, text="上一个", width=6, command=self.previous_match).pack(side=tk.LEFT)
+        ttk.Button(frame, text="下一个", width=6, command=self.next_match).pack(side=tk.LEFT, padx=(2, 5))
+
+        self.count_label = ttk.Label(frame, text="", foreground="#8E8E93", width=14)
+        self.count_label.pack(side=tk.LEFT)
+
+        self.text_var.trace_add("write", lambda *args: self.schedule())
+        self.level_combo.bind("<<ComboboxSelected>>", lambda event: self.apply())
+        self.event_combo.bind("<<ComboboxSelected>>", lambda event: self.apply())
+
+    def current_filter(self):
+        """按输入框和下拉框的当前值创建筛选条件"""
+        return LogFilter(self.text_var.get(),
+                         LEVEL_CHOICES[self.level_combo.current()][1],
+                         EVENT_CHOICES[self.event_combo.current()][1])
+
+    def schedule(self):
+        """输入变化后等待停顿再应用，连续输入时只执行最后一次"""
+        if self._debounce_id is not None:
+            self.log_text.after_cancel(self._debounce_id)
+        self._debounce_id = self.log_text.after(self.DEBOUNCE, self.apply)
+
+    def apply(self):
+        """应用当前的筛选条件，取消未完成的检索并开始新的检索"""
+        self._debounce_id = None
+        self._cancel()
+        log_filter = self.current_filter()
+        view = self.view_var.get() and bool(log_filter)
+        self.logger.set_filter(log_filter, view)
+        if not log_filter:
+            self.count_label.config(text="")
+            return
+        self.count_label.config(text="检索中...")
+        self._search = self.logger.search(log_filter)
+        self._step()
+
+    def _cancel(self):
+        """取消未完成的检索"""
+        if self._step_id is not None:
+            self.log_text.after_cancel(self._step_id)
+            self._step_id = None
+        self._search = None
+
+    def _step(self):
+        """执行一帧检索，未完成时在下一帧继续"""
+        self._step_id = None
+        search = self._search
+        if search is None:
+            return
+        if not search.step(time.perf_counter() + self.STEP_BUDGET):
+            self._step_id = self.log_text.after(self.STEP_INTERVAL, self._step)
+            return
+        self._search = None
+        if self.logger.view_filter is search.filter:
+            self.logger.show_results(search)
+        self.count_label.config(text=f"匹配 {len(search.results)} 行")
+
+    def next_match(self):
+        """选中光标之后的下一处高亮"""
+        self._move(self.log_text.tag_nextrange, "current_match.last", "1.0")
+
+    def previous_match(self):
+        """选中光标之前的上一处高亮"""
+        self._move(self.log_text.tag_prevrange, "current_match.first", "end")
+
+    def _move(self, find, after, wrap):
+        """从当前选中处(没有时从wrap处)查找相邻的高亮并滚动到该处"""
+        text = self.log_text
+        start = after if text.tag_ranges("current_match") else wrap
+        found = find("match", start) or find("match", wrap)
+        text.tag_remove("current_match", "1.0", "end")
+        if found:
+            text.tag_add("current_match", *found)
+            text.see(found[0])
@@ -39,8 +39,8 @@ class SettingsPanel:
         
         # 创建PJSUA路径输入框
         self.pjsua_path_entry = ttk.Entry(path_row)
-        # 自动查找可能的pjsua路径
-        default_path = client.pjsua_utils.find_pjsua_path()
+        # 使用配置中的路径，不可用时启动后在后台查找
+        default_path = client.config_manager.get('pjsua_path', 'pjsua.exe')
         self.pjsua_path_entry.insert(0, default_path)
         self.pjsua_path_entry.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
         
@@ -60,7 +60,8 @@ class SettingsPanel:
         port_frame.pack(side=tk.RIGHT, fill=tk.X, expand=True)
         
         self.port_entry = ttk.Entry(port_frame, width=10)
-        default_port = client.pjsua_utils.find_available_port(5070)
+        # 端口在启动后由update_random_port分配，这里只显示配置中的值
+        default_port = client.config_manager.get('port', 5070)
         self.port_entry.insert(0, str(default_port))
         self.port_entry.pack(side=tk.LEFT, padx=5)
         
@@ -86,6 +87,32 @@ class SettingsPanel:
         )
         self.auto_login_check.pack(side=tk.LEFT)
         
+        # 精简日志选项
+        log_level_row = ttk.Frame(pjsua_section)
+        log_level_row.pack(fill=tk.X, pady=8)
+        
+        self.adaptive_log_var = tk.BooleanVar(value=client.config_manager.get('adaptive_log_level', False))
+        self.adaptive_log_check = ttk.Checkbutton(
+            log_level_row, 
+            text="精简PJSUA日志 (拨号失败或查看日志时自动提高级别)", 
+            variable=self.adaptive_log_var,
+            command=self.toggle_adaptive_log_level
+        )
+        self.adaptive_log_check.pack(side=tk.LEFT)
+        
+        # 预热PJSUA选项
+        warm_pool_row = ttk.Frame(pjsua_section)
+        warm_pool_row.pack(fill=tk.X, pady=8)
+        
+        self.warm_pool_var = tk.BooleanVar(value=bool(client.config_manager.get('warm_pool_size', 0)))
+        self.warm_pool_check = ttk.Checkbutton(
+            warm_pool_row, 
+            text="预热PJSUA (后台保持一个备用进程，加快登录)", 
+            variable=self.warm_pool_var,
+            command=self.toggle_warm_pool
+        )
+        self.warm_pool_check.pack(side=tk.LEFT)
+        
         # 工具按钮区域
         tools_section = ttk.LabelFrame(main_container, text="工具", padding=15)
         tools_section.pack(fill=tk.X, pady=10)
@@ -137,6 +164,22 @@ class SettingsPanel:
         self.client.config_manager.save_config()
         self.client.log(f"自动登录已{'启用' if auto_login else '禁用'}")
     
+    def toggle_adaptive_log_level(self):
+        """切换精简日志模式，下次登录时生效"""
+        adaptive = self.adaptive_log_var.get()
+        self.client.config_manager.set('adaptive_log_level', adaptive)
+        self.client.config_manager.save_config()
+        self.client.log(f"精简PJSUA日志已{'启用' if adaptive else '禁用'}，下次登录时生效")
+    
+    def toggle_warm_pool(self):
+        """切换预热PJSUA"""
+        enabled = self.warm_pool_var.get()
+        self.client.config_manager.set('warm_pool_size', 1 if enabled else 0)
+        self.client.config_manager.save_config()
+        if hasattr(self.client, 'sip_manager'):
+            self.client.sip_manager.configure_warm_pool()
+        self.client.log(f"预热PJSUA已{'启用' if enabled else '禁用'}")
+    
     def save_settings(self):
         """保存当前设置"""
         # 保存PJSUA路径和端口
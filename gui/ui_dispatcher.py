@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+界面更新调度器
+
+收集来自读取线程和UI线程的界面状态变化，每帧在Tk主循环中统一应用一次。
+同一控件在一帧内的多次更新只保留最后一次，值未变化的控件不会被重绘。
+"""
+
+import threading
+import itertools
+
+# UIManager方法 -> 所控制的控件槽位；未列出的方法以方法名作为槽位
+METHOD_SLOTS = {
+    'enable_dial_button': 'dial_button',
+    'disable_dial_button': 'dial_button',
+    'enable_hangup_button': 'hangup_button',
+    'disable_hangup_button': 'hangup_button',
+    'enable_disconnect_button': 'disconnect_button',
+    'disable_disconnect_button': 'disconnect_button',
+    'enable_login_button': 'login_button',
+    'disable_login_button': 'login_button',
+    'reset_login_button': 'login_button',
+    'set_login_button_connected': 'login_button',
+}
+
+
+class UIDispatcher:
+    """按帧合并界面更新的调度器"""
+
+    def __init__(self, root, ui_manager, interval=30):
+        """
+        初始化调度器
+
+        Args:
+            root: Tkinter根窗口
+            ui_manager: UI管理器实例
+            interval: 刷新间隔(毫秒)
+        """
+        self.root = root
+        self.ui_manager = ui_manager
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._pending = {}  # 槽位 -> (序号, 方法名, 参数)
+        self._calls = []    # [(序号, 回调, 参数), ...]
+        self._running_seq = None  # 正在执行的回调的序号
+        self._after_id = None
+
+        # 统计信息
+        self.coalesced = 0  # 被同一帧内后续更新覆盖的次数
+        self.unchanged = 0  # 值未变化而未触碰控件的次数
+        self.applied = 0    # 实际更新控件的次数
+        self.frames = 0     # 执行过更新的帧数
+
+    def update(self, method, *args):
+        """
+        提交一次控件更新，可在任意线程调用
+
+        Args:
+            method: UIManager上的更新方法名，如 'update_status'
+            *args: 传给该方法的参数
+        """
+        slot = METHOD_SLOTS.get(method, method)
+        with self._lock:
+            # 在回调中发起的更新沿用该回调的序号，保证与读取线程的更新按提交顺序生效
+            seq = self._running_seq if self._running_seq is not None and \
+                threading.current_thread() is threading.main_thread() else next(self._seq)
+            previous = self._pending.get(slot)
+            if previous is not None:
+                self.coalesced += 1
+                if previous[0] > seq:
+                    return
+            self._pending[slot] = (seq, method, args)
+
+    def call(self, func, *args):
+        """
+        在下一帧于UI线程中执行回调，可在任意线程调用
+
+        Args:
+            func: 回调函数
+            *args: 回调参数
+        """
+        with self._lock:
+            self._calls.append((next(self._seq), func, args))
+
+    def pending_count(self):
+        """待处理的更新和回调数量"""
+        with self._lock:
+            return len(self._pending) + len(self._calls)
+
+    def start(self):
+        """开始按帧刷新"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+    def stop(self):
+        """停止刷新"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def flush(self):
+        """立即在UI线程中应用所有待处理的回调和更新"""
+        with self._lock:
+            calls, self._calls = self._calls, []
+        if not calls and not self._pending:
+            return
+
+        for seq, func, args in calls:
+            self._running_seq = seq
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"界面回调执行失败: {e}")
+        self._running_seq = None
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for seq, method, args in sorted(pending.values(), key=lambda item: item[0]):
+            try:
+                # UIManager的更新方法在值未变化时返回False
+                if getattr(self.ui_manager, method)(*args) is False:
+                    self.unchanged += 1
+                else:
+                    self.applied += 1
+            except Exception as e:
+                print(f"界面更新失败 ({method}): {e}")
+        self.frames += 1
+
+    def _tick(self):
+        """每帧执行一次"""
+        try:
+            self.flush()
+        finally:
+            self._after_id = self.root.after(self.interval, self._tick)
@@ -12,6 +12,9 @@ from tkinter import ttk, scrolledtext, filedialog, messagebox
 from gui.status_panel import StatusPanel
 from gui.dial_panel import DialPanel
 from gui.settings_panel import SettingsPanel
+from gui.account_panel import AccountPanel
+from gui.log_filter_panel import LogFilterPanel
+from gui.ui_dispatcher import UIDispatcher
 
 class UIManager:
     """管理应用程序的用户界面"""
@@ -27,6 +30,9 @@ class UIManager:
         self.root = root
         self.client = client
         
+        # 各控件当前显示的值，用于跳过未变化的更新
+        self._widget_state = {}
+        
         # 设置主题和样式
         self.setup_styles()
         
@@ -71,6 +77,9 @@ class UIManager:
         # 创建登录面板 (放在登录标签页)
         self.server_panel = self.create_server_panel(self.login_tab)
         
+        # 附加账号面板 (放在登录面板下方)
+        self.account_panel = AccountPanel(self.login_tab, self.client)
+        
         # 初始化拨号面板
         self.dial_panel = DialPanel(self.dial_tab, self.client)
         
@@ -83,6 +92,9 @@ class UIManager:
         # 创建日志面板 (放在日志标签页)
         self.log_panel = self.create_log_panel(self.log_tab)
         
+        # 切换到日志页时按需提高PJSUA日志级别
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        
         # 初始化状态
         self.update_status("未连接", "red")
         self.update_account_info("无", "gray")
@@ -90,6 +102,10 @@ class UIManager:
         self.disable_dial_button()
         self.disable_hangup_button()
         
+        # 界面更新调度器 - 后台线程的状态变化经由它按帧合并后应用
+        self.dispatcher = UIDispatcher(self.root, self)
+        self.dispatcher.start()
+        
     def setup_styles(self):
         """设置样式和主题 - iOS风格"""
         self.style = ttk.Style()
@@ -270,6 +286,11 @@ class UIManager:
         
         return server_frame
         
+    def on_tab_changed(self, event=None):
+        """标签页切换处理"""
+        if self.notebook.select() == str(self.log_tab) and hasattr(self.client, 'sip_manager'):
+            self.client.sip_manager.escalate_log_level("查看日志")
+        
     def create_log_panel(self, parent):
         """创建日志显示面板 - 放在日志标签页"""
         log_frame = ttk.Frame(parent, padding=10)
@@ -312,6 +333,10 @@ class UIManager:
         # 设置日志控件到logger
         self.client.logger.set_log_widget(self.log_text)
         
+        # 筛选栏放在控制区域之下、日志区域之上
+        self.log_filter_panel = LogFilterPanel(log_frame, self.client, self.log_text)
+        self.log_filter_panel.frame.pack_configure(before=log_container)
+        
         return log_frame
         
     def create_status_bar(self, parent):
@@ -400,59 +425,104 @@ class UIManager:
         
         return status_bar
         
-    # 状态更新相关方法
+    # 状态更新相关方法 - 值未变化时不触碰控件并返回False
+    def _state_changed(self, slot, value):
+        """记录控件的新值，返回是否与当前显示的值不同"""
+        if self._widget_state.get(slot) == value:
+            return False
+        self._widget_state[slot] = value
+        return True
+        
     def update_status(self, status_text, color):
         """更新连接状态"""
+        if not self._state_changed('status', (status_text, color)):
+            return False
         self.status_label.config(text=status_text, foreground=color)
         # 更新状态指示器颜色
         if hasattr(self, 'status_indicator'):
             self.status_label.master.winfo_children()[0].itemconfig(self.status_indicator, fill=color)
+        return True
         
     def update_account_info(self, account_text, color):
         """更新账号信息"""
+        if not self._state_changed('account_info', (account_text, color)):
+            return False
         self.account_label.config(text=account_text, foreground=color)
+        return True
         
     def update_call_status(self, status_text, color):
         """更新通话状态"""
+        if not self._state_changed('call_status', (status_text, color)):
+            return False
         self.call_status_label.config(text=status_text, foreground=color)
+        return True
         
     def update_call_time(self, time_text, color="blue"):
         """更新通话时间"""
+        if not self._state_changed('call_time', (time_text, color)):
+            return False
         self.call_time_label.config(text=time_text, foreground=color)
+        return True
+        
+    def _set_button_enabled(self, slot, button, enabled):
+        """设置按钮是否可用"""
+        if not self._state_changed(slot, enabled):
+            return False
+        button.state(['!disabled'] if enabled else ['disabled'])
+        return True
         
     def enable_dial_button(self):
         """启用拨号按钮"""
-        self.dial_panel.dial_button.state(['!disabled'])
+        return self._set_button_enabled('dial_button', self.dial_panel.dial_button, True)
         
     def disable_dial_button(self):
         """禁用拨号按钮"""
-        self.dial_panel.dial_button.state(['disabled'])
+        return self._set_button_enabled('dial_button', self.dial_panel.dial_button, False)
         
     def enable_hangup_button(self):
         """启用挂断按钮"""
-        self.dial_panel.hangup_button.state(['!disabled'])
+        return self._set_button_enabled('hangup_button', self.dial_panel.hangup_button, True)
         
     def disable_hangup_button(self):
         """禁用挂断按钮"""
-        self.dial_panel.hangup_button.state(['disabled'])
+        return self._set_button_enabled('hangup_button', self.dial_panel.hangup_button, False)
+        
+    def _set_login_button(self, text, enabled):
+        """设置登录按钮的文字和可用状态"""
+        if not self._state_changed('login_button', (text, enabled)):
+            return False
+        if text is not None:
+            self.login_button.config(text=text)
+        self.login_button.state(['!disabled'] if enabled else ['disabled'])
+        return True
         
     def enable_login_button(self):
         """启用登录按钮"""
-        self.login_button.state(['!disabled'])
+        return self._set_login_button(None, True)
         
     def disable_login_button(self):
         """禁用登录按钮"""
-        self.login_button.state(['disabled'])
+        return self._set_login_button(None, False)
         
     def set_login_button_connected(self):
         """设置登录按钮为已连接状态"""
-        self.login_button.config(text="已连接")
-        self.login_button.state(['disabled'])
+        return self._set_login_button("已连接", False)
         
     def reset_login_button(self):
         """重置登录按钮为初始状态"""
-        self.login_button.config(text="登录")
-        self.login_button.state(['!disabled'])
+        return self._set_login_button("登录", True)
+        
+    def update_accounts(self, accounts):
+        """更新账号列表和呼出账号选项"""
+        if not self._state_changed('accounts', tuple(accounts)):
+            return False
+        self.account_panel.update_accounts(accounts)
+        self.dial_panel.set_accounts([key for key, _ in accounts])
+        return True
+        
+    def get_call_account(self):
+        """获取呼出账号的键"""
+        return self.dial_panel.get_account()
         
     def get_server_info(self):
         """获取服务器信息"""
@@ -474,6 +544,11 @@ class UIManager:
         """获取PJSUA路径"""
         return self.settings_panel.pjsua_path_entry.get()
         
+    def set_pjsua_path(self, path):
+        """设置PJSUA路径"""
+        self.settings_panel.pjsua_path_entry.delete(0, tk.END)
+        self.settings_panel.pjsua_path_entry.insert(0, path)
+        
     def download_log(self):
         """下载日志到文件"""
         try:
@@ -492,21 +567,21 @@ class UIManager:
             if not filepath:
                 return  # 用户取消操作
                 
-            # 保存日志内容到文件
-            log_content = self.log_text.get(1.0, tk.END)
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(log_content)
-                
-            messagebox.showinfo("成功", f"日志已保存到: {filepath}")
+            # 日志控件只保留最近的部分，完整日志在后台从日志文件导出
+            def on_exported(error):
+                if error is None:
+                    self.dispatcher.call(messagebox.showinfo, "成功", f"日志已保存到: {filepath}")
+                else:
+                    self.dispatcher.call(messagebox.showerror, "错误", f"保存日志时出错: {str(error)}")
+
+            self.client.logger.export(filepath, on_exported)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存日志时出错: {str(e)}")
             
     def clear_log(self):
         """清除日志内容"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.client.logger.clear()
         self.client.logger.log("日志已清除")
         
     def disconnect_sip(self):
@@ -528,8 +603,8 @@ class UIManager:
             
     def enable_disconnect_button(self):
         """启用断开连接按钮"""
-        self.disconnect_button.state(['!disabled'])
+        return self._set_button_enabled('disconnect_button', self.disconnect_button, True)
         
     def disable_disconnect_button(self):
         """禁用断开连接按钮"""
-        self.disconnect_button.state(['disabled']) 
\ No newline at end of file
+        return self._set_button_enabled('disconnect_button', self.disconnect_button, False) 
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+无界面SIP客户端
+
+在没有显示器的服务器上运行SIP引擎：保持账号注册，
+PJSUA意外退出时自动重新登录，所有事件输出到标准输出。
+"""
+
+import os
+import signal
+import threading
+
+from core.sip_engine import SIPEngine, SIPEngineListener
+from core.metrics_server import MetricsServer
+from core.cdr_store import CdrStore
+from core.structured_log import structured_log_from_config
+from core.pjsua_utils import PJSUAUtils
+from utils.logger import ConsoleLogger
+from utils.config_manager import ConfigManager
+
+class HeadlessClient(SIPEngineListener):
+    """无界面SIP客户端"""
+
+    # PJSUA意外退出后重新登录的延迟(毫秒)
+    RELOGIN_DELAY = 5000
+
+    def __init__(self, args):
+        """
+        初始化无界面客户端
+
+        Args:
+            args: 命令行参数，未指定的项从配置文件读取
+        """
+        self.config_manager = ConfigManager(args.config)
+        self.logger = ConsoleLogger()
+        self.pjsua_utils = PJSUAUtils(self.logger)
+        self.show_output = args.verbose
+
+        config = self.config_manager
+        pjsua_path = args.pjsua or config.get('pjsua_path', 'pjsua')
+        if not os.path.exists(pjsua_path):
+            pjsua_path = self.pjsua_utils.find_pjsua_path()
+        port = args.port or config.get('port', 5070)
+
+        self.login_args = (
+            args.server or config.get('server'),
+            args.username or config.get('username'),
+            args.password or config.get('password'),
+            pjsua_path,
+            port,
+        )
+
+        # 通话详单保存到本地数据库，cdr_path为空时不保存
+        cdr_path = config.get('cdr_path', 'sip_client_cdr.db')
+        cdr_store = CdrStore(cdr_path, log=self.logger.log) if cdr_path else None
+
+        # 可选的结构化日志(JSONL + 按时间和Call-ID的索引)
+        structured_log = structured_log_from_config(config, log=self.logger.log)
+        self.engine = SIPEngine(self.pjsua_utils, log=self.logger.log,
+                                adaptive_log_level=bool(config.get('adaptive_log_level', False)),
+                                cdr_store=cdr_store, structured_log=structured_log)
+        self.engine.add_listener(self)
+
+        # 预热的PJSUA让意外退出后的重新登录只需添加账号
+        warm_pool = args.warm_pool if args.warm_pool is not None else config.get('warm_pool_size', 0)
+        if warm_pool:
+            self.engine.configure_warm_pool(pjsua_path, warm_pool)
+
+        # 配置中的附加账号与主账号注册到同一个PJSUA进程
+        for account in config.get_accounts():
+            self.engine.add_account(account.get('username'), account.get('password'),
+                                    account.get('server'))
+
+        # 可选的Prometheus指标端点
+        self.metrics_server = None
+        metrics_port = args.metrics_port if args.metrics_port is not None else config.get('metrics_port', 0)
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.engine, int(metrics_port),
+                                                    config.get('metrics_host', '127.0.0.1'),
+                                                    log=self.logger.log)
+            except OSError as e:
+                self.logger.log(f"无法启动指标端点: {str(e)}")
+
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._unregistered = threading.Event()
+
+    def log_event(self, message):
+        """输出一条事件"""
+        self.logger.log(f"[事件] {message}")
+
+    def run(self):
+        """登录并保持运行，直到收到SIGINT/SIGTERM"""
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+        self.engine.login(*self.login_args)
+
+        # 带超时等待，保证Windows下Ctrl+C也能及时响应
+        while not self._stop_event.wait(1.0):
+            pass
+        self.shutdown()
+
+    def request_stop(self, signum=None, frame=None):
+        """请求退出"""
+        self._stop_event.set()
+
+    def shutdown(self, timeout=8.0):
+        """注销并停止引擎"""
+        self._stopping = True
+        if self.engine.process:
+            self.engine.unregister()
+            self._unregistered.wait(timeout)
+        self.engine.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        self.log_event("已退出")
+
+    def relogin(self):
+        """重新登录"""
+        if not self._stopping:
+            self.engine.login(*self.login_args)
+
+    # 引擎通知
+    def on_output(self, lines, hits=()):
+        """按需输出PJSUA原始输出"""
+        if self.show_output:
+            for line in lines:
+                self.logger.log(line.rstrip())
+
+    def on_connecting(self, server, username):
+        self.log_event(f"正在连接 {username}@{server}")
+
+    def on_login_failed(self, reason):
+        self.log_event(f"登录失败: {reason}")
+
+    def on_registered(self, server, username):
+        self.log_event(f"注册成功 {username}@{server}")
+
+    def on_account_info(self, acc_id, uri, username, server):
+        self.log_event(f"账号信息 {username}@{server}")
+
+    def on_accounts_changed(self, accounts):
+        self.log_event("账号状态 " + ", ".join(f"{key}({state})" for key, state in accounts))
+
+    def on_calling(self, uri):
+        self.log_event(f"正在呼叫 {uri}")
+
+    def on_call_ringing(self):
+        self.log_event("对方响铃")
+
+    def on_call_established(self):
+        self.log_event("通话建立")
+
+    def on_call_failed(self, reason):
+        self.log_event(f"呼叫失败: {reason}")
+
+    def on_call_ended(self):
+        self.log_event("通话结束")
+
+    def on_unregistered(self):
+        self.log_event("已注销")
+        self._unregistered.set()
+
+    def on_process_exited(self, returncode):
+        self.log_event(f"PJSUA已退出 (返回码 {returncode})")
+        if not self._stopping:
+            self.log_event(f"{self.RELOGIN_DELAY // 1000}秒后重新登录")
+            self.engine.scheduler.after(self.RELOGIN_DELAY, self.relogin)
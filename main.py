@@ -5,10 +5,37 @@
 SIP客户端主程序
 
 这是一个基于PJSUA的SIP客户端，提供图形界面进行SIP电话操作。
+使用 --headless 参数可在没有显示器的服务器上无界面运行。
 """
 
-from sip_client import SIPClient
+import argparse
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="基于PJSUA的SIP客户端")
+    parser.add_argument("--headless", action="store_true",
+                        help="无界面运行，保持注册并将事件输出到标准输出")
+    parser.add_argument("--config", default="sip_client_config.json", help="配置文件路径")
+    parser.add_argument("--server", help="SIP服务器地址 (默认读取配置)")
+    parser.add_argument("--username", help="用户名 (默认读取配置)")
+    parser.add_argument("--password", help="密码 (默认读取配置)")
+    parser.add_argument("--pjsua", help="pjsua可执行文件路径 (默认读取配置)")
+    parser.add_argument("--port", type=int, help="本地SIP端口 (默认读取配置)")
+    parser.add_argument("--warm-pool", type=int, help="保持的预热PJSUA实例数，用于加快重新登录 (默认读取配置)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="在该端口提供Prometheus指标，0为不提供 (默认读取配置)")
+    parser.add_argument("--verbose", action="store_true", help="无界面运行时同时输出PJSUA原始日志")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    client = SIPClient()
-    client.run() 
\ No newline at end of file
+    args = parse_args()
+    if args.headless:
+        # 无界面模式不导入tkinter
+        from headless_client import HeadlessClient
+        HeadlessClient(args).run()
+    else:
+        from sip_client import SIPClient
+        client = SIPClient()
+        client.run()
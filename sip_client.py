@@ -17,6 +17,7 @@ from gui.ui_manager import UIManager
 from core.sip_manager import SIPManager
 from core.pjsua_utils import PJSUAUtils
 from utils.logger import Logger
+from utils.log_sink import sink_from_config
 from utils.config_manager import ConfigManager
 
 class SIPClient:
@@ -44,10 +45,10 @@ class SIPClient:
             self.config_manager = ConfigManager()
             
             # 初始化日志管理器
-            self.logger = Logger(self.root)
+            self.logger = Logger(self.root, sink=sink_from_config(self.config_manager))
             
             # 初始化PJSUA工具 (必须在UI管理器之前初始化)
-            self.pjsua_utils = PJSUAUtils(self.logger)
+            self.pjsua_utils = PJSUAUtils(self.logger, show_error=self.show_error)
             
             # 初始化UI管理器
             self.ui_manager = UIManager(self.root, self)
@@ -133,6 +134,14 @@ class SIPClient:
     def log(self, message):
         """记录日志"""
         self.logger.log(message)
+        
+    def show_error(self, title, message):
+        """显示错误对话框，在引擎线程中调用时转到UI线程显示"""
+        ui_manager = getattr(self, 'ui_manager', None)
+        if ui_manager is not None:
+            ui_manager.dispatcher.call(messagebox.showerror, title, message)
+        else:
+            messagebox.showerror(title, message)
     
     def on_exit(self):
         """退出程序时清理资源"""
@@ -142,6 +151,9 @@ class SIPClient:
             
             # 清理SIP资源
             self.sip_manager.cleanup()
+
+            # 写完日志文件
+            self.logger.close()
             
             # 销毁窗口
             self.root.destroy()
@@ -159,7 +171,17 @@ class SIPClient:
     
     def update_random_port(self):
         """更新为随机端口"""
+        # 先释放之前分配但未使用的端口，再分配新端口
+        old_port = self.config_manager.get('port')
+        try:
+            # 配置中的端口可能是字符串，分配器按整数记录
+            self.pjsua_utils.port_allocator.release_unused(int(old_port))
+        except (TypeError, ValueError):
+            pass
         random_port = self.pjsua_utils.find_available_port()
+        if random_port is None:
+            self.logger.log("没有可用的本地端口，保留原端口")
+            return old_port
         
         # 更新UI中的端口显示
         if hasattr(self.ui_manager.settings_panel, 'port_entry'):
@@ -179,8 +201,8 @@ class SIPClient:
             # 更新为随机端口
             self.update_random_port()
             
-            # 检查PJSUA
-            self.sip_manager.check_pjsua()
+            # 在后台检测PJSUA(结果有缓存)，完成后按配置启动预热的PJSUA实例
+            self.sip_manager.locate_pjsua(then=self.sip_manager.configure_warm_pool)
             
             # 如果配置了自动登录，则尝试登录
             if self.config_manager.get('auto_login', False):
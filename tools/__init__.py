@@ -0,0 +1,5 @@
+"""
+开发工具模块
+
+包含基准测试脚本和调试辅助工具，不随客户端打包。
+"""
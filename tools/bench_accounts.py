@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多账号资源占用对比
+
+比较两种承载N个SIP账号的方式: 一个pjsua进程以--next-account注册全部账号，
+与每个账号启动一个pjsua进程。所有账号注册成功后稍作等待，再统计各进程的
+常驻内存和累计CPU时间。默认使用模拟pjsua，指定--pjsua可测量真实的pjsua。
+
+用法:
+    python -m tools.bench_accounts [--accounts N] [--pjsua PATH --server HOST --password PW]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import pjsua_parser
+from core.accounts import SIPAccount
+from core.pjsua_parser import PjsuaLineClassifier
+from utils.process_stats import process_usage
+
+FAKE_PJSUA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_pjsua.py")
+
+
+class RegisteredProcess:
+    """启动一个pjsua进程并统计其输出中的注册成功次数"""
+
+    def __init__(self, command, expected):
+        self.expected = expected
+        self.registered = 0
+        self.done = threading.Event()
+        self.classifier = PjsuaLineClassifier()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT)
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        """读取输出直到进程结束"""
+        for raw in self.process.stdout:
+            kind, _ = self.classifier.classify(raw.decode("utf-8", "replace"))
+            if kind == pjsua_parser.REGISTERED:
+                self.registered += 1
+                if self.registered >= self.expected:
+                    self.done.set()
+        self.done.set()
+
+    def usage(self):
+        return process_usage(self.process.pid)
+
+    def stop(self):
+        """发送q并等待退出"""
+        try:
+            self.process.stdin.write(b"q\n")
+            self.process.stdin.flush()
+            self.process.wait(5)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+
+
+def account_args(accounts, port):
+    """一个进程注册多个账号的命令行参数"""
+    args = list(accounts[0].pjsua_args())
+    args += ["--log-level=4", "--app-log-level=4", f"--local-port={port}"]
+    for account in accounts[1:]:
+        args += ["--next-account", *account.pjsua_args()]
+    return args
+
+
+def measure(processes, settle, timeout):
+    """等待全部注册后统计资源占用，返回 (总内存字节, 总CPU秒, 注册成功数, 注册耗时)"""
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    for item in processes:
+        item.done.wait(max(0.0, deadline - time.monotonic()))
+    registered_time = time.perf_counter() - start
+    time.sleep(settle)
+
+    rss = cpu = 0
+    for item in processes:
+        usage = item.usage()
+        if usage is not None:
+            rss += usage[0]
+            cpu += usage[1]
+    registered = sum(item.registered for item in processes)
+    for item in processes:
+        item.stop()
+    return rss, cpu, registered, registered_time
+
+
+def report(title, count, rss, cpu, registered, seconds):
+    print(f"{title}: 注册成功 {registered}/{count}, 耗时 {seconds:.2f} 秒, "
+          f"内存 {rss / 1048576:.1f} MB, CPU {cpu:.2f} 秒 "
+          f"(每账号 {rss / 1048576 / count:.1f} MB, {cpu / count:.3f} 秒)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号资源占用对比")
+    parser.add_argument("--accounts", type=int, default=10, help="账号数")
+    parser.add_argument("--pjsua", help="pjsua可执行文件，默认使用模拟pjsua")
+    parser.add_argument("--server", default="127.0.0.1", help="SIP服务器地址")
+    parser.add_argument("--first-user", type=int, default=1000, help="第一个账号的用户名")
+    parser.add_argument("--password", default="1234", help="所有账号的密码")
+    parser.add_argument("--port", type=int, default=25060, help="第一个进程的本地端口")
+    parser.add_argument("--settle", type=float, default=2.0, help="注册完成后等待多久再统计(秒)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="等待注册的最长时间(秒)")
+    args = parser.parse_args()
+
+    prefix = [args.pjsua] if args.pjsua else [sys.executable, FAKE_PJSUA]
+    accounts = [SIPAccount(str(args.first_user + i), args.password, args.server)
+                for i in range(args.accounts)]
+
+    print(f"账号数: {args.accounts}, pjsua: {args.pjsua or '模拟pjsua'}")
+
+    single = [RegisteredProcess(prefix + account_args(accounts, args.port), len(accounts))]
+    report("一个进程承载全部账号", args.accounts, *measure(single, args.settle, args.timeout))
+
+    separate = [RegisteredProcess(prefix + account_args([account], args.port + 1 + i), 1)
+                for i, account in enumerate(accounts)]
+    report("每个账号一个进程", args.accounts, *measure(separate, args.settle, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+asyncio驱动并发基准测试
+
+在一个事件循环中同时驱动多个模拟pjsua子进程，每个子进程依次完成
+注册、拨号、挂断和退出，统计每个事件从子进程输出到驱动分发的延迟。
+所有子进程同时启动时解释器启动会争抢CPU，因此注册阶段和通话阶段的延迟分开统计。
+
+用法:
+    python -m tools.bench_async_driver [--children N] [--calls N] [--answer-delay S]
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.async_driver import AsyncPjsuaDriver, install_child_watcher
+from core.pjsua_events import ProcessExited
+
+FAKE_PJSUA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_pjsua.py")
+
+# 模拟pjsua以 --stamp 附加在事件行末尾的输出时刻
+STAMP_PATTERN = re.compile(r"\(t=(\d+\.\d+)\)$")
+
+
+def percentile(sorted_values, fraction):
+    """已排序数据的百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class StartBarrier:
+    """所有子进程注册完成(或失败)后才开始通话"""
+
+    def __init__(self, parties):
+        self.parties = parties
+        self.arrived = 0
+        self.released = asyncio.Event()
+
+    def arrive(self):
+        """一个子进程到达(注册完成或已失败)"""
+        self.arrived += 1
+        if self.arrived >= self.parties:
+            self.released.set()
+
+    async def wait(self):
+        """到达并等待其余子进程"""
+        self.arrive()
+        await self.released.wait()
+
+
+async def collect_latency(events, latencies, counts, all_registered):
+    """消费一个驱动的事件，按阶段记录输出到分发的延迟"""
+    async for event in events:
+        received = time.time()
+        counts[type(event).__name__] = counts.get(type(event).__name__, 0) + 1
+        if isinstance(event, ProcessExited):
+            continue
+        match = STAMP_PATTERN.search(event.line)
+        if match:
+            phase = "call" if all_registered.is_set() else "register"
+            latencies[phase].append(received - float(match.group(1)))
+
+
+async def run_child(index, calls, answer_delay, latencies, counts, peak_threads, barrier):
+    """驱动一个模拟pjsua完成注册、若干次通话和退出"""
+    driver = AsyncPjsuaDriver(
+        FAKE_PJSUA, "127.0.0.1", str(1000 + index), "secret", port=20000 + index,
+        command_prefix=(sys.executable,),
+        extra_args=("--stamp", f"--answer-delay={answer_delay}"))
+    collector = asyncio.ensure_future(
+        collect_latency(driver.events(), latencies, counts, barrier.released))
+    async with driver:
+        try:
+            await driver.login()
+        except Exception:
+            barrier.arrive()
+            raise
+        # 等待所有子进程注册完成后再开始通话
+        await barrier.wait()
+        for _ in range(calls):
+            await driver.call(f"sip:{2000 + index}@127.0.0.1")
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            await driver.hangup()
+    await collector
+
+
+async def run(children, calls, answer_delay):
+    """并发运行所有子进程"""
+    latencies = {"register": [], "call": []}
+    counts = {}
+    peak_threads = [threading.active_count()]
+    barrier = StartBarrier(children)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_child(i, calls, answer_delay, latencies, counts, peak_threads, barrier)
+          for i in range(children)),
+        return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failures = [r for r in results if isinstance(r, Exception)]
+    return elapsed, latencies, counts, failures, peak_threads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio驱动并发基准测试")
+    parser.add_argument("--children", type=int, default=50, help="并发的模拟pjsua进程数")
+    parser.add_argument("--calls", type=int, default=3, help="每个进程的通话次数")
+    parser.add_argument("--answer-delay", type=float, default=0.1, help="模拟接听延迟(秒)")
+    parser.add_argument("--threaded-watcher", action="store_true",
+                        help="使用Python 3.8-3.11默认的每子进程一个线程的监视器作对比")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    elif not args.threaded_watcher:
+        install_child_watcher()
+    loop = asyncio.get_event_loop()
+    elapsed, latencies, counts, failures, peak_threads = loop.run_until_complete(
+        run(args.children, args.calls, args.answer_delay))
+
+    print(f"子进程: {args.children}, 每个通话 {args.calls} 次, 总耗时 {elapsed:.2f} 秒")
+    print(f"事件: {sum(counts.values())} 个 " +
+          ", ".join(f"{name}={count}" for name, count in sorted(counts.items())))
+    print(f"运行期间线程数峰值: {peak_threads}")
+    for phase, title in (("register", "注册阶段"), ("call", "通话阶段")):
+        values = sorted(latencies[phase])
+        print(f"{title}事件延迟(子进程输出 -> 驱动分发): "
+              f"p50 {percentile(values, 0.50) * 1000:.2f} ms, "
+              f"p95 {percentile(values, 0.95) * 1000:.2f} ms, "
+              f"p99 {percentile(values, 0.99) * 1000:.2f} ms, "
+              f"最大 {percentile(values, 1.0) * 1000:.2f} ms ({len(values)} 个样本)")
+    if failures:
+        print(f"失败: {len(failures)} 个子进程")
+        for failure in failures[:5]:
+            print(f"  {type(failure).__name__}: {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
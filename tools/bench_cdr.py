@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+通话详单存储测试
+
+比较每个呼叫单独提交与CdrStore后台批量提交的写入速率，然后在写入的记录上
+测量按号码、按号码前缀和按时间范围查询的耗时。
+
+用法:
+    python -m tools.bench_cdr [--records N] [--single N] [--numbers N]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cdr_store import CdrStore, CallDetailRecord, COLUMNS, SCHEMA, OUTGOING, INCOMING
+
+
+def make_record(index, numbers, started):
+    """生成一条详单，每秒约10个呼叫"""
+    setup = started + index * 0.1
+    number = str(2000 + random.randrange(numbers))
+    answered = random.random() < 0.7
+    answer = setup + random.uniform(0.5, 5.0) if answered else None
+    end = (answer + random.uniform(5, 300)) if answered else setup + random.uniform(1, 30)
+    return CallDetailRecord(f"sip:{number}@10.20.25.111", OUTGOING if index % 3 else INCOMING,
+                            "1000@10.20.25.111", setup, answer, end,
+                            200 if answered else 486, None if answered else "Busy Here")
+
+
+def bench_single(path, count, numbers, started):
+    """每条详单一个事务(默认的FULL同步)，即未做批量时的写法"""
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    sql = f"INSERT INTO cdr ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    begin = time.perf_counter()
+    for index in range(count):
+        with db:
+            db.execute(sql, make_record(index, numbers, started).row())
+    seconds = time.perf_counter() - begin
+    db.close()
+    return seconds
+
+
+def timed(func, repeat=20):
+    """多次执行取中位数(毫秒)和最后一次的结果"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - begin) * 1000)
+    times.sort()
+    return times[len(times) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通话详单存储测试")
+    parser.add_argument("--records", type=int, default=1_000_000, help="批量写入的详单数")
+    parser.add_argument("--single", type=int, default=2000, help="逐条提交的详单数")
+    parser.add_argument("--numbers", type=int, default=5000, help="不同号码的数量")
+    args = parser.parse_args()
+
+    started = time.time() - args.records * 0.1
+    with tempfile.TemporaryDirectory() as directory:
+        seconds = bench_single(os.path.join(directory, "single.db"), args.single, args.numbers, started)
+        print(f"逐条提交: {args.single}条 {seconds:.2f}秒, {args.single / seconds:,.0f} 条/秒")
+
+        store = CdrStore(os.path.join(directory, "cdr.db"))
+        records = [make_record(index, args.numbers, started) for index in range(args.records)]
+        begin = time.perf_counter()
+        for record in records:
+            store.append(record)
+        queued = time.perf_counter() - begin
+        store.close()
+        seconds = time.perf_counter() - begin
+        print(f"批量提交: {args.records}条 {seconds:.2f}秒, {args.records / seconds:,.0f} 条/秒 "
+              f"(调用方入队 {queued / args.records * 1e6:.2f} µs/条), {store.report()}")
+
+        store = CdrStore(os.path.join(directory, "cdr.db"))
+        number = "2042"
+        middle = started + args.records * 0.05
+        cases = [
+            ("按号码", lambda: store.query(number, limit=100)),
+            ("按号码前缀", lambda: store.query("204", limit=100, prefix=True)),
+            ("按号码和时间范围", lambda: store.query(number, middle, middle + 86400, limit=100)),
+            ("按时间范围(1小时)", lambda: store.query(start=middle, end=middle + 3600, limit=1000)),
+            ("最近的记录", lambda: store.query(limit=20)),
+        ]
+        print(f"查询 ({store.count():,}条记录):")
+        for title, func in cases:
+            milliseconds, result = timed(func)
+            print(f"    {title}: {milliseconds:.2f} ms, 返回{len(result)}条")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
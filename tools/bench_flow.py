@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+场景流程测试
+
+对tools/data/scenarios/中的每个场景(或指定的场景文件)，用SIP引擎驱动以该场景
+运行的模拟pjsua完成 登录 -> 呼叫 -> 挂断 -> 注销，记录各步骤的耗时、读取的
+输出行数和速率、引擎记录的各阶段时延以及结构化日志按Call-ID取出的行数，并与场景
+文件中的expect比较。有场景不符合预期时返回码为1，可直接用于CI。
+
+用法:
+    python -m tools.bench_flow [场景文件 ...] [--hold S] [--timeout S]
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sip_engine import SIPEngine, SIPEngineListener
+from core.pjsua_utils import PJSUAUtils
+from core.structured_log import StructuredLog, StructuredSink, StructuredLogReader
+from tools.fake_pjsua import wrapper_script
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "scenarios")
+
+
+class QuietLogger:
+    """只收集日志，不输出"""
+
+    def __init__(self):
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append(message)
+
+
+class FlowWatcher(SIPEngineListener):
+    """把引擎通知按到达顺序放入队列，并统计读取的输出"""
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.output_lines = 0
+        self.output_chars = 0
+
+    def wait(self, names, timeout):
+        """
+        等待names中的任一通知
+
+        Returns:
+            tuple: (通知名, 到达时刻)，超时返回 (None, None)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                name, at = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None, None
+            if name in names:
+                return name, at
+
+    def _put(self, name):
+        self.events.put((name, time.monotonic()))
+
+    def on_output(self, lines, hits=()):
+        self.output_lines += len(lines)
+        self.output_chars += sum(len(line) for line in lines)
+
+    def on_registered(self, server, username):
+        self._put("registered")
+
+    def on_login_failed(self, reason):
+        self._put("login_failed")
+
+    def on_call_established(self):
+        self._put("established")
+
+    def on_call_failed(self, reason):
+        self._put("call_failed")
+
+    def on_call_ended(self):
+        self._put("call_ended")
+
+    def on_unregistered(self):
+        self._put("unregistered")
+
+    def on_process_exited(self, returncode):
+        self._put("exited")
+
+
+def run_scenario(path, directory, args):
+    """运行一个场景，返回结果字典"""
+    pjsua_path = wrapper_script(directory, f'"--scenario={path}"')
+    logger = QuietLogger()
+    log_dir = os.path.join(directory, "logs_" + os.path.splitext(os.path.basename(path))[0])
+    engine = SIPEngine(PJSUAUtils(logger, cache_file=None), log=logger.log,
+                       structured_log=StructuredLog(StructuredSink(log_dir, log=logger.log)))
+    watcher = FlowWatcher()
+    engine.add_listener(watcher)
+    result = {"registered": False, "call": None, "register_ms": None, "answer_ms": None,
+              "log_dir": log_dir}
+
+    started = time.monotonic()
+    try:
+        engine.login("127.0.0.1", "1000", "1234", pjsua_path, args.port)
+        name, at = watcher.wait({"registered", "login_failed", "exited"}, args.timeout)
+        if name != "registered":
+            return finish(result, engine, watcher, args, started)
+        result["registered"] = True
+        result["register_ms"] = (at - started) * 1000
+
+        dialed = time.monotonic()
+        engine.make_call("2000")
+        name, at = watcher.wait({"established", "call_failed", "call_ended", "exited"}, args.timeout)
+        if name == "established":
+            result["answer_ms"] = (at - dialed) * 1000
+            # 保持通话，期间对方挂断或pjsua退出都会提前结束
+            ended, _ = watcher.wait({"call_ended", "exited"}, args.hold)
+            if ended == "call_ended":
+                result["call"] = "remote_hangup"
+            elif ended == "exited":
+                result["call"] = "crashed"
+            else:
+                engine.hangup()
+                ended, _ = watcher.wait({"call_ended", "exited"}, args.timeout)
+                result["call"] = "answered" if ended == "call_ended" else "hangup_timeout"
+        else:
+            result["call"] = {"call_failed": "failed", "call_ended": "rejected",
+                              "exited": "crashed", None: "timeout"}[name]
+        return finish(result, engine, watcher, args, started)
+    finally:
+        engine.shutdown()
+
+
+def finish(result, engine, watcher, args, started):
+    """注销并补充输出统计"""
+    if engine.process:
+        engine.unregister()
+        watcher.wait({"unregistered", "exited"}, args.timeout)
+    seconds = time.monotonic() - started
+    result["seconds"] = seconds
+    result["lines"] = watcher.output_lines
+    result["lines_per_second"] = watcher.output_lines / seconds if seconds > 0 else 0.0
+    result["latency"] = engine.metrics_report()
+    return result
+
+
+def structured_summary(log_dir):
+    """结构化日志的行数，以及按索引取出各呼叫的行数和耗时"""
+    reader = StructuredLogReader(log_dir)
+    rows = reader.between(0, float("inf"))
+    call_ids = sorted({row["call_id"] for row in rows if row["call_id"]})
+    parts = [f"{len(rows)}行"]
+    for call_id in call_ids:
+        begin = time.perf_counter()
+        count = len(reader.call(call_id))
+        parts.append(f"{call_id}: {count}行 {(time.perf_counter() - begin) * 1000:.1f} ms")
+    return ", ".join(parts)
+
+
+def check(expect, result):
+    """返回与预期不符的项"""
+    return [f"{key}: 预期 {value}, 实际 {result.get(key)}"
+            for key, value in expect.items() if result.get(key) != value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="场景流程测试")
+    parser.add_argument("scenarios", nargs="*", help="场景文件，默认运行tools/data/scenarios/中的全部场景")
+    parser.add_argument("--hold", type=float, default=1.5, help="接通后保持多久再挂断(秒)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="每一步的最长等待时间(秒)")
+    parser.add_argument("--port", type=int, default=25080, help="本地SIP端口")
+    args = parser.parse_args()
+
+    paths = args.scenarios or sorted(glob.glob(os.path.join(SCENARIO_DIR, "*.json")))
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                scenario = json.load(f)
+            result = run_scenario(os.path.abspath(path), directory, args)
+            problems = check(scenario.get("expect", {}), result)
+            failures += bool(problems)
+
+            parts = [f"注册={result['registered']} 呼叫={result['call']}"]
+            if result["register_ms"] is not None:
+                parts.append(f"注册 {result['register_ms']:.0f} ms")
+            if result["answer_ms"] is not None:
+                parts.append(f"接通 {result['answer_ms']:.0f} ms")
+            parts.append(f"共 {result['seconds']:.2f} 秒, 读取 {result['lines']} 行 "
+                         f"({result['lines_per_second']:,.0f} 行/秒)")
+            print(f"{'通过' if not problems else '失败'} {os.path.basename(path)}: "
+                  f"{scenario.get('description', '')}")
+            print("    " + ", ".join(parts))
+            print(f"    时延: {result['latency']}")
+            print(f"    结构化日志: {structured_summary(result['log_dir'])}")
+            for problem in problems:
+                print(f"    {problem}")
+
+    print(f"{len(paths) - failures}/{len(paths)} 个场景符合预期")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
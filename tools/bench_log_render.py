@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志显示速率测试
+
+在真实的Tk窗口中，由后台线程以录制的pjsua输出持续记录日志，比较两种显示方式:
+原先每行一次 root.after(0, ...) 插入并滚动，与Logger按帧批量插入。报告每秒显示
+到日志控件中的行数，以及Tk主循环的最长停顿(每10ms一次的心跳之间的最大间隔)，
+停顿越小界面越流畅。需要图形界面(或Xvfb)。
+
+用法:
+    python -m tools.bench_log_render [--lines N] [--rate N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+import tkinter as tk
+from tkinter import scrolledtext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import Logger
+from utils.log_store import LogStore
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+
+class LegacyLogger:
+    """原先的显示方式: 每行格式化一次时间并单独安排一次插入和滚动"""
+
+    MAX_WIDGET_LINES = Logger.MAX_WIDGET_LINES
+    TRIM_LINES = Logger.TRIM_LINES
+
+    def __init__(self, root, log_text):
+        self.root = root
+        self.log_text = log_text
+        self.widget_lines = 0
+        self.rendered = 0
+
+    def log(self, message):
+        log_message = f"[{time.strftime('%H:%M:%S')}] {message}"
+        self.root.after(0, lambda: self._update_log_text(log_message))
+        print(log_message)
+
+    def _update_log_text(self, message):
+        self.log_text.config(state="normal")
+        self.log_text.insert("end", message + "\n")
+        self.widget_lines += 1
+        excess = self.widget_lines - self.MAX_WIDGET_LINES
+        if excess >= self.TRIM_LINES:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.widget_lines -= excess
+        self.log_text.see("end")
+        self.log_text.config(state="disabled")
+        self.rendered += 1
+
+
+def run(name, make_logger, lines, total, rate):
+    """
+    在新窗口中记录total行日志并等待全部显示
+
+    Returns:
+        tuple: (耗时秒数, 显示的行数, 心跳最长间隔秒数)
+    """
+    root = tk.Tk()
+    root.title(f"bench_log_render - {name}")
+    log_text = scrolledtext.ScrolledText(root, width=100, height=30)
+    log_text.pack(fill="both", expand=True)
+    logger, rendered = make_logger(root, log_text)
+
+    gaps = []
+    last_beat = [time.perf_counter()]
+
+    def heartbeat():
+        now = time.perf_counter()
+        gaps.append(now - last_beat[0])
+        last_beat[0] = now
+        root.after(10, heartbeat)
+
+    done = threading.Event()
+
+    def produce():
+        interval = 1.0 / rate if rate else 0
+        begin = time.perf_counter()
+        for index in range(total):
+            logger.log(f"{index} {lines[index % len(lines)]}")
+            if interval:
+                delay = begin + (index + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        done.set()
+
+    began = time.perf_counter()
+
+    def check():
+        # 生产结束且全部处理后(显示或因积压跳过)退出
+        if done.is_set() and rendered() >= total:
+            root.quit()
+        else:
+            root.after(20, check)
+
+    root.after(10, heartbeat)
+    root.after(20, check)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        threading.Thread(target=produce, daemon=True).start()
+        root.mainloop()
+    seconds = time.perf_counter() - began
+    shown = int(log_text.index("end-1c").split(".")[0]) - 1
+    root.destroy()
+    return seconds, shown, max(gaps) if gaps else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志显示速率测试")
+    parser.add_argument("--lines", type=int, default=50_000, help="记录的日志行数")
+    parser.add_argument("--rate", type=int, default=0, help="每秒记录的行数，0表示不限速")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+
+    def legacy(root, log_text):
+        logger = LegacyLogger(root, log_text)
+        return logger, lambda: logger.rendered
+
+    batched_loggers = []
+
+    def batched(root, log_text):
+        logger = Logger(root, LogStore(spill_path=""))
+        logger.set_log_widget(log_text)
+        batched_loggers.append(logger)
+        return logger, lambda: logger.rendered + logger.skipped
+
+    for name, factory in (("逐行after(0)", legacy), ("按帧批量", batched)):
+        seconds, shown, gap = run(name, factory, lines, args.lines, args.rate)
+        print(f"{name}: {args.lines}行 {seconds:.2f}秒, {args.lines / seconds:,.0f} 行/秒, "
+              f"控件中{shown}行, 主循环最长停顿 {gap * 1000:.0f} ms")
+    print(f"按帧批量: {batched_loggers[0].render_report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志检索测试
+
+以录制的pjsua输出填满LogStore(默认50万行)，模拟在日志页筛选框中逐字输入
+关键字: 每次按键开始一次新的检索，按帧调用step()直到完成。报告建立索引的
+总耗时、完整关键字和逐字输入中最慢一次得到结果的耗时、单帧最长耗时，
+并与逐行比较的全量扫描对比。
+单帧耗时就是检索期间Tk主循环被占用的最长时间。
+
+用法:
+    python -m tools.bench_log_search [--lines N] [--budget MS]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pjsua_parser import default_classifier
+from utils.log_store import LogStore, WARNING
+from utils.log_index import LogIndex, LogFilter, PJSUA_OUTPUT
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+# 逐字输入的关键字，以及附加的级别/事件条件
+QUERIES = (
+    ("REGISTER sip:", None, None),
+    ("Call-ID", None, None),
+    ("180 Ringing", None, None),
+    ("失败", None, None),
+    ("", WARNING, None),
+    ("", None, "sip_message"),
+    ("INVITE", None, "sip_message"),
+)
+
+
+def fill(store, lines, count):
+    """按每次读取100行的方式写入count行，带事件类型"""
+    for start in range(0, count, 100):
+        batch = [f"{start + index} {lines[(start + index) % len(lines)]}" for index in range(min(100, count - start))]
+        events = [None] * len(batch)
+        for index, kind, _ in default_classifier.classify_batch(batch):
+            events[index] = kind
+        store.extend(batch, source=PJSUA_OUTPUT, events=events)
+
+
+def run_search(index, log_filter, budget):
+    """
+    按帧执行一次检索
+
+    Returns:
+        tuple: (匹配行数, 帧数, 单帧最长毫秒, 总毫秒)
+    """
+    search = index.search(log_filter)
+    frames = 0
+    worst = 0.0
+    begin = time.perf_counter()
+    while True:
+        started = time.perf_counter()
+        done = search.step(started + budget)
+        frames += 1
+        worst = max(worst, time.perf_counter() - started)
+        if done:
+            break
+    return len(search.results), frames, worst * 1000, (time.perf_counter() - begin) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志检索测试")
+    parser.add_argument("--lines", type=int, default=500_000, help="内存中的日志行数")
+    parser.add_argument("--budget", type=float, default=8.0, help="每帧的时间上限(毫秒)")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    args = parser.parse_args()
+    budget = args.budget / 1000
+
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    store = LogStore(args.lines, spill_path="")
+    fill(store, lines, args.lines)
+
+    index = LogIndex(store)
+    frames = 0
+    worst = 0.0
+    begin = time.perf_counter()
+    while True:
+        started = time.perf_counter()
+        done = index.update(started + budget)
+        frames += 1
+        worst = max(worst, time.perf_counter() - started)
+        if done:
+            break
+    print(f"建立索引: {len(store):,}行 {time.perf_counter() - begin:.2f}秒, {frames}帧, "
+          f"单帧最长 {worst * 1000:.1f}ms, {len(index.postings):,}个词")
+
+    for text, level, event in QUERIES:
+        keystrokes = [text[:length] for length in range(1, len(text) + 1)] or [""]
+        worst = 0.0
+        total = 0.0
+        for typed in keystrokes:
+            count, frames, frame_ms, total_ms = run_search(index, LogFilter(typed, level, event), budget)
+            worst = max(worst, frame_ms)
+            total = max(total, total_ms)
+        log_filter = LogFilter(text, level, event)
+        begin = time.perf_counter()
+        expected = sum(1 for record in store.records() if log_filter.matches(record))
+        scan_ms = (time.perf_counter() - begin) * 1000
+        assert count == expected, (text, count, expected)
+        print(f"{text or '-':<14} 级别={level} 事件={event}: {count:,}行 {total_ms:.0f}ms; "
+              f"逐字输入{len(keystrokes)}次最慢一次 {total:.0f}ms, 单帧最长 {worst:.1f}ms; "
+              f"全量扫描 {scan_ms:.0f}ms(一次占用)")
+
+
+if __name__ == "__main__":
+    main()
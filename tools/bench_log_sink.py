@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志文件写入测试
+
+以录制的pjsua输出作为日志内容，比较记录日志的线程为每行付出的时间:
+逐行打印到控制台并同步写文件(原先的做法) 与 放入LogSink的队列。报告调用方
+每行耗时的p50/p99/最大值、写入线程的实际吞吐、归档和压缩后的文件大小，
+以及小队列在突发输出下按DROP策略丢弃的行数。
+
+用法:
+    python -m tools.bench_log_sink [--lines N] [--max-bytes N] [--queue N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log_store import LogStore
+from utils.log_sink import LogSink, DROP
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+
+def percentiles(samples):
+    """调用耗时(秒)的p50、p99和最大值(微秒)"""
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1e6
+    return f"p50 {pick(0.5):.1f}µs p99 {pick(0.99):.1f}µs 最大 {samples[-1] * 1e6:.0f}µs"
+
+
+def bench_sync(records, path):
+    """每行打印一次(到/dev/null)并同步写入文件"""
+    samples = []
+    with open(os.devnull, "w") as console, open(path, "a", encoding="utf-8") as f:
+        begin = time.perf_counter()
+        for record in records:
+            started = time.perf_counter()
+            print(record.display(), file=console)
+            f.write(record.full() + "\n")
+            f.flush()
+            samples.append(time.perf_counter() - started)
+        seconds = time.perf_counter() - begin
+    return seconds, samples
+
+
+def bench_sink(records, directory, max_bytes, queue_size=None):
+    """放入LogSink的队列，等待写入线程写完(返回的LogSink未关闭)"""
+    sink = LogSink(directory, max_bytes=max_bytes, queue_size=queue_size or len(records), policy=DROP)
+    samples = []
+    begin = time.perf_counter()
+    for record in records:
+        started = time.perf_counter()
+        sink.put(record)
+        samples.append(time.perf_counter() - started)
+    queued = time.perf_counter() - begin
+    sink.flush()
+    seconds = time.perf_counter() - begin
+    return sink, queued, seconds, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志文件写入测试")
+    parser.add_argument("--lines", type=int, default=300_000, help="记录的日志行数")
+    parser.add_argument("--max-bytes", type=int, default=4 * 1024 * 1024, help="单个日志文件的大小上限")
+    parser.add_argument("--queue", type=int, default=1000, help="突发测试的队列长度")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    store = LogStore(args.lines, spill_path="")
+    records = [store.append(f"{index} {lines[index % len(lines)]}", source="pjsua")
+               for index in range(args.lines)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        seconds, samples = bench_sync(records, os.path.join(directory, "sync.log"))
+        print(f"逐行打印并写文件: {args.lines / seconds:,.0f} 行/秒, 每行 {percentiles(samples)}")
+
+        sink, queued, seconds, samples = bench_sink(records, os.path.join(directory, "sink"),
+                                                    args.max_bytes)
+        files = sink.files()
+        size = sum(os.path.getsize(path) for path in files)
+        print(f"LogSink: 入队 {args.lines / queued:,.0f} 行/秒, 每行 {percentiles(samples)}; "
+              f"写完 {args.lines / seconds:,.0f} 行/秒")
+        print(f"    {sink.report()}")
+        print(f"    {len(files)}个文件共 {size / 1e6:.1f} MB (未压缩 {sink.bytes / 1e6:.1f} MB)")
+
+        export_path = os.path.join(directory, "export.log")
+        begin = time.perf_counter()
+        sink.export(export_path)
+        sink.flush()
+        print(f"    导出 {os.path.getsize(export_path) / 1e6:.1f} MB 用时 {time.perf_counter() - begin:.2f}秒")
+        sink.close()
+
+        sink, queued, seconds, samples = bench_sink(records, os.path.join(directory, "burst"),
+                                                    args.max_bytes, queue_size=args.queue)
+        sink.close()
+        print(f"突发(队列{args.queue}条, DROP): 丢弃 {sink.dropped}/{args.lines} 行, "
+              f"每行 {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
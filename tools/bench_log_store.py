@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志存储内存测试
+
+以录制的pjsua输出作为日志内容，模拟以固定速率(默认每秒1000行)长时间记录日志，
+每经过一段模拟时间报告一次LogStore占用的内存(tracemalloc)和进程常驻内存，
+检验内存在缓冲写满后保持不变；同时与不设上限的列表比较。
+
+用法:
+    python -m tools.bench_log_store [--rate N] [--hours H] [--capacity N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log_store import LogStore
+from utils.process_stats import process_usage
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志存储内存测试")
+    parser.add_argument("--rate", type=int, default=1000, help="每秒的日志行数")
+    parser.add_argument("--hours", type=float, default=0.25, help="模拟的运行时长(小时)")
+    parser.add_argument("--capacity", type=int, default=100_000, help="内存中保留的记录数")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    total = int(args.rate * args.hours * 3600)
+    checkpoints = 6
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LogStore(args.capacity, spill_path=os.path.join(directory, "spill.txt"))
+        tracemalloc.start()
+        started = time.time()
+        began = time.perf_counter()
+        for index in range(total):
+            # 每行都是新的字符串对象，与实际运行相同
+            store.append(f"{index} {lines[index % len(lines)]}", source="pjsua",
+                         timestamp=started + index / args.rate)
+            if (index + 1) % (total // checkpoints) == 0:
+                current, _ = tracemalloc.get_traced_memory()
+                usage = process_usage(os.getpid())
+                rss = f", 进程常驻 {usage[0] / 1e6:.0f} MB" if usage else ""
+                print(f"模拟 {(index + 1) / args.rate / 60:6.1f} 分钟: {index + 1:>9,} 行, "
+                      f"Python分配 {current / 1e6:6.1f} MB{rss}")
+        seconds = time.perf_counter() - began
+        tracemalloc.stop()
+        print(f"LogStore: {total / seconds:,.0f} 行/秒, {store.report()}, "
+              f"溢出文件 {store.spill_bytes / 1e6:.0f} MB")
+
+        # 对照: 不设上限(与原先日志控件持续累积相同)
+        tracemalloc.start()
+        unbounded = []
+        for index in range(min(total, args.capacity * 5)):
+            unbounded.append(f"{index} {lines[index % len(lines)]}")
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"不设上限: {len(unbounded):,} 行占用 {current / 1e6:.1f} MB，并随运行时长线性增长")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+登录耗时基准测试
+
+用SIP引擎反复登录和注销，测量从请求登录到注册成功的耗时，比较冷启动
+(检测PJSUA、启动进程、初始化后注册)与从预热池取出实例后添加账号两种方式。
+默认使用模拟pjsua，以--startup-delay模拟pjsua的传输和媒体初始化时间。
+
+用法:
+    python -m tools.bench_login [--rounds N] [--startup-delay S] [--pjsua PATH --server HOST ...]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sip_engine import SIPEngine, SIPEngineListener
+from core.pjsua_utils import PJSUAUtils
+from core.warm_pool import REFILL_DELAY
+from tools.fake_pjsua import wrapper_script
+
+
+class QuietLogger:
+    """只收集日志，不输出"""
+
+    def __init__(self):
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append(message)
+
+
+class LoginWaiter(SIPEngineListener):
+    """等待注册成功和注销完成"""
+
+    def __init__(self):
+        self.registered = threading.Event()
+        self.stopped = threading.Event()
+
+    def on_registered(self, server, username):
+        self.registered.set()
+
+    def on_login_failed(self, reason):
+        print(f"登录失败: {reason}")
+        self.registered.set()
+
+    def on_unregistered(self):
+        self.stopped.set()
+
+    def on_process_exited(self, returncode):
+        self.stopped.set()
+
+
+def run_rounds(pjsua_path, args, pool_size):
+    """登录、注销若干轮，返回引擎统计的各次登录耗时(秒)"""
+    logger = QuietLogger()
+    engine = SIPEngine(PJSUAUtils(logger, cache_file=None), log=logger.log)
+    waiter = LoginWaiter()
+    engine.add_listener(waiter)
+    if pool_size:
+        engine.configure_warm_pool(pjsua_path, pool_size)
+    # 等待预热实例就绪(或冷启动前的空闲)
+    time.sleep(args.startup_delay + 1.0)
+
+    try:
+        for index in range(args.rounds):
+            waiter.registered.clear()
+            waiter.stopped.clear()
+            engine.login(args.server, args.username, args.password, pjsua_path, args.port + index)
+            if not waiter.registered.wait(args.timeout):
+                print("等待注册超时")
+                break
+            engine.unregister()
+            waiter.stopped.wait(args.timeout)
+            # 留出补充预热实例的时间
+            time.sleep(REFILL_DELAY / 1000 + args.startup_delay + 0.5)
+    finally:
+        engine.shutdown()
+    return [t for times in engine.login_times.values() for t in times]
+
+
+def summarize(title, times):
+    if not times:
+        print(f"{title}: 无数据")
+        return
+    values = sorted(times)
+    print(f"{title}: {len(values)}次, 中位数 {values[len(values) // 2] * 1000:.0f} ms, "
+          f"平均 {sum(values) / len(values) * 1000:.0f} ms, "
+          f"最快 {values[0] * 1000:.0f} ms, 最慢 {values[-1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录耗时基准测试")
+    parser.add_argument("--rounds", type=int, default=5, help="每种方式的登录次数")
+    parser.add_argument("--pjsua", help="pjsua可执行文件，默认使用模拟pjsua")
+    parser.add_argument("--startup-delay", type=float, default=0.5,
+                        help="模拟pjsua的初始化延迟(秒)，仅用于模拟pjsua")
+    parser.add_argument("--server", default="127.0.0.1", help="SIP服务器地址")
+    parser.add_argument("--username", default="1000", help="用户名")
+    parser.add_argument("--password", default="1234", help="密码")
+    parser.add_argument("--port", type=int, default=25070, help="冷启动使用的本地端口")
+    parser.add_argument("--timeout", type=float, default=15.0, help="等待注册的最长时间(秒)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pjsua_path = args.pjsua or wrapper_script(directory, f"--startup-delay={args.startup_delay}")
+        print(f"pjsua: {args.pjsua or '模拟pjsua'}, 每种方式 {args.rounds} 次")
+        summarize("冷启动", run_rounds(pjsua_path, args, 0))
+        summarize("预热池", run_rounds(pjsua_path, args, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+输出行分类基准测试
+
+在录制的pjsua日志上比较旧版逐条子串判断与单次扫描分类器(逐行/整批)的吞吐量。
+
+用法:
+    python -m tools.bench_parser [--transcript FILE] [--repeat N]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pjsua_parser import PjsuaLineClassifier
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+account_pattern = re.compile(r"\*\[\s*(\d+)\]\s+(sip:([^@]+)@([^:]+))")
+alt_account_pattern = re.compile(r"Account\s+\d+:\s+sip:([^@]+)@([^:]+)")
+
+
+def legacy_classify(line):
+    """重构前read_output中的判断链，返回命中的判断数"""
+    hits = 0
+    if ("registration success" in line and "status=200" in line) or \
+       ("registration success" in line and "OK" in line) or \
+       ("REGISTER" in line and "200 OK" in line) or \
+       ("Registration success" in line):
+        hits += 1
+    account_match = account_pattern.search(line)
+    if account_match:
+        account_match.group(1, 2, 3, 4)
+        hits += 1
+    alt_match = alt_account_pattern.search(line)
+    if alt_match and not account_match:
+        hits += 1
+    if "Account" in line and "sip:" in line and not account_match and not alt_match:
+        hits += 1
+    if "Incoming INVITE" in line or "incoming call" in line:
+        hits += 1
+    if "Call established" in line or "call connected" in line or "Media active" in line:
+        hits += 1
+    if "state changed to CONFIRMED" in line or "Call state: CONFIRMED" in line:
+        hits += 1
+    if "Call disconnected" in line or "call disconnected" in line or "Call state: DISCONNECTED" in line:
+        hits += 1
+    if "Making call" in line:
+        hits += 1
+    if "Call state" in line:
+        hits += 1
+    if "Sending INVITE" in line:
+        hits += 1
+    if "180 Ringing" in line:
+        hits += 1
+    if "200 OK" in line and "INVITE" in line:
+        hits += 1
+    if "Media will be active soon" in line:
+        hits += 1
+    if "BYE sent" in line:
+        hits += 1
+    if "Unable to make call" in line:
+        hits += 1
+    return hits
+
+
+def run(func, lines, repeat):
+    """对lines重复执行func，返回 (耗时秒, 命中行数)"""
+    matched = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            if func(line):
+                matched += 1
+    return time.perf_counter() - start, matched // repeat
+
+
+def run_batch(classifier, lines, repeat, batch_size):
+    """按batch_size分批调用classify_batch，返回 (耗时秒, 命中行数)"""
+    matched = 0
+    batches = [lines[i:i + batch_size] for i in range(0, len(lines), batch_size)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for batch in batches:
+            matched += len(classifier.classify_batch(batch))
+    return time.perf_counter() - start, matched // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pjsua输出行分类基准测试")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    parser.add_argument("--repeat", type=int, default=2000, help="重复次数")
+    parser.add_argument("--batch-size", type=int, default=256, help="整批分类时每批的行数")
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+
+    classifier = PjsuaLineClassifier()
+    total = len(lines) * args.repeat
+
+    legacy_time, legacy_matched = run(legacy_classify, lines, args.repeat)
+    compiled_time, compiled_matched = run(lambda l: classifier.classify(l)[0], lines, args.repeat)
+    # 整批模式下把样本首尾相接成连续流，避免批次边界受样本长度影响
+    stream = lines * max(1, args.batch_size // len(lines) + 1)
+    batch_repeat = max(1, total // len(stream))
+    batch_time, batch_matched = run_batch(classifier, stream, batch_repeat, args.batch_size)
+    batch_total = len(stream) * batch_repeat
+
+    print(f"样本: {args.transcript} ({len(lines)} 行 x {args.repeat})")
+    print(f"旧版判断链:   {total / legacy_time:12,.0f} 行/秒  命中 {legacy_matched} 行")
+    print(f"单次扫描分类: {total / compiled_time:12,.0f} 行/秒  命中 {compiled_matched} 行")
+    print(f"整批分类:     {batch_total / batch_time:12,.0f} 行/秒  "
+          f"命中 {batch_matched * len(lines) // len(stream)} 行 (每批 {args.batch_size} 行)")
+    print(f"加速比: 逐行 {legacy_time / compiled_time:.2f}x, "
+          f"整批 {(batch_total / batch_time) / (total / legacy_time):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
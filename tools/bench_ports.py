@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地端口分配冲突测试
+
+模拟多个客户端进程在同一主机上同时分配本地SIP端口: 每个进程分配若干个端口
+并像pjsua一样在交出后绑定，统计不同进程拿到同一端口(重复分配)的次数。
+比较原来的方式(随机选一个端口，试绑定后立即关闭)与PortAllocator
+(持有套接字并通过登记文件跨进程协调)。用较小的端口范围放大冲突。
+
+用法:
+    python -m tools.bench_ports [--processes N] [--ports N] [--range 20000-20063]
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.port_allocator import PortAllocator
+
+
+def legacy_allocate(port_range):
+    """原来的方式: 随机端口试绑定后立即关闭"""
+    port = random.randint(*port_range)
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind(('0.0.0.0', port))
+        s.close()
+    except OSError:
+        port = random.randint(*port_range)
+    return port
+
+
+def worker(method, port_range, registry, count, start_at, results):
+    """分配count个端口，交出后模拟pjsua绑定，记录结果"""
+    allocator = PortAllocator(port_range, registry_file=registry)
+    # 所有进程同时开始
+    time.sleep(max(0.0, start_at - time.time()))
+    ports = []
+    bound = []
+    started = time.perf_counter()
+    for _ in range(count):
+        if method == "legacy":
+            port = legacy_allocate(port_range)
+        else:
+            port = allocator.reserve()
+            if port is None:
+                continue
+            allocator.handoff(port)
+        ports.append(port)
+        # 模拟pjsua稍后才绑定端口
+        time.sleep(0.001)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind(('0.0.0.0', port))
+            bound.append(sock)
+        except OSError:
+            sock.close()
+    elapsed = time.perf_counter() - started
+    # 持有到所有进程完成，再释放
+    time.sleep(0.5)
+    for sock in bound:
+        sock.close()
+    results.put((method, ports, len(ports) - len(bound), elapsed, allocator.collisions))
+    allocator.release_all()
+
+
+def run(method, args, port_range):
+    """启动若干进程同时分配，返回 (重复分配次数, 绑定失败次数, 每次分配平均毫秒, 跳过次数)"""
+    registry = os.path.join(tempfile.mkdtemp(), "ports.json")
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0
+    processes = [multiprocessing.Process(target=worker,
+                                         args=(method, port_range, registry, args.ports,
+                                               start_at, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    owners = {}
+    for index, (_, ports, _, _, _) in enumerate(collected):
+        for port in ports:
+            owners.setdefault(port, set()).add(index)
+    duplicates = sum(len(indexes) - 1 for indexes in owners.values())
+    failed = sum(item[2] for item in collected)
+    allocated = sum(len(item[1]) for item in collected) or 1
+    latency = sum(item[3] for item in collected) / allocated * 1000
+    skipped = sum(item[4] for item in collected)
+    return duplicates, failed, latency, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地端口分配冲突测试")
+    parser.add_argument("--processes", type=int, default=8, help="同时分配的进程数")
+    parser.add_argument("--ports", type=int, default=6, help="每个进程分配的端口数")
+    parser.add_argument("--range", default="20000-20063", help="端口范围")
+    args = parser.parse_args()
+    low, high = (int(part) for part in args.range.split("-"))
+
+    print(f"{args.processes}个进程 x {args.ports}个端口, 范围 {low}-{high}")
+    for method, title in (("legacy", "随机试绑定"), ("allocator", "PortAllocator")):
+        duplicates, failed, latency, skipped = run(method, args, (low, high))
+        print(f"{title}: 重复分配 {duplicates} 次, pjsua绑定失败 {failed} 次, "
+              f"平均每次分配 {latency:.2f} ms (含模拟绑定), 跳过已占用端口 {skipped} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地SIP注册服务器吞吐量测试
+
+在子进程中启动tools.sip_registrar(不设振铃和接听延迟)，用asyncio UDP客户端
+以固定的并发窗口发起带摘要认证的注册(REGISTER -> 401 -> REGISTER -> 200)
+和完整的呼叫(INVITE -> 100/180/200 -> ACK -> BYE -> 200)，
+报告每秒事务数和事务耗时的百分位数。
+
+用法:
+    python -m tools.bench_registrar [--registers N] [--calls N] [--window N] [--port P]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.sip_registrar import SipMessage, parse_auth, digest_response, set_receive_buffer, T1, T2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchClient(asyncio.DatagramProtocol):
+    """按Call-ID把响应分发给等待中的流程"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.queues = {}
+        self.port = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.port = transport.get_extra_info("sockname")[1]
+        set_receive_buffer(transport)
+
+    def datagram_received(self, data, addr):
+        message = SipMessage.parse(data)
+        if message is None:
+            return
+        queue = self.queues.get(message.header("call-id"))
+        if queue is not None:
+            queue.put_nowait(message)
+
+    def build(self, method, uri, call_id, cseq, from_tag, to_tag=None, extra=(), to_uri=None):
+        """构造请求，To头域默认与请求URI相同"""
+        to = f"<{to_uri or uri}>" + (f";tag={to_tag}" if to_tag else "")
+        lines = [
+            f"{method} {uri} SIP/2.0",
+            f"Via: SIP/2.0/UDP 127.0.0.1:{self.port};branch=z9hG4bK{os.urandom(6).hex()};rport",
+            "Max-Forwards: 70",
+            f"From: <sip:bench@127.0.0.1>;tag={from_tag}",
+            f"To: {to}",
+            f"Call-ID: {call_id}",
+            f"CSeq: {cseq} {method}",
+            f"Contact: <sip:bench@127.0.0.1:{self.port}>",
+            *extra,
+            "Content-Length: 0", "", "",
+        ]
+        return "\r\n".join(lines).encode("utf-8")
+
+    async def transaction(self, data, call_id, timeout):
+        """
+        发送请求，未收到响应前按RFC 3261重发
+
+        Returns:
+            tuple: (最终响应, 耗时)，超时时响应为None
+        """
+        queue = self.queues[call_id]
+        started = time.perf_counter()
+        deadline = started + timeout
+        interval = T1
+        provisional = False
+        self.transport.sendto(data, self.server)
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None, time.perf_counter() - started
+            try:
+                message = await asyncio.wait_for(queue.get(), min(interval, remaining))
+            except asyncio.TimeoutError:
+                # 收到临时响应后INVITE不再重发
+                if not provisional:
+                    self.transport.sendto(data, self.server)
+                interval = min(interval * 2, T2)
+                continue
+            if message.status >= 200:
+                return message, time.perf_counter() - started
+            provisional = True
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.failures = 0
+
+    def add(self, response, latency, expected=200):
+        if response is None or response.status != expected:
+            self.failures += 1
+        else:
+            self.latencies.append(latency)
+
+
+async def register_flow(client, index, args, results):
+    user = str(args.first_user + index)
+    uri = f"sip:{user}@127.0.0.1"
+    call_id = f"reg-{index}-{os.urandom(4).hex()}"
+    tag = os.urandom(4).hex()
+    client.queues[call_id] = asyncio.Queue()
+    try:
+        response, latency = await client.transaction(
+            client.build("REGISTER", "sip:127.0.0.1", call_id, 1, tag, extra=["Expires: 300"],
+                         to_uri=uri),
+            call_id, args.timeout)
+        results.add(response, latency, 401)
+        if response is None or response.status != 401:
+            return
+        challenge = parse_auth(response.header("www-authenticate"))
+        cnonce = os.urandom(4).hex()
+        digest = digest_response(user, challenge["realm"], args.password, "REGISTER", "sip:127.0.0.1",
+                                 challenge["nonce"], "auth", "00000001", cnonce)
+        authorization = (f'Authorization: Digest username="{user}", realm="{challenge["realm"]}", '
+                         f'nonce="{challenge["nonce"]}", uri="sip:127.0.0.1", response="{digest}", '
+                         f'algorithm=MD5, cnonce="{cnonce}", qop=auth, nc=00000001')
+        data = client.build("REGISTER", "sip:127.0.0.1", call_id, 2, tag,
+                            extra=["Expires: 300", authorization], to_uri=uri)
+        results.add(*await client.transaction(data, call_id, args.timeout))
+    finally:
+        del client.queues[call_id]
+
+
+async def call_flow(client, index, args, results):
+    uri = f"sip:{args.first_user + index}@127.0.0.1"
+    call_id = f"call-{index}-{os.urandom(4).hex()}"
+    tag = os.urandom(4).hex()
+    client.queues[call_id] = asyncio.Queue()
+    try:
+        response, latency = await client.transaction(client.build("INVITE", uri, call_id, 1, tag),
+                                                     call_id, args.timeout)
+        results.add(response, latency)
+        if response is None or response.status != 200:
+            return
+        to_tag = response.header("to").split("tag=", 1)[1]
+        client.transport.sendto(client.build("ACK", uri, call_id, 1, tag, to_tag), client.server)
+        results.add(*await client.transaction(client.build("BYE", uri, call_id, 2, tag, to_tag),
+                                              call_id, args.timeout))
+    finally:
+        del client.queues[call_id]
+
+
+async def run_flows(flow, count, client, args):
+    """以固定并发窗口运行count个流程，返回 (结果, 总耗时)"""
+    results = Results()
+    semaphore = asyncio.Semaphore(args.window)
+
+    async def one(index):
+        async with semaphore:
+            await flow(client, index, args, results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return results, time.perf_counter() - started
+
+
+def summarize(title, results, seconds):
+    values = sorted(results.latencies)
+    transactions = len(values) + results.failures
+    line = f"{title}: {transactions}个事务, {transactions / seconds:.0f} 事务/秒, 失败 {results.failures}"
+    if values:
+        pick = lambda fraction: values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+        line += f", p50 {pick(0.5):.2f} ms, p99 {pick(0.99):.2f} ms, 最大 {values[-1] * 1000:.2f} ms"
+    print(line)
+
+
+async def bench(args):
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        lambda: BenchClient(("127.0.0.1", args.port)), local_addr=("127.0.0.1", 0))
+    try:
+        summarize("注册(含401质询)", *await run_flows(register_flow, args.registers, client, args))
+        summarize("呼叫(INVITE+BYE)", *await run_flows(call_flow, args.calls, client, args))
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地SIP注册服务器吞吐量测试")
+    parser.add_argument("--registers", type=int, default=5000, help="注册流程数")
+    parser.add_argument("--calls", type=int, default=5000, help="呼叫流程数")
+    parser.add_argument("--window", type=int, default=100, help="同时进行的流程数")
+    parser.add_argument("--port", type=int, default=25090, help="服务器端口")
+    parser.add_argument("--first-user", type=int, default=1000, help="第一个用户名")
+    parser.add_argument("--password", default="1234", help="密码")
+    parser.add_argument("--timeout", type=float, default=5.0, help="每个事务的超时(秒)")
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "tools.sip_registrar", "--host", "127.0.0.1", "--port", str(args.port),
+         "--password", args.password, "--ring-delay", "0", "--answer-delay", "0",
+         "--stats-interval", "0"],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        # 等待服务器绑定端口
+        print(server.stdout.readline().strip())
+        asyncio.run(bench(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志查询测试
+
+用StructuredSink写出指定大小的结构化日志(多个呼叫交错进行，夹杂不属于呼叫的
+背景输出，按大小归档为多个文件)，然后比较按Call-ID取出一个呼叫的全部行时
+使用索引与逐行扫描的耗时，并测量按时间范围读取一分钟日志的耗时。
+
+用法:
+    python -m tools.bench_structured_log [--megabytes N] [--concurrent N] [--dir DIR]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.structured_log import StructuredSink, StructuredRecord, StructuredLogReader, OUTPUT
+from utils.log_sink import BLOCK
+from utils.log_store import DEBUG, INFO
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+# 每个呼叫的行数，以及每行呼叫输出之间夹杂的背景输出行数
+CALL_LINES = 40
+CHATTER_PER_LINE = 3
+
+
+def generate(directory, megabytes, concurrent, lines, rate):
+    """
+    写出约megabytes MB的日志，模拟时刻从现在往前推，每秒rate行
+
+    Returns:
+        tuple: (写出的呼叫Call-ID列表, 起始时刻, 写入秒数, sink)
+    """
+    sink = StructuredSink(directory, max_bytes=256 * 1024 * 1024, backups=1000,
+                          queue_size=100_000, policy=BLOCK, block_timeout=60)
+    target = megabytes * 1024 * 1024
+    average = sum(len(line) for line in lines) / len(lines) + 150  # JSON字段的开销
+    total = int(target / average)
+    started = time.time() - total / rate
+    active = {}  # Call-ID -> 已输出的行数
+    next_call = 0
+    call_ids = []
+    batch = []
+    begin = time.perf_counter()
+    for index in range(total):
+        wall = started + index / rate
+        if index % (CHATTER_PER_LINE + 1):
+            call_id, level, event = None, DEBUG, OUTPUT
+        else:
+            while len(active) < concurrent:
+                call_id = f"{next_call:08x}-{random.getrandbits(32):08x}@10.20.25.111"
+                active[call_id] = 0
+                call_ids.append(call_id)
+                next_call += 1
+            call_id = random.choice(list(active))
+            active[call_id] += 1
+            if active[call_id] >= CALL_LINES:
+                del active[call_id]
+            level, event = INFO, "sip_message"
+        batch.append(StructuredRecord(wall - started, wall, level, "1000@10.20.25.111", call_id,
+                                      event, "pjsua", lines[index % len(lines)]))
+        if len(batch) >= 500:
+            sink.put_many(batch)
+            batch = []
+    sink.put_many(batch)
+    sink.flush()
+    seconds = time.perf_counter() - begin
+    return call_ids, started, seconds, sink
+
+
+def timed(func, repeat=5):
+    """多次执行取中位数(毫秒)和最后一次的结果"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - begin) * 1000)
+    times.sort()
+    return times[len(times) // 2], result
+
+
+def run(directory, args):
+    with open(args.transcript, encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    call_ids, started, seconds, sink = generate(directory, args.megabytes, args.concurrent,
+                                                lines, args.rate)
+    sink.close()
+    reader = StructuredLogReader(directory)
+    files = reader.files()
+    size = sum(os.path.getsize(path) for path in files)
+    index_size = sum(os.path.getsize(path + ".idx") for path in files if os.path.exists(path + ".idx"))
+    print(f"写出 {sink.written:,}行 {size / 1e6:,.0f} MB ({len(files)}个文件, 索引 {index_size / 1e6:.1f} MB), "
+          f"{len(call_ids):,}个呼叫, {sink.written / seconds:,.0f} 行/秒")
+
+    samples = [call_ids[len(call_ids) // 10], call_ids[len(call_ids) // 2], call_ids[-10]]
+    for call_id in samples:
+        milliseconds, rows = timed(lambda: reader.call(call_id))
+        print(f"按索引取出 {call_id}: {len(rows)}行 {milliseconds:.2f} ms")
+    milliseconds, rows = timed(lambda: reader.scan(samples[1]), repeat=1)
+    print(f"逐行扫描取出 {samples[1]}: {len(rows)}行 {milliseconds:,.0f} ms")
+
+    middle = started + sink.written / args.rate / 2
+    milliseconds, rows = timed(lambda: reader.between(middle, middle + 60))
+    print(f"按时间范围取出1分钟: {len(rows):,}行 {milliseconds:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结构化日志查询测试")
+    parser.add_argument("--megabytes", type=int, default=1024, help="写出的日志大小(MB)")
+    parser.add_argument("--concurrent", type=int, default=50, help="同时进行的呼叫数")
+    parser.add_argument("--rate", type=int, default=2000, help="模拟的每秒行数")
+    parser.add_argument("--dir", help="日志目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    args = parser.parse_args()
+
+    if args.dir:
+        run(args.dir, args)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            run(directory, args)
+
+
+if __name__ == "__main__":
+    main()
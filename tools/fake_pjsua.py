@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模拟pjsua
+
+在没有pjsua可执行文件的环境中模拟其标准输出和控制台命令，用于基准测试和调试。
+
+用法:
+    python tools/fake_pjsua.py --flood 100000 [--transcript FILE] [--corrupt]
+        尽可能快地输出录制的pjsua日志，共输出指定行数后退出；
+        --corrupt 在输出中夹杂非法字节，用于检验读取端的容错
+
+    python tools/fake_pjsua.py [--id=sip:1000@host [--next-account --id=sip:1001@host ...]]
+                               [--startup-delay S] [--register-delay S] [--answer-delay S]
+                               [--answer-ratio R] [--stamp] [--scenario FILE] [其他场景选项]
+        控制台模式: 启动后模拟各账号注册成功(不指定--id时不带账号启动，与pjsua相同)，
+        注册和呼叫过程中按4级日志格式输出收发SIP消息的TX/RX行，
+        并从标准输入接受pjsua的控制台命令
+        (m 拨号、h 挂断、d 显示账号、ru 注销、+a/-a 增删账号、</> 切换当前账号、q 退出)；
+        输入提示与pjsua一样不换行；
+        --answer-ratio 对方接听的比例，其余呼叫在响铃后以--fail-status结束；
+        --stamp 在事件行末尾附加输出时刻 (t=<time.time()>)，用于测量读取端延迟
+
+场景文件(JSON)以选项名(下划线形式)为键设置上述及以下选项的默认值，命令行
+指定的选项优先，可重复运行同一场景进行对比:
+    register_status   注册的响应码，非200时输出注册失败
+    fail_status       未接听的呼叫结束时的响应码
+    hangup_after      接通后多久由对方挂断(秒)，0为不挂断
+    command_delay     处理每条控制台命令前的延迟(秒)
+    chatter_rate      每秒输出的背景日志行数(取自录制的4级日志，不含事件行)
+    exit_after        启动后多久异常退出(秒)，0为不退出；exit_code 为返回码
+    timeline          [{"at": 秒, "sender": "pjsua_core.c", "text": "..."}] 按时刻输出的附加行
+    description/expect 场景说明和预期结果，供tools.bench_flow使用，模拟pjsua忽略
+场景示例见 tools/data/scenarios/。
+"""
+
+import os
+import re
+import sys
+import stat
+import time
+import json
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pjsua_parser import PjsuaLineClassifier
+
+DEFAULT_TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "data", "pjsua_transcript.log")
+
+# 常见SIP响应码的原因短语
+REASONS = {
+    200: "OK", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 408: "Request Timeout",
+    480: "Temporarily Unavailable", 486: "Busy Here", 487: "Request Terminated",
+    500: "Server Internal Error", 503: "Service Unavailable", 603: "Decline",
+}
+
+# 只在场景文件中使用的键
+SCENARIO_ONLY_KEYS = ("timeline", "description", "expect")
+
+_clock_pattern = re.compile(r"^\d\d:\d\d:\d\d\.\d{3}")
+
+
+def wrapper_script(directory, *options):
+    """
+    生成启动模拟pjsua的可执行脚本，引擎以单个路径启动pjsua
+
+    Args:
+        directory: 脚本所在目录
+        options: 附加的模拟pjsua参数，如 "--startup-delay=0.5"
+
+    Returns:
+        str: 脚本路径
+    """
+    script = os.path.abspath(__file__)
+    args = " ".join([f'"{sys.executable}" "{script}"', *options])
+    if sys.platform == "win32":
+        path = os.path.join(directory, "fake_pjsua.cmd")
+        with open(path, "w") as f:
+            f.write(f"@{args} %*\n")
+    else:
+        path = os.path.join(directory, "fake_pjsua")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec {args} "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def flood(transcript, total_lines, corrupt=False):
+    """循环输出录制的日志，直到输出total_lines行"""
+    with open(transcript, "rb") as f:
+        sample = f.read().splitlines(keepends=True)
+    if corrupt:
+        sample[len(sample) // 2] = b"\xff\xfe\x80 garbled output\n"
+    out = sys.stdout.buffer
+    written = 0
+    while written < total_lines:
+        chunk = sample[:total_lines - written]
+        out.write(b"".join(chunk))
+        written += len(chunk)
+    out.flush()
+
+
+def load_scenario(path):
+    """
+    读取场景文件
+
+    Returns:
+        tuple: (选项默认值字典, 附加输出行列表)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        scenario = json.load(f)
+    timeline = scenario.get("timeline", [])
+    options = {key: value for key, value in scenario.items() if key not in SCENARIO_ONLY_KEYS}
+    return options, timeline
+
+
+def clock_text(now):
+    """pjsua日志的时刻格式 HH:MM:SS.mmm"""
+    return time.strftime("%H:%M:%S", time.localtime(now)) + f".{int(now * 1000) % 1000:03d}"
+
+
+def chatter_lines(transcript):
+    """录制日志中不会被解析为事件的行，用作背景输出"""
+    classifier = PjsuaLineClassifier()
+    with open(transcript, "r", encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f]
+    # 状态变化行也排除，避免预热池误判就绪
+    return [line for line in lines if line.strip() and "state changed" not in line
+            and classifier.classify(line)[0] is None]
+
+
+class FakeConsole:
+    """模拟pjsua控制台的命令处理"""
+
+    def __init__(self, accounts, options):
+        """
+        初始化模拟控制台
+
+        Args:
+            accounts: 账号URI列表，如 ["sip:1000@10.20.25.111"]
+            options: 命令行参数(已合并场景文件)，各项含义见模块说明和main中的参数定义
+        """
+        # 账号ID -> URI，与pjsua一样从1开始编号(0为本地账号)
+        self.accounts = {index: uri for index, uri in enumerate(accounts, 1)}
+        self.next_acc_id = len(accounts) + 1
+        self.current_acc = 1
+        self.options = options
+        self.register_delay = options.register_delay
+        self.startup_delay = options.startup_delay
+        self.ring_delay = options.ring_delay
+        self.answer_delay = options.answer_delay
+        self.answer_ratio = options.answer_ratio
+        self.stamp = options.stamp
+        self.next_call_id = 0
+        self.current_call = None
+        self.dialog = 0  # 最近一个呼叫的序号，用于SIP报文的Call-ID
+        self.out = sys.stdout
+        # 背景输出、对方挂断和附加行在其他线程中输出，与命令处理共用一把锁
+        self._lock = threading.RLock()
+        self._hangup_timer = None
+
+    def write(self, text):
+        """输出文本(线程安全)"""
+        with self._lock:
+            self.out.write(text)
+            self.out.flush()
+
+    def emit(self, sender, text, event=False):
+        """按pjsua日志格式输出一行"""
+        now = time.time()
+        line = f"{clock_text(now)} {sender:>23}  {text}"
+        if event and self.stamp:
+            line += f" (t={now:.6f})"
+        self.write(line + "\n")
+
+    def sip(self, direction, summary, cseq, method):
+        """
+        按4级日志格式输出一条收发SIP消息的行
+
+        Args:
+            direction: "TX" 或 "RX"
+            summary: 请求方法或响应码，如 "INVITE"、"180"
+            cseq: CSeq序号
+            method: CSeq中的方法
+        """
+        kind = "Response" if summary.isdigit() else "Request"
+        text = f"{summary}/{method}" if kind == "Response" else method
+        peer = "to" if direction == "TX" else "from"
+        # 报文正文只保留Call-ID头，注册和呼叫各用一个Call-ID
+        call_id = f"reg-{os.getpid()}" if method == "REGISTER" else f"call{self.dialog}-{os.getpid()}"
+        line = (f"{clock_text(time.time())} {'pjsua_core.c':>23}  .{direction} {300 + 40 * cseq} bytes "
+                f"{kind} msg {text}/cseq={cseq} ({'tdta' if direction == 'TX' else 'rdata'}0x7f3c{cseq:04x}) "
+                f"{peer} UDP 127.0.0.1:5060:")
+        self.write(f"{line}\nCall-ID: {call_id}\nCSeq: {cseq} {method}\n--end msg--\n")
+
+    def prompt(self, text):
+        """输出不换行的输入提示"""
+        self.write(f"{text}: ")
+
+    def register(self, uri):
+        """模拟一个账号注册，场景指定非200的响应码时注册失败"""
+        status = self.options.register_status
+        self.sip("RX", "401", 1, "REGISTER")
+        self.sip("TX", "REGISTER", 2, "REGISTER")
+        self.sip("RX", str(status), 2, "REGISTER")
+        if status != 200:
+            self.emit("pjsua_acc.c", f"....{uri}: registration failed, status={status} "
+                                     f"({REASONS.get(status, 'Error')})", event=True)
+            return
+        self.emit("pjsua_acc.c", f"....{uri}: registration success, status=200 (OK), "
+                                 "will re-register in 300 seconds", event=True)
+
+    def start_background(self, timeline):
+        """启动背景输出、附加行和异常退出的线程"""
+        options = self.options
+        if options.chatter_rate > 0:
+            threading.Thread(target=self._chatter, args=(chatter_lines(options.transcript),),
+                             daemon=True).start()
+        for item in timeline:
+            timer = threading.Timer(float(item.get("at", 0)), self.emit,
+                                    (item.get("sender", "pjsua_app.c"), item.get("text", "")))
+            timer.daemon = True
+            timer.start()
+        if options.exit_after > 0:
+            timer = threading.Timer(options.exit_after, self._crash)
+            timer.daemon = True
+            timer.start()
+
+    def _chatter(self, lines):
+        """按chatter_rate每秒输出若干行录制日志，每10ms补齐一次"""
+        if not lines:
+            return
+        rate = self.options.chatter_rate
+        started = time.monotonic()
+        written = 0
+        index = 0
+        while True:
+            due = int((time.monotonic() - started) * rate) - written
+            if due > 0:
+                clock = clock_text(time.time())
+                chunk = []
+                for _ in range(due):
+                    line = lines[index % len(lines)]
+                    index += 1
+                    chunk.append(_clock_pattern.sub(clock, line))
+                self.write("\n".join(chunk) + "\n")
+                written += due
+            time.sleep(0.01)
+
+    def _crash(self):
+        """模拟pjsua异常退出"""
+        with self._lock:
+            self.out.flush()
+            os._exit(self.options.exit_code)
+
+    def startup(self):
+        """模拟启动和注册"""
+        self.emit("pjsua_core.c", ".PJSUA state changed: NULL --> CREATED")
+        time.sleep(self.startup_delay)
+        for uri in self.accounts.values():
+            self.emit("pjsua_acc.c", f"Adding account: id={uri}")
+        self.emit("pjsua_core.c", ".PJSUA state changed: STARTING --> RUNNING")
+        for uri in self.accounts.values():
+            self.sip("TX", "REGISTER", 1, "REGISTER")
+        if self.accounts:
+            time.sleep(self.register_delay)
+        for uri in self.accounts.values():
+            self.register(uri)
+
+    def make_call(self, uri):
+        """模拟拨号"""
+        if not uri.startswith("sip:"):
+            self.emit("pjsua_call.c", "Unable to make call: Invalid URI (PJSIP_EINVALIDURI) "
+                                      "[status=171039]", event=True)
+            return
+        call_id = self.next_call_id
+        self.next_call_id += 1
+        self.current_call = call_id
+        self.dialog = call_id
+        self.emit("pjsua_call.c", f"Making call with acc #{self.current_acc} to {uri}", event=True)
+        self.emit("pjsua_call.c", ".Sending INVITE request", event=True)
+        self.sip("TX", "INVITE", 1, "INVITE")
+        self.sip("RX", "100", 1, "INVITE")
+        time.sleep(self.ring_delay)
+        self.sip("RX", "180", 1, "INVITE")
+        self.emit("pjsua_app.c", f".......Call {call_id} state changed to EARLY (180 Ringing)", event=True)
+        time.sleep(self.answer_delay)
+        if random.random() >= self.answer_ratio:
+            status = self.options.fail_status
+            self.current_call = None
+            self.sip("RX", str(status), 1, "INVITE")
+            self.sip("TX", "ACK", 1, "ACK")
+            self.emit("pjsua_app.c", f"......Call {call_id} state changed to DISCONNECTED "
+                                     f"[reason={status} ({REASONS.get(status, 'Error')})]", event=True)
+            return
+        self.sip("RX", "200", 1, "INVITE")
+        self.sip("TX", "ACK", 1, "ACK")
+        self.emit("pjsua_app.c", f".......Call {call_id} state changed to CONFIRMED", event=True)
+        if self.options.hangup_after > 0:
+            self._hangup_timer = threading.Timer(self.options.hangup_after, self.remote_hangup, (call_id,))
+            self._hangup_timer.daemon = True
+            self._hangup_timer.start()
+
+    def hangup(self):
+        """模拟挂断"""
+        with self._lock:
+            if self.current_call is None:
+                self.write("No current call\n")
+                return
+            call_id, self.current_call = self.current_call, None
+            if self._hangup_timer is not None:
+                self._hangup_timer.cancel()
+            self.sip("TX", "BYE", 2, "BYE")
+            self.emit("pjsua_call.c", ".BYE sent", event=True)
+            self.sip("RX", "200", 2, "BYE")
+            self.emit("pjsua_app.c", f"......Call {call_id} state changed to DISCONNECTED "
+                                     "[reason=200 (Normal call clearing)]", event=True)
+
+    def remote_hangup(self, call_id):
+        """模拟对方挂断"""
+        with self._lock:
+            if self.current_call != call_id:
+                return
+            self.current_call = None
+            self.sip("RX", "BYE", 2, "BYE")
+            self.sip("TX", "200", 2, "BYE")
+            self.emit("pjsua_app.c", f"......Call {call_id} state changed to DISCONNECTED "
+                                     "[reason=200 (Normal call clearing)]", event=True)
+
+    def dump_accounts(self):
+        """模拟d命令"""
+        lines = ["Account list:", "  [ 0] <sip:127.0.0.1:5060>: does not register"]
+        for acc_id, uri in self.accounts.items():
+            marker = "*" if acc_id == self.current_acc else " "
+            lines += [f" {marker}[{acc_id:2d}] {uri}: 200/OK (expires=299)", "       Online status: Online"]
+        lines += ["Buddy list:", " -none-"]
+        self.write("\n".join(lines) + "\n")
+
+    def cycle_account(self, step):
+        """模拟>和<命令: 按ID顺序切换当前账号"""
+        ids = sorted(self.accounts)
+        if not ids:
+            return
+        index = ids.index(self.current_acc) if self.current_acc in ids else -1
+        self.current_acc = ids[(index + step) % len(ids)]
+        self.emit("pjsua_app.c", f"Current account changed to {self.current_acc}", event=True)
+
+    def add_account(self, answers):
+        """模拟+a命令，answers为依次输入的URI、注册服务器、认证域、用户名和密码"""
+        uri = answers[0]
+        acc_id = self.next_acc_id
+        self.next_acc_id += 1
+        self.accounts[acc_id] = uri
+        self.emit("pjsua_acc.c", f"Account {uri} added with id {acc_id}")
+        self.sip("TX", "REGISTER", 1, "REGISTER")
+        time.sleep(self.register_delay)
+        self.register(uri)
+
+    def remove_account(self, text):
+        """模拟-a命令"""
+        try:
+            acc_id = int(text)
+        except ValueError:
+            self.write("Invalid input\n")
+            return
+        uri = self.accounts.pop(acc_id, None)
+        if uri is None:
+            self.write("Invalid account id\n")
+            return
+        self.emit("pjsua_acc.c", f"{uri}: unregistration success", event=True)
+        if self.current_acc == acc_id:
+            self.current_acc = min(self.accounts, default=0)
+
+    def run(self, stdin=None, timeline=()):
+        """处理控制台命令直到q或标准输入关闭"""
+        stdin = stdin or sys.stdin
+        self.start_background(timeline)
+        self.startup()
+        # 等待输入的提示: (剩余提示, 已输入的内容, 输入完成后的处理)
+        pending = None
+        for raw in stdin:
+            command = raw.strip()
+            if self.options.command_delay > 0:
+                time.sleep(self.options.command_delay)
+            if pending is not None:
+                prompts, answers, done = pending
+                if not command or command == "q":
+                    pending = None
+                    continue
+                answers.append(command)
+                if prompts:
+                    self.prompt(prompts.pop(0))
+                else:
+                    pending = None
+                    done(answers)
+                continue
+            if command == "m":
+                self.prompt("Make call")
+                pending = ([], [], lambda answers: self.make_call(answers[0]))
+            elif command == "+a":
+                prompts = ["URL of the registrar", "Auth Realm", "Auth Username", "Auth Password"]
+                self.prompt("Your SIP URL (empty to cancel)")
+                pending = ([f"{p} (empty to cancel)" for p in prompts], [], self.add_account)
+            elif command == "-a":
+                self.prompt("Enter account ID to delete")
+                pending = ([], [], lambda answers: self.remove_account(answers[0]))
+            elif command in (">", "<"):
+                self.cycle_account(1 if command == ">" else -1)
+            elif command == "h":
+                self.hangup()
+            elif command == "d":
+                self.dump_accounts()
+            elif command == "ru":
+                uri = self.accounts.get(self.current_acc)
+                if uri:
+                    self.emit("pjsua_acc.c", f"{uri}: unregistration success", event=True)
+            elif command == "q":
+                if self.current_call is not None:
+                    self.hangup()
+                self.emit("pjsua_core.c", "PJSUA destroyed...")
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟pjsua输出")
+    parser.add_argument("--flood", type=int, metavar="N", help="快速输出N行录制日志后退出")
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT, help="录制的pjsua输出文件")
+    parser.add_argument("--corrupt", action="store_true", help="在输出中夹杂非法字节")
+    parser.add_argument("--id", action="append", help="账号URI (与pjsua相同，多个账号以--next-account分隔)")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="模拟初始化的延迟(秒)")
+    parser.add_argument("--register-delay", type=float, default=0.05, help="注册成功前的延迟(秒)")
+    parser.add_argument("--ring-delay", type=float, default=0.05, help="对方响铃前的延迟(秒)")
+    parser.add_argument("--answer-delay", type=float, default=0.1, help="对方接听前的延迟(秒)")
+    parser.add_argument("--answer-ratio", type=float, default=1.0, help="对方接听的比例(0~1)")
+    parser.add_argument("--next-account", action="store_true", help="开始下一个账号的参数")
+    parser.add_argument("--version", action="version", version="PJ_VERSION: 2.14.1 (模拟pjsua)")
+    parser.add_argument("--stamp", action="store_true", help="在事件行末尾附加输出时刻")
+    parser.add_argument("--scenario", help="场景文件(JSON)，设置以下选项的默认值")
+    parser.add_argument("--register-status", type=int, default=200, help="注册的响应码")
+    parser.add_argument("--fail-status", type=int, default=486, help="未接听的呼叫结束时的响应码")
+    parser.add_argument("--hangup-after", type=float, default=0.0, help="接通后多久由对方挂断(秒)")
+    parser.add_argument("--command-delay", type=float, default=0.0, help="处理每条命令前的延迟(秒)")
+    parser.add_argument("--chatter-rate", type=float, default=0.0, help="每秒输出的背景日志行数")
+    parser.add_argument("--exit-after", type=float, default=0.0, help="启动后多久异常退出(秒)")
+    parser.add_argument("--exit-code", type=int, default=1, help="异常退出的返回码")
+    # 接受并忽略pjsua的其他参数，便于直接替换pjsua路径
+    args, _ = parser.parse_known_args()
+
+    timeline = []
+    if args.scenario:
+        defaults, timeline = load_scenario(args.scenario)
+        unknown = [key for key in defaults if not hasattr(args, key)]
+        if unknown:
+            parser.error(f"场景文件中有未知的选项: {', '.join(unknown)}")
+        # 场景设置默认值，命令行指定的选项仍然优先
+        parser.set_defaults(**defaults)
+        args, _ = parser.parse_known_args()
+
+    if args.flood:
+        flood(args.transcript, args.flood, args.corrupt)
+        return
+
+    accounts = [re.sub(r"^<|>$", "", uri) for uri in (args.id or [])]
+    FakeConsole(accounts, args).run(timeline=timeline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SIP负载生成器
+
+从CSV读取账号，每个账号启动一个无界面的SIP引擎实例(各自一个pjsua进程)，
+按设定的速率依次注册，然后在设定的时长内按目标速率发起呼叫：同时进行的
+呼叫数不超过并发上限，接通后保持设定的时长再挂断。结束时报告注册耗时的
+百分位数、实际呼叫速率(CPS)、接通率和各类失败次数。
+
+默认使用模拟pjsua在本机完成注册和呼叫，不需要SIP服务器；
+指定--pjsua和--server可对真实的PBX施压。
+
+CSV格式(可带表头): username,password[,server[,destination]]
+不指定CSV时按--instances生成账号，每个账号呼叫下一个账号。
+
+用法:
+    python -m tools.loadgen [--accounts FILE | --instances N] [--cps R] [--concurrency N]
+                            [--hold S] [--duration S] [--pjsua PATH --server HOST]
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sip_engine import SIPEngine, SIPEngineListener
+from core.pjsua_utils import PJSUAUtils
+from tools.fake_pjsua import wrapper_script
+
+
+class LoadLogger:
+    """为每个实例的日志加上账号前缀，写入日志文件或丢弃"""
+
+    def __init__(self, stream=None, prefix=""):
+        self.stream = stream
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    def child(self, prefix):
+        child = LoadLogger(self.stream, prefix)
+        child._lock = self._lock
+        return child
+
+    def log(self, message):
+        if self.stream is None:
+            return
+        line = f"[{time.strftime('%H:%M:%S')}] {self.prefix}{message}\n"
+        with self._lock:
+            self.stream.write(line)
+
+
+def percentile(values, fraction):
+    """已排序列表的百分位数(最近秩)"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class LoadStats:
+    """各实例共享的统计，可在任意线程更新"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.registered = []        # 注册耗时(秒)
+        self.register_failures = 0
+        self.attempts = 0
+        self.answered = 0
+        self.rejected = 0           # 对方未接听(忙、拒绝等)
+        self.failed = 0             # 拨号失败
+        self.timeouts = 0           # 超时未接通
+        self.throttled = 0          # 因并发上限或没有空闲账号而未发起
+        self.setup_times = []       # 从拨号到接通的耗时(秒)
+        self.active = 0
+        self.peak_active = 0
+
+    def register_done(self, latency):
+        with self._lock:
+            if latency is None:
+                self.register_failures += 1
+            else:
+                self.registered.append(latency)
+
+    def call_started(self):
+        with self._lock:
+            self.attempts += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def call_answered(self, setup_time):
+        with self._lock:
+            self.answered += 1
+            self.setup_times.append(setup_time)
+
+    def call_finished(self, outcome):
+        """outcome: answered / rejected / failed / timeout"""
+        with self._lock:
+            self.active -= 1
+            if outcome != "answered":
+                setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def throttle(self):
+        with self._lock:
+            self.throttled += 1
+
+    def report(self, call_seconds):
+        """返回报告文本"""
+        lines = []
+        registered = sorted(self.registered)
+        total = len(registered) + self.register_failures
+        lines.append(f"注册: 成功 {len(registered)}/{total}, 失败 {self.register_failures}")
+        if registered:
+            lines.append("注册耗时: " + self._percentiles(registered))
+        cps = self.attempts / call_seconds if call_seconds > 0 else 0.0
+        ratio = self.answered / self.attempts * 100 if self.attempts else 0.0
+        lines.append(f"呼叫: 发起 {self.attempts} 次 ({cps:.2f} CPS), 接通 {self.answered} 次 "
+                     f"(接通率 {ratio:.1f}%), 未接听 {self.rejected}, 拨号失败 {self.failed}, "
+                     f"超时 {self.timeouts}, 未发起 {self.throttled}, 最大并发 {self.peak_active}")
+        if self.setup_times:
+            lines.append("接通耗时: " + self._percentiles(sorted(self.setup_times)))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _percentiles(values):
+        parts = [f"p{int(p * 100)} {percentile(values, p) * 1000:.0f} ms" for p in (0.5, 0.9, 0.99)]
+        return ", ".join(parts) + f", 最大 {values[-1] * 1000:.0f} ms"
+
+
+class LoadInstance(SIPEngineListener):
+    """一个账号的SIP引擎实例"""
+
+    def __init__(self, account, pjsua_utils, stats, logger, args):
+        """
+        创建引擎
+
+        Args:
+            account: {'username', 'password', 'server', 'destination'}
+            pjsua_utils: 各实例共用的PJSUA工具(共享端口分配和检测缓存)
+            stats: 共享统计
+            logger: 实例日志
+            args: 命令行参数
+        """
+        self.account = account
+        self.stats = stats
+        self.hold_ms = int(args.hold * 1000)
+        self.call_timeout_ms = int(args.call_timeout * 1000)
+        self.engine = SIPEngine(pjsua_utils, log=logger.log)
+        self.engine.add_listener(self)
+
+        self.login_started = None
+        self.registered = False
+        self.login_done = threading.Event()
+        self.stopped = threading.Event()
+        # 当前呼叫: [拨号时刻, 是否接通, 是否已计入结果]，只在引擎的调度线程中读写
+        self.call = None
+        self._call_serial = 0
+        # 从请求拨号到呼叫结束期间置位，主线程据此判断实例是否空闲
+        self.busy = threading.Event()
+
+    @property
+    def idle(self):
+        return self.registered and not self.busy.is_set()
+
+    def login(self, pjsua_path, port):
+        account = self.account
+        self.login_started = time.monotonic()
+        self.engine.login(account['server'], account['username'], account['password'],
+                          pjsua_path, port)
+
+    def place_call(self):
+        """发起一次呼叫(只记下请求时刻，呼叫的登记和拨号都在引擎的调度线程中进行)"""
+        self.busy.set()
+        self.stats.call_started()
+        self.engine.scheduler.call_soon(self._dial, time.monotonic())
+
+    def stop(self):
+        """注销并停止pjsua"""
+        if self.engine.process:
+            self.engine.unregister()
+        else:
+            self.stopped.set()
+
+    def _dial(self, requested_at):
+        self.call = [requested_at, False, False]
+        self._call_serial += 1
+        self.engine.make_call(self.account['destination'], self.account['server'])
+        self.engine.scheduler.after(self.call_timeout_ms, self._check_timeout, self._call_serial)
+
+    def _check_timeout(self, serial):
+        """超时仍未接通时挂断并计为超时"""
+        call = self.call
+        if call is None or serial != self._call_serial or call[1]:
+            return
+        self._finish("timeouts")
+        self.engine.hangup()
+
+    def _finish(self, outcome):
+        call, self.call = self.call, None
+        if call is not None and not call[2]:
+            call[2] = True
+            self.stats.call_finished(outcome)
+            self.busy.clear()
+
+    # 引擎通知(在引擎的调度线程中调用)
+    def on_registered(self, server, username):
+        if self.login_started is not None:
+            self.stats.register_done(time.monotonic() - self.login_started)
+            self.login_started = None
+        self.registered = True
+        self.login_done.set()
+
+    def on_login_failed(self, reason):
+        if self.login_started is not None:
+            self.stats.register_done(None)
+            self.login_started = None
+        self.login_done.set()
+
+    def on_call_established(self):
+        call = self.call
+        if call is None or call[1]:
+            return
+        call[1] = True
+        self.stats.call_answered(time.monotonic() - call[0])
+        self.engine.scheduler.after(self.hold_ms, self.engine.hangup)
+
+    def on_call_failed(self, reason):
+        self._finish("failed")
+
+    def on_hangup_failed(self, reason):
+        self._finish("failed")
+
+    def on_call_ended(self):
+        call = self.call
+        self._finish("answered" if call is not None and call[1] else "rejected")
+
+    def on_unregistered(self):
+        self.registered = False
+        self.stopped.set()
+
+    def on_process_exited(self, returncode):
+        self.registered = False
+        if self.call is not None:
+            self._finish("failed")
+        self.login_done.set()
+        self.stopped.set()
+
+
+def load_accounts(path, default_server):
+    """读取CSV账号，缺少的服务器用默认值，缺少的被叫为下一个账号"""
+    accounts = []
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+    if rows and rows[0][0].strip().lower() == "username":
+        rows = rows[1:]
+    for row in rows:
+        row = [cell.strip() for cell in row] + [""] * 4
+        accounts.append({'username': row[0], 'password': row[1],
+                         'server': row[2] or default_server, 'destination': row[3]})
+    _default_destinations(accounts)
+    return accounts
+
+
+def generate_accounts(count, first_user, password, server):
+    accounts = [{'username': str(first_user + i), 'password': password,
+                 'server': server, 'destination': ""} for i in range(count)]
+    _default_destinations(accounts)
+    return accounts
+
+
+def _default_destinations(accounts):
+    for index, account in enumerate(accounts):
+        if not account['destination']:
+            account['destination'] = accounts[(index + 1) % len(accounts)]['username']
+
+
+def wait_all(events, timeout):
+    deadline = time.monotonic() + timeout
+    for event in events:
+        event.wait(max(0.0, deadline - time.monotonic()))
+
+
+def run(args, pjsua_path):
+    if args.accounts:
+        accounts = load_accounts(args.accounts, args.server)
+    else:
+        accounts = generate_accounts(args.instances, args.first_user, args.password, args.server)
+    if not accounts:
+        print("没有账号")
+        return
+
+    stream = open(args.log, "w", encoding="utf-8") if args.log else None
+    logger = LoadLogger(stream)
+    pjsua_utils = PJSUAUtils(logger.child("[PJSUA] "), cache_file=None)
+    stats = LoadStats()
+    instances = [LoadInstance(account, pjsua_utils, stats,
+                              logger.child(f"[{account['username']}] "), args)
+                 for account in accounts]
+    print(f"实例: {len(instances)}, pjsua: {args.pjsua or '模拟pjsua'}, 服务器: {args.server}")
+
+    try:
+        # 注册阶段: 按注册速率依次登录
+        for index, instance in enumerate(instances):
+            instance.login(pjsua_path, args.port + index)
+            time.sleep(1.0 / args.register_rate)
+        wait_all([instance.login_done for instance in instances], args.register_timeout)
+        ready = [instance for instance in instances if instance.registered]
+        print(f"已注册 {len(ready)}/{len(instances)}")
+
+        # 呼叫阶段: 按目标速率发起，受并发上限和空闲账号限制
+        started = time.monotonic()
+        next_at = started
+        cursor = 0
+        while ready and time.monotonic() - started < args.duration:
+            next_at += 1.0 / args.cps
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            if stats.active >= args.concurrency:
+                stats.throttle()
+                continue
+            for offset in range(len(ready)):
+                instance = ready[(cursor + offset) % len(ready)]
+                if instance.idle:
+                    cursor = (cursor + offset + 1) % len(ready)
+                    instance.place_call()
+                    break
+            else:
+                stats.throttle()
+        call_seconds = time.monotonic() - started
+
+        # 等待进行中的呼叫结束
+        deadline = time.monotonic() + args.hold + args.call_timeout + 2.0
+        while stats.active > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        for instance in instances:
+            instance.stop()
+        wait_all([instance.stopped for instance in instances], 10.0)
+        for instance in instances:
+            instance.engine.shutdown()
+        if stream:
+            stream.close()
+
+    print(stats.report(call_seconds))
+    print(f"本地端口分配: {pjsua_utils.port_allocator.report()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIP负载生成器")
+    parser.add_argument("--accounts", help="账号CSV文件: username,password[,server[,destination]]")
+    parser.add_argument("--instances", type=int, default=10, help="未指定CSV时生成的账号数")
+    parser.add_argument("--first-user", type=int, default=1000, help="生成账号的第一个用户名")
+    parser.add_argument("--password", default="1234", help="生成账号的密码")
+    parser.add_argument("--server", default="127.0.0.1", help="SIP服务器地址(CSV中未指定时)")
+    parser.add_argument("--pjsua", help="pjsua可执行文件，默认使用模拟pjsua")
+    parser.add_argument("--answer-ratio", type=float, default=0.9,
+                        help="模拟pjsua中对方接听的比例，仅用于模拟pjsua")
+    parser.add_argument("--port", type=int, default=26000, help="第一个实例的本地端口")
+    parser.add_argument("--register-rate", type=float, default=20.0, help="每秒注册的账号数")
+    parser.add_argument("--register-timeout", type=float, default=30.0, help="等待全部注册的最长时间(秒)")
+    parser.add_argument("--cps", type=float, default=5.0, help="目标呼叫速率(每秒呼叫数)")
+    parser.add_argument("--concurrency", type=int, default=5, help="同时进行的最大呼叫数")
+    parser.add_argument("--hold", type=float, default=1.0, help="接通后保持的时长(秒)")
+    parser.add_argument("--call-timeout", type=float, default=10.0, help="等待接通的最长时间(秒)")
+    parser.add_argument("--duration", type=float, default=10.0, help="呼叫阶段的时长(秒)")
+    parser.add_argument("--log", help="将各实例的日志写入此文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pjsua_path = args.pjsua or wrapper_script(directory, f"--answer-ratio={args.answer_ratio}")
+        run(args, pjsua_path)
+
+
+if __name__ == "__main__":
+    main()
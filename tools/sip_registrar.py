@@ -0,0 +1,693 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地SIP注册服务器/被叫模拟
+
+纯Python的asyncio UDP服务器，用来在没有网络和真实PBX的机器上测试和压测
+本客户端、pjsua及负载工具:
+    REGISTER: 以摘要认证(401 WWW-Authenticate)质询后接受注册，记录绑定
+    INVITE:   立即回100，按设定的延迟回180和200(带SDP)，可按比例以指定的
+              失败码拒绝；200在收到ACK前按RFC 3261重发
+    BYE:      以设定的响应码应答，也可在接通一段时间后由服务器主动发BYE
+    CANCEL:   对未接通的呼叫回200和487
+    OPTIONS:  200
+重发的请求按事务(Via branch)直接重发上次的响应。nonce无状态(时间戳+签名)，
+每个请求只做一次解析和最多一次MD5校验，单进程可处理每秒数千个事务。
+
+用法:
+    python -m tools.sip_registrar [--port 5060] [--users FILE | --password PW] [--no-auth]
+                                  [--ring-delay S] [--answer-delay S] [--fail-code 486 --fail-ratio R]
+                                  [--bye-after S] [--bye-response CODE]
+"""
+
+import os
+import re
+import csv
+import time
+import socket
+import random
+import asyncio
+import hashlib
+import argparse
+
+SERVER_NAME = "sip-client-registrar"
+
+# RFC 3261 定时器(秒)
+T1 = 0.5
+T2 = 4.0
+TRANSACTION_TTL = 64 * T1
+
+# 接收缓冲区大小，突发请求较多时避免丢包
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+# nonce有效期(秒)，过期后以stale=true重新质询
+NONCE_TTL = 300
+
+# 头域的紧凑形式
+COMPACT_HEADERS = {
+    "v": "via", "f": "from", "t": "to", "i": "call-id", "m": "contact",
+    "l": "content-length", "c": "content-type", "k": "supported",
+}
+
+REASONS = {
+    100: "Trying", 180: "Ringing", 200: "OK", 400: "Bad Request", 401: "Unauthorized",
+    403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+    407: "Proxy Authentication Required", 480: "Temporarily Unavailable",
+    481: "Call/Transaction Does Not Exist", 486: "Busy Here", 487: "Request Terminated",
+    500: "Server Internal Error", 503: "Service Unavailable", 603: "Decline",
+}
+
+ALLOW = "INVITE, ACK, CANCEL, BYE, OPTIONS, REGISTER"
+
+_branch_pattern = re.compile(r";\s*branch=([^;,\s]+)", re.I)
+_tag_pattern = re.compile(r";\s*tag=([^;,\s>]+)", re.I)
+_uri_pattern = re.compile(r"<([^>]+)>|(sips?:[^\s;,>]+)", re.I)
+_user_pattern = re.compile(r"sips?:([^@;>\s]+)@", re.I)
+_auth_param_pattern = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([^\s,]+))')
+_expires_pattern = re.compile(r";\s*expires=(\d+)", re.I)
+
+
+def md5_hex(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def digest_response(username, realm, password, method, uri, nonce, qop=None, nc=None, cnonce=None):
+    """计算摘要认证的response (RFC 2617, MD5)"""
+    ha1 = md5_hex(f"{username}:{realm}:{password}")
+    ha2 = md5_hex(f"{method}:{uri}")
+    if qop:
+        return md5_hex(f"{ha1}:{nonce}:{nc}:{cnonce}:{qop}:{ha2}")
+    return md5_hex(f"{ha1}:{nonce}:{ha2}")
+
+
+def parse_auth(value):
+    """解析 Digest k=v, ... 为字典"""
+    if not value or not value[:6].lower() == "digest":
+        return {}
+    return {name.lower(): unquoted or quoted
+            for name, quoted, unquoted in _auth_param_pattern.findall(value[6:])}
+
+
+def uri_of(value):
+    """取头域值中的URI(去掉尖括号和参数)"""
+    match = _uri_pattern.search(value or "")
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+def user_of(value):
+    match = _user_pattern.search(value or "")
+    return match.group(1) if match else None
+
+
+def set_receive_buffer(transport, size=RECEIVE_BUFFER):
+    """尽量增大UDP接收缓冲区(超过系统上限时由系统截断)"""
+    sock = transport.get_extra_info("socket")
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    except OSError:
+        pass
+
+
+class SipMessage:
+    """一个SIP请求或响应"""
+
+    __slots__ = ("method", "uri", "status", "reason", "headers", "body")
+
+    def __init__(self, method=None, uri=None, status=None, reason=None, headers=None, body=b""):
+        self.method = method
+        self.uri = uri
+        self.status = status
+        self.reason = reason
+        # [(小写头域名, 值), ...]，保留顺序和重复
+        self.headers = headers or []
+        self.body = body
+
+    @property
+    def is_request(self):
+        return self.method is not None
+
+    def header(self, name, default=None):
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return default
+
+    def all(self, name):
+        return [value for key, value in self.headers if key == name]
+
+    @property
+    def branch(self):
+        match = _branch_pattern.search(self.header("via", ""))
+        return match.group(1) if match else None
+
+    @property
+    def cseq(self):
+        """(序号, 方法)"""
+        parts = self.header("cseq", "").split()
+        try:
+            return int(parts[0]), parts[1].upper()
+        except (IndexError, ValueError):
+            return 0, ""
+
+    @classmethod
+    def parse(cls, data):
+        """
+        解析一个UDP数据报
+
+        Returns:
+            SipMessage: 格式不正确时返回None
+        """
+        head, sep, body = data.partition(b"\r\n\r\n")
+        if not sep:
+            head, sep, body = data.partition(b"\n\n")
+        lines = head.decode("utf-8", "replace").splitlines()
+        if not lines:
+            return None
+        first = lines[0].split(" ", 2)
+        if len(first) < 3:
+            return None
+        if first[0] == "SIP/2.0":
+            try:
+                message = cls(status=int(first[1]), reason=first[2])
+            except ValueError:
+                return None
+        elif first[2].startswith("SIP/2.0"):
+            message = cls(method=first[0].upper(), uri=first[1])
+        else:
+            return None
+
+        headers = message.headers
+        for line in lines[1:]:
+            if line[:1] in (" ", "\t") and headers:
+                # 折行
+                name, value = headers[-1]
+                headers[-1] = (name, f"{value} {line.strip()}")
+                continue
+            name, colon, value = line.partition(":")
+            if not colon:
+                continue
+            name = name.strip().lower()
+            headers.append((COMPACT_HEADERS.get(name, name), value.strip()))
+        message.body = body
+        return message
+
+
+class Dialog:
+    """服务器作为被叫的一个呼叫"""
+
+    __slots__ = ("call_id", "invite", "addr", "local_tag", "state", "timers", "cseq",
+                 "remote_target", "response", "answered_at")
+
+    def __init__(self, call_id, invite, addr, local_tag):
+        self.call_id = call_id
+        self.invite = invite
+        self.addr = addr
+        self.local_tag = local_tag
+        self.state = "proceeding"   # proceeding -> answered (等待ACK) -> confirmed -> terminated
+        self.timers = []
+        self.cseq = 1
+        self.remote_target = uri_of(invite.header("contact")) or uri_of(invite.header("from"))
+        self.response = None
+        self.answered_at = None
+
+    def cancel_timers(self):
+        for timer in self.timers:
+            timer.cancel()
+        self.timers = []
+
+
+class RegistrarStats:
+    """请求和响应计数"""
+
+    def __init__(self):
+        self.requests = {}
+        self.responses = {}
+        self.retransmissions = 0
+        self.malformed = 0
+        self.auth_failures = 0
+        self.transactions = 0
+        self._last = (time.monotonic(), 0)
+
+    def request(self, method):
+        self.requests[method] = self.requests.get(method, 0) + 1
+        if method != "ACK":
+            self.transactions += 1
+
+    def response(self, code):
+        self.responses[code] = self.responses.get(code, 0) + 1
+
+    def report(self, bindings, dialogs):
+        """返回自上次报告以来的事务速率和累计计数"""
+        now = time.monotonic()
+        last_time, last_count = self._last
+        rate = (self.transactions - last_count) / max(now - last_time, 1e-6)
+        self._last = (now, self.transactions)
+        requests = " ".join(f"{method}={count}" for method, count in sorted(self.requests.items()))
+        responses = " ".join(f"{code}={count}" for code, count in sorted(self.responses.items()))
+        return (f"{rate:.0f} 事务/秒, 注册 {bindings}, 呼叫 {dialogs}, 重发 {self.retransmissions}, "
+                f"认证失败 {self.auth_failures}, 格式错误 {self.malformed} | 请求 {requests} | 响应 {responses}")
+
+
+class RegistrarProtocol(asyncio.DatagramProtocol):
+    """注册服务器和被叫的UDP协议处理"""
+
+    def __init__(self, options, users=None, log=print):
+        """
+        Args:
+            options: 命令行参数(见build_parser)
+            users: 用户名 -> 密码；为None时所有用户使用options.password
+            log: 日志函数
+        """
+        self.options = options
+        self.users = users
+        self.log = log
+        self.stats = RegistrarStats()
+        self.transport = None
+        self.loop = None
+        self.secret = os.urandom(8).hex()
+        # 用户名 -> {Contact URI: (过期时刻, 来源地址)}
+        self.bindings = {}
+        self.dialogs = {}
+        # (branch, 方法) -> [创建时刻, 最后的响应, 目标地址]
+        self.transactions = {}
+        host = options.host if options.host not in ("0.0.0.0", "") else "127.0.0.1"
+        self.advertise = options.advertise or host
+
+    # asyncio回调
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        set_receive_buffer(transport)
+        self.loop.call_later(TRANSACTION_TTL, self._expire_transactions)
+
+    def datagram_received(self, data, addr):
+        if not data.strip():
+            # 保活用的空行
+            return
+        message = SipMessage.parse(data)
+        if message is None:
+            self.stats.malformed += 1
+            return
+        if self.options.verbose:
+            first = data.split(b"\r\n", 1)[0].decode("utf-8", "replace")
+            self.log(f"<- {addr[0]}:{addr[1]} {first}")
+        if not message.is_request:
+            # 服务器发出的BYE的响应
+            self.stats.response(message.status)
+            return
+
+        self.stats.request(message.method)
+        if message.method == "ACK":
+            self._on_ack(message)
+            return
+        if message.header("call-id") is None or message.header("via") is None:
+            self.stats.malformed += 1
+            return
+
+        key = (message.branch, message.method)
+        transaction = self.transactions.get(key) if key[0] else None
+        if transaction is not None:
+            # 重发的请求: 重发上次的响应
+            self.stats.retransmissions += 1
+            if transaction[1] is not None:
+                self.transport.sendto(transaction[1], addr)
+            return
+        if key[0]:
+            self.transactions[key] = [time.monotonic(), None, addr]
+
+        handler = getattr(self, f"_on_{message.method.lower()}", None)
+        if handler is None:
+            self.reply(message, addr, 405, extra=[f"Allow: {ALLOW}"])
+        else:
+            handler(message, addr)
+
+    def error_received(self, exc):
+        # ICMP端口不可达等，对方已经退出
+        pass
+
+    # 发送
+    def reply(self, request, addr, code, extra=(), body=b"", to_tag=None):
+        """发送响应并记入事务"""
+        lines = [f"SIP/2.0 {code} {REASONS.get(code, 'Unknown')}"]
+        vias = request.all("via")
+        for index, via in enumerate(vias):
+            if index == 0:
+                via = self._received_via(via, addr)
+            lines.append(f"Via: {via}")
+        to = request.header("to", "")
+        if to_tag and not _tag_pattern.search(to):
+            to = f"{to};tag={to_tag}"
+        lines += [
+            f"From: {request.header('from', '')}",
+            f"To: {to}",
+            f"Call-ID: {request.header('call-id', '')}",
+            f"CSeq: {request.header('cseq', '')}",
+            f"Server: {SERVER_NAME}",
+            *extra,
+        ]
+        if body:
+            lines.append("Content-Type: application/sdp")
+        lines += [f"Content-Length: {len(body)}", "", ""]
+        data = "\r\n".join(lines).encode("utf-8") + body
+        self._send(data, addr)
+        self.stats.response(code)
+        transaction = self.transactions.get((request.branch, request.method))
+        if transaction is not None:
+            transaction[1] = data
+        return data
+
+    def _send(self, data, addr):
+        if self.options.verbose:
+            first = data.split(b"\r\n", 1)[0].decode("utf-8", "replace")
+            self.log(f"-> {addr[0]}:{addr[1]} {first}")
+        self.transport.sendto(data, addr)
+
+    @staticmethod
+    def _received_via(via, addr):
+        """RFC 3581: 客户端请求rport时填入源地址和端口"""
+        if re.search(r";\s*rport(?=;|$|\s)", via):
+            via = re.sub(r";\s*rport(?=;|$|\s)", f";rport={addr[1]}", via, count=1)
+            if ";received=" not in via:
+                via += f";received={addr[0]}"
+        return via
+
+    # 认证
+    def _nonce(self):
+        stamp = f"{int(time.time()):x}"
+        return stamp + md5_hex(f"{self.secret}:{stamp}")[:16]
+
+    def _nonce_state(self, nonce):
+        """返回 'valid'、'stale' 或 'invalid'"""
+        stamp, signature = nonce[:-16], nonce[-16:]
+        if not stamp or md5_hex(f"{self.secret}:{stamp}")[:16] != signature:
+            return "invalid"
+        try:
+            age = time.time() - int(stamp, 16)
+        except ValueError:
+            return "invalid"
+        return "valid" if age <= NONCE_TTL else "stale"
+
+    def _password(self, username):
+        if self.users is None:
+            return self.options.password
+        return self.users.get(username)
+
+    def _authorize(self, request, addr, header, challenge_code, challenge_header):
+        """
+        校验摘要认证，未通过时发出质询
+
+        Returns:
+            str: 通过认证的用户名，未通过时返回None(已回复质询或403)
+        """
+        credentials = parse_auth(request.header(header))
+        stale = False
+        if credentials:
+            username = credentials.get("username", "")
+            password = self._password(username)
+            state = self._nonce_state(credentials.get("nonce", ""))
+            if password is not None and state == "valid":
+                expected = digest_response(username, credentials.get("realm", ""), password,
+                                           request.method, credentials.get("uri", ""),
+                                           credentials.get("nonce", ""), credentials.get("qop"),
+                                           credentials.get("nc"), credentials.get("cnonce"))
+                if expected == credentials.get("response"):
+                    return username
+            stale = state == "stale"
+            if not stale:
+                self.stats.auth_failures += 1
+                if password is None:
+                    self.reply(request, addr, 403)
+                    return None
+        challenge = (f'Digest realm="{self.options.realm}", nonce="{self._nonce()}", '
+                     f'algorithm=MD5, qop="auth"' + (", stale=true" if stale else ""))
+        self.reply(request, addr, challenge_code, extra=[f"{challenge_header}: {challenge}"])
+        return None
+
+    # 请求处理
+    def _on_register(self, request, addr):
+        if not self.options.no_auth:
+            if self._authorize(request, addr, "authorization", 401, "WWW-Authenticate") is None:
+                return
+        user = user_of(request.header("to"))
+        if user is None:
+            self.reply(request, addr, 400)
+            return
+        now = time.monotonic()
+        bindings = self.bindings.setdefault(user, {})
+        default_expires = request.header("expires")
+        try:
+            default_expires = int(default_expires) if default_expires is not None else 3600
+        except ValueError:
+            default_expires = 3600
+
+        for contact in request.all("contact"):
+            if contact.strip() == "*":
+                if default_expires == 0:
+                    bindings.clear()
+                continue
+            uri = uri_of(contact)
+            if uri is None:
+                continue
+            match = _expires_pattern.search(contact)
+            expires = min(int(match.group(1)) if match else default_expires, self.options.max_expires)
+            if expires == 0:
+                bindings.pop(uri, None)
+            else:
+                bindings[uri] = (now + expires, addr)
+
+        extra = [f"Contact: <{uri}>;expires={max(0, int(expiry - now))}"
+                 for uri, (expiry, _) in bindings.items() if expiry > now]
+        if not bindings:
+            del self.bindings[user]
+        extra.append(time.strftime("Date: %a, %d %b %Y %H:%M:%S GMT", time.gmtime()))
+        self.reply(request, addr, 200, extra=extra)
+
+    def _on_invite(self, request, addr):
+        call_id = request.header("call-id")
+        dialog = self.dialogs.get(call_id)
+        if dialog is not None and _tag_pattern.search(request.header("to", "")):
+            # 会话中的re-INVITE(如保持): 以同样的SDP应答
+            self.reply(request, addr, 200, extra=self._contact(), body=self._sdp(),
+                       to_tag=dialog.local_tag)
+            return
+        if self.options.auth_invite:
+            if self._authorize(request, addr, "proxy-authorization", 407, "Proxy-Authenticate") is None:
+                return
+
+        dialog = Dialog(call_id, request, addr, os.urandom(4).hex())
+        self.dialogs[call_id] = dialog
+        self.reply(request, addr, 100)
+
+        callee = user_of(request.uri)
+        if self.options.callee_must_register and not self._is_registered(callee):
+            self._finish_unanswered(dialog, 480)
+            return
+        dialog.timers.append(self.loop.call_later(self.options.ring_delay, self._ring, dialog))
+
+    def _ring(self, dialog):
+        if dialog.state != "proceeding":
+            return
+        self.reply(dialog.invite, dialog.addr, 180, to_tag=dialog.local_tag)
+        dialog.timers.append(self.loop.call_later(self.options.answer_delay, self._answer, dialog))
+
+    def _answer(self, dialog):
+        if dialog.state != "proceeding":
+            return
+        if self.options.fail_ratio > 0 and random.random() < self.options.fail_ratio:
+            self._finish_unanswered(dialog, self.options.fail_code)
+            return
+        dialog.state = "answered"
+        dialog.answered_at = time.monotonic()
+        dialog.response = self.reply(dialog.invite, dialog.addr, 200, extra=self._contact(),
+                                     body=self._sdp(), to_tag=dialog.local_tag)
+        dialog.timers = [self.loop.call_later(T1, self._retransmit_ok, dialog, T1)]
+
+    def _retransmit_ok(self, dialog, interval):
+        """收到ACK前重发200 (RFC 3261 13.3.1.4)"""
+        if dialog.state != "answered":
+            return
+        if time.monotonic() - dialog.answered_at >= TRANSACTION_TTL:
+            # 始终没有ACK: 以BYE结束
+            self._send_bye(dialog)
+            return
+        self.stats.retransmissions += 1
+        self._send(dialog.response, dialog.addr)
+        interval = min(interval * 2, T2)
+        dialog.timers = [self.loop.call_later(interval, self._retransmit_ok, dialog, interval)]
+
+    def _finish_unanswered(self, dialog, code):
+        dialog.cancel_timers()
+        dialog.state = "terminated"
+        self.dialogs.pop(dialog.call_id, None)
+        self.reply(dialog.invite, dialog.addr, code, to_tag=dialog.local_tag)
+
+    def _on_ack(self, request):
+        dialog = self.dialogs.get(request.header("call-id"))
+        if dialog is None or dialog.state != "answered":
+            return
+        dialog.cancel_timers()
+        dialog.state = "confirmed"
+        if self.options.bye_after > 0:
+            dialog.timers.append(self.loop.call_later(self.options.bye_after, self._send_bye, dialog))
+
+    def _send_bye(self, dialog):
+        """服务器主动挂断"""
+        if dialog.state not in ("answered", "confirmed"):
+            return
+        dialog.cancel_timers()
+        dialog.state = "terminated"
+        self.dialogs.pop(dialog.call_id, None)
+        invite = dialog.invite
+        dialog.cseq += 1
+        lines = [
+            f"BYE {dialog.remote_target} SIP/2.0",
+            f"Via: SIP/2.0/UDP {self.advertise}:{self.options.port};branch=z9hG4bK{os.urandom(6).hex()};rport",
+            "Max-Forwards: 70",
+            f"From: {invite.header('to')};tag={dialog.local_tag}",
+            f"To: {invite.header('from')}",
+            f"Call-ID: {dialog.call_id}",
+            f"CSeq: {dialog.cseq} BYE",
+            f"User-Agent: {SERVER_NAME}",
+            "Content-Length: 0", "", "",
+        ]
+        self._send("\r\n".join(lines).encode("utf-8"), dialog.addr)
+
+    def _on_bye(self, request, addr):
+        dialog = self.dialogs.pop(request.header("call-id"), None)
+        if dialog is None:
+            self.reply(request, addr, 481)
+            return
+        dialog.cancel_timers()
+        dialog.state = "terminated"
+        self.reply(request, addr, self.options.bye_response)
+
+    def _on_cancel(self, request, addr):
+        dialog = self.dialogs.get(request.header("call-id"))
+        if dialog is None or dialog.state != "proceeding":
+            self.reply(request, addr, 481)
+            return
+        self.reply(request, addr, 200, to_tag=dialog.local_tag)
+        self._finish_unanswered(dialog, 487)
+
+    def _on_options(self, request, addr):
+        self.reply(request, addr, 200, extra=[f"Allow: {ALLOW}"])
+
+    # 辅助
+    def _contact(self):
+        return [f"Contact: <sip:{self.advertise}:{self.options.port}>", f"Allow: {ALLOW}"]
+
+    def _sdp(self):
+        session = int(time.time())
+        ip = self.advertise
+        return (f"v=0\r\no=- {session} {session} IN IP4 {ip}\r\ns={SERVER_NAME}\r\n"
+                f"c=IN IP4 {ip}\r\nt=0 0\r\nm=audio {self.options.rtp_port} RTP/AVP 0 101\r\n"
+                "a=rtpmap:0 PCMU/8000\r\na=rtpmap:101 telephone-event/8000\r\n"
+                "a=fmtp:101 0-15\r\na=sendrecv\r\n").encode("ascii")
+
+    def _is_registered(self, user):
+        now = time.monotonic()
+        return any(expiry > now for expiry, _ in self.bindings.get(user, {}).values())
+
+    def _expire_transactions(self):
+        """清除已结束的事务和过期的注册"""
+        deadline = time.monotonic() - TRANSACTION_TTL
+        for key in [key for key, value in self.transactions.items() if value[0] < deadline]:
+            del self.transactions[key]
+        now = time.monotonic()
+        for user in list(self.bindings):
+            contacts = {uri: value for uri, value in self.bindings[user].items() if value[0] > now}
+            if contacts:
+                self.bindings[user] = contacts
+            else:
+                del self.bindings[user]
+        self.loop.call_later(TRANSACTION_TTL, self._expire_transactions)
+
+    def report(self):
+        return self.stats.report(len(self.bindings), len(self.dialogs))
+
+
+def load_users(path):
+    """读取 username,password CSV(可带表头)"""
+    users = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0].startswith("#") or row[0].strip().lower() == "username":
+                continue
+            users[row[0].strip()] = row[1].strip()
+    return users
+
+
+async def serve(options, log=print, started=None):
+    """
+    运行服务器直到被取消
+
+    Args:
+        options: 命令行参数
+        log: 日志函数
+        started: 绑定完成后调用 started(protocol)
+    """
+    users = load_users(options.users) if options.users else None
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: RegistrarProtocol(options, users, log), local_addr=(options.host, options.port))
+    log(f"SIP注册服务器已启动: udp {options.host}:{options.port}, 认证域 {options.realm}, "
+        f"{'不认证' if options.no_auth else (f'{len(users)}个用户' if users is not None else '任意用户')}")
+    if started:
+        started(protocol)
+    try:
+        while True:
+            if options.stats_interval > 0:
+                await asyncio.sleep(options.stats_interval)
+                log(protocol.report())
+            else:
+                await asyncio.sleep(3600)
+    finally:
+        transport.close()
+        log(protocol.report())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本地SIP注册服务器/被叫模拟")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=5060, help="监听端口")
+    parser.add_argument("--advertise", help="Contact和SDP中使用的地址，默认为监听地址或127.0.0.1")
+    parser.add_argument("--realm", default="sip-client", help="认证域")
+    parser.add_argument("--users", help="用户CSV: username,password；不指定时任意用户名均可注册")
+    parser.add_argument("--password", default="1234", help="未指定--users时所有用户的密码")
+    parser.add_argument("--no-auth", action="store_true", help="不进行摘要认证")
+    parser.add_argument("--auth-invite", action="store_true", help="INVITE也要求认证(407)")
+    parser.add_argument("--max-expires", type=int, default=3600, help="注册的最长有效期(秒)")
+    parser.add_argument("--ring-delay", type=float, default=0.1, help="收到INVITE到回180的延迟(秒)")
+    parser.add_argument("--answer-delay", type=float, default=0.5, help="回180到回200的延迟(秒)")
+    parser.add_argument("--fail-code", type=int, default=486, help="拒绝呼叫时的响应码")
+    parser.add_argument("--fail-ratio", type=float, default=0.0, help="拒绝呼叫的比例(0~1)")
+    parser.add_argument("--callee-must-register", action="store_true",
+                        help="被叫未注册时以480拒绝")
+    parser.add_argument("--bye-after", type=float, default=0.0,
+                        help="接通后多久由服务器发BYE挂断(秒)，0为不主动挂断")
+    parser.add_argument("--bye-response", type=int, default=200, help="应答BYE的响应码")
+    parser.add_argument("--rtp-port", type=int, default=40000, help="SDP中声明的RTP端口(不实际收发媒体)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="输出统计的间隔(秒)，0为只在退出时输出")
+    parser.add_argument("--verbose", action="store_true", help="输出每个收发消息的首行")
+    return parser
+
+
+def main():
+    options = build_parser().parse_args()
+
+    def log(message):
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    try:
+        asyncio.run(serve(options, log))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -36,7 +36,22 @@ class ConfigManager:
             'password': '1234',
             'pjsua_path': 'pjsua.exe',
             'port': 5070,
-            'auto_login': False
+            'auto_login': False,
+            'adaptive_log_level': False,
+            'warm_pool_size': 0,
+            'metrics_port': 0,
+            'metrics_host': '127.0.0.1',
+            'cdr_path': 'sip_client_cdr.db',
+            'log_dir': 'logs',
+            'log_max_bytes': 10 * 1024 * 1024,
+            'log_max_age': 24 * 3600,
+            'log_backups': 10,
+            'log_compress': True,
+            'log_queue_size': 10000,
+            'log_queue_policy': 'drop',
+            'structured_log': False,
+            'structured_log_max_bytes': 256 * 1024 * 1024,
+            'accounts': []
         }
         
         try:
@@ -94,4 +109,22 @@ class ConfigManager:
         Args:
             new_config: 包含新配置的字典
         """
-        self.config.update(new_config) 
\ No newline at end of file
+        self.config.update(new_config)
+
+    def get_accounts(self):
+        """
+        获取附加账号列表
+
+        Returns:
+            list: [{'server': ..., 'username': ..., 'password': ...}, ...]
+        """
+        return list(self.config.get('accounts') or [])
+
+    def set_accounts(self, accounts):
+        """
+        设置附加账号列表
+
+        Args:
+            accounts: 账号字典列表
+        """
+        self.config['accounts'] = list(accounts)
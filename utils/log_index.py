@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志检索
+
+为LogStore中的记录建立倒排索引: 消息中每个英文数字词(小写)和每个非ASCII字符
+各为一个词，级别、来源和事件类型作为特殊的词，每个词对应按序号排列的记录列表。
+
+检索时从各条件中选出候选记录最少的一个，用索引取出候选，其余条件逐条确认。
+建立索引和检索都按小批执行，调用方每次只运行到给定的时刻，在Tk主循环中
+分帧完成，几十万行的日志也不会让界面停顿。
+"""
+
+import re
+import time
+from array import array
+from bisect import bisect_left
+
+from utils.log_store import DEBUG, INFO, WARNING, ERROR
+
+# 词: 英文数字串或单个非ASCII字符(中文不分词，按字索引)
+_TOKEN = re.compile(r"[0-9a-z]+|[^\x00-\x7f\s]")
+
+# 事件筛选的特殊取值: 程序自身的消息、全部pjsua输出
+APP_MESSAGES = "app"
+PJSUA_OUTPUT = "pjsua"
+
+LEVELS = (DEBUG, INFO, WARNING, ERROR)
+
+# 每批处理的记录数，处理完一批才检查时间
+BATCH = 256
+
+# 候选记录超过内存中记录数的1/SCAN_RATIO时改为逐条确认
+SCAN_RATIO = 8
+
+
+def tokenize(text):
+    """把文本拆分为索引使用的词"""
+    return _TOKEN.findall(text.lower())
+
+
+class LogFilter:
+    """日志的筛选条件: 关键字(每个都须出现，不区分大小写)、最低级别和事件类型"""
+
+    def __init__(self, text="", min_level=None, event=None):
+        """
+        Args:
+            text: 以空白分隔的关键字
+            min_level: 最低级别，None表示不限
+            event: 事件类型、APP_MESSAGES或PJSUA_OUTPUT，None表示不限
+        """
+        self.text = text
+        self.terms = text.lower().split()
+        self.min_level = min_level if min_level not in (None, DEBUG) else None
+        self.event = event
+        # 较长的关键字优先，高亮时不会只标出其中较短的一部分
+        self.pattern = re.compile("|".join(re.escape(term) for term in
+                                           sorted(self.terms, key=len, reverse=True)),
+                                  re.IGNORECASE) if self.terms else None
+
+    def __bool__(self):
+        return bool(self.terms) or self.restricts
+
+    @property
+    def restricts(self):
+        """是否有关键字以外的条件"""
+        return self.min_level is not None or self.event is not None
+
+    def matches(self, record):
+        """记录是否满足全部条件"""
+        if self.min_level is not None and record.level < self.min_level:
+            return False
+        event = self.event
+        if event is not None:
+            if event == APP_MESSAGES or event == PJSUA_OUTPUT:
+                if record.source != event:
+                    return False
+            elif record.event != event:
+                return False
+        if self.terms:
+            message = record.message.lower()
+            return all(term in message for term in self.terms)
+        return True
+
+    def spans(self, text):
+        """
+        text中关键字出现的位置
+
+        Returns:
+            list: [(起始, 结束), ...]
+        """
+        if self.pattern is None:
+            return []
+        return [match.span() for match in self.pattern.finditer(text)]
+
+
+class LogIndex:
+    """LogStore的倒排索引，只在一个线程(Tk主线程)中使用"""
+
+    def __init__(self, store):
+        """
+        Args:
+            store: LogStore
+        """
+        self.store = store
+        # 词 -> 记录序号: 只出现一次的词为int，多次的为按升序排列的array('q')
+        # (Call-ID、tag等大多只出现一次，用int不必为每个词创建一个需要垃圾回收跟踪的对象)
+        self.postings = {}
+        self.vocabulary = []  # postings中的普通词，按首次出现的顺序
+        self.next_seq = store.first_seq
+        self._compacted_seq = self.next_seq
+
+    def pending(self):
+        """尚未建立索引的记录数"""
+        return max(0, self.store.next_seq - self.next_seq)
+
+    def update(self, deadline=None):
+        """
+        为新记录建立索引
+
+        Args:
+            deadline: time.perf_counter()时刻，到时停止，None表示处理全部
+
+        Returns:
+            bool: 是否已处理全部新记录
+        """
+        postings = self.postings
+        while True:
+            batch = self.store.records(self.next_seq, BATCH)
+            if not batch:
+                break
+            for record in batch:
+                seq = record.seq
+                keys = set(_TOKEN.findall(record.message.lower()))
+                keys.add(("level", record.level))
+                keys.add(("source", record.source))
+                if record.event:
+                    keys.add(("event", record.event))
+                for key in keys:
+                    posting = postings.get(key)
+                    if posting is None:
+                        postings[key] = seq
+                        if type(key) is str:
+                            self.vocabulary.append(key)
+                    elif type(posting) is int:
+                        postings[key] = array('q', (posting, seq))
+                    else:
+                        posting.append(seq)
+            self.next_seq = batch[-1].seq + 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        # 移出内存的记录累计到容量的一半时，从索引中删除
+        first = self.store.first_seq
+        self.next_seq = max(self.next_seq, first)
+        if first - self._compacted_seq >= max(1, self.store.capacity // 2):
+            self.compact()
+        return self.pending() == 0
+
+    def compact(self):
+        """删除已移出内存的记录"""
+        first = self.store.first_seq
+        postings = self.postings
+        for key, posting in list(postings.items()):
+            if type(posting) is int:
+                if posting < first:
+                    del postings[key]
+                continue
+            index = bisect_left(posting, first)
+            if index == len(posting):
+                del postings[key]
+            elif index:
+                postings[key] = posting[index:]
+        self.vocabulary = [key for key in self.vocabulary if key in postings]
+        self._compacted_seq = first
+
+    def lookup(self, key):
+        """包含某个词的记录序号(升序)"""
+        posting = self.postings.get(key, ())
+        return (posting,) if type(posting) is int else posting
+
+    def search(self, log_filter):
+        """
+        创建一次检索
+
+        Args:
+            log_filter: LogFilter
+
+        Returns:
+            LogSearch: 调用其step()分批执行
+        """
+        return LogSearch(self, log_filter)
+
+
+class LogSearch:
+    """一次分批执行的检索"""
+
+    def __init__(self, index, log_filter):
+        self.index = index
+        self.filter = log_filter
+        self.results = []       # 匹配的记录，按序号排列
+        self.end_seq = None     # 检索范围之后的第一个序号，之后的记录不在结果中
+        self.done = False
+        self._steps = self._run()
+
+    def step(self, deadline):
+        """
+        执行到deadline(time.perf_counter()时刻)或完成
+
+        Returns:
+            bool: 是否已完成
+        """
+        while not self.done:
+            try:
+                next(self._steps)
+            except StopIteration:
+                self.done = True
+            if time.perf_counter() >= deadline:
+                break
+        return self.done
+
+    def _run(self):
+        """检索过程，每处理一批产出一次"""
+        index = self.index
+        while not index.update(time.perf_counter()):
+            yield
+        snapshot = index.store.records()
+        self.end_seq = snapshot[-1].seq + 1 if snapshot else index.store.next_seq
+        if not snapshot:
+            return
+        first = snapshot[0].seq
+        candidates = yield from self._candidates()
+        matches = self.filter.matches
+        results = self.results
+        if candidates is None:
+            for start in range(0, len(snapshot), BATCH):
+                results.extend(record for record in snapshot[start:start + BATCH] if matches(record))
+                yield
+            return
+        count = len(snapshot)
+        for start in range(0, len(candidates), BATCH):
+            for seq in candidates[start:start + BATCH]:
+                position = seq - first
+                if 0 <= position < count:
+                    record = snapshot[position]
+                    if matches(record):
+                        results.append(record)
+            yield
+
+    def _candidates(self):
+        """
+        选出候选记录最少的条件，返回其候选序号(升序)；没有可用索引的条件、或候选多到
+        不如逐条确认时返回None
+
+        各关键字按词拆分: 只有一个词时须包含在某个索引词中，有多个词时首词是索引词
+        的结尾、末词是开头、中间的词完全相同。
+        """
+        lookup = self.index.lookup
+        log_filter = self.filter
+        cost = lambda keys: sum(len(lookup(key)) for key in keys)
+        options = []  # 每个条件可能对应的索引词及其候选记录数: (词列表, 记录数)
+        if log_filter.min_level is not None:
+            keys = [("level", level) for level in LEVELS if level >= log_filter.min_level]
+            options.append((keys, cost(keys)))
+        if log_filter.event in (APP_MESSAGES, PJSUA_OUTPUT):
+            options.append(([("source", log_filter.event)], cost([("source", log_filter.event)])))
+        elif log_filter.event is not None:
+            options.append(([("event", log_filter.event)], cost([("event", log_filter.event)])))
+
+        vocabulary = self.index.vocabulary
+        for term in log_filter.terms:
+            words = tokenize(term)
+            if not words:
+                continue
+            for position, word in enumerate(words):
+                # 中间的词和非ASCII字符(本身就是一个词)直接查索引
+                if (len(words) > 1 and 0 < position < len(words) - 1) or not word.isascii():
+                    options.append(([word], cost([word])))
+                    continue
+                if len(words) == 1:
+                    test = lambda key, word=word: word in key
+                elif position == 0:
+                    test = lambda key, word=word: key.endswith(word)
+                else:
+                    test = lambda key, word=word: key.startswith(word)
+                keys = []
+                total = 0
+                for start in range(0, len(vocabulary), BATCH * 8):
+                    found = [key for key in vocabulary[start:start + BATCH * 8] if test(key)]
+                    keys.extend(found)
+                    total += cost(found)
+                    yield
+                options.append((keys, total))
+
+        if not options:
+            return None
+        best, total = min(options, key=lambda option: option[1])
+        if total > len(self.index.store) // SCAN_RATIO:
+            # 如输入的第一个字符，几乎每条记录都是候选，合并排序反而比逐条确认慢
+            return None
+        if len(best) == 1:
+            return lookup(best[0])
+        merged = set()
+        for key in best:
+            merged.update(lookup(key))
+            yield
+        return sorted(merged)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志文件
+
+日志记录放入有界队列后立即返回，由后台线程格式化并批量写入日志目录中的文件，
+记录日志的线程(PJSUA输出读取线程、Tk主线程)不做任何文件操作。当前文件超过
+大小上限或打开时间超过时限后改名归档，可选gzip压缩，只保留最近的若干个归档。
+
+队列满时按策略处理: DROP 丢弃新记录并计数；BLOCK 等待写入线程腾出空间，
+超过等待时限仍然丢弃。导出日志也由写入线程完成，导出的内容包含导出前
+放入队列的全部记录。
+"""
+
+import os
+import gzip
+import time
+import shutil
+import threading
+from collections import deque
+
+# 队列满时的处理策略
+DROP = "drop"
+BLOCK = "block"
+
+# 默认限制: 单个文件10MB、最长一天，保留10个归档
+MAX_BYTES = 10 * 1024 * 1024
+MAX_AGE = 24 * 3600
+BACKUPS = 10
+QUEUE_SIZE = 10_000
+
+# 导出时每次读写的字节数
+CHUNK_SIZE = 1 << 20
+
+
+class _Export:
+    """排在队列中的导出请求"""
+
+    __slots__ = ('path', 'callback')
+
+    def __init__(self, path, callback):
+        self.path = path
+        self.callback = callback
+
+
+class LogSink:
+    """后台写入的滚动日志文件(线程安全)"""
+
+    # 与日志文件同名、随之改名和删除的附属文件后缀(子类使用)
+    SIDECARS = ()
+
+    def __init__(self, directory, basename="sip_client", max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                 backups=BACKUPS, compress=True, queue_size=QUEUE_SIZE, policy=DROP,
+                 block_timeout=1.0, formatter=None, suffix=".log", log=print):
+        """
+        创建日志目录并启动写入线程
+
+        Args:
+            directory: 日志目录
+            basename: 文件名前缀，当前文件为 <basename><suffix>
+            max_bytes: 单个文件的大小上限(字节)，0表示不限
+            max_age: 单个文件的时长上限(秒)，0表示不限
+            backups: 保留的归档数
+            compress: 归档是否gzip压缩
+            queue_size: 队列中最多等待写入的记录数
+            policy: 队列满时的策略，DROP 或 BLOCK
+            block_timeout: BLOCK策略下最长等待(秒)
+            formatter: 把记录转换为一行文本的函数，默认为 record.full()
+            suffix: 文件扩展名
+            log: 报告写入错误的函数(不能是写入本文件的日志函数)
+        """
+        if policy not in (DROP, BLOCK):
+            raise ValueError(f"未知的队列策略: {policy}")
+        self.directory = directory
+        self.basename = basename
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.compress = compress
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.formatter = formatter or (lambda record: record.full())
+        self.log = log
+        self.path = os.path.join(directory, basename + suffix)
+
+        # 统计信息
+        self.written = 0        # 写入的记录数
+        self.bytes = 0          # 写入的字节数
+        self.dropped = 0        # 队列满而丢弃的记录数
+        self.rotations = 0
+        self.errors = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # 上次运行留下的当前文件先归档，每次运行从新文件开始
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self._rotate()
+        self._file = None
+        self._opened = None
+        self._size = 0
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._records = 0       # 队列中的记录数(不含导出请求)
+        self._busy = False      # 写入线程正在处理取出的一批
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        """
+        放入一条记录，不等待写入
+
+        Args:
+            record: 日志记录
+
+        Returns:
+            bool: 是否放入，队列满而丢弃时为False
+        """
+        with self._cond:
+            return self._put_locked(record)
+
+    def put_many(self, records):
+        """
+        放入一批记录，只获取一次锁
+
+        Returns:
+            int: 放入的记录数
+        """
+        with self._cond:
+            return sum(self._put_locked(record) for record in records)
+
+    def _put_locked(self, record):
+        """在持有锁时放入一条记录"""
+        if self._closing:
+            return False
+        if self._records >= self.queue_size:
+            if self.policy == DROP or not self._cond.wait_for(
+                    lambda: self._records < self.queue_size or self._closing, self.block_timeout) \
+                    or self._closing:
+                self.dropped += 1
+                return False
+        self._queue.append(record)
+        self._records += 1
+        if len(self._queue) == 1:
+            self._cond.notify_all()
+        return True
+
+    def pending(self):
+        """等待写入的记录数"""
+        return self._records
+
+    def export(self, path, callback=None):
+        """
+        把全部日志文件(从旧到新，压缩的归档解压)依次写入path
+
+        在写入线程中完成，导出前放入的记录都会包含在内。
+
+        Args:
+            path: 目标文件路径
+            callback: 完成后在写入线程中调用 callback(error)，成功时error为None
+        """
+        with self._cond:
+            if self._closing:
+                if callback:
+                    callback(RuntimeError("日志文件已关闭"))
+                return
+            self._queue.append(_Export(path, callback))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        等待队列中的记录全部写入
+
+        Returns:
+            bool: 超时前是否完成
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self, timeout=5.0):
+        """写入剩余的记录后关闭文件"""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def files(self):
+        """
+        日志目录中的文件，从旧到新
+
+        Returns:
+            list: 文件路径，最后一项为当前文件(如果存在)
+        """
+        prefix = self.basename + "_"
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith(prefix) and
+                 (name.endswith(self.suffix) or name.endswith(self.suffix + ".gz"))]
+        # 同一秒内的归档文件名顺序不一定是归档顺序，按修改时刻排列
+        paths.sort(key=lambda path: (os.path.getmtime(path), path))
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return paths
+
+    def report(self):
+        """写入统计"""
+        return (f"已写入{self.written}条({self.bytes / 1e6:.1f} MB), 归档{self.rotations}次, "
+                f"排队{self.pending()}条, 丢弃{self.dropped}条, 失败{self.errors}次")
+
+    def _run(self):
+        """写入线程: 取出队列中的全部内容，记录批量写入，遇到导出请求时先写完之前的记录"""
+        while True:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                items = list(self._queue)
+                self._queue.clear()
+                self._records = 0
+                self._busy = bool(items)
+                closing = self._closing
+                # 腾出了空间，唤醒BLOCK策略下等待的线程
+                self._cond.notify_all()
+            batch = []
+            for item in items:
+                if isinstance(item, _Export):
+                    self._write(batch)
+                    batch = []
+                    self._export(item)
+                else:
+                    batch.append(item)
+            self._write(batch)
+            if closing:
+                self._close_file()
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+                return
+
+    def _write(self, records):
+        """格式化并写入一批记录，必要时先归档当前文件"""
+        if not records:
+            return
+        try:
+            data = self._encode(records)
+        except Exception as e:
+            self.errors += 1
+            self.log(f"格式化日志失败: {str(e)}")
+            return
+        try:
+            if self._file is not None and self._expired():
+                self._close_file()
+                self._rotate()
+            if self._file is None:
+                self._file = open(self.path, "ab")
+                self._opened = time.time()
+                self._size = self._file.tell()
+            offset = self._size
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.written += len(records)
+            self.bytes += len(data)
+        except OSError as e:
+            self.errors += 1
+            self.log(f"写入日志文件失败: {str(e)}")
+            self._close_file()
+            return
+        try:
+            self._after_write(records, offset)
+        except Exception as e:
+            self.errors += 1
+            self.log(f"写入日志附属文件失败: {str(e)}")
+
+    def _encode(self, records):
+        """把一批记录编码为写入文件的字节"""
+        return ("\n".join(self.formatter(record) for record in records) + "\n").encode("utf-8")
+
+    def _after_write(self, records, offset):
+        """一批记录写入当前文件后调用，offset为这批数据在文件中的起始位置(子类覆盖)"""
+
+    def _expired(self):
+        """当前文件是否超过大小或时长上限"""
+        return ((self.max_bytes and self._size >= self.max_bytes) or
+                (self.max_age and time.time() - self._opened >= self.max_age))
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """把当前文件改名为带时刻的归档，按需压缩，删除多余的旧归档"""
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(os.path.getmtime(self.path)))
+        target = os.path.join(self.directory, f"{self.basename}_{stamp}{self.suffix}")
+        serial = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = os.path.join(self.directory, f"{self.basename}_{stamp}_{serial:03d}{self.suffix}")
+            serial += 1
+        try:
+            os.replace(self.path, target)
+            for sidecar in self.SIDECARS:
+                if os.path.exists(self.path + sidecar):
+                    os.replace(self.path + sidecar, target + sidecar)
+            self.rotations += 1
+            if self.compress:
+                with open(target, "rb") as src, gzip.open(target + ".gz", "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.remove(target)
+        except OSError as e:
+            self.errors += 1
+            self.log(f"归档日志文件失败: {str(e)}")
+        archives = self.files()
+        if archives and archives[-1] == self.path:
+            archives.pop()
+        for path in archives[:max(0, len(archives) - self.backups)]:
+            for name in (path,) + tuple(path + sidecar for sidecar in self.SIDECARS):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+
+    def _export(self, request):
+        """把全部日志文件依次写入request.path"""
+        error = None
+        try:
+            with open(request.path, "wb") as out:
+                for path in self.files():
+                    opener = gzip.open if path.endswith(".gz") else open
+                    with opener(path, "rb") as f:
+                        shutil.copyfileobj(f, out, CHUNK_SIZE)
+        except OSError as e:
+            error = e
+        if request.callback:
+            try:
+                request.callback(error)
+            except Exception as e:
+                self.log(f"日志导出回调出错: {str(e)}")
+
+
+def sink_from_config(config, log=print):
+    """
+    按配置创建日志文件，log_dir为空时返回None
+
+    Args:
+        config: ConfigManager
+
+    Returns:
+        LogSink: 或None
+    """
+    directory = config.get('log_dir', 'logs')
+    if not directory:
+        return None
+    try:
+        return LogSink(directory,
+                       max_bytes=int(config.get('log_max_bytes', MAX_BYTES)),
+                       max_age=float(config.get('log_max_age', MAX_AGE)),
+                       backups=int(config.get('log_backups', BACKUPS)),
+                       compress=bool(config.get('log_compress', True)),
+                       queue_size=int(config.get('log_queue_size', QUEUE_SIZE)),
+                       policy=config.get('log_queue_policy', DROP),
+                       log=log)
+    except (OSError, ValueError) as e:
+        log(f"无法创建日志文件，日志只保存在内存中: {str(e)}")
+        return None
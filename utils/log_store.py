@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志存储
+
+日志以紧凑的记录(序号、时刻、级别、来源、消息)保存在有界的内存环形缓冲中，
+缓冲满时最旧的一批记录整批追加到磁盘上的溢出文件，内存占用不随运行时长增长。
+界面的日志控件只显示最近的一段，完整的日志由本存储(内存 + 溢出文件)提供。
+"""
+
+import os
+import time
+import tempfile
+import threading
+from itertools import islice
+from collections import deque
+
+# 日志级别
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# 未指定级别时按消息中的关键字推断
+_ERROR_WORDS = ("错误", "异常", "失败", "Error", "error", "Exception")
+_WARNING_WORDS = ("超时", "警告", "已被占用", "无法", "Warning", "warning")
+
+# 内存中保留的记录数
+DEFAULT_CAPACITY = 100_000
+
+# 最近一次格式化的 (整秒, "HH:MM:SS")，同一秒内的记录不再调用strftime
+_last_clock = (None, "")
+
+
+def _clock(timestamp):
+    """时刻的 "HH:MM:SS" 文本"""
+    global _last_clock
+    second = int(timestamp)
+    cached = _last_clock
+    if cached[0] != second:
+        cached = _last_clock = (second, time.strftime('%H:%M:%S', time.localtime(second)))
+    return cached[1]
+
+
+def guess_level(message):
+    """
+    按关键字推断消息的级别
+
+    Args:
+        message: 日志消息
+
+    Returns:
+        int: ERROR、WARNING或INFO
+    """
+    if any(word in message for word in _ERROR_WORDS):
+        return ERROR
+    if any(word in message for word in _WARNING_WORDS):
+        return WARNING
+    return INFO
+
+
+class LogRecord:
+    """一条日志"""
+
+    __slots__ = ('seq', 'time', 'level', 'source', 'message', 'event')
+
+    def __init__(self, seq, timestamp, level, source, message, event=None):
+        self.seq = seq
+        self.time = timestamp
+        self.level = level
+        self.source = source
+        self.message = message
+        self.event = event  # pjsua输出行的事件类型，未归类为None
+
+    def display(self):
+        """日志控件中显示的文本"""
+        return f"[{_clock(self.time)}] {self.message}"
+
+    def full(self):
+        """写入文件的文本，含日期、毫秒、级别和来源"""
+        clock = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.time))
+        millis = int(self.time * 1000) % 1000
+        return f"{clock}.{millis:03d} {LEVEL_NAMES.get(self.level, self.level):<7} {self.source} {self.message}"
+
+
+class LogStore:
+    """有界的内存日志缓冲，满时把最旧的记录批量写入溢出文件(线程安全)"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, spill_path=None, spill_chunk=None):
+        """
+        Args:
+            capacity: 内存中最多保留的记录数
+            spill_path: 溢出文件路径，默认在临时目录中按进程号创建；为空字符串时丢弃溢出的记录
+            spill_chunk: 每次溢出的记录数，默认为容量的1/10
+        """
+        self.capacity = capacity
+        self.spill_chunk = spill_chunk or max(1, capacity // 10)
+        if spill_path is None:
+            directory = os.path.join(tempfile.gettempdir(), "sip_client_logs")
+            spill_path = os.path.join(directory, f"log_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.txt")
+        self.spill_path = spill_path
+        self.spilled = 0        # 已写入溢出文件的记录数
+        self.spill_bytes = 0    # 溢出文件中已写入的字节数
+        self.spill_errors = 0
+
+        self._records = deque()
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def first_seq(self):
+        """内存中最旧记录的序号"""
+        with self._lock:
+            return self._records[0].seq if self._records else self._next_seq
+
+    @property
+    def next_seq(self):
+        """下一条记录的序号"""
+        return self._next_seq
+
+    def append(self, message, level=None, source="app", timestamp=None, event=None):
+        """
+        添加一条日志
+
+        Args:
+            message: 消息
+            level: 级别，默认按关键字推断
+            source: 来源，如 "app"、"pjsua"
+            timestamp: time.time()时刻，默认为现在
+            event: 事件类型
+
+        Returns:
+            LogRecord: 新记录
+        """
+        if level is None:
+            level = guess_level(message)
+        with self._lock:
+            record = LogRecord(self._next_seq, timestamp or time.time(), level, source, message, event)
+            self._next_seq += 1
+            self._records.append(record)
+            self._trim()
+        return record
+
+    def extend(self, messages, source="app", events=None, timestamp=None):
+        """
+        添加一批日志(如同一次读取的pjsua输出)，只获取一次锁
+
+        Args:
+            messages: 消息列表，级别按关键字推断
+            source: 来源
+            events: 与messages等长的事件类型列表，默认都为None
+            timestamp: time.time()时刻，默认为现在
+
+        Returns:
+            list: 新记录
+        """
+        timestamp = timestamp or time.time()
+        levels = [guess_level(message) for message in messages]
+        events = events or [None] * len(messages)
+        with self._lock:
+            seq = self._next_seq
+            records = [LogRecord(seq + index, timestamp, level, source, message, event)
+                       for index, (message, level, event) in enumerate(zip(messages, levels, events))]
+            self._next_seq = seq + len(records)
+            self._records.extend(records)
+            self._trim()
+        return records
+
+    def _trim(self):
+        """超出容量时(持有锁)整批移出最旧的记录，分摊文件写入的开销；在锁内写出以保持文件中的顺序"""
+        while len(self._records) > self.capacity:
+            count = min(self.spill_chunk, len(self._records))
+            self._spill([self._records.popleft() for _ in range(count)])
+
+    def _spill(self, records):
+        """把移出内存的记录追加到溢出文件"""
+        if not self.spill_path or not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            data = ("\n".join(record.full() for record in records) + "\n").encode("utf-8")
+            with open(self.spill_path, "ab") as f:
+                f.write(data)
+            self.spilled += len(records)
+            self.spill_bytes += len(data)
+        except OSError:
+            self.spill_errors += 1
+
+    def records(self, start_seq=None, limit=None):
+        """
+        内存中的记录快照
+
+        Args:
+            start_seq: 只返回序号不小于该值的记录
+            limit: 最多返回的条数
+
+        Returns:
+            list: [LogRecord, ...]
+        """
+        with self._lock:
+            records = self._records
+            skip = max(0, start_seq - records[0].seq) if start_seq is not None and records else 0
+            stop = len(records) if limit is None else min(len(records), skip + limit)
+            if skip >= stop:
+                return []
+            if skip == 0 and stop == len(records):
+                return list(records)
+            if skip > len(records) // 2:
+                # 靠近末尾时从右端取，不必跳过前面的大部分记录
+                return list(islice(reversed(records), len(records) - stop, len(records) - skip))[::-1]
+            return list(islice(records, skip, stop))
+
+    def tail(self, count):
+        """最近的count条记录"""
+        with self._lock:
+            return list(islice(self._records, max(0, len(self._records) - count), None))
+
+    def clear(self):
+        """清空内存中的记录，记录先写入溢出文件，不会丢失"""
+        with self._lock:
+            self._spill(list(self._records))
+            self._records.clear()
+
+    def export(self, path):
+        """
+        把完整的日志(溢出文件和内存中的记录)写入path
+
+        Args:
+            path: 目标文件路径
+
+        Returns:
+            int: 写入的记录数
+        """
+        # 同时记下溢出文件的长度，之后溢出的记录已包含在快照中
+        with self._lock:
+            records = list(self._records)
+            spilled, remaining = self.spilled, self.spill_bytes
+        with open(path, "wb") as out:
+            if remaining:
+                with open(self.spill_path, "rb") as f:
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 1 << 20))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        remaining -= len(chunk)
+            for start in range(0, len(records), 10000):
+                out.write("".join(record.full() + "\n"
+                                  for record in records[start:start + 10000]).encode("utf-8"))
+        return spilled + len(records)
+
+    def report(self):
+        """内存和溢出文件的统计"""
+        return (f"内存中{len(self._records)}条(上限{self.capacity}), "
+                f"已溢出到文件{self.spilled}条, 溢出失败{self.spill_errors}次")
@@ -4,42 +4,362 @@
 """
 日志管理器
 
-提供日志记录和显示功能。
+提供日志记录和显示功能。日志保存在有界的LogStore中(旧记录溢出到磁盘)，
+日志控件只保留最近的若干行。
+
+任意线程记录的日志先进入队列，由Tk主循环每帧取出，以一次插入和一次滚动
+显示；每帧的处理时间有上限，大量日志涌入时界面仍能及时响应。记录日志的
+线程不调用任何Tk方法。配置了LogSink时日志同时由后台线程写入滚动的日志文件，
+不再逐行打印到控制台。
+
+日志页的筛选由LogIndex在内存中的全部日志上分批检索，控件只重新显示匹配的行；
+只高亮关键字时给已显示的行添加标签，不重新插入文本。
 """
 
-import tkinter as tk
+import sys
 import time
+import threading
+from collections import deque
+
+from utils.log_store import LogStore
+from utils.log_index import LogIndex
 
 class Logger:
     """日志管理器类"""
+
+    # 日志控件最多保留的行数，超出TRIM_LINES行后一次删除最旧的部分
+    MAX_WIDGET_LINES = 5000
+    TRIM_LINES = 1000
+    # 刷新间隔(毫秒)和每帧用于格式化日志的时间上限(秒)
+    FRAME_INTERVAL = 30
+    FRAME_BUDGET = 0.008
+    # 每格式化这么多行检查一次时间
+    FORMAT_CHUNK = 256
     
-    def __init__(self, root):
-        """初始化日志管理器"""
+    def __init__(self, root, store=None, sink=None):
+        """
+        初始化日志管理器
+
+        Args:
+            root: Tk根窗口
+            store: 保存最近日志的LogStore，默认新建
+            sink: 写入日志文件的LogSink，为None时打印到控制台
+        """
         self.root = root
         self.log_text = None  # 会在UI创建过程中设置
+        self.sink = sink
+        # 有日志文件时完整日志已在文件中，内存缓冲不再溢出到临时文件
+        self.store = store or LogStore(spill_path="" if sink is not None else None)
+        self.widget_lines = 0  # 日志控件中的行数
+
+        # 等待显示的记录，deque的append和popleft是线程安全的
+        self._pending = deque()
+        self._running = False
+        # 日志控件中各行对应的记录，与控件同步删除
+        self._shown = deque()
+
+        # 筛选: view_filter不为None时只显示匹配的记录；highlight中的关键字高亮显示
+        self.view_filter = None
+        self.highlight = None
+        # 首次检索时创建，之后每帧用剩余的时间为新记录建立索引
+        self.index = None
+
+        # 统计信息
+        self.frames = 0         # 执行过插入的帧数
+        self.rendered = 0       # 显示的行数
+        self.skipped = 0        # 积压超过控件容量而未显示的行数(仍在日志存储中)
+        self.max_frame = 0.0    # 单帧最长耗时(秒)
         
     def set_log_widget(self, log_text):
-        """设置日志文本控件"""
+        """设置日志文本控件，并显示设置前已记录的日志"""
+        if log_text is self.log_text:
+            return
         self.log_text = log_text
+        self._pending.extend(self.store.tail(self.MAX_WIDGET_LINES))
+        if not self._running:
+            self._running = True
+            self.root.after(self.FRAME_INTERVAL, self._tick)
         
-    def log(self, message):
-        """记录日志消息"""
+    def log(self, message, level=None, source="app"):
+        """
+        记录日志消息
+
+        Args:
+            message: 消息
+            level: 级别(utils.log_store中的常量)，默认按关键字推断
+            source: 来源
+        """
+        record = self.store.append(message, level, source)
+        if self.sink is not None:
+            self.sink.put(record)
         if not self.log_text:
             print(f"日志控件未设置，消息：{message}")
             return
-            
-        timestamp = time.strftime("%H:%M:%S", time.localtime())
-        log_message = f"[{timestamp}] {message}"
+
+        # 由UI线程在下一帧显示
+        self._pending.append(record)
+
+        if self.sink is None:
+            # 没有日志文件时同时打印到控制台
+            print(record.display())
+
+    def log_many(self, messages, source="app", events=None):
+        """
+        记录一批日志消息(如一次读取的pjsua输出)，可在任意线程调用
+
+        Args:
+            messages: 消息列表
+            source: 来源
+            events: 与messages等长的事件类型列表
+        """
+        if not messages:
+            return
+        records = self.store.extend(messages, source, events)
+        if self.sink is not None:
+            self.sink.put_many(records)
+        if not self.log_text:
+            for message in messages:
+                print(f"日志控件未设置，消息：{message}")
+            return
+        self._pending.extend(records)
+        if self.sink is None:
+            print("\n".join(record.display() for record in records))
+
+    def stop(self):
+        """停止按帧刷新"""
+        self._running = False
+
+    def close(self):
+        """停止刷新，写完日志文件后关闭"""
+        self.stop()
+        if self.sink is not None:
+            self.sink.close()
+
+    def export(self, path, callback):
+        """
+        导出完整日志，不阻塞调用的线程
+
+        有日志文件时由其写入线程依次复制各文件，否则从日志存储导出。
+
+        Args:
+            path: 目标文件路径
+            callback: 完成后调用 callback(error)，可能在其他线程中调用，成功时error为None
+        """
+        if self.sink is not None:
+            self.sink.export(path, callback)
+            return
+
+        def run():
+            try:
+                self.store.export(path)
+            except OSError as e:
+                callback(e)
+            else:
+                callback(None)
+
+        threading.Thread(target=run, name="log-export", daemon=True).start()
+
+    def _tick(self):
+        """每帧执行一次"""
+        if not self._running:
+            return
+        try:
+            started = time.perf_counter()
+            self.flush()
+            if self.index is not None:
+                self.index.update(started + self.FRAME_BUDGET)
+        finally:
+            self.root.after(self.FRAME_INTERVAL, self._tick)
+
+    def flush(self):
+        """
+        在UI线程中显示队列中的日志
+
+        本帧的时间上限内能格式化的行一次插入控件，其余留到下一帧。
+        积压超过控件容量时只显示最新的部分，更早的行反正会被立即删除。
+        """
+        pending = self._pending
+        if not pending:
+            return
+        started = time.perf_counter()
+        excess = len(pending) - self.MAX_WIDGET_LINES
+        for _ in range(max(0, excess)):
+            pending.popleft()
+        self.skipped += max(0, excess)
+
+        view = self.view_filter
+        highlight = self.highlight
+        first_line = self.widget_lines + 1
+        records = []
+        texts = []
+        ranges = []  # 需要高亮的位置，筛选、格式化和查找关键字都计入本帧的时间
+        while pending and time.perf_counter() - started < self.FRAME_BUDGET:
+            for _ in range(min(self.FORMAT_CHUNK, len(pending))):
+                record = pending.popleft()
+                if view is not None and not view.matches(record):
+                    continue
+                text = record.display()
+                if highlight is not None:
+                    self._match_ranges(ranges, first_line + len(records), record, text)
+                records.append(record)
+                texts.append(text)
+        if records:
+            self._insert(records, texts, ranges)
+            self.rendered += len(records)
+            self.frames += 1
+            self.max_frame = max(self.max_frame, time.perf_counter() - started)
+
+    def pending_count(self):
+        """等待显示的行数"""
+        return len(self._pending)
+
+    def render_report(self):
+        """日志显示的统计"""
+        average = self.rendered / self.frames if self.frames else 0
+        return (f"{self.rendered}行 {self.frames}帧(平均每帧{average:.1f}行), "
+                f"积压跳过{self.skipped}行, 单帧最长{self.max_frame * 1000:.1f}ms, 待显示{self.pending_count()}行")
         
-        # 在UI线程中更新日志
-        self.root.after(0, lambda: self._update_log_text(log_message))
+    def _insert(self, records, texts, ranges):
+        """
+        在日志文本控件末尾插入已格式化的记录并高亮关键字，超过行数上限时删除最旧的行
+
+        Args:
+            records: 记录
+            texts: 各记录显示的文本
+            ranges: 高亮位置，从插入前的下一行起算的Tk索引，成对排列
+        """
+        # 使用Tk常量的字符串值，本模块无需导入tkinter即可在无界面环境中使用
+        self.log_text.config(state="normal")  # 允许修改
+        self.log_text.insert("end", "\n".join(texts) + "\n")
+        self._shown.extend(records)
+        self.widget_lines += len(records)
+        if ranges:
+            # 一次调用标出全部位置
+            self.log_text.tag_add("match", *ranges)
+        excess = self.widget_lines - self.MAX_WIDGET_LINES
+        if excess >= self.TRIM_LINES:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            for _ in range(excess):
+                self._shown.popleft()
+            self.widget_lines -= excess
+        self.log_text.see("end")  # 滚动到最后
+        self.log_text.config(state="disabled")  # 恢复只读
+
+    def _match_ranges(self, ranges, line, record, text):
+        """把显示为第line行text的记录中关键字的位置追加到ranges"""
+        # 只在消息中匹配，不标出时刻中的数字
+        offset = len(text) - len(record.message)
+        for start, end in self.highlight.spans(record.message):
+            ranges.append(f"{line}.{offset + start}")
+            ranges.append(f"{line}.{offset + end}")
+
+    def search(self, log_filter):
+        """
+        在内存中的全部日志中检索，在UI线程中调用
+
+        Args:
+            log_filter: LogFilter
+
+        Returns:
+            LogSearch: 调用方在Tk主循环中分批调用其step()
+        """
+        if self.index is None:
+            self.index = LogIndex(self.store)
+        return self.index.search(log_filter)
+
+    def set_filter(self, log_filter, view=False):
+        """
+        设置日志页的筛选条件，在UI线程中调用
+
+        只高亮时重新标记控件中已有的行。开始只显示匹配的行时清空控件，之后的新记录
+        按条件筛选，已有的匹配记录由调用方检索完成后通过show_results()显示；
+        取消时恢复显示最近的日志。
+
+        Args:
+            log_filter: LogFilter，为None或不含任何条件时取消筛选
+            view: 是否只显示匹配的记录(否则只高亮关键字)
+        """
+        if not log_filter:
+            log_filter = None
+        was_viewing = self.view_filter is not None
+        self.highlight = log_filter if log_filter is not None and log_filter.pattern else None
+        self.view_filter = log_filter if view else None
+        if not self.log_text:
+            return
+        if self.view_filter is not None:
+            self._replace([], self.store.next_seq)
+        elif was_viewing:
+            records = self.store.tail(self.MAX_WIDGET_LINES)
+            self._replace(records, records[-1].seq + 1 if records else self.store.next_seq)
+        else:
+            self.log_text.tag_remove("match", "1.0", "end")
+            if self.highlight is not None:
+                ranges = []
+                for line, record in enumerate(self._shown, 1):
+                    self._match_ranges(ranges, line, record, record.display())
+                if ranges:
+                    self.log_text.tag_add("match", *ranges)
+
+    def show_results(self, search):
+        """
+        显示检索完成的匹配记录，在UI线程中调用
+
+        Args:
+            search: 已完成的LogSearch，其条件须与当前的view_filter相同
+        """
+        if not self.log_text or search.filter is not self.view_filter:
+            return
+        end_seq = search.end_seq
+        # 检索开始后已显示的新记录接在检索结果之后
+        later = [record for record in self._shown if record.seq >= end_seq]
+        records = search.results[-self.MAX_WIDGET_LINES:] + later
+        self._replace(records[-self.MAX_WIDGET_LINES:], end_seq)
+
+    def _replace(self, records, cutoff_seq):
+        """
+        清空控件并重新显示records，丢弃等待显示的记录中序号小于cutoff_seq的部分
+
+        records排在等待显示的记录之前，与新日志一样由flush()按帧的时间上限分批显示。
+        """
+        pending = self._pending
+        while pending and pending[0].seq < cutoff_seq:
+            pending.popleft()
+        pending.extendleft(reversed(records))
+        self.log_text.config(state="normal")
+        self.log_text.delete("1.0", "end")
+        self._shown.clear()
+        self.widget_lines = 0
+        self.log_text.config(state="disabled")
+
+    def clear(self):
+        """清除日志控件，内存中的日志转入溢出文件"""
+        self.store.clear()
+        self._pending.clear()
+        self._shown.clear()
+        self.widget_lines = 0
+        if self.index is not None:
+            self.index.compact()
+        if self.log_text:
+            self.log_text.config(state="normal")
+            self.log_text.delete("1.0", "end")
+            self.log_text.config(state="disabled")
+
+
+class ConsoleLogger:
+    """控制台日志管理器，供无界面运行时使用"""
+    
+    def __init__(self, stream=None):
+        """
+        初始化控制台日志管理器
         
-        # 同时打印到控制台
-        print(log_message)
+        Args:
+            stream: 输出流，默认为标准输出
+        """
+        self.stream = stream or sys.stdout
         
-    def _update_log_text(self, message):
-        """更新日志文本控件"""
-        self.log_text.config(state=tk.NORMAL)  # 允许修改
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)  # 滚动到最后
-        self.log_text.config(state=tk.DISABLED)  # 恢复只读 
\ No newline at end of file
+    def log(self, message):
+        """记录日志消息，可在任意线程调用"""
+        timestamp = time.strftime("%H:%M:%S", time.localtime())
+        # 一次写入整行，避免多线程输出交错
+        self.stream.write(f"[{timestamp}] {message}\n")
+        self.stream.flush()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进程资源统计
+
+读取指定进程的常驻内存和累计CPU时间，用于比较一个pjsua进程承载多个账号
+与每个账号一个进程的资源占用。优先使用psutil(可选依赖)，未安装时在Linux上
+读取/proc，在Windows上调用psapi。
+"""
+
+import os
+import sys
+
+
+def process_usage(pid):
+    """
+    获取进程的资源占用
+
+    Args:
+        pid: 进程ID
+
+    Returns:
+        tuple: (常驻内存字节数, 累计CPU秒数)，无法获取时返回None
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    try:
+        if psutil is not None:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return process.memory_info().rss, times.user + times.system
+        if sys.platform == "win32":
+            return _windows_usage(pid)
+        if os.path.exists(f"/proc/{pid}/stat"):
+            return _proc_usage(pid)
+    except Exception:
+        pass
+    return None
+
+
+def _proc_usage(pid):
+    """从/proc读取(Linux)"""
+    with open(f"/proc/{pid}/stat") as f:
+        # 进程名可能含空格，从右括号之后开始按空格切分
+        fields = f.read().rpartition(")")[2].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    return rss, cpu
+
+
+def _windows_usage(pid):
+    """通过psapi读取(Windows)"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        creation, exit_time, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        if not kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                                        ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        # FILETIME以100纳秒为单位
+        cpu = sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in (kernel, user)) / 1e7
+        return counters.WorkingSetSize, cpu
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def format_usage(usage, accounts=1):
+    """
+    格式化资源占用
+
+    Args:
+        usage: process_usage()的返回值
+        accounts: 分摊的账号数
+
+    Returns:
+        str: 如 "内存 12.3 MB, CPU 0.52 秒 (每账号 4.1 MB, 0.17 秒)"
+    """
+    if usage is None:
+        return "无法获取"
+    rss, cpu = usage
+    text = f"内存 {rss / 1048576:.1f} MB, CPU {cpu:.2f} 秒"
+    if accounts > 1:
+        text += f" (每账号 {rss / 1048576 / accounts:.1f} MB, {cpu / accounts:.2f} 秒)"
+    return text